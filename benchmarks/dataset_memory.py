@@ -0,0 +1,61 @@
+"""Memory of the outlet datasets as the server holds them, per dataset and column.
+
+Synthetic sources in the schema of Data Habs, Leads and Customers are cleaned
+with ``route_optimizer.datasets.prepare_*``, which return the compact layout
+(categorical regions, float32 coordinates, only the used columns of Customers).
+The same cleaned data with plain object strings and float64 coordinates is
+measured for comparison. Every session of a server shares the one dataset.
+
+Run from the repository root:
+
+    python benchmarks/dataset_memory.py --rows 10000 100000 --columns
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.datasets import DATASETS, memory_report, prepare_customers, prepare_data_habs, prepare_leads  # noqa: E402
+from synthetic import MAKERS  # noqa: E402
+
+PREPARE = {
+    "data_habs": prepare_data_habs,
+    "leads": prepare_leads,
+    "customers": prepare_customers,
+}
+
+
+def plain(df):
+    # the cleaned data without the compact dtypes
+    dtypes = {column: object for column in df.columns if str(df[column].dtype) == "category"}
+    dtypes.update({column: np.float64 for column in df.columns if df[column].dtype == np.float32})
+    return df.astype(dtypes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--datasets", nargs="+", choices=sorted(DATASETS), default=sorted(DATASETS))
+    parser.add_argument("--columns", action="store_true", help="also print the memory of every column")
+    args = parser.parse_args()
+
+    print(f"{'dataset':>10} {'rows':>8} {'raw (MB)':>9} {'plain (MB)':>11} {'compact (MB)':>13} {'saved':>6}")
+    for name in args.datasets:
+        for rows in args.rows:
+            raw = MAKERS[name](rows)
+            raw_bytes = raw.memory_usage(index=True, deep=True).sum()
+            df = PREPARE[name](raw)
+            report = memory_report(df)
+            compact_bytes = report.loc["total", "bytes"]
+            plain_bytes = plain(df).memory_usage(index=True, deep=True).sum()
+            print(f"{name:>10} {rows:>8} {raw_bytes / 1e6:>9.1f} {plain_bytes / 1e6:>11.1f} {compact_bytes / 1e6:>13.1f} "
+                  f"{1 - compact_bytes / plain_bytes:>6.0%}")
+            if args.columns:
+                print(report.to_string())
+
+
+if __name__ == "__main__":
+    main()
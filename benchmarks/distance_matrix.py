@@ -0,0 +1,80 @@
+"""Benchmark of the vectorised distance matrix against per-pair geopy calls.
+
+Run from the repository root:
+
+    python benchmarks/distance_matrix.py --sizes 100 1000 10000 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from geopy.distance import great_circle
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from route_optimizer.distance import haversine_matrix, iter_haversine_blocks  # noqa: E402
+
+# geopy is far too slow for the big sizes, above this it is skipped
+GEOPY_MAX_SIZE = 300
+# the full float64 matrix is skipped above this size, only the blockwise mode runs
+FULL_MATRIX_MAX_SIZE = 10000
+
+
+def random_outlets(n, seed=0):
+    # points spread over greater Jakarta
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-6.40, -6.08, n)
+    lon = rng.uniform(106.65, 107.00, n)
+    return lat, lon
+
+
+def time_geopy(lat, lon):
+    start = time.perf_counter()
+    out = np.empty((len(lat), len(lat)))
+    for i in range(len(lat)):
+        for j in range(len(lat)):
+            out[i, j] = great_circle((lat[i], lon[i]), (lat[j], lon[j])).meters
+    return time.perf_counter() - start, out
+
+
+def time_full(lat, lon):
+    start = time.perf_counter()
+    out = haversine_matrix(lat, lon)
+    return time.perf_counter() - start, out
+
+
+def time_blockwise(lat, lon, block_size):
+    # reduce every block so memory stays bounded, like the ranking helpers do
+    start = time.perf_counter()
+    nearest = np.empty(len(lat), dtype=np.float32)
+    for first, block in iter_haversine_blocks(lat, lon, block_size=block_size):
+        rows = np.arange(len(block))
+        block[rows, first + rows] = np.inf
+        nearest[first:first + len(block)] = block.min(axis=1)
+    return time.perf_counter() - start, nearest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 10000])
+    parser.add_argument("--block-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    print(f"{'outlets':>8} {'geopy (s)':>10} {'numpy (s)':>10} {'blockwise f32 (s)':>18} {'max error (m)':>14}")
+    for n in args.sizes:
+        lat, lon = random_outlets(n)
+        geopy_time = numpy_time = error = float("nan")
+        full = None
+        if n <= FULL_MATRIX_MAX_SIZE:
+            numpy_time, full = time_full(lat, lon)
+        if n <= GEOPY_MAX_SIZE:
+            geopy_time, reference = time_geopy(lat, lon)
+            error = float(np.abs(full - reference).max())
+        block_time, _ = time_blockwise(lat, lon, args.block_size)
+        print(f"{n:>8} {geopy_time:>10.4f} {numpy_time:>10.4f} {block_time:>18.4f} {error:>14.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""End-to-end timings of every stage a page goes through, per dataset and size.
+
+For each dataset (Data Habs, Leads, Customers) and size a synthetic source file
+is written, then these stages are timed separately, each the way the pages run
+them:
+
+    load       loader reading and cleaning the source file
+    filter     "Add filters" explorer: date coercion plus a city, numeric and text filter
+    select     city/outlet selection masks of the sidebar
+    payload    openrouteservice Jobs and Vehicles (get_delivery/get_vehicle)
+    optimize   shared routing client against the local stub (benchmarks/ors_stub.py)
+    parse      route steps merged with the outlets into the downloadable table
+    map        folium map with every route, rendered to HTML
+    export     Excel file of the downloadable table, written route by route
+
+The median of ``--repeat`` runs is written to a JSON file (one per commit by
+default) so runs can be compared across commits:
+
+    python benchmarks/end_to_end.py --sizes 1000 10000 100000
+    python benchmarks/end_to_end.py --compare benchmarks/results/end_to_end_<old>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from ors_stub import start_stub  # noqa: E402
+from route_optimizer.datasets import DATASETS  # noqa: E402
+from route_optimizer.export import export_bytes, route_items  # noqa: E402
+from route_optimizer.filters import coerce_datetimes  # noqa: E402
+from route_optimizer.maps import route_map  # noqa: E402
+from route_optimizer.ors import RoutingClient  # noqa: E402
+from route_optimizer.routes import (  # noqa: E402
+    all_stations_dataframe,
+    build_jobs,
+    build_vehicles,
+    downloadable_dataframe,
+    merge_outlets,
+    time_window,
+)
+from synthetic import MAKERS, write_raw  # noqa: E402
+
+STAGES = ["load", "filter", "select", "payload", "optimize", "parse", "map", "export"]
+# city column and file extension of every dataset
+CITY_COLUMNS = {"data_habs": "kota/kab", "leads": "m_regency_name", "customers": "kota_outlet"}
+EXTENSIONS = {"data_habs": "csv", "leads": "csv", "customers": "xlsx"}
+# a stage counts as a regression when it got this much slower
+REGRESSION_RATIO = 1.2
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_pipeline(name, path, stops, client):
+    """One pass through every stage, returns {stage: seconds}"""
+    config = DATASETS[name]
+    city_column = CITY_COLUMNS[name]
+    timings = {}
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        value = function()
+        timings[stage] = time.perf_counter() - start
+        return value
+
+    df = timed("load", lambda: config["loader"](path))
+
+    def explore():
+        explored = coerce_datetimes(df.copy())
+        explored = explored[explored[city_column].isin(explored[city_column].unique()[:1])]
+        explored = explored[explored[config["latitude"]].between(-6.3, -6.1)]
+        return explored[explored[config["name"]].astype(str).str.contains("1")]
+    timed("filter", explore)
+
+    city = df[city_column].iloc[0]
+    names = df.loc[df[city_column] == city, config["name"]].head(stops).tolist()
+    selected = timed("select", lambda: df.loc[df[city_column].isin([city]) & df[config["name"]].isin(names)].copy())
+
+    start_point = [float(selected[config["longitude"]].median()), float(selected[config["latitude"]].median())]
+    day = datetime.datetime(2022, 10, 21)
+    window = time_window(8, 0, 20, 0, day)
+    jobs, vehicles = timed("payload", lambda: (
+        build_jobs(selected, config["longitude"], config["latitude"], 20 * 60, window),
+        build_vehicles([start_point], window, len(selected) + 2),
+    ))
+
+    result = timed("optimize", lambda: client.optimization(jobs=jobs, vehicles=vehicles, geometry=True))
+
+    def parse():
+        df_stations = all_stations_dataframe(result)
+        df_merged = merge_outlets(df_stations, selected, config["merge"])
+        df_merged_clean = df_merged.loc[df_merged["duration"].notnull()].copy()
+        return df_merged_clean, downloadable_dataframe(df_merged_clean, config["download"])
+    df_merged_clean, table = timed("parse", parse)
+
+    timed("map", lambda: route_map(df_merged_clean, result["routes"], config["name"], start_point[::-1]).get_root().render())
+    timed("export", lambda: export_bytes("xlsx", route_items(result, df_merged_clean, table), name_column=config["name"]))
+    return timings
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    before = {(row["dataset"], row["rows"], row["stage"]): row["seconds"] for row in baseline["results"]}
+    print(f"\ncompared with {baseline['commit']} ({baseline_path})")
+    regressions = 0
+    for row in results:
+        key = (row["dataset"], row["rows"], row["stage"])
+        if key not in before or not before[key]:
+            continue
+        ratio = row["seconds"] / before[key]
+        flag = ""
+        if ratio > REGRESSION_RATIO:
+            flag = "  <-- slower"
+            regressions += 1
+        print(f"{row['dataset']:>10} {row['rows']:>8} {row['stage']:>9} {before[key]:>9.4f} -> {row['seconds']:>9.4f} s {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", nargs="+", choices=sorted(MAKERS), default=list(MAKERS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--stops", type=int, default=25, help="outlets selected for the route")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--time-limit", type=float, default=0.2, help="local solver time limit of the stub")
+    parser.add_argument("--output", help="results file, benchmarks/results/end_to_end_<commit>.json by default")
+    parser.add_argument("--compare", help="earlier results file to compare with, exits with 1 on a regression")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    server, base_url = start_stub(time_limit=args.time_limit)
+    # no quota on the stub, the limiter must not show up in the timings
+    client = RoutingClient(key=None, base_url=base_url, rate_per_minute=60000, burst=1000)
+
+    results = []
+    print(f"{'dataset':>10} {'rows':>8} " + " ".join(f"{stage:>9}" for stage in STAGES))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in args.datasets:
+                for rows in args.sizes:
+                    path = os.path.join(tmp, f"{name}_{rows}.{EXTENSIONS[name]}")
+                    write_raw(name, MAKERS[name](rows), path)
+                    runs = [run_pipeline(name, path, args.stops, client) for _ in range(args.repeat)]
+                    medians = {stage: statistics.median(run[stage] for run in runs) for stage in STAGES}
+                    for stage in STAGES:
+                        results.append({"dataset": name, "rows": rows, "stage": stage, "seconds": medians[stage],
+                                         "runs": [run[stage] for run in runs]})
+                    print(f"{name:>10} {rows:>8} " + " ".join(f"{medians[stage]:>9.4f}" for stage in STAGES))
+    finally:
+        server.shutdown()
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"end_to_end_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "commit": commit,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "config": {"stops": args.stops, "repeat": args.repeat, "time_limit": args.time_limit},
+            "results": results,
+        }, file, indent=1)
+    print(f"results written to {output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Time of one "Add filters" interaction: the previous filter_dataframe vs FilterSchema.
+
+A synthetic Data Habs sheet (with a scraped-at date column) is cleaned, then
+the same filters are applied on every rerun the way the explorer does: a city
+selection, a latitude range, a date range and a name search. The previous
+version copied the frame, converted the dates and counted distinct values on
+every rerun; FilterSchema does that once, timed separately as "build".
+
+Run from the repository root:
+
+    python benchmarks/explorer_filters.py --rows 100000 500000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype, is_datetime64_any_dtype, is_numeric_dtype, is_object_dtype
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.datasets import prepare_data_habs  # noqa: E402
+from route_optimizer.filters import FilterSchema  # noqa: E402
+from synthetic import make_data_habs  # noqa: E402
+
+CITY = "Kota Jakarta Selatan"
+LATITUDE = (-6.3, -6.1)
+DATES = (pd.Timestamp(2022, 3, 1), pd.Timestamp(2022, 6, 30))
+SEARCH = "12"
+
+
+def legacy_filter(df, columns):
+    # the explorer before FilterSchema, widgets replaced by the fixed inputs above
+    df = df.copy()
+    for col in df.columns:
+        if is_object_dtype(df[col]):
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except Exception:
+                pass
+        if is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.tz_localize(None)
+    for column in columns:
+        if is_categorical_dtype(df[column]) or df[column].nunique() < 10:
+            df[column].unique()
+            df = df[df[column].isin([CITY])]
+        elif is_numeric_dtype(df[column]):
+            float(df[column].min()), float(df[column].max())
+            df = df[df[column].between(*LATITUDE)]
+        elif is_datetime64_any_dtype(df[column]):
+            df[column].min(), df[column].max()
+            df = df.loc[df[column].between(*DATES)]
+        else:
+            df = df[df[column].astype(str).str.contains(SEARCH)]
+    return df
+
+
+def schema_filter(schema, columns):
+    masks = []
+    for column in columns:
+        kind = schema.kinds[column]
+        if kind == "categorical":
+            schema.options(column)
+            masks.append(schema.isin(column, [CITY]))
+        elif kind == "numeric":
+            schema.bounds(column)
+            masks.append(schema.between(column, *LATITUDE))
+        elif kind == "datetime":
+            schema.bounds(column)
+            masks.append(schema.between(column, *DATES))
+        else:
+            masks.append(schema.contains(column, SEARCH))
+    return schema.select(masks)
+
+
+def make_sheet(rows, seed=0):
+    raw = make_data_habs(rows, seed)
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 365, rows)
+    raw["Scraped At"] = (pd.Timestamp(2022, 1, 1) + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d %H:%M:%S")
+    return prepare_data_habs(raw)
+
+
+def median_seconds(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 500000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'filters':>30} {'previous (ms)':>14} {'schema (ms)':>12} {'build (s)':>10}")
+    for rows in args.rows:
+        df = make_sheet(rows)
+        build, schema = median_seconds(lambda: FilterSchema(df), 1)
+        for columns in (["kota/kab"], ["kota/kab", "latitude"], ["kota/kab", "latitude", "scraped_at"],
+                        ["kota/kab", "latitude", "scraped_at", "nama"]):
+            before, expected = median_seconds(lambda: legacy_filter(df, columns), max(1, args.repeat // 2))
+            after, result = median_seconds(lambda: schema_filter(schema, columns), args.repeat)
+            # same rows in the same order
+            assert expected.index.equals(result.index)
+            print(f"{rows:>8} {'+'.join(columns):>30} {before * 1000:>14.1f} {after * 1000:>12.1f} {build:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
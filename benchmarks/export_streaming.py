@@ -0,0 +1,94 @@
+"""Export of many routes: the single in-memory Excel sheet vs the streaming exporters.
+
+Synthetic route tables in the layout of the "Downloadable Data" table (with a
+road-like geometry per route) are exported for a growing number of routes.
+Peak Python memory is traced while exporting; with the streaming exporters it
+should not grow with the number of routes.
+
+Run from the repository root:
+
+    python benchmarks/export_streaming.py --routes 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.export import EXPORTERS, open_exporter  # noqa: E402
+from route_optimizer.routes import excel_bytes  # noqa: E402
+from route_optimizer.solver import encode_polyline  # noqa: E402
+
+
+def make_route(rng, number, stops):
+    # one route: its downloadable table, result route and stop locations
+    lon = 106.8 + np.cumsum(rng.normal(0, 0.005, stops))
+    lat = -6.2 + np.cumsum(rng.normal(0, 0.005, stops))
+    arrival = pd.Timestamp(2022, 10, 21, 8) + pd.to_timedelta(np.arange(stops) * 25, unit="min")
+    table = pd.DataFrame({
+        "nama": [f"Outlet {number}-{i}" for i in range(stops)],
+        "arrival": arrival,
+        "departure": arrival + pd.Timedelta(minutes=20),
+        "google_maps_url": [f'<a href="https://www.google.com/maps/?q={y},{x}">https://www.google.com/maps/?q={y},{x}</a>' for x, y in zip(lon, lat)],
+        "duration_to_previous_in_minutes": rng.uniform(1, 15, stops).round(2),
+        "distance_to_previous_in_km": rng.uniform(0.2, 5, stops).round(2),
+    })
+    # about 40 road vertices between two stops
+    line = np.column_stack((np.interp(np.linspace(0, stops - 1, stops * 40), np.arange(stops), lon),
+                            np.interp(np.linspace(0, stops - 1, stops * 40), np.arange(stops), lat)))
+    route = {"vehicle": number, "distance": 50000, "duration": 20000, "geometry": encode_polyline(line.tolist()),
+             "steps": [{"type": "job"}] * stops}
+    return table, route, np.column_stack((lon, lat)).tolist()
+
+
+def routes(count, stops, seed=0):
+    rng = np.random.default_rng(seed)
+    for number in range(count):
+        yield (f"Canvasser {number + 1}",) + make_route(rng, number, stops)
+
+
+def traced(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--stops", type=int, default=40, help="stops per route")
+    args = parser.parse_args()
+
+    print(f"{'routes':>7} {'format':>14} {'seconds':>8} {'peak MB':>8} {'file MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.routes:
+            def single_sheet():
+                # the previous download: every route concatenated into one sheet in a BytesIO
+                table = pd.concat([table for _, table, _, _ in routes(count, args.stops)])
+                single_sheet.size = len(excel_bytes(table).getvalue())
+            seconds, peak = traced(single_sheet)
+            print(f"{count:>7} {'xlsx (BytesIO)':>14} {seconds:>8.2f} {peak / 2 ** 20:>8.1f} {single_sheet.size / 2 ** 20:>8.2f}")
+
+            for file_format in EXPORTERS:
+                path = os.path.join(tmp, f"routes.{file_format}")
+
+                def stream():
+                    with open_exporter(path, file_format, name_column="nama") as exporter:
+                        for name, table, route, locations in routes(count, args.stops):
+                            exporter.add(name, table, route, locations)
+                seconds, peak = traced(stream)
+                print(f"{count:>7} {file_format:>14} {seconds:>8.2f} {peak / 2 ** 20:>8.1f} {os.path.getsize(path) / 2 ** 20:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cost of a live refresh of the rest of the day, per refresh and canvasser.
+
+A day is planned for a team of canvassers over a synthetic district with the
+local solver, then the day is replayed: at every refresh each canvasser has
+visited a few more of their stops, and the remaining stops are planned again
+with ``replan_remaining`` (warm start, stored travel times) and, for
+comparison, solved from scratch for the same start points and time.
+
+Run from the repository root:
+
+    python benchmarks/live_reroute.py --canvassers 4 --stops 30 --refreshes 6 --per-refresh 3
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import openrouteservice
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.incremental import DEFAULT_REPAIR_TIME_LIMIT  # noqa: E402
+from route_optimizer.live import replan_remaining  # noqa: E402
+from route_optimizer.matrix_store import MatrixClient, MatrixStore  # noqa: E402
+from route_optimizer.solver import DEFAULT_TIME_LIMIT, LocalClient  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--canvassers", type=int, default=4)
+    parser.add_argument("--stops", type=int, default=30, help="outlets per canvasser")
+    parser.add_argument("--refreshes", type=int, default=6)
+    parser.add_argument("--per-refresh", type=int, default=3, help="stops every canvasser visits between two refreshes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    outlets = args.canvassers * args.stops
+    locations = np.column_stack((rng.uniform(106.78, 106.86, outlets), rng.uniform(-6.28, -6.20, outlets)))
+    day = datetime.datetime(2022, 10, 24)
+    window = [int(day.replace(hour=8).timestamp()), int(day.replace(hour=20).timestamp())]
+    jobs = [openrouteservice.optimization.Job(id=i, location=location.tolist(), service=15 * 60, amount=[1], time_windows=[window])
+            for i, location in enumerate(locations)]
+    vehicles = [openrouteservice.optimization.Vehicle(id=v, start=[106.82, -6.24], capacity=[args.stops + 2], time_window=window)
+                for v in range(args.canvassers)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MatrixStore(os.path.join(tmp, "road_matrix.sqlite"))
+        result = MatrixClient(LocalClient(time_limit=DEFAULT_TIME_LIMIT), store).optimization(jobs=jobs, vehicles=vehicles, geometry=True)
+        repair = MatrixClient(LocalClient(time_limit=DEFAULT_REPAIR_TIME_LIMIT), store).optimization
+        scratch = MatrixClient(LocalClient(time_limit=DEFAULT_TIME_LIMIT), store).optimization
+        order = {route["vehicle"]: [step["id"] for step in route["steps"] if step["type"] == "job"] for route in result["routes"]}
+        visited = {}
+        print(f"{'refresh':>8} {'time':>6} {'visited':>8} {'remaining':>10} {'live (ms)':>10} {'per canvasser':>14} {'scratch (ms)':>13}")
+        for refresh in range(1, args.refreshes + 1):
+            now = window[0] + refresh * args.per_refresh * 25 * 60
+            for stops in order.values():
+                for stop in [stop for stop in stops if stop not in visited][:args.per_refresh]:
+                    visited[stop] = float("nan")
+            start = time.perf_counter()
+            live = replan_remaining(repair, result, jobs, vehicles, visited, now=now)
+            live_ms = (time.perf_counter() - start) * 1000
+            # the same remaining stops solved again from nothing, canvasser by canvasser
+            start = time.perf_counter()
+            for route in live["routes"]:
+                first = route["steps"][0]
+                rest = [jobs[step["id"]] for step in route["steps"] if step["type"] == "job"]
+                vehicle = openrouteservice.optimization.Vehicle(id=route["vehicle"], start=first["location"], capacity=[args.stops + 2],
+                                                                time_window=[first["arrival"], window[1]])
+                scratch(jobs=rest, vehicles=[vehicle], geometry=True)
+            scratch_ms = (time.perf_counter() - start) * 1000
+            remaining = sum(step["type"] == "job" for route in live["routes"] for step in route["steps"])
+            active = max(1, len(live["routes"]))
+            print(f"{refresh:>8} {datetime.datetime.fromtimestamp(now):%H:%M} {len(live['visited']):>8} {remaining:>10} "
+                  f"{live_ms:>10.1f} {live_ms / active:>14.1f} {scratch_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
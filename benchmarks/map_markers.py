@@ -0,0 +1,93 @@
+"""Route map build time and size: one folium.Marker per stop vs the StopLayer data layer.
+
+Synthetic routes with a growing number of stops are drawn twice, with the
+previous per-stop ``folium.Marker`` + ``BeautifyIcon`` loop and with
+``route_map``, and both maps are rendered to HTML as ``folium_static`` does.
+
+Run from the repository root:
+
+    python benchmarks/map_markers.py --stops 100 1000 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import BeautifyIcon
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.maps import route_color, route_map  # noqa: E402
+
+
+def legacy_route_map(df_merged_clean, routes, name_column, center):
+    m = folium.Map(location=center, zoom_start=10, tiles='cartodbpositron')
+    for position, route in enumerate(routes):
+        color = route_color(position)
+        layer = folium.FeatureGroup(name='Canvasser {}'.format(position + 1))
+        stops = df_merged_clean.loc[df_merged_clean["vehicle"] == route["vehicle"]]
+        for location in stops.itertuples():
+            tooltip = folium.map.Tooltip("Merchant: {}".format(getattr(location, name_column)))
+            popup = folium.map.Popup(f"Distance to Previous: {location.distance_to_previous/1000:.2f} km <br> Duration to Previous: {location.duration_to_previous/60:.2f} minutes <br> Maps URL: <a href={location.google_maps}>{location.google_maps}</a>")
+            folium.Marker(
+                location=list(reversed(location.location)),
+                tooltip=tooltip,
+                popup=popup,
+                icon=BeautifyIcon(
+                    icon_shape='marker',
+                    number=int(location.Index),
+                    spin=True,
+                    text_color=color,
+                    border_color=color,
+                    background_color="#FFF",
+                    inner_icon_style="font-size:12px;padding-top:-5px;"
+                )
+            ).add_to(layer)
+        layer.add_to(m)
+    folium.LayerControl().add_to(m)
+    return m
+
+
+def make_stops(stops, canvassers=2, seed=0):
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(106.65, 107.00, stops)
+    lat = rng.uniform(-6.40, -6.08, stops)
+    vehicles = np.arange(stops) % canvassers
+    df = pd.DataFrame({
+        "vehicle": vehicles,
+        "location": [[x, y] for x, y in zip(lon, lat)],
+        "nama": [f"Outlet <{i}> & co" for i in range(stops)],
+        "distance_to_previous": rng.uniform(100, 5000, stops),
+        "duration_to_previous": rng.uniform(60, 900, stops),
+        "google_maps": [f"https://www.google.com/maps/?q={y},{x}" for x, y in zip(lon, lat)],
+    }, index=pd.RangeIndex(1, stops + 1))
+    routes = [{"vehicle": vehicle, "steps": [{"type": "start", "location": [106.83, -6.2]}]} for vehicle in range(canvassers)]
+    return df, routes
+
+
+def timed(function):
+    start = time.perf_counter()
+    html = function().get_root().render()
+    return time.perf_counter() - start, html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--canvassers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'stops':>6} {'markers (s)':>12} {'layer (s)':>10} {'speedup':>8} {'markers html':>13} {'layer html':>11}")
+    for stops in args.stops:
+        df, routes = make_stops(stops, args.canvassers)
+        before, legacy_html = timed(lambda: legacy_route_map(df, routes, "nama", [-6.2, 106.83]))
+        after, html = timed(lambda: route_map(df, routes, "nama", [-6.2, 106.83], lines=[None] * len(routes)))
+        print(f"{stops:>6} {before:>12.3f} {after:>10.4f} {before / after:>7.0f}x "
+              f"{len(legacy_html) / 1024:>11.0f}KB {len(html) / 1024:>9.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Size of the route map sent to the browser: full route lines vs simplified ones.
+
+Road-like routes are synthesized (straight stretches with a vertex every ~8 m,
+as openrouteservice returns them), encoded as polylines and rendered with
+``route_map`` twice: with every vertex, and simplified by ``simplify_routes``.
+The largest deviation of the simplified lines is checked against the tolerance.
+
+Run from the repository root:
+
+    python benchmarks/map_payload.py --stops 25 100 300 --canvassers 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.geometry import (  # noqa: E402
+    DEFAULT_ZOOM,
+    decode_polyline,
+    simplify_routes,
+    tolerance_for_zoom,
+)
+from route_optimizer.maps import route_map  # noqa: E402
+from route_optimizer.solver import encode_polyline  # noqa: E402
+
+# metres per degree, for the deviation check
+_METRES_PER_DEGREE = 111320
+
+
+def road_route(rng, stops, start, vertex_metres=8.0):
+    """Polyline through ``stops`` random outlets, each leg a few straight stretches"""
+    points = [np.asarray(start, dtype=float)]
+    locations = []
+    for _ in range(stops):
+        target = points[-1] + rng.normal(0, 0.01, 2)
+        for _ in range(rng.integers(2, 6)):
+            # stretches turn at corners on the way to the outlet
+            corner = points[-1] + (target - points[-1]) * rng.uniform(0.3, 0.7) + rng.normal(0, 0.001, 2)
+            length = np.hypot(*(corner - points[-1])) * _METRES_PER_DEGREE
+            count = max(1, int(length / vertex_metres))
+            points.extend(points[-1] + np.outer(np.arange(1, count + 1) / count, corner - points[-1]))
+        locations.append(points[-1].tolist())
+    return np.array(points), locations
+
+
+def make_result(rng, stops, canvassers, start=(106.83, -6.2)):
+    routes, rows = [], []
+    for vehicle in range(canvassers):
+        line, locations = road_route(rng, stops, start)
+        steps = [{"type": "start", "location": list(start)}]
+        steps += [{"type": "job", "location": location, "job": vehicle * stops + position}
+                  for position, location in enumerate(locations)]
+        routes.append({"vehicle": vehicle, "steps": steps, "geometry": encode_polyline(line.tolist())})
+        rows += [{"vehicle": vehicle, "location": location, "name": f"Outlet {vehicle}-{position}",
+                  "distance_to_previous": 1000.0, "duration_to_previous": 120.0,
+                  "google_maps": "https://www.google.com/maps/?q=0,0"} for position, location in enumerate(locations)]
+    return routes, pd.DataFrame(rows, index=range(1, len(rows) + 1))
+
+
+def max_deviation(full, simplified):
+    """Largest distance in metres from a dropped vertex to the simplified segment spanning it"""
+    scale = np.array([np.cos(np.radians(full[:, 1].mean())), 1.0]) * _METRES_PER_DEGREE
+    # the simplified line is a subsequence of the full one
+    kept, position = [], 0
+    for vertex in simplified:
+        while not np.array_equal(full[position], vertex):
+            position += 1
+        kept.append(position)
+    worst = 0.0
+    for first, last in zip(kept[:-1], kept[1:]):
+        a, b, inside = full[first] * scale, full[last] * scale, full[first + 1:last] * scale
+        if not len(inside):
+            continue
+        segment = b - a
+        along = np.clip((inside - a) @ segment / max(segment @ segment, 1e-12), 0, 1)
+        worst = max(worst, float(np.hypot(*(inside - a - along[:, None] * segment).T).max()))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, nargs="+", default=[25, 100, 300], help="outlets per canvasser")
+    parser.add_argument("--canvassers", type=int, default=3)
+    parser.add_argument("--zoom", type=int, default=DEFAULT_ZOOM)
+    args = parser.parse_args()
+
+    print(f"{'stops':>6} {'points':>8} {'kept':>7} {'simplify (s)':>13} {'full html':>11} {'simplified html':>16} {'ratio':>6} {'max dev (m)':>12}")
+    for stops in args.stops:
+        rng = np.random.default_rng(stops)
+        routes, stations = make_result(rng, stops, args.canvassers)
+        full_lines = [decode_polyline(route["geometry"]) for route in routes]
+
+        start = time.perf_counter()
+        lines, stats = simplify_routes(routes, zoom=args.zoom)
+        seconds = time.perf_counter() - start
+
+        tolerance = tolerance_for_zoom(args.zoom, -6.2)
+        deviation = max(max_deviation(full, line) for full, line in zip(full_lines, lines))
+        assert deviation <= tolerance * 1.01, (deviation, tolerance)
+
+        full_html = len(route_map(stations, routes, "name", [-6.2, 106.83], lines=full_lines).get_root().render())
+        small_html = len(route_map(stations, routes, "name", [-6.2, 106.83], lines=lines).get_root().render())
+        print(f"{stops:>6} {stats['points']:>8} {stats['simplified_points']:>7} {seconds:>13.3f} "
+              f"{full_html / 1024:>9.0f}KB {small_html / 1024:>14.0f}KB {full_html / small_html:>5.1f}x {deviation:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Google Maps url parsing and near-duplicate merging of the Customers ingest.
+
+Synthetic Customers urls come in every supported format (``?q=``,
+``?query=``, ``/@<lat>,<lon>,17z``, place urls with a ``!3d!4d`` pin, url-
+encoded commas), and a share of the outlets is listed a second time a few
+metres away. Parsing is timed against the old chained ``str.split`` (which only
+reads ``?q=`` urls), then the merge stage is timed and the job payload sent to
+the optimizer is measured before and after it.
+
+Run from the repository root:
+
+    python benchmarks/maps_dedup.py --rows 10000 100000 --duplicates 0.05 --radius 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.datasets import coordinates_from_urls  # noqa: E402
+from route_optimizer.dedup import merge_duplicates  # noqa: E402
+from synthetic import coordinates  # noqa: E402
+
+FORMATS = [
+    "https://www.google.com/maps/?q={lat},{lon}",
+    "https://www.google.com/maps/search/?api=1&query={lat}%2C{lon}",
+    "https://www.google.com/maps/@{lat},{lon},17z",
+    "https://www.google.com/maps/place/Toko/@{view_lat},{view_lon},17z/data=!3m1!4b1!4m5!3m4!1s0x0:0x0!8m2!3d{lat}!4d{lon}",
+]
+
+
+def make_urls(rows, duplicates, rng):
+    lat, lon = coordinates(rng, rows, missing=0)
+    # second listings of some outlets, a couple of metres from the first
+    copies = rng.choice(rows, int(rows * duplicates), replace=False)
+    lat = np.concatenate((lat, lat[copies] + rng.uniform(-2e-5, 2e-5, len(copies))))
+    lon = np.concatenate((lon, lon[copies] + rng.uniform(-2e-5, 2e-5, len(copies))))
+    formats = rng.integers(len(FORMATS), size=len(lat))
+    return pd.Series([FORMATS[f].format(lat=a, lon=b, view_lat=round(a + 0.001, 5), view_lon=round(b - 0.001, 5))
+                      for f, a, b in zip(formats, lat, lon)])
+
+
+def split_coordinates(urls):
+    # the chained splits the Customers loader used to run
+    longitude = pd.to_numeric(urls.str.split(",", expand=True)[1], errors="coerce")
+    latitude = pd.to_numeric(urls.str.split(",", expand=True)[0].str.split("=", expand=True)[1], errors="coerce")
+    return pd.DataFrame({"latitude": latitude, "longitude": longitude})
+
+
+def payload_bytes(df):
+    jobs = [{"id": int(i), "location": [float(lon), float(lat)], "service": 900, "amount": [1]}
+            for i, lat, lon in zip(df.index, df["latitude"], df["longitude"])]
+    return len(json.dumps(jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of the outlets listed twice")
+    parser.add_argument("--radius", type=float, default=5, help="merge radius in metres")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'split (s)':>10} {'read':>8} {'regex (s)':>10} {'merge (s)':>10} "
+          f"{'read':>8} {'kept':>8} {'payload before (KB)':>20} {'after (KB)':>11}")
+    for rows in args.rows:
+        urls = make_urls(rows, args.duplicates, np.random.default_rng(0))
+        start = time.perf_counter()
+        split = split_coordinates(urls)
+        split_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        parsed = coordinates_from_urls(urls)
+        regex_seconds = time.perf_counter() - start
+        outlets = parsed.loc[parsed["latitude"].notnull() & parsed["longitude"].notnull()]
+        start = time.perf_counter()
+        kept, _ = merge_duplicates(outlets, "latitude", "longitude", args.radius)
+        merge_seconds = time.perf_counter() - start
+        print(f"{rows:>8} {split_seconds:>10.3f} {int(split.notnull().all(axis=1).sum()):>8} {regex_seconds:>10.3f} "
+              f"{merge_seconds:>10.3f} {len(outlets):>8} {len(kept):>8} "
+              f"{payload_bytes(outlets) / 1024:>20.0f} {payload_bytes(kept) / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
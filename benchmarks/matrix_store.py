@@ -0,0 +1,87 @@
+"""Road matrix requests per plan as the MatrixStore warms up.
+
+Every simulated day a canvasser is planned over yesterday's outlets with a
+few of them swapped for other outlets of the same district, through
+``MatrixClient`` and the local openrouteservice stub (benchmarks/ors_stub.py). Without the store every plan needs the full
+matrix of its locations; with it only the pairs never seen before are
+requested, so the elements requested and the time of a plan (matrix calls
+plus a short local solve) fall as the days go by.
+
+Run from the repository root:
+
+    python benchmarks/matrix_store.py --days 10 --outlets 300 --stops 60 --new 6 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ors_stub import start_stub  # noqa: E402
+from route_optimizer.matrix_store import MatrixClient, MatrixStore, ors_fetch  # noqa: E402
+from route_optimizer.ors import RoutingClient  # noqa: E402
+from route_optimizer.solver import LocalClient  # noqa: E402
+
+
+def district(outlets, seed=0):
+    # outlets of one district, ~3 x 3 km
+    rng = np.random.default_rng(seed)
+    return np.column_stack((rng.uniform(106.80, 106.83, outlets), rng.uniform(-6.26, -6.23, outlets))).round(6)
+
+
+def next_selection(selection, outlets, new, rng):
+    # yesterday's outlets, some of them replaced by outlets not planned yesterday
+    kept = rng.choice(selection, len(selection) - new, replace=False)
+    others = np.setdiff1d(np.arange(outlets), selection)
+    return np.concatenate((kept, rng.choice(others, new, replace=False)))
+
+
+def plan(pool, selection):
+    stops = len(selection)
+    selected = pool[selection]
+    jobs = [{"id": i, "location": location.tolist(), "service": 1200} for i, location in enumerate(selected)]
+    vehicles = [{"id": 0, "profile": "driving-car", "start": pool[0].tolist(), "capacity": [stops + 2]}]
+    return jobs, vehicles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--outlets", type=int, default=300, help="outlets of the district")
+    parser.add_argument("--stops", type=int, default=60, help="outlets planned per day")
+    parser.add_argument("--new", type=int, default=6, help="outlets swapped for other ones every day")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the stub adds to every answer")
+    args = parser.parse_args()
+
+    server, base_url = start_stub(latency=args.latency)
+    client = RoutingClient(base_url=base_url, rate_per_minute=6000, burst=100)
+    pool = district(args.outlets)
+    rng = np.random.default_rng(1)
+    selection = rng.choice(args.outlets, args.stops, replace=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MatrixStore(os.path.join(tmp, "road_matrix.sqlite"))
+        matrix_client = MatrixClient(LocalClient(time_limit=0.05), store, fetch=ors_fetch(client))
+        print(f"{'day':>4} {'full matrix':>12} {'requested':>10} {'requests':>9} {'hit rate':>9} {'plan (s)':>9} {'stored pairs':>13}")
+        for day in range(1, args.days + 1):
+            if day > 1:
+                selection = next_selection(selection, args.outlets, args.new, rng)
+            jobs, vehicles = plan(pool, selection)
+            requests, elements = server.requests, server.matrix_elements
+            before = store.stats()
+            start = time.perf_counter()
+            result = matrix_client.optimization(jobs=jobs, vehicles=vehicles, geometry=True)
+            seconds = time.perf_counter() - start
+            assert len(result["routes"][0]["steps"]) == args.stops + 1
+            after = store.stats()
+            looked_up = (after["hits"] - before["hits"]) + (after["misses"] - before["misses"])
+            print(f"{day:>4} {(args.stops + 1) ** 2:>12} {server.matrix_elements - elements:>10} {server.requests - requests:>9} "
+                  f"{(after['hits'] - before['hits']) / looked_up:>9.0%} {seconds:>9.2f} {after['pairs']:>13}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Local stand-in for the openrouteservice optimization and matrix endpoints.
+
+Answers ``POST /optimization`` like api.openrouteservice.org, solving with the
+local solver, and ``POST /v2/matrix/<profile>/json`` with the straight-line
+estimates of ``route_optimizer.distance``, so the real
+``openrouteservice.Client`` (HTTP, JSON encoding, retries) can be exercised
+without network access or API quota.
+
+Run standalone and point a client at it:
+
+    python benchmarks/ors_stub.py --port 8080 --latency 0.2
+    openrouteservice.Client(base_url="http://127.0.0.1:8080")
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.distance import travel_matrices  # noqa: E402
+from route_optimizer.solver import optimization  # noqa: E402
+
+
+def _matrix(payload):
+    # rows of the sources, columns of the destinations, all locations by default
+    durations, distances = travel_matrices(payload["locations"])
+    sources = payload.get("sources", list(range(len(durations))))
+    destinations = payload.get("destinations", list(range(len(durations))))
+    cells = np.ix_(sources, destinations)
+    return {"durations": durations[cells].round(2).tolist(), "distances": distances[cells].round(2).tolist()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # set on the server: time_limit (local solver), latency (seconds added to every answer)
+    # and fail_rate/fail_status (share of requests answered with an error)
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        matrix = path.startswith("/v2/matrix/")
+        if path != "/optimization" and not matrix:
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.random.random() < self.server.fail_rate
+        time.sleep(self.server.latency)
+        if fail:
+            body = json.dumps({"error": {"code": self.server.fail_status, "message": "stub failure"}}).encode()
+            self.send_response(self.server.fail_status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if matrix:
+            result = _matrix(payload)
+            with self.server.lock:
+                self.server.matrix_elements += len(result["durations"]) * len(result["durations"][0] if result["durations"] else [])
+        else:
+            result = optimization(
+                jobs=payload.get("jobs"),
+                vehicles=payload.get("vehicles"),
+                matrix=payload.get("matrix"),
+                geometry=payload.get("options", {}).get("g"),
+                time_limit=self.server.time_limit,
+            )
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(host="127.0.0.1", port=0, time_limit=0.5, latency=0.0, fail_rate=0.0, fail_status=503, seed=0):
+    """
+    Serves the stub on a daemon thread
+
+    ``server.requests`` counts the requests received, failed ones included,
+    ``server.matrix_elements`` the sources x destinations answered.
+
+    Returns:
+        tuple: (server, base_url), call ``server.shutdown()`` when done
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.time_limit = time_limit
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.fail_status = fail_status
+    server.random = random.Random(seed)
+    server.requests = 0
+    server.matrix_elements = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--time-limit", type=float, default=0.5, help="local solver time limit per request")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.host, args.port, args.time_limit, args.latency, args.fail_rate, args.fail_status)
+    print(f"openrouteservice stub listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""One rerun of the Leads sidebar: chained isin masks vs the precomputed RegionIndex.
+
+Leads are spread over a province → city → district hierarchy; one rerun
+builds the four option lists and the selected outlets the way the page does.
+Both versions are checked to give the same options and rows.
+
+Run from the repository root:
+
+    python benchmarks/region_index.py --rows 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.regions import RegionIndex  # noqa: E402
+
+LEVELS = ["m_province_name", "m_regency_name", "m_district_name"]
+
+
+def make_leads(rows, provinces=34, cities=15, districts=12, seed=0):
+    # district names repeat across cities, as they do in the real data
+    rng = np.random.default_rng(seed)
+    province = rng.integers(0, provinces, rows)
+    city = province * cities + rng.integers(0, cities, rows)
+    district = rng.integers(0, districts, rows)
+    return pd.DataFrame({
+        "m_province_name": pd.Series(province).map(lambda p: f"PROVINCE {p}"),
+        "m_regency_name": pd.Series(city).map(lambda c: f"CITY {c}"),
+        "m_district_name": pd.Series(district).map(lambda d: f"DISTRICT {d}"),
+        "outlet_name": [f"Outlet {i}" for i in range(rows)],
+    })
+
+
+def masks_rerun(df, province, city, district, outlet):
+    provinces = df["m_province_name"].unique().tolist()
+    cities = df.loc[df["m_province_name"].isin(province), "m_regency_name"].unique().tolist()
+    districts = df.loc[(df["m_province_name"].isin(province)) & (df["m_regency_name"].isin(city)), "m_district_name"].unique().tolist()
+    outlets = df.loc[(df["m_province_name"].isin(province)) & (df["m_regency_name"].isin(city)) & (df["m_district_name"].isin(district)), "outlet_name"].unique().tolist()
+    selected = df.loc[
+        (df["m_province_name"].isin(province)) &
+        (df["m_regency_name"].isin(city)) &
+        (df["m_district_name"].isin(district)) &
+        (df["outlet_name"].isin(outlet))].copy()
+    return provinces, cities, districts, outlets, selected
+
+
+def index_rerun(df, regions, province, city, district, outlet):
+    provinces = regions.options()
+    cities = regions.options([province])
+    districts = regions.options([province, city])
+    outlets = regions.values("outlet_name", [province, city, district])
+    selected = df.iloc[regions.select([province, city, district], "outlet_name", outlet)].copy()
+    return provinces, cities, districts, outlets, selected
+
+
+def median_ms(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'build (s)':>10} {'masks (ms)':>11} {'index (ms)':>11} {'speedup':>8}")
+    for rows in args.rows:
+        df = make_leads(rows)
+        start = time.perf_counter()
+        regions = RegionIndex(df, LEVELS)
+        build = time.perf_counter() - start
+
+        province = ["PROVINCE 0"]
+        city = ["CITY 0", "CITY 1"]
+        district = ["DISTRICT 0", "DISTRICT 3"]
+        outlet = df.loc[df["m_regency_name"].isin(city) & df["m_district_name"].isin(district), "outlet_name"].head(25).tolist()
+
+        before, expected = median_ms(lambda: masks_rerun(df, province, city, district, outlet), args.repeat)
+        after, result = median_ms(lambda: index_rerun(df, regions, province, city, district, outlet), args.repeat)
+        assert expected[:4] == result[:4]
+        assert expected[4].index.equals(result[4].index)
+        print(f"{rows:>8} {build:>10.2f} {before:>11.1f} {after:>11.2f} {before / after:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
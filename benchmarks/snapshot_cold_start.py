@@ -0,0 +1,110 @@
+"""Cold-start load time and peak RSS growth: parsing the source files vs reading the Parquet snapshot.
+
+Every measurement runs in a fresh Python process, like a restarted Streamlit
+server (Linux only, the peak is read from /proc). Synthetic files in the schema of the Customers (xlsx) and Leads (csv)
+datasets are generated first.
+
+Run from the repository root:
+
+    python benchmarks/snapshot_cold_start.py --rows 10000 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# runs inside the child process and prints a json line with the timings
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from route_optimizer.datasets import load_customers, load_leads
+from route_optimizer.snapshot import load_snapshot
+import openpyxl, pyarrow.parquet
+
+def rss_mb(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+
+# imports are the same for both modes, reset the peak so only the load itself is measured
+with open("/proc/self/clear_refs", "w") as clear_refs:
+    clear_refs.write("5")
+baseline = rss_mb("VmRSS")
+start = time.perf_counter()
+loader = {{"customers": load_customers, "leads": load_leads}}[{name!r}]
+if {mode!r} == "source":
+    df = loader({path!r})
+else:
+    df = load_snapshot({name!r}, {path!r}, loader, snapshot_dir={snapshot_dir!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rows": len(df), "peak_rss_mb": rss_mb("VmHWM") - baseline}}))
+"""
+
+
+def make_customers(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-6.40, -6.08, rows).round(7)
+    lon = rng.uniform(106.65, 107.00, rows).round(7)
+    df = pd.DataFrame({
+        "ID Merchant": np.arange(rows),
+        "Nama Outlet": [f"Outlet {i}" for i in range(rows)],
+        "Kota Outlet": rng.choice(["Kota Jakarta Selatan", "Kota Jakarta Barat", "Kota Jakarta Timur"], rows),
+        "Provinsi Outlet": "DKI Jakarta",
+        "Google Maps": [f"https://www.google.com/maps/?q={a},{b}" for a, b in zip(lat, lon)],
+        "Last Transaction Date": pd.Timestamp("2022-10-01"),
+    })
+    # plain strings, xlsxwriter refuses more than 65k hyperlinks per sheet
+    with pd.ExcelWriter(path, engine="xlsxwriter", engine_kwargs={"options": {"strings_to_urls": False}}) as writer:
+        df.to_excel(writer, index=False)
+
+
+def make_leads(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "mt_leads_code": [f"LEAD{i:07d}" for i in range(rows)],
+        "outlet_name": [f"Outlet {i}" for i in range(rows)],
+        "outlet_langitude": rng.uniform(-6.40, -6.08, rows).round(7),
+        "outlet_longitude": rng.uniform(106.65, 107.00, rows).round(7),
+        "pic_phone": [f"08{rng.integers(10**9, 10**10)}" for _ in range(rows)],
+        "m_province_name": "DKI JAKARTA",
+        "m_regency_name": rng.choice(["KOTA JAKARTA SELATAN", "KOTA JAKARTA BARAT"], rows),
+        "m_district_name": rng.choice(["KEBAYORAN BARU", "CILANDAK", "PESANGGRAHAN", "KEMBANGAN"], rows),
+    }).to_csv(path, index=False)
+
+
+def measure(name, path, mode, snapshot_dir):
+    code = CHILD.format(root=ROOT, name=name, path=path, mode=mode, snapshot_dir=snapshot_dir)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'dataset':>10} {'rows':>8} {'source (s)':>11} {'snapshot (s)':>13} {'source +RSS (MB)':>17} {'snapshot +RSS (MB)':>19}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            for name, make, extension in (("customers", make_customers, "xlsx"), ("leads", make_leads, "csv")):
+                path = os.path.join(tmp, f"{name}_{rows}.{extension}")
+                make(path, rows)
+                snapshot_dir = os.path.join(tmp, f"snapshots_{rows}")
+                before = measure(name, path, "source", snapshot_dir)
+                # the first snapshot load builds it, the second one is the cold start we care about
+                measure(name, path, "snapshot", snapshot_dir)
+                after = measure(name, path, "snapshot", snapshot_dir)
+                print(f"{name:>10} {rows:>8} {before['seconds']:>11.3f} {after['seconds']:>13.3f} "
+                      f"{before['peak_rss_mb']:>17.1f} {after['peak_rss_mb']:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Nearest-outlet and radius queries: grid SpatialIndex vs a full haversine scan.
+
+Outlets are spread uniformly over greater Jakarta, queries start at random
+points inside it. Both methods are checked to return the same outlets.
+
+Run from the repository root:
+
+    python benchmarks/spatial_index.py --points 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.distance import distance_to_point  # noqa: E402
+from route_optimizer.spatial import SpatialIndex  # noqa: E402
+
+
+def full_scan(lat, lon, point_lat, point_lon, k, radius_km=None):
+    distances = distance_to_point(lat, lon, point_lat, point_lon)
+    if radius_km is not None:
+        distances = np.where(distances <= radius_km * 1000, distances, np.inf)
+    order = np.argsort(distances, kind="stable")[:k]
+    return order[np.isfinite(distances[order])]
+
+
+def per_query_ms(function, queries):
+    start = time.perf_counter()
+    results = [function(*query) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=25, help="outlets per nearest query")
+    parser.add_argument("--radius", type=float, default=1.0, help="radius of the within query in km")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'points':>8} {'build (s)':>10} {'scan k-NN (ms)':>15} {'index k-NN (ms)':>16} {'scan radius (ms)':>17} {'index radius (ms)':>18}")
+    for points in args.points:
+        lat = rng.uniform(-6.40, -6.08, points)
+        lon = rng.uniform(106.65, 107.00, points)
+        queries = list(zip(rng.uniform(-6.40, -6.08, args.queries), rng.uniform(106.65, 107.00, args.queries)))
+
+        start = time.perf_counter()
+        index = SpatialIndex(lat, lon)
+        build = time.perf_counter() - start
+
+        scan_knn, expected = per_query_ms(lambda a, b: full_scan(lat, lon, a, b, args.k), queries)
+        index_knn, found = per_query_ms(lambda a, b: index.nearest(a, b, args.k)[0], queries)
+        assert all(np.array_equal(np.sort(x), np.sort(y)) for x, y in zip(expected, found))
+
+        scan_radius, expected = per_query_ms(lambda a, b: full_scan(lat, lon, a, b, points, args.radius), queries)
+        index_radius, found = per_query_ms(lambda a, b: index.within(a, b, args.radius)[0], queries)
+        assert all(np.array_equal(np.sort(x), np.sort(y)) for x, y in zip(expected, found))
+
+        print(f"{points:>8} {build:>10.3f} {scan_knn:>15.3f} {index_knn:>16.3f} {scan_radius:>17.3f} {index_radius:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
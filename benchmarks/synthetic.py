@@ -0,0 +1,75 @@
+"""Synthetic raw outlet tables in the schema of Data Habs, Leads and Customers.
+
+Outlets are spread uniformly over greater Jakarta. The tables look like the
+sources before cleaning: ``route_optimizer.datasets.prepare_*`` turn them into
+what the pages use.
+"""
+import numpy as np
+import pandas as pd
+
+
+def coordinates(rng, rows, missing=0.02):
+    lat = rng.uniform(-6.40, -6.08, rows).round(7)
+    lon = rng.uniform(106.65, 107.00, rows).round(7)
+    lat[rng.random(rows) < missing] = np.nan
+    return lat, lon
+
+
+def make_data_habs(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lat, lon = coordinates(rng, rows)
+    return pd.DataFrame({
+        "Nama": [f"Outlet {i}" for i in range(rows)],
+        "Kota/Kab": rng.choice(["Kota Jakarta Selatan", "Kota Jakarta Barat"], rows),
+        "Telp": "0812345678",
+        "Latitude": lat,
+        "Longitude": lon,
+        "Visited": rng.choice(["Yes", "No"], rows, p=[0.1, 0.9]),
+    })
+
+
+def make_leads(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lat, lon = coordinates(rng, rows, missing=0)
+    return pd.DataFrame({
+        "mt_leads_code": [f"LEAD{i:07d}" for i in range(rows)],
+        "outlet_name": [f"Outlet {i}" for i in range(rows)],
+        "outlet_langitude": lat,
+        "outlet_longitude": lon,
+        "pic_phone": rng.integers(10**9, 10**10, rows).astype(str),
+        "m_province_name": "DKI JAKARTA",
+        "m_regency_name": rng.choice(["KOTA JAKARTA SELATAN", "KOTA JAKARTA BARAT"], rows),
+        "m_district_name": rng.choice(["KEBAYORAN BARU", "CILANDAK", "PESANGGRAHAN", "KEMBANGAN"], rows),
+    })
+
+
+def make_customers(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lat, lon = coordinates(rng, rows, missing=0)
+    urls = pd.Series([f"https://www.google.com/maps/?q={a},{b}" for a, b in zip(lat, lon)])
+    urls[rng.random(rows) < 0.02] = None
+    return pd.DataFrame({
+        "ID Merchant": np.arange(rows),
+        "Nama Outlet": [f"Outlet {i}" for i in range(rows)],
+        "Kota Outlet": rng.choice(["Kota Jakarta Selatan", "Kota Jakarta Barat"], rows),
+        "Provinsi Outlet": "DKI Jakarta",
+        "Google Maps": urls,
+        "Last Transaction Date": pd.Timestamp("2022-10-01"),
+    })
+
+
+def write_raw(name, df, path):
+    """Writes a raw table in the file format of its dataset (xlsx for Customers, csv otherwise)"""
+    if name == "customers":
+        # plain strings, xlsxwriter refuses more than 65k hyperlinks per sheet
+        with pd.ExcelWriter(path, engine="xlsxwriter", engine_kwargs={"options": {"strings_to_urls": False}}) as writer:
+            df.to_excel(writer, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+MAKERS = {
+    "data_habs": make_data_habs,
+    "leads": make_leads,
+    "customers": make_customers,
+}
@@ -0,0 +1,58 @@
+"""Multi-day territory plan of a city backlog: one worker vs a process pool.
+
+A synthetic Data Habs backlog of one city is planned for a team of
+canvassers over several working days with the local solver, once with a
+single worker and once with a process pool, and the scheduled outlets are
+reported with the time taken.
+
+Run from the repository root:
+
+    python benchmarks/territory_plan.py --canvassers 4 --days 5 --time-limit 1
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from route_optimizer.datasets import prepare_data_habs  # noqa: E402
+from route_optimizer.planning import plan_territory, working_days  # noqa: E402
+from route_optimizer.solver import LocalClient  # noqa: E402
+from route_optimizer.splitting import DEFAULT_LOCAL_MAX_JOBS, SplitOptimizer  # noqa: E402
+from synthetic import make_data_habs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="rows of the synthetic sheet, about a third in the city")
+    parser.add_argument("--canvassers", type=int, default=4)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--time-limit", type=float, default=1.0, help="local solver time limit per day route")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    df = prepare_data_habs(make_data_habs(args.rows, 0))
+    backlog = df.loc[df["kota/kab"] == df["kota/kab"].iloc[0]]
+    latitude = backlog["latitude"].astype(float)
+    longitude = backlog["longitude"].astype(float)
+    # start points spread along the city
+    quantiles = [(number + 0.5) / args.canvassers for number in range(args.canvassers)]
+    starts = [[float(longitude.quantile(q)), float(latitude.quantile(q))] for q in quantiles]
+    days = working_days(datetime.date(2022, 10, 24), args.days)
+    optimize = SplitOptimizer(LocalClient(time_limit=args.time_limit).optimization, DEFAULT_LOCAL_MAX_JOBS)
+
+    print(f"backlog of {len(backlog)} outlets, {args.canvassers} canvassers, {args.days} days")
+    print(f"{'workers':>8} {'seconds':>8} {'routes':>7} {'planned':>8} {'unassigned':>11} {'unscheduled':>12}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        plan = plan_territory(optimize, backlog, "longitude", "latitude", starts, days, (8, 0, 17, 0), 20 * 60,
+                              workers=workers, processes=True)
+        seconds = time.perf_counter() - start
+        planned = sum(step["type"] == "job" for route in plan["routes"] for step in route["steps"])
+        print(f"{workers:>8} {seconds:>8.2f} {len(plan['routes']):>7} {planned:>8} {len(plan['unassigned']):>11} {len(plan['unscheduled']):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,92 @@
 import streamlit as st
 import pandas as pd
 import folium
-from folium import FeatureGroup
-from folium.plugins import MarkerCluster
 from streamlit_folium import folium_static
-from geopy.distance import distance
 import openrouteservice
-from openrouteservice import convert
+from route_optimizer.cache import get_result_cache
+from route_optimizer.export import EXPORT_FORMATS, export_bytes, route_items
+from route_optimizer.filters import FilterSchema
+from route_optimizer.datasets import DATA_HABS_URL, memory_report, merge_near_duplicates, prepare_data_habs
+from route_optimizer.dedup import expand_duplicates
+from route_optimizer.geometry import describe_stats, simplify_routes
+from route_optimizer.incremental import DEFAULT_REPAIR_TIME_LIMIT, reoptimize
+from route_optimizer.jobs import DONE, FAILED, POLL_SECONDS, get_job_manager
+from route_optimizer.live import DEFAULT_LIVE_INTERVAL, replan_remaining, visited_stops
+from route_optimizer.maps import route_map
+from route_optimizer.matrix_store import MatrixClient, get_matrix_store, ors_fetch
+from route_optimizer.ors import api_key, get_routing_client
+from route_optimizer.planning import plan_territory, working_days
+from route_optimizer.sheets import get_sheet_source
+from route_optimizer.regions import RegionIndex
+from route_optimizer.routes import all_stations_dataframe, merge_outlets, downloadable_dataframe, parse_start_points
+from route_optimizer.solver import LocalClient, DEFAULT_TIME_LIMIT
+from route_optimizer.spatial import SpatialIndex
+from route_optimizer.splitting import DEFAULT_LOCAL_MAX_JOBS, DEFAULT_MAX_JOBS, SplitOptimizer, solve
+from route_optimizer.timing import Timings, get_timing_log, save_profile, start_profile, stop_profile
 import datetime
-from folium.plugins import BeautifyIcon
-import io
-from pandas.api.types import (
-    is_categorical_dtype,
-    is_datetime64_any_dtype,
-    is_numeric_dtype,
-    is_object_dtype,
-)
-from folium.plugins import BeautifyIcon
+import time
 
 st.set_page_config(layout="wide", page_title="Route Optimizer", page_icon="💎")
+# timing spans of this rerun, shown in the performance section of the sidebar and logged (see route_optimizer.timing)
+timings = Timings("data_habs")
+# the reruns that only poll (running jobs, live mode) are not logged, see the end of the page
+poll_rerun = st.session_state.pop("poll_rerun", False)
+# the whole rerun is profiled when asked for in the performance section
+# a profiled rerun cut short (an error, a widget change) never gets there, its profile is stopped here
+stop_profile(st.session_state.pop("profiler", None))
+profiler = st.session_state["profiler"] = start_profile() if st.session_state.pop("profile_rerun", False) else None
 st.markdown("# Route Optimizer on Data Habs Scraping")
 st.markdown(f"Outlet data updated automatically from spreadsheets")
 
-file_url='https://docs.google.com/spreadsheets/d/e/2PACX-1vSvPKfCcokx7jBATBeDziy-4zeNGUWo_6uUG4CfEchmTHxUNX1HelhloU0oKG3HbNIkieGD7KPmCn9A/pub?output=csv'
+file_url = DATA_HABS_URL
 
-@st.cache(allow_output_mutation=True)
-def get_data_habs(path):
-    df =  pd.read_csv(path)
-    # adding new columns (for openrouteservice api compatibility)
-    df["needed_amount"] = 1
-    
-    df.columns = df.columns.str.lower().str.replace(' ', '_')
-    # adding new column of google maps url
-    df["google_maps"] = df.apply(lambda row: "https://www.google.com/maps/?q=" + str(row["latitude"]) + "," + str(row["longitude"]), axis=1)
-    df['longitude'] =  df['longitude'].astype('str')
-    df['latitude'] =  df['latitude'].astype('str')
-    df = df.loc[(df['latitude'].notnull()) & (df['latitude'] != 'nan') & (df['visited'] != 'Yes')].copy()
+# local copy of the sheet, revalidated in the background so no rerun waits on the download
+# its visited column drives live mode, so it is refreshed as often as live mode plans again
+sheet = get_sheet_source(file_url, DEFAULT_LIVE_INTERVAL)
 
-    return df
+# every refresh of the sheet is a new version, only the current one is kept
+@st.cache(allow_output_mutation=True, max_entries=1)
+def get_data_habs(path, version):
+    # version is the content hash of the local copy, a refreshed sheet is cleaned again
+    return prepare_data_habs(get_sheet_source(path, DEFAULT_LIVE_INTERVAL).dataframe())
 
 # run get_outlet_data
-dataframe = get_data_habs(file_url)
-
+with timings.span("sheet load"):
+    sheet_version = sheet.load()
+    dataframe = get_data_habs(file_url, sheet_version)
+# when the sheet last changed and whether the background refresh is working
+sheet_status = sheet.status()
+if sheet_status["fetched_at"]:
+    st.caption(f"Sheet last changed at {datetime.datetime.fromtimestamp(sheet_status['fetched_at']).strftime('%Y-%m-%d %H:%M')}"
+               + (f", refreshing failed: {sheet_status['last_error']}" if sheet_status["last_error"] else ""))
+
+@st.cache(allow_output_mutation=True, max_entries=1)
+def get_spatial_index(path, version):
+    # built once per dataset load, positions refer to the rows of the cached dataframe
+    return SpatialIndex.from_dataframe(get_data_habs(path, version), "latitude", "longitude")
+
+
+@st.cache(allow_output_mutation=True, max_entries=1)
+def get_region_index(path, version):
+    # city row positions, built once per dataset load and shared by every session
+    return RegionIndex(get_data_habs(path, version), ["kota/kab"])
+
+with timings.span("region index"):
+    regions = get_region_index(file_url, sheet_version)
+
+@st.cache(allow_output_mutation=True, max_entries=1)
+def get_filter_schema(path, version):
+    # column kinds, category codes and sorted values of the explorer, built once per dataset load
+    return FilterSchema(get_data_habs(path, version))
 
 # auto filter function
-def filter_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+def filter_dataframe(df: pd.DataFrame, schema: FilterSchema) -> pd.DataFrame:
     """
     Adds a UI on top of a dataframe to let viewers filter columns
 
     Args:
         df (pd.DataFrame): Original dataframe
+        schema (FilterSchema): cached filter structures of the same dataframe
 
     Returns:
         pd.DataFrame: Filtered dataframe
@@ -59,36 +96,27 @@ def filter_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     if not modify:
         return df
 
-    df = df.copy()
-
-    # Try to convert datetimes into a standard format (datetime, no timezone)
-    for col in df.columns:
-        if is_object_dtype(df[col]):
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except Exception:
-                pass
-
-        if is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.tz_localize(None)
-
     modification_container = st.container()
+    masks = []
 
     with modification_container:
-        to_filter_columns = st.multiselect("Filter dataframe on", df.columns)
+        to_filter_columns = st.multiselect("Filter dataframe on", schema.columns)
         for column in to_filter_columns:
             left, right = st.columns((1, 20))
+            kind = schema.kinds[column]
             # Treat columns with < 10 unique values as categorical
-            if is_categorical_dtype(df[column]) or df[column].nunique() < 10:
+            if kind == "categorical":
+                options = schema.options(column)
                 user_cat_input = right.multiselect(
                     f"Values for {column}",
-                    df[column].unique(),
-                    default=list(df[column].unique()),
+                    options,
+                    default=options,
                 )
-                df = df[df[column].isin(user_cat_input)]
-            elif is_numeric_dtype(df[column]):
-                _min = float(df[column].min())
-                _max = float(df[column].max())
+                masks.append(schema.isin(column, user_cat_input))
+            elif kind == "numeric":
+                _min, _max = schema.bounds(column)
+                if _min is None:
+                    continue
                 step = (_max - _min) / 100
                 user_num_input = right.slider(
                     f"Values for {column}",
@@ -97,37 +125,37 @@ def filter_dataframe(df: pd.DataFrame) -> pd.DataFrame:
                     value=(_min, _max),
                     step=step,
                 )
-                df = df[df[column].between(*user_num_input)]
-            elif is_datetime64_any_dtype(df[column]):
+                masks.append(schema.between(column, *user_num_input))
+            elif kind == "datetime":
+                _min, _max = schema.bounds(column)
+                if _min is None:
+                    continue
                 user_date_input = right.date_input(
                     f"Values for {column}",
-                    value=(
-                        df[column].min(),
-                        df[column].max(),
-                    ),
+                    value=(_min, _max),
                 )
                 if len(user_date_input) == 2:
-                    user_date_input = tuple(map(pd.to_datetime, user_date_input))
                     start_date, end_date = user_date_input
-                    df = df.loc[df[column].between(start_date, end_date)]
+                    masks.append(schema.between(column, start_date, end_date))
             else:
                 user_text_input = right.text_input(
                     f"Substring or regex in {column}",
                 )
                 if user_text_input:
-                    df = df[df[column].astype(str).str.contains(user_text_input)]
+                    masks.append(schema.contains(column, user_text_input))
 
-    return df
+    return schema.select(masks)
 
 ####################### EXPLORE THE DATAFRAME #################
 st.subheader("Explore Data Here")
 st.markdown("##### Before inputting into sidebar, please explore data below by filtering out")
-st.dataframe(filter_dataframe(dataframe))
+with timings.span("filter_dataframe"):
+    st.dataframe(filter_dataframe(dataframe, get_filter_schema(file_url, sheet_version)))
 
 ######################## SIDEBAR PART 1 ###############################
 st.sidebar.markdown("#### Outlet Selection Section")
 ############ SELECT CITY ############
-select_city = st.sidebar.multiselect(label="Select city", options=dataframe["kota/kab"].unique().tolist(), default=['Kota Jakarta Selatan', 'South Jakarta City'], help="You can select multiple, but please select as minimum as possible to optimize the results")
+select_city = st.sidebar.multiselect(label="Select city", options=regions.options(), default=['Kota Jakarta Selatan', 'South Jakarta City'], help="You can select multiple, but please select as minimum as possible to optimize the results")
 # initiate session_state for select_province
 if "city" not in st.session_state:
     st.session_state["city"] = select_city
@@ -140,7 +168,7 @@ if submit_city:
 
 
 ############ SELECT OUTLET ############
-select_outlet = st.sidebar.multiselect(label="Select outlet", options=dataframe.loc[(dataframe["kota/kab"].isin(st.session_state["city"])), "nama"].unique().tolist(), 
+select_outlet = st.sidebar.multiselect(label="Select outlet", options=regions.values("nama", [st.session_state["city"]]), 
     help="You can select multiple, but please select as minimum as possible to optimize the results"
 )
 
@@ -154,6 +182,30 @@ submit_outlet = st.sidebar.button("Change outlet")
 if submit_outlet:
     st.session_state["outlet"] = select_outlet
 
+############ SELECT NEAREST OUTLETS ############
+with st.sidebar:
+    # outlets around the start point instead of picking them by name
+    near1, near2 = st.columns(2)
+    select_nearest = near1.number_input("Nearest outlets", value=20, min_value=1, help="Number of outlets closest to the start point")
+    select_radius = near2.number_input("Within (km)", value=0.0, min_value=0.0, help="Only outlets at most this far from the start point, 0 means no limit")
+    submit_nearest = st.button("Select nearest outlets")
+
+# row ids of the outlets selected around the start point, empty when picked by name
+if "nearest_data_habs" not in st.session_state:
+    st.session_state["nearest_data_habs"] = []
+
+if submit_outlet:
+    st.session_state["nearest_data_habs"] = []
+
+if submit_nearest:
+    if st.session_state.get("latitude", 0) != 0 and st.session_state.get("longitude", 0) != 0:
+        with timings.span("nearest outlets"):
+            positions, _ = get_spatial_index(file_url, sheet_version).nearest(st.session_state["latitude"], st.session_state["longitude"], int(select_nearest), radius_km=select_radius or None)
+        st.session_state["nearest_data_habs"] = dataframe.index[positions].tolist()
+        st.session_state["outlet"] = dataframe.loc[st.session_state["nearest_data_habs"], "nama"].unique().tolist()
+    else:
+        st.sidebar.warning("Please input the start point first")
+
 
 #################### Filtered DataFrame from sidebar #################################
 if len(st.session_state["outlet"]) > 0:
@@ -161,9 +213,11 @@ if len(st.session_state["outlet"]) > 0:
     st.subheader("You've Selected Outlets Below")
     st.markdown("Make sure you select corectly number of outlets on the sidebar")
     # dataframe
-    filtered_dataframe = dataframe.loc[
-        (dataframe["kota/kab"].isin(st.session_state["city"])) &
-        (dataframe["nama"].isin(st.session_state["outlet"]))].copy()
+    if st.session_state["nearest_data_habs"]:
+        # the sheet may have been refreshed since, outlets that are gone are skipped
+        filtered_dataframe = dataframe.loc[dataframe.index.isin(st.session_state["nearest_data_habs"])]
+    else:
+        filtered_dataframe = dataframe.iloc[regions.select([st.session_state["city"]], "nama", st.session_state["outlet"])]
     st.dataframe(filtered_dataframe)
 else:
     st.warning("You have no outlets selected, please select first from the sidebar.")
@@ -225,6 +279,8 @@ with st.sidebar:
     input_longitude = coor2.number_input(label="Input longitude of start point", value=106.7350485, help="Example format: 10x.xxxxxxx")
     # clickable link
     st.markdown("_How to find out longitude and latitude [click here](%s)_" % url)
+    # other canvassers (optional), the outlets are split between everyone
+    input_other_starts = st.text_area(label="Start points of other canvassers", help="Optional, one canvasser per line as 'latitude, longitude'. Outlets are split into one compact group per canvasser")
 
 # initiate session_state for input_longitude and input_latitude
 if "longitude" not in st.session_state:
@@ -233,6 +289,9 @@ if "longitude" not in st.session_state:
 if "latitude" not in st.session_state:
     st.session_state["latitude"] = input_latitude
 
+if "other_starts" not in st.session_state:
+    st.session_state["other_starts"] = parse_start_points(input_other_starts)
+
 # submit button to submit the changes in sidebar
 with st.sidebar:
     submit_start = st.button("Change start point")
@@ -241,6 +300,43 @@ with st.sidebar:
 if submit_start:
     st.session_state["longitude"] = input_longitude
     st.session_state["latitude"] = input_latitude
+    st.session_state["other_starts"] = parse_start_points(input_other_starts)
+
+############ SELECT OPTIMIZER ENGINE ############
+def ors_api_key():
+    # openrouteservice key from .streamlit/secrets.toml, without one route_optimizer.ors reads the ORS_API_KEY environment variable
+    try:
+        return st.secrets.get("ORS_API_KEY")
+    except FileNotFoundError:
+        return None
+
+with st.sidebar:
+    # local solver works offline and does not use the API quota
+    select_engine = st.radio("Optimizer engine", options=["Openrouteservice", "Local solver"], help="Local solver runs offline without using the API quota, travel time comes from the road times stored by earlier runs or is estimated from straight-line distance")
+    if select_engine == "Openrouteservice":
+        try:
+            api_key(ors_api_key())
+        except ValueError as error:
+            st.error(f"{error} or add ORS_API_KEY to .streamlit/secrets.toml")
+    select_time_limit = st.number_input("Local solver time limit (seconds)", value=DEFAULT_TIME_LIMIT, min_value=0.0, help="How long the local solver may keep improving the route, default is 2 seconds")
+    select_incremental = st.checkbox("Update the last run on small edits", value=True, help="Adding or removing a few outlets or moving a start point updates the routes of the last run in milliseconds, starting from them, instead of optimizing everything again")
+    # result cache usage
+    cache_stats = get_result_cache().stats()
+    st.caption(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} stored plans")
+    matrix_stats = get_matrix_store().stats()
+    st.caption(f"Road matrix store: {matrix_stats['pairs']} location pairs stored, {matrix_stats['hits']} reused by the runs, {matrix_stats['requested']} matrix cells requested")
+    # chosen before running, changing a widget afterwards reruns the page without the result
+    export_format = st.selectbox("Download format", list(EXPORT_FORMATS), format_func=lambda key: EXPORT_FORMATS[key][2])
+
+############ MULTI-DAY TERRITORY PLANNING ############
+with st.sidebar:
+    st.markdown("#### Multi-day Planning Section")
+    # the whole unvisited backlog of the selected cities, split between every canvasser and working day
+    plan1, plan2 = st.columns(2)
+    select_days = plan1.number_input("Working days", value=5, min_value=1, max_value=60, help="Number of working days to plan, Sundays are skipped")
+    select_first_day = plan2.date_input("First day", value=datetime.date.today() + datetime.timedelta(days=1))
+    select_per_day = st.number_input("Outlets per canvasser per day", value=0, min_value=0, help="0 estimates it from the visit duration, the working hours and the distance between outlets")
+    post_plan = st.button("Plan Territory", help="Plans every unvisited outlet of the selected cities for all canvassers (start points above) over the working days, using the time settings above")
 
 ################# POST BUTTON TO CALL OPENROUTESERVICE API ##############
 if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0:
@@ -253,8 +349,10 @@ else:
 
 ###### Add filtered_dataframe with open and close hours
 if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0:
-    filtered_dataframe["open"] = datetime.datetime.today().replace(hour=st.session_state["clock_hour"], minute=st.session_state["clock_minute"], second=0)
-    filtered_dataframe["close"] = datetime.datetime.today().replace(hour=st.session_state["clock_hour_finish"], minute=st.session_state["clock_minute_finish"], second=0)
+    # a new frame for the selection, the dataframe shared by every session is never written to
+    filtered_dataframe = filtered_dataframe.assign(
+        open=datetime.datetime.today().replace(hour=st.session_state["clock_hour"], minute=st.session_state["clock_minute"], second=0),
+        close=datetime.datetime.today().replace(hour=st.session_state["clock_hour_finish"], minute=st.session_state["clock_minute_finish"], second=0))
 
 
 
@@ -262,12 +360,13 @@ if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 a
 def get_vehicle():
     # https://openrouteservice-py.readthedocs.io/en/latest/openrouteservice.html#openrouteservice.optimization.Vehicle
     vehicles = list()
-    for idx in range(1):
+    starts = [[st.session_state["longitude"], st.session_state["latitude"]]] + st.session_state["other_starts"]
+    for idx, start in enumerate(starts):
         vehicles.append(
             openrouteservice.optimization.Vehicle(
                 id=idx,
                 # start point
-                start=[st.session_state["longitude"], st.session_state["latitude"]],
+                start=start,
                 # len of outlets
                 capacity=[len(st.session_state["outlet"])+2],
                 time_window=[int(datetime.datetime.today().replace(hour=st.session_state["clock_hour"], minute=st.session_state["clock_minute"], second=0).timestamp()),
@@ -278,10 +377,10 @@ def get_vehicle():
 
 
 # Next, define the delivery stations
-def get_delivery():   
+def get_delivery(outlets):
     # https://openrouteservice-py.readthedocs.io/en/latest/openrouteservice.html#openrouteservice.optimization.Job
     deliveries = list()
-    for delivery in filtered_dataframe.itertuples():
+    for delivery in outlets.itertuples():
         deliveries.append(
             openrouteservice.optimization.Job(
                 id=delivery.Index,
@@ -296,186 +395,355 @@ def get_delivery():
 
 
 
-# this function is intended to call ors api
-
-# this function is intended to call ors api
-@st.cache(allow_output_mutation=True, ttl=30)
-def get_optimizer():
+# this function is intended to call ors api, on a worker thread of the job manager:
+# jobs and vehicles are built on the script thread since st.session_state is not available there
+def run_optimizer(job, engine, time_limit, jobs, vehicles):
     # Initialize a client and make the request
-    ors_client = openrouteservice.Client(key='5b3ce3597851110001cf6248f903a2eb28b04234bcb4b7ada2ccf7c3')  # Get an API key from https://openrouteservice.org/dev/#/signup
-    result = ors_client.optimization(
-        jobs=get_delivery(),
-        vehicles=get_vehicle(),
-        geometry=True
-    )
+    if engine == "Local solver":
+        # offline solver, road travel times already in the matrix store are used
+        # and the other ones are estimated from straight-line distance
+        # the solver reports its progress and stops at its next step once the run is cancelled
+        ors_client = MatrixClient(LocalClient(time_limit=time_limit, progress=job.report), get_matrix_store())
+    else:
+        # one rate-limited client per process, shared by every session (see route_optimizer.ors);
+        # road travel times between outlets are stored, only the unknown pairs are requested
+        routing_client = get_routing_client(ors_api_key())
+        ors_client = MatrixClient(routing_client, get_matrix_store(), fetch=ors_fetch(routing_client))
+    # one compact group of outlets per canvasser, and routes longer than the engine takes
+    # in one request are split into chunks solved concurrently and stitched back together
+    max_jobs = DEFAULT_LOCAL_MAX_JOBS if engine == "Local solver" else DEFAULT_MAX_JOBS
+    optimize = lambda: solve(ors_client.optimization, jobs, vehicles, max_jobs=max_jobs, processes=engine == "Local solver",
+                             progress=job.report)
+    # the run logs its own spans, it usually finishes after the rerun that submitted it
+    run_timings = Timings("data_habs run")
+    # identical plans are answered from the on-disk cache without using the API quota
+    job.report(0, message="solving" if engine == "Local solver" else "waiting for openrouteservice")
+    with run_timings.span(f"optimization ({engine})"):
+        result = get_result_cache().get_or_compute(
+            optimize,
+            jobs, vehicles, engine=engine, time_limit=time_limit if engine == "Local solver" else None, geometry=True
+        )
+    get_timing_log().write(run_timings)
 
     return result
 
-############################## CONDITIONS TO CALL FUNCTION #####################################
-if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0:
-    if post_ors_api:
-        try:
-            result = get_optimizer()
-            if result:
-                # create list of extracted result
-                stations = list()
-                for route in result['routes']:
-                    vehicle = list()
-                    for step in route["steps"]:
-                        vehicle.append([
-                                step.get("job", "Center/Start"),  # Station ID
-                                step["arrival"],  # Arrival time
-                                step["arrival"] + step.get("service", 0),  # Departure time
-                                step["location"],
-                                step["distance"],
-                                step["duration"]
-                            ])
-                    stations.append(vehicle)
-
-                # create dataframe
-                df_stations = pd.DataFrame(stations[0], columns=["Station ID", "Arrival", "Departure", "Location", "Distance", "Duration"])
-                df_stations['Arrival'] = pd.to_datetime(df_stations['Arrival'], unit='s')
-                df_stations['Departure'] = pd.to_datetime(df_stations['Departure'], unit='s')
-                df_stations["Distance to Previous"] = df_stations["Distance"] - df_stations["Distance"].shift(periods=1, fill_value=0)
-                df_stations["Duration to Previous"] = df_stations["Duration"] - df_stations["Duration"].shift(periods=1, fill_value=0)
-
-                ###### CARD #######
-                st.subheader("Estimated Route in Total")
-                st.markdown("Time in total is calculated by adding total visit time and total trip time.")
-                st.markdown("__Disclaimer__: _Estimated time does not calculate the traffic jam._")
-                col1, col2, col3 = st.columns(3)
-                # total distance
-                col1.metric(label="Total Estimated Distance", value=f"{df_stations.tail(1)['Distance'].values[0]/1000:.2f} km")
-                # total duration in minutes
-                col2.metric(label="Total Estimated Time", value=f"{(df_stations.tail(1)['Duration'].values[0]/60)+((len(df_stations)-1)*st.session_state['minutes']):.2f} in minute(s)")
-                # total duration in minutes
-                col3.metric(label="Total Estimated Time", value=f"{((df_stations.tail(1)['Duration'].values[0]/60)+((len(df_stations)-1)*st.session_state['minutes']))/60:.2f} in hour(s)")
-
-                # merge filtered dataframe and df_stations to get nama_outlet and google_maps link
-                df_merged = pd.merge(
-                    df_stations,
-                    filtered_dataframe.loc[:, ["nama", "google_maps", "telp"]],
-                    how="outer", 
-                    left_on="Station ID", 
-                    right_index=True
-                )
+# small edits of the last run of this session are repaired from its routes instead of solved again
+def update_last_run(engine, deliveries, vehicles):
+    previous = next((job for job in map(manager.get, reversed(st.session_state["data_habs_jobs"]))
+                     if job is not None and job.status == DONE and job.context.get("engine") == engine and "jobs" in job.context), None)
+    if previous is None:
+        return None, None
+    # road times of new outlets are fetched (openrouteservice) or estimated (local solver), there is no remote optimization
+    fetch = ors_fetch(get_routing_client(ors_api_key())) if engine == "Openrouteservice" else None
+    repair_client = MatrixClient(LocalClient(time_limit=DEFAULT_REPAIR_TIME_LIMIT), get_matrix_store(), fetch=fetch)
+    try:
+        return previous, reoptimize(repair_client.optimization, previous.result, previous.context["jobs"], previous.context["vehicles"], deliveries, vehicles)
+    except Exception:
+        # e.g. the matrix request failed, the full run reports the error in the runs section
+        return previous, None
+
+# live mode: visited outlets are dropped and the rest of the day is planned again (see route_optimizer.live)
+def get_live_result(run):
+    # the local copy of the sheet is refreshed in the background, visited outlets are marked in its visited column
+    # an outlet is named by its name and phone number, the sheet rows move when rows are inserted or deleted
+    visited = visited_stops(run.context["outlets"], sheet.dataframe(), key=["nama", "telp"], flag="visited")
+    # a visit to a merged listing is a visit to the job of its kept listing
+    kept = {other: job_id for job_id, others in run.context.get("duplicates", {}).items() for other in others}
+    visited = {kept.get(job_id, job_id): seconds for job_id, seconds in visited.items()}
+    fetch = ors_fetch(get_routing_client(ors_api_key())) if run.context["engine"] == "Openrouteservice" else None
+    repair_client = MatrixClient(LocalClient(time_limit=DEFAULT_REPAIR_TIME_LIMIT), get_matrix_store(), fetch=fetch)
+    return replan_remaining(repair_client.optimization, run.result, run.context["jobs"], run.context["vehicles"], visited)
+
+def current_live_result(run):
+    # planned again at most once per interval, the poll reruns in between show the stored plan and when it was made
+    live = st.session_state.get("data_habs_live")
+    if live is None or live["job"] != run.id or time.time() - live["at"] >= DEFAULT_LIVE_INTERVAL:
+        live = {"job": run.id, "at": time.time(), "result": get_live_result(run)}
+        st.session_state["data_habs_live"] = live
+    return live["result"], live["at"]
+
+def cached_export(key, build):
+    # the file of the shown run is built once per run and format, not on every rerun (e.g. the polling ones)
+    cached = st.session_state.get("data_habs_export")
+    if cached is None or cached[0] != key:
+        cached = (key, build().getvalue())
+        st.session_state["data_habs_export"] = cached
+    return cached[1]
+
+# the result of a finished run, with the outlets, start point and visit duration it was submitted with
+# result_key names the shown result (run id, live plan time) for the export cache
+def show_result(result, outlets, center, minutes, result_key):
+    if not result:
+        st.markdown("There was an error in generating the result")
+        return
+    if not result.get("routes"):
+        # every outlet left unassigned (e.g. none fits the time window) or, live, every stop visited
+        if result.get("finished"):
+            st.markdown("Every canvasser has visited all of their outlets.")
+        else:
+            st.warning(f"No route could be planned, {len(result.get('unassigned', []))} outlet(s) were left unassigned. "
+                       "Please check the time window, the visit duration and the start point.")
+        return
+    if "incremental" in result:
+        st.caption(f"Updated from the previous run in {result['incremental']['milliseconds']} ms ({result['incremental']['edits']} edit(s)), route lines are straight between stops")
+    # create dataframe of every route (one per canvasser)
+    with timings.span("routes tables"):
+        df_stations = all_stations_dataframe(result)
+    route_totals = df_stations.groupby("Vehicle")[["Distance", "Duration"]].last()
+
+    ###### CARD #######
+    st.subheader("Estimated Route in Total")
+    st.markdown("Time in total is calculated by adding total visit time and total trip time.")
+    st.markdown("__Disclaimer__: _Estimated time does not calculate the traffic jam._")
+    col1, col2, col3 = st.columns(3)
+    # total distance
+    col1.metric(label="Total Estimated Distance", value=f"{route_totals['Distance'].sum()/1000:.2f} km")
+    # total duration in minutes
+    col2.metric(label="Total Estimated Time", value=f"{(route_totals['Duration'].sum()/60)+((len(df_stations)-len(route_totals))*minutes):.2f} in minute(s)")
+    # total duration in minutes
+    col3.metric(label="Total Estimated Time", value=f"{((route_totals['Duration'].sum()/60)+((len(df_stations)-len(route_totals))*minutes))/60:.2f} in hour(s)")
+
+    # merge filtered dataframe and df_stations to get nama_outlet and google_maps link
+    with timings.span("merge outlets"):
+        df_merged = merge_outlets(df_stations, outlets, ["nama", "google_maps", "telp"])
+    # copying df_merged
+    df_merged_clean = df_merged.loc[df_merged["duration"].notnull()].copy()
+
+
+    # create map with one colored layer per canvasser
+    with timings.span("polyline decoding"):
+        lines, geometry_stats = simplify_routes(result['routes'])
+    with timings.span("map building"):
+        m = route_map(df_merged_clean, result['routes'], "nama", center, lines=lines)
 
-                # rename columns' name
-                df_merged.columns = df_merged.columns.str.lower().str.replace(" ", "_")
-                # copying df_merged
-                df_merged_clean = df_merged.loc[df_merged["duration"].notnull()].copy()
-
-
-                # create map by instantiating folium object
-                m = folium.Map(location=[st.session_state["latitude"], st.session_state["longitude"]], zoom_start=10, tiles='cartodbpositron')
-
-                
-
-                # Plot the locations on the map with more info in the ToolTip (using for loop)
-                for location in df_merged_clean.itertuples():
-                    tooltip = folium.map.Tooltip("Merchant: {}".format(location.nama))
-                    popup=folium.map.Popup(f"Distance to Previous: {location.distance_to_previous/1000:.2f} km <br> Duration to Previous: {location.duration_to_previous/60:.2f} minutes <br> Maps URL: <a href={location.google_maps}>{location.google_maps}</a>")
-                    
-                    folium.Marker(
-                        location=list(reversed(location.location)),
-                        tooltip=tooltip,
-                        popup=popup,
-                        icon=BeautifyIcon(
-                            icon_shape='marker',
-                            number=int(location.Index),
-                            spin=True,
-                            text_color='red',
-                            background_color="#FFF",
-                            inner_icon_style="font-size:12px;padding-top:-5px;"
-                        )
-                    ).add_to(m)
-
-                # plot starting point
-                folium.Marker(
-                    location=[st.session_state["latitude"], st.session_state["longitude"]],
-                    icon=folium.Icon(color="green", icon="bus", prefix='fa'),
-                    setZIndexOffset=1000,tooltip="Start Point"
-                ).add_to(m)
-
-                # add geometry distance
-                for color, route in zip(['green', 'red', 'blue'], result['routes']):
-                    decoded = convert.decode_polyline(route['geometry'])  # Route geometry is encoded
-                    gj = folium.GeoJson(
-                        name='Vehicle {}'.format(route['vehicle']),
-                        data={"type": "FeatureCollection", "features": [{"type": "Feature",
-                                                                        "geometry": decoded,
-                                                                        "properties": {"color": color}
-                                                                        }]},
-                        style_function=lambda x: {"color": x['properties']['color']}
-                    )
-                    gj.add_to(m)
-                folium.LayerControl().add_to(m)
-                
-                # title
-                st.subheader("The Generated Routes in Order")
-
-                # showing the maps using streamlit_folium
-                folium_static(m, width=900, height=600)
-
-                 # check the length of the dataframe to find out invalid longitude and latitude
-                if len(st.session_state["outlet"])+1 != len(df_stations):
-                    st.markdown("There are invalid data of selected outlet (longitude and latitude). The number of generated routes are decreased from its origin.")
-                    st.markdown("__Invalid Data Shown Below__")
-                    st.dataframe(df_merged.loc[df_merged["duration"].isnull()])
-                else:
-                    st.success("All generated data are valid")
-
-                
-                # showing the final dataframe
-                st.subheader("Downloadable Data")
-                st.markdown("Please download the data to save it offline")
-
-                ######################## DOWNLOADABLE DATAFRAME #########################
-                # add url link to columns
-                df_merged_clean["google_maps_url"] = df_merged_clean["google_maps"].apply(lambda x: f'<a href="{x}">{x}</a>')
-
-                ######################## SHOWING DATAFRAME (HTML) #########################
-                # slicing the important columns
-                df_merged_clean_linked = df_merged_clean.loc[:, ["nama", "arrival", "departure", "google_maps_url", "duration_to_previous", "distance_to_previous"]].copy()
-                
-                # change unit in duration
-                df_merged_clean_linked['duration_to_previous'] = df_merged_clean_linked['duration_to_previous']/60
-                df_merged_clean_linked['duration_to_previous'] = df_merged_clean_linked['duration_to_previous'].round(2)
-
-                # change unit in distance
-                df_merged_clean_linked['distance_to_previous'] = df_merged_clean_linked['distance_to_previous']/1000
-                df_merged_clean_linked['distance_to_previous'] = df_merged_clean_linked['distance_to_previous'].round(2)
-
-                # rename columns
-                df_merged_clean_linked.columns = ["nama", "arrival", "departure", "google_maps_url", "duration_to_previous_in_minutes", "distance_to_previous_in_km"]
-                # convert to HTML
-                df_link = df_merged_clean_linked.copy().to_html(escape=False)
-                # show the HTML
-                st.write(df_link, unsafe_allow_html=True)
-
-                # download the dataframe
-                buffer = io.BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    # Write excel with single worksheet
-                    df_merged_clean_linked.to_excel(writer, index=False)
-                    # Close the Pandas Excel writer and output the Excel file to the buffer
-                    writer.save()
-
-                    # assign file to download button
-                    st.download_button(
-                        label="Download Data in Excel",
-                        data=buffer,
-                        file_name=f"optimized_routes{datetime.datetime.now().strftime('%Y-%m-%d')}.xlsx",
-                        mime="application/vnd.ms-excel"
-                )
+    # title
+    st.subheader("The Generated Routes in Order")
+
+    # showing the maps using streamlit_folium
+    with timings.span("map render"):
+        folium_static(m, width=900, height=600)
+    st.caption(describe_stats(geometry_stats))
+
+     # check the length of the dataframe to find out invalid longitude and latitude
+    if df_merged["duration"].isnull().any():
+        st.markdown("There are invalid data of selected outlet (longitude and latitude). The number of generated routes are decreased from its origin.")
+        st.markdown("__Invalid Data Shown Below__")
+        st.dataframe(df_merged.loc[df_merged["duration"].isnull()])
+    else:
+        st.success("All generated data are valid")
+
+
+    # showing the final dataframe
+    st.subheader("Downloadable Data")
+    st.markdown("Please download the data to save it offline")
+
+    ######################## DOWNLOADABLE DATAFRAME #########################
+    # slicing the important columns, with duration in minutes and distance in km
+    download_columns = ["nama", "arrival", "departure", "google_maps_url", "duration_to_previous", "distance_to_previous"]
+    if len(result['routes']) > 1:
+        download_columns = ["vehicle"] + download_columns
+    df_merged_clean_linked = downloadable_dataframe(df_merged_clean, download_columns)
+
+    # convert to HTML
+    df_link = df_merged_clean_linked.copy().to_html(escape=False)
+    # show the HTML
+    st.write(df_link, unsafe_allow_html=True)
+
+    # download the dataframe, written route by route
+    extension, mime, label = EXPORT_FORMATS[export_format]
+    with timings.span(f"export ({export_format})"):
+        data = cached_export((result_key, export_format), lambda: export_bytes(export_format, route_items(result, df_merged_clean, df_merged_clean_linked), name_column="nama"))
+    st.download_button(
+        label=f"Download Data in {label}",
+        data=data,
+        file_name=f"optimized_routes{datetime.datetime.now().strftime('%Y-%m-%d')}.{extension}",
+        mime=mime
+    )
 
+# runs go to the background job manager, their ids are kept for this session
+manager = get_job_manager()
+if "data_habs_jobs" not in st.session_state:
+    st.session_state["data_habs_jobs"] = []
 
+############################## CONDITIONS TO CALL FUNCTION #####################################
+if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0:
+    if post_ors_api:
+        with timings.span("submit run"):
+            # an outlet listed twice a few metres apart is one job, the other listings are put back into the result
+            outlets, duplicates = merge_near_duplicates(filtered_dataframe, "data_habs")
+            deliveries, vehicles = get_delivery(outlets), get_vehicle()
+            label = f"{len(filtered_dataframe)} outlets, {len(vehicles)} canvasser(s), {select_engine}"
+            context = {"outlets": filtered_dataframe, "center": [st.session_state["latitude"], st.session_state["longitude"]],
+                       "minutes": st.session_state["minutes"], "engine": select_engine, "jobs": deliveries, "vehicles": vehicles,
+                       "duplicates": duplicates}
+            previous, update = update_last_run(select_engine, deliveries, vehicles) if select_incremental else (None, None)
+            if update is not None:
+                job = manager.record(update, label=f"{label}, updated from {previous.id}", context=context)
             else:
-                st.markdown("There was an error in generating the result")
-        except:
-            st.markdown("Maker sure you have pressed __Run Optimizer__ button first on the sidebar.")
+                job = manager.submit(run_optimizer, select_engine, select_time_limit, deliveries, vehicles, label=label, context=context)
+            st.session_state["data_habs_jobs"].append(job.id)
+else:
+    st.warning("You're not able to run the app until you have selected outlet and input starting point (longitude and latitude) corectly")
+
+############################## MULTI-DAY TERRITORY PLAN #####################################
+def run_territory_plan(job, engine, time_limit, backlog, starts, days, clock, service, capacity):
+    # same engines as the single day optimizer, the day routes are solved in parallel
+    if engine == "Local solver":
+        ors_client = MatrixClient(LocalClient(time_limit=time_limit), get_matrix_store())
     else:
-        st.markdown("There was an error when trying to call openrouteservice API. Please try again by checking all inputs correctly.")
+        routing_client = get_routing_client(ors_api_key())
+        ors_client = MatrixClient(routing_client, get_matrix_store(), fetch=ors_fetch(routing_client))
+    max_jobs = DEFAULT_LOCAL_MAX_JOBS if engine == "Local solver" else DEFAULT_MAX_JOBS
+    run_timings = Timings("data_habs plan")
+    # cancelling the job stops the plan after the day route being solved
+    with run_timings.span(f"territory plan ({engine})"):
+        plan = plan_territory(
+            SplitOptimizer(ors_client.optimization, max_jobs), backlog, "longitude", "latitude", starts,
+            days, clock, service, capacity=capacity, processes=engine == "Local solver", progress=job.report
+        )
+    get_timing_log().write(run_timings)
+    return plan
+
+def show_plan(plan, backlog, center, first_day, result_key):
+    st.subheader("Multi-day Territory Plan")
+    if not plan["routes"]:
+        st.markdown("No day route could be planned, please check the selected cities and the time settings.")
+        return
+    with timings.span("routes tables"):
+        df_plan = all_stations_dataframe(plan)
+    plan_totals = df_plan.groupby("Vehicle")[["Distance", "Duration"]].last()
+    plan1, plan2, plan3, plan4 = st.columns(4)
+    plan1.metric(label="Planned Outlets", value=f"{len(df_plan) - len(plan_totals)} of {len(backlog)}")
+    plan2.metric(label="Day Routes", value=len(plan["routes"]))
+    plan3.metric(label="Total Estimated Distance", value=f"{plan_totals['Distance'].sum()/1000:.2f} km")
+    plan4.metric(label="Left for Later", value=len(plan["unscheduled"]) + len(plan["unassigned"]), help="Outlets past the last working day, that did not fit in a day or without valid coordinates")
+
+    with timings.span("merge outlets"):
+        df_plan_merged = merge_outlets(df_plan, backlog, ["nama", "google_maps", "telp"])
+    df_plan_clean = df_plan_merged.loc[df_plan_merged["duration"].notnull()].copy()
+    # day and canvasser of every stop, the vehicle ids are unique per canvasser and day
+    df_plan_clean["day"] = df_plan_clean["vehicle"].map({route["vehicle"]: route["day"] for route in plan["routes"]})
+    df_plan_clean["canvasser"] = df_plan_clean["vehicle"].map({route["vehicle"]: route["canvasser"] + 1 for route in plan["routes"]})
+
+    # one map layer per day, one color per canvasser
+    with timings.span("polyline decoding"):
+        plan_lines, plan_geometry_stats = simplify_routes(plan["routes"])
+    with timings.span("map building"):
+        plan_map = route_map(df_plan_clean, plan["routes"], "nama", center, lines=plan_lines)
+    with timings.span("map render"):
+        folium_static(plan_map, width=900, height=600)
+    st.caption(describe_stats(plan_geometry_stats))
+
+    df_plan_linked = downloadable_dataframe(df_plan_clean, ["day", "canvasser", "nama", "arrival", "departure", "google_maps_url", "duration_to_previous", "distance_to_previous"])
+    st.dataframe(df_plan_linked.drop(columns="google_maps_url"))
+    extension, mime, label = EXPORT_FORMATS[export_format]
+    with timings.span(f"export ({export_format})"):
+        data = cached_export((result_key, export_format), lambda: export_bytes(export_format, route_items(plan, df_plan_clean, df_plan_linked), name_column="nama"))
+    st.download_button(
+        label=f"Download Plan in {label}",
+        data=data,
+        file_name=f"territory_plan{first_day.strftime('%Y-%m-%d')}.{extension}",
+        mime=mime
+    )
 
+if post_plan:
+    if st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0 and len(st.session_state["city"]) > 0:
+        with timings.span("submit plan"):
+            backlog = dataframe.iloc[regions.select([st.session_state["city"]])]
+            starts = [[st.session_state["longitude"], st.session_state["latitude"]]] + st.session_state["other_starts"]
+            clock = (st.session_state["clock_hour"], st.session_state["clock_minute"],
+                     st.session_state["clock_hour_finish"], st.session_state["clock_minute_finish"])
+            planned, duplicates = merge_near_duplicates(backlog, "data_habs")
+            job = manager.submit(
+                run_territory_plan, select_engine, select_time_limit, planned, starts,
+                working_days(select_first_day, int(select_days)), clock, st.session_state["minutes"]*60, int(select_per_day) or None,
+                label=f"Territory plan, {len(backlog)} outlets, {len(starts)} canvasser(s), {int(select_days)} days, {select_engine}",
+                context={"kind": "plan", "outlets": backlog, "center": [st.session_state["latitude"], st.session_state["longitude"]],
+                         "first_day": select_first_day, "engine": select_engine,
+                         "duplicates": duplicates}
+            )
+            st.session_state["data_habs_jobs"].append(job.id)
+    else:
+        st.warning("Please select a city and input the start point before planning the territory")
+
+############################## OPTIMIZER RUNS #####################################
+# jobs of this session still known to the manager, the newest first
+live_mode = False
+session_jobs = [job for job in map(manager.get, st.session_state["data_habs_jobs"]) if job is not None]
+st.session_state["data_habs_jobs"] = [job.id for job in session_jobs]
+if session_jobs:
+    st.subheader("Optimizer Runs")
+    for job in reversed(session_jobs):
+        run1, run2 = st.columns([5, 1])
+        run1.markdown(f"__{job.label}__ `{job.id}`: {job.status}, {job.elapsed():.0f} s")
+        if job.active:
+            if job.progress:
+                run1.progress(job.progress)
+            if job.message:
+                run1.caption(job.message)
+            # a request already sent to openrouteservice is waited for, its answer is then dropped
+            run2.button("Cancel", key=f"cancel_{job.id}", on_click=manager.cancel, args=(job.id,),
+                        help="Stops the run at its next step" if job.context.get("engine") == "Local solver"
+                        else "Stops the run once the pending openrouteservice request returns")
+        elif job.status == FAILED:
+            run1.error(f"The run failed, please check the inputs and try again. {job.error}")
+    finished = {job.id: job for job in reversed(session_jobs) if job.status == DONE}
+    if finished:
+        shown = finished[st.selectbox("Show run", list(finished), format_func=lambda job_id: f"{finished[job_id].label} ({job_id})")]
+        shown_result, result_key = shown.result, shown.id
+        # live mode: the outlets marked visited in the sheet are dropped and the rest of the day is planned again
+        if "jobs" in shown.context:
+            live_mode = st.checkbox("Live re-routing", help=f"Every {DEFAULT_LIVE_INTERVAL // 60} minutes the outlets marked visited in the sheet are dropped and the remaining stops of every canvasser are planned again from their last visited outlet and the current time")
+        if live_mode:
+            try:
+                with timings.span("live re-routing"):
+                    shown_result, planned_at = current_live_result(shown)
+                result_key = (shown.id, planned_at)
+                next_refresh = max(0, int(planned_at + DEFAULT_LIVE_INTERVAL - time.time()))
+                st.caption(f"Live: {len(shown_result['visited'])} stop(s) visited, {len(shown_result['finished'])} canvasser(s) done, the rest of the day planned again at {datetime.datetime.fromtimestamp(planned_at):%H:%M}, next refresh in {next_refresh} s")
+            except (OSError, ValueError) as error:
+                st.warning(f"The visited outlets could not be read, the planned routes are shown. {error}")
+        if shown.context.get("kind") == "plan":
+            with timings.span("show plan"):
+                show_plan(expand_duplicates(shown.result, shown.context.get("duplicates")), shown.context["outlets"], shown.context["center"], shown.context["first_day"], result_key)
+        elif live_mode and not shown_result["routes"]:
+            st.success("Every stop of this run has been visited")
+        else:
+            with timings.span("show result"):
+                show_result(expand_duplicates(shown_result, shown.context.get("duplicates")), shown.context["outlets"], shown.context["center"], shown.context["minutes"], result_key)
 else:
-    st.warning("You're not able to run the app until you have selected outlet and input starting point (longitude and latitude) corectly")
\ No newline at end of file
+    st.markdown("Press __Run Optimizer__ on the sidebar to generate the routes, runs go on in the background and can be cancelled.")
+
+############################## PERFORMANCE SECTION #####################################
+def profile_next_rerun():
+    st.session_state["profile_rerun"] = True
+
+with st.sidebar:
+    st.markdown("#### Performance Section")
+    show_timings = st.checkbox("Show timings of this rerun", help="Where the time of this rerun went: data load, filtering, routes tables, map and export")
+    try:
+        if not poll_rerun:
+            get_timing_log().write(timings)
+    finally:
+        # stopped and saved even when the log cannot be written
+        profile_path = save_profile(profiler, "data_habs") if profiler is not None else None
+        st.session_state.pop("profiler", None)
+    if show_timings:
+        st.dataframe(pd.DataFrame(timings.breakdown()))
+        st.caption(f"Rerun took {timings.total():.2f} s, every rerun but the polling ones is logged to {get_timing_log().path} and {get_timing_log().metrics_path}")
+    st.button("Profile a rerun", on_click=profile_next_rerun, help="Reruns the page under cProfile and saves the profile to disk, open it with snakeviz or python -m pstats")
+    if st.checkbox("Show dataset memory", help="Memory of the outlet dataset held once by the server and shared by every session, per column"):
+        st.dataframe(memory_report(dataframe))
+    if profile_path:
+        st.caption(f"Profile of this rerun saved to {profile_path}")
+
+# poll the running jobs, the page stays usable in between
+if any(job.active for job in session_jobs):
+    time.sleep(POLL_SECONDS)
+    st.session_state["poll_rerun"] = True
+    st.experimental_rerun()
+elif live_mode:
+    # polled like the running jobs, current_live_result plans again once the interval is over
+    time.sleep(POLL_SECONDS)
+    st.session_state["poll_rerun"] = True
+    st.experimental_rerun()
@@ -1,18 +1,37 @@
 import streamlit as st
 import pandas as pd
 import folium
-from folium import FeatureGroup
-from folium.plugins import MarkerCluster
 from streamlit_folium import folium_static
-from geopy.distance import distance
 import openrouteservice
-from openrouteservice import convert
+from route_optimizer.cache import get_result_cache
+from route_optimizer.datasets import load_customers, memory_report, merge_near_duplicates
+from route_optimizer.dedup import expand_duplicates
+from route_optimizer.export import EXPORT_FORMATS, export_bytes, route_items
+from route_optimizer.geometry import describe_stats, simplify_routes
+from route_optimizer.incremental import DEFAULT_REPAIR_TIME_LIMIT, reoptimize
+from route_optimizer.jobs import DONE, FAILED, POLL_SECONDS, get_job_manager
+from route_optimizer.maps import route_map
+from route_optimizer.matrix_store import MatrixClient, get_matrix_store, ors_fetch
+from route_optimizer.ors import api_key, get_routing_client
+from route_optimizer.regions import RegionIndex
+from route_optimizer.routes import all_stations_dataframe, merge_outlets, downloadable_dataframe, parse_start_points
+from route_optimizer.snapshot import load_snapshot
+from route_optimizer.solver import LocalClient, DEFAULT_TIME_LIMIT
+from route_optimizer.spatial import SpatialIndex
+from route_optimizer.splitting import DEFAULT_LOCAL_MAX_JOBS, DEFAULT_MAX_JOBS, solve
+from route_optimizer.timing import Timings, get_timing_log, save_profile, start_profile, stop_profile
 import datetime
-from folium.plugins import BeautifyIcon
-import io
+import time
 
-from folium.plugins import BeautifyIcon
 st.set_page_config(layout="wide", page_title="Route Optimizer", page_icon="📫")
+# timing spans of this rerun, shown in the performance section of the sidebar and logged (see route_optimizer.timing)
+timings = Timings("customers")
+# the reruns that only poll running jobs are not logged, see the end of the page
+poll_rerun = st.session_state.pop("poll_rerun", False)
+# the whole rerun is profiled when asked for in the performance section
+# a profiled rerun cut short (an error, a widget change) never gets there, its profile is stopped here
+stop_profile(st.session_state.pop("profiler", None))
+profiler = st.session_state["profiler"] = start_profile() if st.session_state.pop("profile_rerun", False) else None
 st.markdown("# Route Optimizer on Majoo's Existing Merchants")
 st.markdown(f"Outlet data updated manually at __{datetime.datetime(2022,10,17).strftime('%Y-%m-%d')}__")
 
@@ -20,40 +39,31 @@ local_files = "data/Data_Outlet.xlsx"
 
 @st.cache(allow_output_mutation=True)
 def get_outlet_data(path):
-    # read the file
-    df =  pd.read_excel(path)
-    # filter non-null values
-    df =  df.loc[df["Last Transaction Date"].notnull()].copy()
-    # slicing dataframe
-    df =  df.loc[df["Google Maps"].notnull(), ["ID Merchant", "Nama Outlet", "Kota Outlet", "Provinsi Outlet","Google Maps"]].copy()
-    # extracting longitude from Google Maps URL
-    df["longitude"] = df['Google Maps'].str.split(",", expand=True)[1]
-    # extracting longitude from Google Maps URL
-    df["latitude"] = df['Google Maps'].str.split(",", expand=True)[0].str.split("=", expand=True)[1]
-    # convert latitude and longitude into integer values
-    df["latitude"] = pd.to_numeric(df["latitude"], errors='coerce')
-    df["longitude"] = pd.to_numeric(df["longitude"], errors='coerce')
-    # lowering columns' name
-    df.columns = df.columns.str.lower().str.replace(" ", "_")
-    # final slicing, get rid of null values of longitude and latitude
-    df = df.loc[(df["longitude"].notnull()) & (df["latitude"].notnull())].copy()
-    
+    # cleaned data comes from a parquet snapshot, rebuilt only when the excel file changes
+    return load_snapshot("customers", path, load_customers)
 
-    # adding new columns (for openrouteservice api compatibility)
-    df["needed_amount"] = 1
-    df["open"] = datetime.datetime.today().replace(hour=8, minute=0, second=0)
-    df["close"] = datetime.datetime.today().replace(hour=20, minute=0, second=0)
+# run get_outlet_data
+with timings.span("data load"):
+    dataframe = get_outlet_data(local_files)
 
-    return df
+@st.cache(allow_output_mutation=True)
+def get_spatial_index(path):
+    # built once per dataset load, positions refer to the rows of the cached dataframe
+    return SpatialIndex.from_dataframe(get_outlet_data(path), "latitude", "longitude")
 
-# run get_outlet_data
-dataframe = get_outlet_data(local_files)
+@st.cache(allow_output_mutation=True)
+def get_region_index(path):
+    # city row positions, built once per dataset load and shared by every session
+    return RegionIndex(get_outlet_data(path), ["kota_outlet"])
+
+with timings.span("region index"):
+    regions = get_region_index(local_files)
 
 
 ######################### FIRST select on sidebar
 with st.sidebar:
     # city (multiple)
-    select_city = st.multiselect(label="Select city", options=dataframe["kota_outlet"].unique().tolist(), default="Kota Jakarta Selatan", help="You can select multiple, but please select as minimum as possible to optimize the results")
+    select_city = st.multiselect(label="Select city", options=regions.options(), default="Kota Jakarta Selatan", help="You can select multiple, but please select as minimum as possible to optimize the results")
 
 ############ SESSION STATE ############
 # initiate session_state for select_city
@@ -72,7 +82,7 @@ if submit_city:
 ############## TITLE #################
 st.subheader("Data Outlet based on City You Selected")
 st.markdown("You can scroll, view, or search the outlets' name here and paste it into ___Select Outlet___ filter on the sidebar")
-st.dataframe(dataframe.loc[dataframe["kota_outlet"].isin(st.session_state["city"])])    
+st.dataframe(dataframe.iloc[regions.select([st.session_state["city"]])])    
     
 
 ######################### SECOND select on sidebar
@@ -80,8 +90,8 @@ with st.sidebar:
     # outlet (multiple)
     select_outlet = st.multiselect(
         label="Select outlet",
-        options=dataframe.loc[dataframe["kota_outlet"].isin(st.session_state["city"]), "nama_outlet"].unique().tolist(),
-        help="Please select multiple outlets to run your trip, we suggest up to 20 outlets only per search"
+        options=regions.values("nama_outlet", [st.session_state["city"]]),
+        help="Please select multiple outlets to run your trip, large selections are split and solved in parts automatically"
     )
 
 ############ SESSION STATE ############
@@ -97,15 +107,46 @@ with st.sidebar:
 if submit_outlet:
     st.session_state["outlet"] = select_outlet
 
+############ SELECT NEAREST OUTLETS ############
+with st.sidebar:
+    # outlets around the start point instead of picking them by name
+    near1, near2 = st.columns(2)
+    select_nearest = near1.number_input("Nearest outlets", value=20, min_value=1, help="Number of outlets closest to the start point")
+    select_radius = near2.number_input("Within (km)", value=0.0, min_value=0.0, help="Only outlets at most this far from the start point, 0 means no limit")
+    submit_nearest = st.button("Select nearest outlets")
+
+# row ids of the outlets selected around the start point, empty when picked by name
+if "nearest_customers" not in st.session_state:
+    st.session_state["nearest_customers"] = []
+
+if submit_outlet:
+    st.session_state["nearest_customers"] = []
+
+if submit_nearest:
+    if st.session_state.get("latitude", 0) != 0 and st.session_state.get("longitude", 0) != 0:
+        with timings.span("nearest outlets"):
+            positions, _ = get_spatial_index(local_files).nearest(st.session_state["latitude"], st.session_state["longitude"], int(select_nearest), radius_km=select_radius or None)
+        st.session_state["nearest_customers"] = dataframe.index[positions].tolist()
+        st.session_state["outlet"] = dataframe.loc[st.session_state["nearest_customers"], "nama_outlet"].unique().tolist()
+    else:
+        st.sidebar.warning("Please input the start point first")
+
 
 ############## TITLE #################
+# selected outlets, picked around the start point or by city and name
+if st.session_state["nearest_customers"]:
+    filtered_dataframe = dataframe.loc[st.session_state["nearest_customers"]]
+else:
+    filtered_dataframe = dataframe.iloc[regions.select([st.session_state["city"]], "nama_outlet", st.session_state["outlet"])]
+# adding new columns (for openrouteservice api compatibility), to a new frame of the selection only
+filtered_dataframe = filtered_dataframe.assign(open=datetime.datetime.today().replace(hour=8, minute=0, second=0),
+                                               close=datetime.datetime.today().replace(hour=20, minute=0, second=0))
+
 if len(st.session_state["outlet"]) > 0:
 
     st.subheader("You've Selected Outlets Below")
     st.markdown("Make sure you select corectly number of outlets on the sidebar")
-    st.dataframe(dataframe.loc[(dataframe["kota_outlet"].isin(st.session_state["city"])) &
-        (dataframe["nama_outlet"].isin(st.session_state["outlet"]))]
-    )    
+    st.dataframe(filtered_dataframe)    
 else:
     st.warning("You have no outlets selected, please select first.")
 
@@ -120,6 +161,8 @@ with st.sidebar:
     input_longitude = st.number_input(label="Input longitude of start point", help="Example format: 10x.xxxxxxx")
     # clickable link
     st.markdown("_How to find out longitude and latitude [here](%s)_" % url)
+    # other canvassers (optional), the outlets are split between everyone
+    input_other_starts = st.text_area(label="Start points of other canvassers", help="Optional, one canvasser per line as 'latitude, longitude'. Outlets are split into one compact group per canvasser")
 
 
 ############ SESSION STATE ############
@@ -130,6 +173,9 @@ if "longitude" not in st.session_state:
 if "latitude" not in st.session_state:
     st.session_state["latitude"] = input_latitude
 
+if "other_starts" not in st.session_state:
+    st.session_state["other_starts"] = parse_start_points(input_other_starts)
+
 # submit button to submit the changes in sidebar
 with st.sidebar:
     submit_start = st.button("Change start point")
@@ -138,6 +184,33 @@ with st.sidebar:
 if submit_start:
     st.session_state["longitude"] = input_longitude
     st.session_state["latitude"] = input_latitude
+    st.session_state["other_starts"] = parse_start_points(input_other_starts)
+
+############ SELECT OPTIMIZER ENGINE ############
+def ors_api_key():
+    # openrouteservice key from .streamlit/secrets.toml, without one route_optimizer.ors reads the ORS_API_KEY environment variable
+    try:
+        return st.secrets.get("ORS_API_KEY")
+    except FileNotFoundError:
+        return None
+
+with st.sidebar:
+    # local solver works offline and does not use the API quota
+    select_engine = st.radio("Optimizer engine", options=["Openrouteservice", "Local solver"], help="Local solver runs offline without using the API quota, travel time comes from the road times stored by earlier runs or is estimated from straight-line distance")
+    if select_engine == "Openrouteservice":
+        try:
+            api_key(ors_api_key())
+        except ValueError as error:
+            st.error(f"{error} or add ORS_API_KEY to .streamlit/secrets.toml")
+    select_time_limit = st.number_input("Local solver time limit (seconds)", value=DEFAULT_TIME_LIMIT, min_value=0.0, help="How long the local solver may keep improving the route, default is 2 seconds")
+    select_incremental = st.checkbox("Update the last run on small edits", value=True, help="Adding or removing a few outlets or moving a start point updates the routes of the last run in milliseconds, starting from them, instead of optimizing everything again")
+    # result cache usage
+    cache_stats = get_result_cache().stats()
+    st.caption(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} stored plans")
+    matrix_stats = get_matrix_store().stats()
+    st.caption(f"Road matrix store: {matrix_stats['pairs']} location pairs stored, {matrix_stats['hits']} reused by the runs, {matrix_stats['requested']} matrix cells requested")
+    # chosen before running, changing a widget afterwards reruns the page without the result
+    export_format = st.selectbox("Download format", list(EXPORT_FORMATS), format_func=lambda key: EXPORT_FORMATS[key][2])
 
 ################# POST BUTTON TO CALL OPENROUTESERVICE API ##############
 if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0:
@@ -153,12 +226,13 @@ def get_vehicle():
     # Define the vehicles (how many canvassers are)
     # https://openrouteservice-py.readthedocs.io/en/latest/openrouteservice.html#openrouteservice.optimization.Vehicle
     vehicles = list()
-    for idx in range(1):
+    starts = [[st.session_state["longitude"], st.session_state["latitude"]]] + st.session_state["other_starts"]
+    for idx, start in enumerate(starts):
         vehicles.append(
             openrouteservice.optimization.Vehicle(
                 id=idx,
                 # start point
-                start=[st.session_state["longitude"], st.session_state["latitude"]],
+                start=start,
                 # len of outlets
                 capacity=[len(st.session_state["outlet"])+2],
                 time_window=[int(datetime.datetime.today().replace(hour=8, minute=0, second=0).timestamp()),
@@ -168,15 +242,15 @@ def get_vehicle():
     return vehicles
 
 
-def get_delivery():   
+def get_delivery(outlets):
     # Next define the delivery stations
     # https://openrouteservice-py.readthedocs.io/en/latest/openrouteservice.html#openrouteservice.optimization.Job
     deliveries = list()
-    for delivery in dataframe.loc[(dataframe["kota_outlet"].isin(st.session_state["city"])) & (dataframe["nama_outlet"].isin(st.session_state["outlet"]))].itertuples():
+    for delivery in outlets.itertuples():
         deliveries.append(
             openrouteservice.optimization.Job(
                 id=delivery.Index,
-                location=[delivery.longitude, delivery.latitude],
+                location=[float(delivery.longitude), float(delivery.latitude)],
                 service=1200,
                 amount=[delivery.needed_amount],
                 time_windows=[[int(delivery.open.timestamp()), int(delivery.close.timestamp())]]
@@ -185,167 +259,214 @@ def get_delivery():
 
     return deliveries
     
-# this function is intended to call ors api
-def get_optimizer():
+# this function is intended to call ors api, on a worker thread of the job manager:
+# jobs and vehicles are built on the script thread since st.session_state is not available there
+def run_optimizer(job, engine, time_limit, jobs, vehicles):
     # Initialize a client and make the request
-    ors_client = openrouteservice.Client(key='5b3ce3597851110001cf6248f903a2eb28b04234bcb4b7ada2ccf7c3')  # Get an API key from https://openrouteservice.org/dev/#/signup
-    result = ors_client.optimization(
-        jobs=get_delivery(),
-        vehicles=get_vehicle(),
-        geometry=True
-    )
+    if engine == "Local solver":
+        # offline solver, road travel times already in the matrix store are used
+        # and the other ones are estimated from straight-line distance
+        # the solver reports its progress and stops at its next step once the run is cancelled
+        ors_client = MatrixClient(LocalClient(time_limit=time_limit, progress=job.report), get_matrix_store())
+    else:
+        # one rate-limited client per process, shared by every session (see route_optimizer.ors);
+        # road travel times between outlets are stored, only the unknown pairs are requested
+        routing_client = get_routing_client(ors_api_key())
+        ors_client = MatrixClient(routing_client, get_matrix_store(), fetch=ors_fetch(routing_client))
+    # one compact group of outlets per canvasser, and routes longer than the engine takes
+    # in one request are split into chunks solved concurrently and stitched back together
+    max_jobs = DEFAULT_LOCAL_MAX_JOBS if engine == "Local solver" else DEFAULT_MAX_JOBS
+    optimize = lambda: solve(ors_client.optimization, jobs, vehicles, max_jobs=max_jobs, processes=engine == "Local solver",
+                             progress=job.report)
+    # the run logs its own spans, it usually finishes after the rerun that submitted it
+    run_timings = Timings("customers run")
+    # identical plans are answered from the on-disk cache without using the API quota
+    job.report(0, message="solving" if engine == "Local solver" else "waiting for openrouteservice")
+    with run_timings.span(f"optimization ({engine})"):
+        result = get_result_cache().get_or_compute(
+            optimize,
+            jobs, vehicles, engine=engine, time_limit=time_limit if engine == "Local solver" else None, geometry=True
+        )
+    get_timing_log().write(run_timings)
 
     return result
 
 
+# small edits of the last run of this session are repaired from its routes instead of solved again
+def update_last_run(engine, deliveries, vehicles):
+    previous = next((job for job in map(manager.get, reversed(st.session_state["customers_jobs"]))
+                     if job is not None and job.status == DONE and job.context.get("engine") == engine and "jobs" in job.context), None)
+    if previous is None:
+        return None, None
+    # road times of new outlets are fetched (openrouteservice) or estimated (local solver), there is no remote optimization
+    fetch = ors_fetch(get_routing_client(ors_api_key())) if engine == "Openrouteservice" else None
+    repair_client = MatrixClient(LocalClient(time_limit=DEFAULT_REPAIR_TIME_LIMIT), get_matrix_store(), fetch=fetch)
+    try:
+        return previous, reoptimize(repair_client.optimization, previous.result, previous.context["jobs"], previous.context["vehicles"], deliveries, vehicles)
+    except Exception:
+        # e.g. the matrix request failed, the full run reports the error in the runs section
+        return previous, None
+
+def cached_export(key, build):
+    # the file of the shown run is built once per run and format, not on every rerun (e.g. the polling ones)
+    cached = st.session_state.get("customers_export")
+    if cached is None or cached[0] != key:
+        cached = (key, build().getvalue())
+        st.session_state["customers_export"] = cached
+    return cached[1]
+
+# the result of a finished run, with the outlets, start point and visit duration it was submitted with
+# result_key names the shown run for the export cache
+def show_result(result, outlets, center, minutes, result_key):
+    if not result:
+        st.markdown("There was an error in generating the result")
+        return
+    if not result.get("routes"):
+        # every outlet left unassigned (e.g. none fits the time window) or, live, every stop visited
+        if result.get("finished"):
+            st.markdown("Every canvasser has visited all of their outlets.")
+        else:
+            st.warning(f"No route could be planned, {len(result.get('unassigned', []))} outlet(s) were left unassigned. "
+                       "Please check the time window, the visit duration and the start point.")
+        return
+    if "incremental" in result:
+        st.caption(f"Updated from the previous run in {result['incremental']['milliseconds']} ms ({result['incremental']['edits']} edit(s)), route lines are straight between stops")
+    # create dataframe of every route (one per canvasser)
+    with timings.span("routes tables"):
+        df_stations = all_stations_dataframe(result)
+
+    # merge filtered dataframe and df_stations to get nama_outlet and google_maps link
+    with timings.span("merge outlets"):
+        df_merged = merge_outlets(df_stations, outlets, ["nama_outlet", "google_maps"])
+    df_merged_clean = df_merged.loc[df_merged["duration"].notnull()].copy()
+
+
+    # create map with one colored layer per canvasser
+    with timings.span("polyline decoding"):
+        lines, geometry_stats = simplify_routes(result['routes'])
+    with timings.span("map building"):
+        m = route_map(df_merged_clean, result['routes'], "nama_outlet", center, lines=lines)
+
+    # title
+    st.subheader("The Generated Routes in Order")
+
+    # showing the maps using streamlit_folium
+    with timings.span("map render"):
+        folium_static(m, width=900, height=600)
+    st.caption(describe_stats(geometry_stats))
+
+    # check the length of the dataframe to find out invalid longitude and latitude
+    if df_merged["duration"].isnull().any():
+        st.markdown("There are invalid data of selected outlet (longitude and latitude). The number of generated routes are decreased from its origin.")
+        st.markdown("__Invalid Data Shown Below__")
+        st.dataframe(df_merged.loc[df_merged["duration"].isnull()])
+    else:
+        st.success("All generated data are valid")
+
+    # showing the final dataframe
+    st.subheader("Downloadable Data")
+    st.markdown("Please download the data to save it offline")
+
+    # slicing the important columns, with duration in minutes and distance in km
+    download_columns = ["nama_outlet", "google_maps_url", "duration_to_previous", "distance_to_previous"]
+    if len(result['routes']) > 1:
+        download_columns = ["vehicle"] + download_columns
+    df_merged_clean_linked = downloadable_dataframe(df_merged_clean, download_columns)
+
+    # convert to HTML
+    df_link = df_merged_clean_linked.copy().to_html(escape=False)
+    # show the HTML
+    st.write(df_link, unsafe_allow_html=True)
+
+    # download the dataframe, written route by route
+    extension, mime, label = EXPORT_FORMATS[export_format]
+    with timings.span(f"export ({export_format})"):
+        data = cached_export((result_key, export_format), lambda: export_bytes(export_format, route_items(result, df_merged_clean, df_merged_clean_linked), name_column="nama_outlet"))
+    st.download_button(
+        label=f"Download Data in {label}",
+        data=data,
+        file_name=f"optimized_routes{datetime.datetime.now().strftime('%Y-%m-%d')}.{extension}",
+        mime=mime
+    )
+
+# runs go to the background job manager, their ids are kept for this session
+manager = get_job_manager()
+if "customers_jobs" not in st.session_state:
+    st.session_state["customers_jobs"] = []
+
 ##### CONDITIONS TO CALL FUNCTION#####
 if len(st.session_state["outlet"]) > 0 and  st.session_state["longitude"] != 0 and st.session_state["latitude"] != 0:
     if post_ors_api:
-        try:
-            result = get_optimizer()
-            if result:
-                # create list of extracted result
-                stations = list()
-                for route in result['routes']:
-                    vehicle = list()
-                    for step in route["steps"]:
-                        vehicle.append([
-                                step.get("job", "Center/Start"),  # Station ID
-                                step["arrival"],  # Arrival time
-                                step["arrival"] + step.get("service", 0),  # Departure time
-                                step["location"],
-                                step["distance"],
-                                step["duration"]
-                            ])
-                    stations.append(vehicle)
-                
-                # create dataframe
-                df_stations = pd.DataFrame(stations[0], columns=["Station ID", "Arrival", "Departure", "Location", "Distance", "Duration"])
-                df_stations['Arrival'] = pd.to_datetime(df_stations['Arrival'], unit='s')
-                df_stations['Departure'] = pd.to_datetime(df_stations['Departure'], unit='s')
-                df_stations["Distance to Previous"] = df_stations["Distance"] - df_stations["Distance"].shift(periods=1, fill_value=0)
-                df_stations["Duration to Previous"] = df_stations["Duration"] - df_stations["Duration"].shift(periods=1, fill_value=0)
-                
-                # merge filtered dataframe and df_stations to get nama_outlet and google_maps link
-                df_merged = pd.merge(
-                    df_stations,
-                    dataframe.loc[(dataframe["kota_outlet"].isin(st.session_state["city"])) & (dataframe["nama_outlet"].isin(st.session_state["outlet"])), ["nama_outlet", "google_maps"]],
-                    how="outer", 
-                    left_on="Station ID", 
-                    right_index=True
-                )
-            
-                # rename columns' name
-                df_merged.columns = df_merged.columns.str.lower().str.replace(" ", "_")
-                df_merged_clean = df_merged.loc[df_merged["duration"].notnull()].copy()
-
-
-                # # start to show the maps
-                m = folium.Map(location=[st.session_state["latitude"], st.session_state["longitude"]], zoom_start=10, tiles='cartodbpositron')
-                
-                # # Plot the locations on the map with more info in the ToolTip
-                for location in df_merged_clean.itertuples():
-                    tooltip = folium.map.Tooltip("Merchant: {}".format(location.nama_outlet))
-                    popup=folium.map.Popup(f"Distance to Previous: {location.distance_to_previous/1000:.2f} km <br> Duration to Previous: {location.duration_to_previous/60:.2f} minutes <br> Maps URL: <a href={location.google_maps}>{location.google_maps}</a>")
-                    
-                    folium.Marker(
-                        location=list(reversed(location.location)),
-                        tooltip=tooltip,
-                        popup=popup,
-                        icon=BeautifyIcon(
-                            icon_shape='marker',
-                            number=int(location.Index),
-                            spin=True,
-                            text_color='red',
-                            background_color="#FFF",
-                            inner_icon_style="font-size:12px;padding-top:-5px;"
-                        )
-                    ).add_to(m)
-
-                
-
-                # # plot start point
-                folium.Marker(
-                    location=[st.session_state["latitude"], st.session_state["longitude"]],
-                    icon=folium.Icon(color="green", icon="bus", prefix='fa'),
-                    setZIndexOffset=1000,tooltip="Start Point"
-                ).add_to(m)
-
-                
-
-                # add geometry distance
-                for color, route in zip(['green', 'red', 'blue'], result['routes']):
-                    decoded = convert.decode_polyline(route['geometry'])  # Route geometry is encoded
-                    gj = folium.GeoJson(
-                        name='Vehicle {}'.format(route['vehicle']),
-                        data={"type": "FeatureCollection", "features": [{"type": "Feature",
-                                                                        "geometry": decoded,
-                                                                        "properties": {"color": color}
-                                                                        }]},
-                        style_function=lambda x: {"color": x['properties']['color']}
-                    )
-                    gj.add_to(m)
-                folium.LayerControl().add_to(m)
-
-                # title
-                st.subheader("The Generated Routes in Order")
-
-                # showing the maps using streamlit_folium
-                folium_static(m, width=900, height=600)
-
-                # check the length of the dataframe to find out invalid longitude and latitude
-                if len(st.session_state["outlet"])+1 != len(df_stations):
-                    st.markdown("There are invalid data of selected outlet (longitude and latitude). The number of generated routes are decreased from its origin.")
-                    st.markdown("__Invalid Data Shown Below__")
-                    st.dataframe(df_merged.loc[df_merged["duration"].isnull()])
-                else:
-                    st.success("All generated data are valid")
-
-                # showing the final dataframe
-                st.subheader("Downloadable Data")
-                st.markdown("Please download the data to save it offline")
-
-                # add url link to columns
-                df_merged_clean["google_maps_url"] = df_merged_clean["google_maps"].apply(lambda x: f'<a href="{x}">{x}</a>') # for showing
-                
-                # slicing the important columns
-                df_merged_clean_linked = df_merged_clean.loc[:, ["nama_outlet", "google_maps_url", "duration_to_previous", "distance_to_previous"]].copy()
-                
-                # change unit in duration
-                df_merged_clean_linked['duration_to_previous'] = df_merged_clean_linked['duration_to_previous']/60
-                df_merged_clean_linked['duration_to_previous'] = df_merged_clean_linked['duration_to_previous'].round(2)
-
-                # change unit in distance
-                df_merged_clean_linked['distance_to_previous'] = df_merged_clean_linked['distance_to_previous']/1000
-                df_merged_clean_linked['distance_to_previous'] = df_merged_clean_linked['distance_to_previous'].round(2)
-
-                # rename columns
-                df_merged_clean_linked.columns = ["nama_outlet", "google_maps_url", "duration_to_previous_in_minutes", "distance_to_previous_in_km"]
-                # convert to HTML
-                df_link = df_merged_clean_linked.copy().to_html(escape=False)
-                # show the HTML
-                st.write(df_link, unsafe_allow_html=True)
-
-                # download the dataframe
-                buffer = io.BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    # Write excel with single worksheet
-                    df_merged_clean_linked.to_excel(writer, index=False)
-                    # Close the Pandas Excel writer and output the Excel file to the buffer
-                    writer.save()
-
-                    # assign file to download button
-                    st.download_button(
-                        label="Download Data in Excel",
-                        data=buffer,
-                        file_name=f"optimized_routes{datetime.datetime.now().strftime('%Y-%m-%d')}.xlsx",
-                        mime="application/vnd.ms-excel"
-                )
-
-        except:
-            st.markdown("There was an error when trying to call openrouteservice API. Please try again and make sure press __Run Optimizer__ first.")
-    else:
-        st.markdown("There was an error when trying to call openrouteservice API. Please try again by inputting correctly.")
+        with timings.span("submit run"):
+            # an outlet listed twice a few metres apart is one job, the other listings are put back into the result
+            outlets, duplicates = merge_near_duplicates(filtered_dataframe, "customers")
+            deliveries, vehicles = get_delivery(outlets), get_vehicle()
+            label = f"{len(filtered_dataframe)} outlets, {len(vehicles)} canvasser(s), {select_engine}"
+            context = {"outlets": filtered_dataframe, "center": [st.session_state["latitude"], st.session_state["longitude"]],
+                       "minutes": st.session_state["minutes"], "engine": select_engine, "jobs": deliveries, "vehicles": vehicles,
+                       "duplicates": duplicates}
+            previous, update = update_last_run(select_engine, deliveries, vehicles) if select_incremental else (None, None)
+            if update is not None:
+                job = manager.record(update, label=f"{label}, updated from {previous.id}", context=context)
+            else:
+                job = manager.submit(run_optimizer, select_engine, select_time_limit, deliveries, vehicles, label=label, context=context)
+            st.session_state["customers_jobs"].append(job.id)
 else:
     st.warning("You're not able to run until you have selected outlet and start point corectly")
 
+############################## OPTIMIZER RUNS #####################################
+# jobs of this session still known to the manager, the newest first
+session_jobs = [job for job in map(manager.get, st.session_state["customers_jobs"]) if job is not None]
+st.session_state["customers_jobs"] = [job.id for job in session_jobs]
+if session_jobs:
+    st.subheader("Optimizer Runs")
+    for job in reversed(session_jobs):
+        run1, run2 = st.columns([5, 1])
+        run1.markdown(f"__{job.label}__ `{job.id}`: {job.status}, {job.elapsed():.0f} s")
+        if job.active:
+            if job.progress:
+                run1.progress(job.progress)
+            if job.message:
+                run1.caption(job.message)
+            # a request already sent to openrouteservice is waited for, its answer is then dropped
+            run2.button("Cancel", key=f"cancel_{job.id}", on_click=manager.cancel, args=(job.id,),
+                        help="Stops the run at its next step" if job.context.get("engine") == "Local solver"
+                        else "Stops the run once the pending openrouteservice request returns")
+        elif job.status == FAILED:
+            run1.error(f"The run failed, please check the inputs and try again. {job.error}")
+    finished = {job.id: job for job in reversed(session_jobs) if job.status == DONE}
+    if finished:
+        shown = finished[st.selectbox("Show run", list(finished), format_func=lambda job_id: f"{finished[job_id].label} ({job_id})")]
+        with timings.span("show result"):
+            show_result(expand_duplicates(shown.result, shown.context.get("duplicates")), shown.context["outlets"], shown.context["center"], shown.context["minutes"], shown.id)
+else:
+    st.markdown("Press __Run Optimizer__ on the sidebar to generate the routes, runs go on in the background and can be cancelled.")
+
+############################## PERFORMANCE SECTION #####################################
+def profile_next_rerun():
+    st.session_state["profile_rerun"] = True
+
+with st.sidebar:
+    st.markdown("#### Performance Section")
+    show_timings = st.checkbox("Show timings of this rerun", help="Where the time of this rerun went: data load, filtering, routes tables, map and export")
+    try:
+        if not poll_rerun:
+            get_timing_log().write(timings)
+    finally:
+        # stopped and saved even when the log cannot be written
+        profile_path = save_profile(profiler, "customers") if profiler is not None else None
+        st.session_state.pop("profiler", None)
+    if show_timings:
+        st.dataframe(pd.DataFrame(timings.breakdown()))
+        st.caption(f"Rerun took {timings.total():.2f} s, every rerun but the job polling is logged to {get_timing_log().path} and {get_timing_log().metrics_path}")
+    st.button("Profile a rerun", on_click=profile_next_rerun, help="Reruns the page under cProfile and saves the profile to disk, open it with snakeviz or python -m pstats")
+    if st.checkbox("Show dataset memory", help="Memory of the outlet dataset held once by the server and shared by every session, per column"):
+        st.dataframe(memory_report(dataframe))
+    if profile_path:
+        st.caption(f"Profile of this rerun saved to {profile_path}")
+
+# poll the running jobs, the page stays usable in between
+if any(job.active for job in session_jobs):
+    time.sleep(POLL_SECONDS)
+    st.session_state["poll_rerun"] = True
+    st.experimental_rerun()
@@ -0,0 +1,308 @@
+"""Headless batch planning.
+
+Reads a plan file with one row per canvasser and optimizes every plan in
+parallel across a process pool, writing one Excel/CSV file per plan in the
+same layout as the "Downloadable Data" table of the pages (or as Parquet,
+GeoJSON or GPX, see ``route_optimizer.export``).
+
+Plan file columns (CSV, Excel or JSON records):
+
+    canvasser         name or id used for the output file, a name used twice
+                      gets "_2", "_3"... on the later files
+    dataset           data_habs, leads or customers (or pass --dataset)
+    start_latitude    start point of the canvasser
+    start_longitude
+    start_time        "08:00", optional
+    end_time          "20:00", optional
+    service_minutes   visit duration, optional (20)
+    outlet_ids        outlet ids separated by ";" (mt_leads_code for leads,
+                      id_merchant for customers, the row index for data habs)
+
+Example:
+
+    python -m route_optimizer.batch plans.csv --dataset leads --engine local --workers 8 --output routes/
+"""
+import argparse
+import concurrent.futures
+import datetime
+import os
+import re
+import sys
+
+import pandas as pd
+
+from route_optimizer.cache import DEFAULT_CACHE_PATH, ResultCache
+from route_optimizer.datasets import DATASETS, merge_near_duplicates
+from route_optimizer.dedup import expand_duplicates
+from route_optimizer.export import EXPORT_FORMATS, open_exporter
+from route_optimizer.matrix_store import DEFAULT_MATRIX_PATH, MatrixClient, get_matrix_store, ors_fetch
+from route_optimizer.ors import DEFAULT_RATE_PER_MINUTE, api_key, get_routing_client
+from route_optimizer.routes import (
+    build_jobs,
+    build_vehicles,
+    downloadable_dataframe,
+    merge_outlets,
+    stations_dataframe,
+    time_window,
+)
+from route_optimizer.snapshot import load_dataset_snapshot
+from route_optimizer.solver import DEFAULT_TIME_LIMIT, LocalClient
+
+DEFAULT_START_TIME = "08:00"
+DEFAULT_END_TIME = "20:00"
+DEFAULT_SERVICE_MINUTES = 20
+
+
+def read_plans(path):
+    """Plan file as a dataframe, the format is taken from the extension"""
+    if path.endswith((".xlsx", ".xls")):
+        return pd.read_excel(path)
+    if path.endswith(".json"):
+        return pd.read_json(path, orient="records")
+    return pd.read_csv(path)
+
+
+def _clock(value, default):
+    if value is None or pd.isna(value) or value == "":
+        value = default
+    hour, minute = str(value).split(":")[:2]
+    return int(hour), int(minute)
+
+
+def _canvasser(value, number):
+    # numeric ids read from Excel come back as floats, 1234.0 is written as 1234
+    if value is None or (not isinstance(value, str) and pd.isna(value)) or str(value).strip() == "":
+        return f"plan_{number}"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _file_name(canvasser):
+    return re.sub(r"[^\w\-]+", "_", canvasser).strip("_") or "plan"
+
+
+def _outlet_ids(value):
+    return [item.strip() for item in str(value).split(";") if item.strip()]
+
+
+def needed_columns(dataset):
+    """Columns of a dataset used for planning, the snapshot is read with only these"""
+    config = DATASETS[dataset]
+    # duplicate_match keeps the names and phone numbers near-duplicates are matched on
+    columns = config["merge"] + config["duplicate_match"] + [config["latitude"], config["longitude"], "needed_amount"]
+    if config["id"]:
+        columns.append(config["id"])
+    return list(dict.fromkeys(columns))
+
+
+def select_outlets(df, dataset, outlet_ids):
+    """Rows of the dataset for the given outlet ids, unknown ids are ignored"""
+    id_column = DATASETS[dataset]["id"]
+    if id_column is None:
+        index = pd.Index(df.index.astype(str))
+        return df.loc[index.isin(outlet_ids)]
+    return df.loc[df[id_column].astype(str).isin(outlet_ids)]
+
+
+def build_tasks(plans, datasets, default_dataset=None, day=None):
+    """
+    Turns plan rows into picklable optimization tasks
+
+    Args:
+        plans (pd.DataFrame): plan file rows
+        datasets (dict): loaded dataframes by dataset name
+        default_dataset (str): dataset used when the plan has no dataset column
+        day (datetime.datetime): working day, today by default
+
+    Returns:
+        list: one dict per plan with the outlets, jobs and vehicles
+    """
+    tasks = []
+    file_names = set()
+    for number, plan in enumerate(plans.to_dict(orient="records")):
+        dataset = plan.get("dataset")
+        if not isinstance(dataset, str) or not dataset:
+            dataset = default_dataset
+        if dataset not in DATASETS:
+            raise ValueError(f"Plan {number} has an unknown dataset {dataset!r}")
+        config = DATASETS[dataset]
+        outlets = select_outlets(datasets[dataset], dataset, _outlet_ids(plan["outlet_ids"]))
+        start_hour, start_minute = _clock(plan.get("start_time"), DEFAULT_START_TIME)
+        end_hour, end_minute = _clock(plan.get("end_time"), DEFAULT_END_TIME)
+        window = time_window(start_hour, start_minute, end_hour, end_minute, day=day)
+        service_minutes = plan.get("service_minutes")
+        if service_minutes is None or pd.isna(service_minutes):
+            service_minutes = DEFAULT_SERVICE_MINUTES
+
+        canvasser = _canvasser(plan.get("canvasser"), number)
+        # one file per plan, a canvasser planned twice must not overwrite their first plan
+        file_name = base = _file_name(canvasser)
+        suffix = 2
+        while file_name.lower() in file_names:
+            file_name = f"{base}_{suffix}"
+            suffix += 1
+        file_names.add(file_name.lower())
+
+        # an outlet listed twice a few metres apart is one job, the other listings are put back into the result
+        kept, duplicates = merge_near_duplicates(outlets, dataset)
+        tasks.append({
+            "canvasser": canvasser,
+            "file_name": file_name,
+            "dataset": dataset,
+            "outlets": outlets.loc[:, config["merge"]],
+            "jobs": build_jobs(kept, config["longitude"], config["latitude"], int(service_minutes * 60), window),
+            "duplicates": duplicates,
+            "vehicles": build_vehicles(
+                [[float(plan["start_longitude"]), float(plan["start_latitude"])]], window, len(outlets) + 2
+            ),
+        })
+    return tasks
+
+
+def _client(options):
+    store = get_matrix_store(options["matrix_path"]) if options["matrix_path"] else None
+    if options["engine"] == "local":
+        client = LocalClient(time_limit=options["time_limit"])
+        return MatrixClient(client, store) if store else client
+    # a stub server can be used by passing its base url, the client (and its
+    # keep-alive session and rate limiter) is reused by every task of the worker
+    client = get_routing_client(options["api_key"], options["base_url"], options["rate_per_minute"])
+    # the workers share the store file, a pair fetched by one is reused by the others
+    return MatrixClient(client, store, fetch=ors_fetch(client)) if store else client
+
+
+def _output_path(output, file_name, file_format):
+    return os.path.join(output, f"optimized_routes_{file_name}.{file_format}")
+
+
+def run_task(task, options):
+    """
+    Optimizes a single plan and writes its downloadable table
+
+    Runs inside a worker process.
+
+    Returns:
+        dict: summary of the plan
+    """
+    summary = {"canvasser": task["canvasser"], "dataset": task["dataset"], "outlets": len(task["jobs"])}
+    if not task["jobs"]:
+        summary["error"] = "no outlets found"
+        return summary
+
+    client = _client(options)
+
+    def compute():
+        return client.optimization(jobs=task["jobs"], vehicles=task["vehicles"], geometry=True)
+
+    try:
+        if options["cache_path"]:
+            result = ResultCache(options["cache_path"]).get_or_compute(
+                compute, task["jobs"], task["vehicles"], engine=options["engine"],
+                time_limit=options["time_limit"] if options["engine"] == "local" else None, geometry=True
+            )
+        else:
+            result = compute()
+    except Exception as exc:
+        summary["error"] = str(exc)
+        return summary
+
+    if not result or not result.get("routes"):
+        summary["error"] = "no route found"
+        return summary
+
+    result = expand_duplicates(result, task["duplicates"])
+    df_stations = stations_dataframe(result["routes"][0])
+    df_merged = merge_outlets(df_stations, task["outlets"], list(task["outlets"].columns))
+    df_merged_clean = df_merged.loc[df_merged["duration"].notnull()]
+    table = downloadable_dataframe(df_merged_clean, DATASETS[task["dataset"]]["download"])
+
+    path = _output_path(options["output"], task["file_name"], options["format"])
+    with open_exporter(path, options["format"], name_column=DATASETS[task["dataset"]]["name"]) as exporter:
+        exporter.add(task["canvasser"], table, result["routes"][0], df_merged_clean["location"].tolist())
+
+    summary.update({
+        "visited": len(df_stations) - 1,
+        "distance_km": round(df_stations["Distance"].iloc[-1] / 1000, 2),
+        "duration_minutes": round(df_stations["Duration"].iloc[-1] / 60, 2),
+        "file": path,
+    })
+    return summary
+
+
+def run_batch(tasks, options, workers=None):
+    """Runs every task across a process pool and returns the summaries in plan order"""
+    os.makedirs(options["output"], exist_ok=True)
+    if workers == 1:
+        return [run_task(task, options) for task in tasks]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_task, tasks, [options] * len(tasks)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("plans", help="plan file (csv, xlsx or json)")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), help="dataset for plans without a dataset column")
+    parser.add_argument("--data-path", action="append", default=[], metavar="DATASET=PATH",
+                        help="override the source of a dataset, e.g. leads=data/Data_Canvassing.csv")
+    parser.add_argument("--engine", choices=["local", "ors"], default="local")
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="local solver time limit in seconds")
+    parser.add_argument("--api-key", help="openrouteservice key, defaults to the ORS_API_KEY environment variable")
+    parser.add_argument("--base-url", help="openrouteservice base url, e.g. a local stub server")
+    parser.add_argument("--rate-per-minute", type=float, default=DEFAULT_RATE_PER_MINUTE,
+                        help="openrouteservice requests per minute allowed by the plan, shared by all workers")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, defaults to the CPU count")
+    parser.add_argument("--output", default="routes", help="output directory")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="xlsx")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, help="working day (YYYY-MM-DD), today by default")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="result cache file, empty to disable")
+    parser.add_argument("--matrix-path", default=DEFAULT_MATRIX_PATH, help="road matrix store file, empty to disable")
+    args = parser.parse_args(argv)
+    # a missing key would otherwise only show up as a failed task in every worker
+    if args.engine == "ors":
+        try:
+            args.api_key = api_key(args.api_key, args.base_url)
+        except ValueError as error:
+            parser.error(f"{error} or pass --api-key")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    plans = read_plans(args.plans)
+    paths = dict(item.split("=", 1) for item in args.data_path)
+
+    names = set(plans["dataset"].dropna()) if "dataset" in plans else set()
+    if args.dataset:
+        names.add(args.dataset)
+    datasets = {name: load_dataset_snapshot(name, paths.get(name), columns=needed_columns(name)) for name in names}
+
+    day = datetime.datetime.combine(args.date, datetime.time()) if args.date else None
+    tasks = build_tasks(plans, datasets, default_dataset=args.dataset, day=day)
+    options = {
+        "engine": args.engine,
+        "time_limit": args.time_limit,
+        "api_key": args.api_key,
+        "base_url": args.base_url,
+        # every worker process has its own limiter, each gets an equal share of the quota
+        "rate_per_minute": args.rate_per_minute / (1 if args.workers == 1 else args.workers or os.cpu_count() or 1),
+        "output": args.output,
+        "format": args.format,
+        "cache_path": args.cache_path,
+        "matrix_path": args.matrix_path,
+    }
+    summaries = run_batch(tasks, options, workers=args.workers)
+
+    failed = 0
+    for summary in summaries:
+        if "error" in summary:
+            failed += 1
+            print(f"{summary['canvasser']}: FAILED ({summary['error']})")
+        else:
+            print(f"{summary['canvasser']}: {summary['visited']} outlets, {summary['distance_km']} km, "
+                  f"{summary['duration_minutes']} min -> {summary['file']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Persistent, content-addressed cache for optimization results.
+
+Results are stored in SQLite, keyed by a hash of the normalized jobs/vehicles
+payload, so identical plans are answered without calling openrouteservice
+again, across reruns, restarts and users.
+"""
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "optimization_cache.sqlite")
+# one week, the results hold absolute arrival times so they expire with the day anyway
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 10000
+
+# coordinates are compared at ~10 cm precision
+_COORDINATE_DECIMALS = 6
+
+
+def normalize(value):
+    """
+    Plain json types with rounded floats, so equal jobs and vehicles always serialize the same way
+
+    Args:
+        value: job, vehicle, list or dict of them, or any json-like value
+
+    Returns:
+        dicts, lists, strings, numbers, booleans and ``None`` only
+    """
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if hasattr(value, "item"):
+        # numpy scalars (e.g. the pandas index used as job id)
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, _COORDINATE_DECIMALS)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    return normalize(vars(value))
+
+
+def payload_key(jobs, vehicles, **options):
+    """
+    Stable hash of an optimization request
+
+    Args:
+        jobs (list): openrouteservice.optimization.Job objects (or their dicts)
+        vehicles (list): openrouteservice.optimization.Vehicle objects (or their dicts)
+        **options: anything else that changes the result, e.g. engine or geometry
+
+    Returns:
+        str: hex digest
+    """
+    payload = {
+        "jobs": sorted(normalize(list(jobs)), key=lambda job: json.dumps(job, sort_keys=True)),
+        "vehicles": sorted(normalize(list(vehicles)), key=lambda vehicle: json.dumps(vehicle, sort_keys=True)),
+        "options": normalize(options),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed LRU cache with expiry
+
+    A connection is opened per operation, so one instance can be shared by all
+    Streamlit sessions and threads, and several processes can use the same file.
+
+    Args:
+        path (str): database file
+        ttl (float): seconds before an entry expires, None to keep forever
+        max_bytes (int): total size of stored results before LRU eviction
+        max_entries (int): number of stored results before LRU eviction
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, conn, name):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def get(self, key):
+        """Returns the cached result or None, counting a hit or a miss"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, result):
+        """Stores a result and evicts the least recently used entries over the limits"""
+        value = zlib.compress(json.dumps(normalize(result)).encode())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            if self.ttl is not None:
+                conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        evicted = 0
+        for key, entry_size in conn.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+            evicted += 1
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES ('evictions', ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (evicted,)
+        )
+
+    def get_or_compute(self, compute, jobs, vehicles, **options):
+        """
+        Returns the cached result for the payload or computes and stores it
+
+        Args:
+            compute (callable): called without arguments on a miss
+            jobs (list): jobs of the request
+            vehicles (list): vehicles of the request
+            **options: anything else that changes the result
+
+        Returns:
+            dict: optimization result
+        """
+        key = payload_key(jobs, vehicles, **options)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            if result:
+                self.set(key, result)
+        return result
+
+    def stats(self):
+        """Hit, miss and eviction counts plus the current size of the cache"""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "evictions": counts.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM stats")
+
+
+@functools.lru_cache(maxsize=None)
+def get_result_cache(path=DEFAULT_CACHE_PATH):
+    """One cache instance per process and path, shared by every session"""
+    return ResultCache(path)
@@ -0,0 +1,182 @@
+"""Cluster-first, route-second planning for several canvassers.
+
+The selected outlets are split into one geographically compact group per
+canvasser, every group is solved on its own (concurrently) and the routes are
+merged back into a single openrouteservice-shaped result.
+"""
+import concurrent.futures
+import math
+
+import numpy as np
+
+from route_optimizer.distance import KM_PER_DEGREE
+from route_optimizer.solver import attr
+
+
+def _project(coordinates, origin_lat):
+    # equirectangular projection of [longitude, latitude] pairs to kilometres
+    coords = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    return np.column_stack((
+        coords[:, 0] * KM_PER_DEGREE * math.cos(math.radians(origin_lat)),
+        coords[:, 1] * KM_PER_DEGREE,
+    ))
+
+
+def _squared_distances(points, centroids):
+    return ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+
+
+def kmeans(points, centroids, iterations=50):
+    """
+    Lloyd's k-means on projected points, vectorised over all points and centroids
+
+    Args:
+        points (np.ndarray): n x 2 projected points
+        centroids (np.ndarray): k x 2 initial centroids
+        iterations (int): maximum number of iterations
+
+    Returns:
+        tuple: (labels, centroids)
+    """
+    centroids = np.array(centroids, dtype=float)
+    k = len(centroids)
+    labels = np.full(len(points), -1, dtype=int)
+    for _ in range(iterations):
+        new_labels = np.argmin(_squared_distances(points, centroids), axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        for axis in range(2):
+            sums = np.bincount(labels, weights=points[:, axis], minlength=k)
+            # empty clusters keep their previous centroid
+            centroids[:, axis] = np.where(counts > 0, sums / np.maximum(counts, 1), centroids[:, axis])
+    return labels, centroids
+
+
+def balanced_labels(points, centroids, capacity=None):
+    """
+    Assigns points to the closest centroid that still has room
+
+    Pairs are processed from the shortest distance up, so every cluster holds at
+    most ``capacity`` points (``ceil(n / k)`` by default).
+    """
+    n, k = len(points), len(centroids)
+    capacity = capacity or math.ceil(n / k)
+    distances = _squared_distances(points, centroids)
+    order = np.argsort(distances, axis=None, kind="stable")
+    labels = np.full(n, -1, dtype=int)
+    room = np.full(k, capacity)
+    assigned = 0
+    for flat in order:
+        point, cluster = divmod(int(flat), k)
+        if labels[point] >= 0 or room[cluster] == 0:
+            continue
+        labels[point] = cluster
+        room[cluster] -= 1
+        assigned += 1
+        if assigned == n:
+            break
+    return labels
+
+
+def partition(coordinates, starts, balanced=True, iterations=50):
+    """
+    Splits outlets into one compact group per canvasser
+
+    Clusters are seeded at the canvassers' start points, so every canvasser gets
+    the group around where they start.
+
+    Args:
+        coordinates (list): [longitude, latitude] of every outlet
+        starts (list): [longitude, latitude] start point of every canvasser
+        balanced (bool): give every canvasser roughly the same number of outlets
+        iterations (int): maximum k-means iterations
+
+    Returns:
+        np.ndarray: canvasser position for every outlet
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    if len(starts) <= 1 or len(coordinates) == 0:
+        return np.zeros(len(coordinates), dtype=int)
+    origin_lat = float(np.mean(coordinates[:, 1]))
+    points = _project(coordinates, origin_lat)
+    seeds = _project(starts, origin_lat)
+
+    labels, centroids = kmeans(points, seeds, iterations=iterations)
+    if balanced:
+        # a few rounds of balanced assignment and centroid updates
+        for _ in range(5):
+            new_labels = balanced_labels(points, centroids)
+            for cluster in range(len(centroids)):
+                members = points[new_labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+    # hand every cluster to the canvasser starting closest to it
+    distances = _squared_distances(centroids, seeds)
+    mapping = np.full(len(centroids), -1, dtype=int)
+    taken = set()
+    for flat in np.argsort(distances, axis=None, kind="stable"):
+        cluster, vehicle = divmod(int(flat), len(seeds))
+        if mapping[cluster] >= 0 or vehicle in taken:
+            continue
+        mapping[cluster] = vehicle
+        taken.add(vehicle)
+    return mapping[labels]
+
+
+def merge_results(results):
+    """Combines openrouteservice-shaped results of disjoint sub-problems into one"""
+    routes = [route for result in results for route in result.get("routes", [])]
+    unassigned = [job for result in results for job in result.get("unassigned", [])]
+    summary = {"routes": len(routes), "unassigned": len(unassigned)}
+    for key in ("cost", "service", "duration", "waiting_time", "distance"):
+        summary[key] = sum(result.get("summary", {}).get(key, 0) for result in results)
+    return {"code": 0, "summary": summary, "unassigned": unassigned, "routes": routes}
+
+
+def solve_partitioned(optimize, jobs, vehicles, balanced=True, workers=None, processes=True, progress=None):
+    """
+    Clusters the jobs per vehicle and solves every group concurrently
+
+    Args:
+        optimize (callable): ``optimize(jobs=..., vehicles=..., geometry=True)``, e.g.
+            ``LocalClient().optimization``; must be picklable when ``processes`` is True
+        jobs (list): openrouteservice.optimization.Job objects
+        vehicles (list): openrouteservice.optimization.Vehicle objects, each with a start
+        balanced (bool): give every vehicle roughly the same number of jobs
+        workers (int): pool size, defaults to the number of vehicles
+        processes (bool): use a process pool (CPU-bound local solving) instead of threads
+        progress (callable): ``progress(done, total, message)`` after every solved group, e.g. ``Job.report``;
+            when it raises (a cancelled job) the groups not started yet are dropped
+
+    Returns:
+        dict: merged result with one route per vehicle
+    """
+    labels = partition([attr(job, "location") for job in jobs],
+                       [attr(vehicle, "start") for vehicle in vehicles], balanced=balanced)
+    groups = [([job for job, label in zip(jobs, labels) if label == v], [vehicle])
+              for v, vehicle in enumerate(vehicles)]
+    groups = [group for group in groups if group[0]]
+    if len(groups) <= 1:
+        return merge_results([optimize(jobs=group_jobs, vehicles=group_vehicles, geometry=True)
+                              for group_jobs, group_vehicles in groups])
+
+    pool = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+    executor = pool(max_workers=workers or len(groups))
+    try:
+        futures = {executor.submit(optimize, jobs=group_jobs, vehicles=group_vehicles, geometry=True): position
+                   for position, (group_jobs, group_vehicles) in enumerate(groups)}
+        results = [None] * len(groups)
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(done, len(groups), f"{done} of {len(groups)} canvassers routed")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return merge_results(results)
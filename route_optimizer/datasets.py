@@ -0,0 +1,241 @@
+"""Loaders and column layout of the three outlet datasets.
+
+The pages wrap these loaders with ``st.cache``; the batch CLI calls them
+directly, so both produce exactly the same dataframes. Each loader only reads
+its source and hands the raw dataframe to a ``prepare_*`` function, which
+cleans it with vectorized pandas operations (no per-row python).
+
+A cleaned dataset is held once per server process and shared by every
+session, so ``compact`` keeps it small: region columns as categoricals, float32
+coordinates and, for Customers, only the columns the page uses (the Data Habs
+and Leads explorers show every column of their source). The shared dataframe is
+never modified by a page, selections are taken from it (``df.take``) and get
+their own columns with ``assign``. Outlets listed more than once a few metres
+apart stay in the dataset, the explorer, filters and searches show every
+listing; they are merged when the jobs are built (``merge_near_duplicates``)
+so they never become separate jobs, and ``route_optimizer.dedup.expand_duplicates``
+puts them back into the result.
+"""
+import re
+
+import pandas as pd
+
+from route_optimizer.dedup import merge_duplicates
+
+DATA_HABS_URL = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vSvPKfCcokx7jBATBeDziy-4zeNGUWo_6uUG4CfEchmTHxUNX1HelhloU0oKG3HbNIkieGD7KPmCn9A/pub?output=csv'
+LEADS_PATH = "data/Data_Canvassing.csv"
+CUSTOMERS_PATH = "data/Data_Outlet.xlsx"
+
+
+# every dataset links to its outlet as "<MAPS_URL><latitude>,<longitude>"
+MAPS_URL = "https://www.google.com/maps/?q="
+_NUMBER = r"[-+]?\d+(?:\.\d+)?"
+# latitude and longitude of every supported maps url format, extracted in a single regex pass:
+# the pin of a place url ("/place/...!3d<lat>!4d<lon>"), a query or viewport ("?q=", "?query=", "?ll=",
+# "/@<lat>,<lon>,17z", with the comma url-encoded or not) and plain "<lat>, <lon>" text
+MAPS_URL_COORDINATES = re.compile(
+    rf"^(?:.*?!3d(?P<pin_latitude>{_NUMBER})!4d(?P<pin_longitude>{_NUMBER})"
+    rf"|.*?[=@]\s*(?P<latitude>{_NUMBER})\s*(?:,|%2C)\s*(?P<longitude>{_NUMBER})"
+    rf"|\s*(?P<text_latitude>{_NUMBER})\s*,\s*(?P<text_longitude>{_NUMBER})\s*$)",
+    re.IGNORECASE,
+)
+# outlets closer than this many metres are one outlet listed twice
+DEFAULT_DUPLICATE_RADIUS = 5
+# float32 keeps coordinates to about a metre, plenty for routing, at half the memory of float64
+COORDINATE_DTYPE = "float32"
+
+
+def maps_urls(latitude, longitude):
+    """Google Maps url of every row, built with vectorized string concatenation"""
+    return MAPS_URL + latitude.astype(str) + "," + longitude.astype(str)
+
+
+def coordinates_from_urls(urls):
+    """
+    Extracts latitude and longitude from Google Maps urls, see MAPS_URL_COORDINATES for the formats
+
+    Returns:
+        pd.DataFrame: float ``latitude`` and ``longitude`` columns, NaN where a url has no valid coordinates
+    """
+    found = urls.astype(str).str.extract(MAPS_URL_COORDINATES).astype(float)
+    # the place pin first, it is where the outlet is; a viewport is only centred near it
+    coordinates = pd.DataFrame({axis: found[f"pin_{axis}"].fillna(found[axis]).fillna(found[f"text_{axis}"])
+                                for axis in ("latitude", "longitude")})
+    return coordinates.where(coordinates["latitude"].between(-90, 90) & coordinates["longitude"].between(-180, 180))
+
+
+def numeric_coordinates(df, latitude, longitude):
+    """Casts the coordinate columns to float and drops the rows where either is missing"""
+    df[latitude] = pd.to_numeric(df[latitude], errors="coerce")
+    df[longitude] = pd.to_numeric(df[longitude], errors="coerce")
+    return df.loc[df[latitude].notnull() & df[longitude].notnull()]
+
+
+def merge_near_duplicates(df, name):
+    """
+    Selected outlets to build the jobs from, see ``route_optimizer.dedup.merge_duplicates``
+
+    The first listing of the outlets closer than the ``duplicate_radius`` of the dataset
+    in DATASETS that share one of its ``duplicate_match`` names or phone numbers is kept.
+
+    Returns:
+        tuple: (the outlets kept, dict of kept index -> indexes of the listings merged into it)
+    """
+    config = DATASETS[name]
+    return merge_duplicates(df, config["latitude"], config["longitude"], config["duplicate_radius"], config["duplicate_match"])
+
+
+def compact(df, name):
+    """
+    Compact in-memory layout of a cleaned dataset
+
+    Keeps the ``columns`` of the dataset in DATASETS (those missing from the
+    source are skipped, None keeps every column), turns its ``categories`` into
+    categoricals and its coordinates into float32.
+
+    Args:
+        df (pd.DataFrame): cleaned dataset
+        name (str): dataset name in DATASETS
+
+    Returns:
+        pd.DataFrame: a new, compact dataframe
+    """
+    config = DATASETS[name]
+    if config["columns"] is not None:
+        df = df.loc[:, [column for column in config["columns"] if column in df.columns]]
+    dtypes = {column: "category" for column in config["categories"] if column in df.columns}
+    dtypes.update({config["latitude"]: COORDINATE_DTYPE, config["longitude"]: COORDINATE_DTYPE})
+    return df.astype(dtypes)
+
+
+def memory_report(df):
+    """
+    Memory held by a dataframe, strings and categories counted in full
+
+    Returns:
+        pd.DataFrame: dtype and bytes of the index and of every column, then the total
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({"dtype": [str(df.index.dtype)] + [str(dtype) for dtype in df.dtypes], "bytes": usage.to_numpy()},
+                          index=usage.index)
+    report.loc["total"] = ["", int(usage.sum())]
+    return report
+
+
+def prepare_data_habs(df):
+    """Cleans the raw Data Habs sheet, see ``load_data_habs``"""
+    # adding new columns (for openrouteservice api compatibility)
+    df["needed_amount"] = 1
+
+    df.columns = df.columns.str.lower().str.replace(' ', '_')
+    # adding new column of google maps url, from the coordinates as they are written in the sheet
+    df["google_maps"] = maps_urls(df["latitude"], df["longitude"])
+    # float coordinates, outlets without coordinates or already visited are dropped
+    df = numeric_coordinates(df, "latitude", "longitude")
+    df = df.loc[df['visited'] != 'Yes']
+
+    return compact(df, "data_habs")
+
+
+def prepare_leads(df):
+    """Cleans the raw Leads table, see ``load_leads``"""
+    # adding new columns (for openrouteservice api compatibility)
+    df["needed_amount"] = 1
+
+    # adding new column of google maps url
+    df["google_maps"] = maps_urls(df["outlet_langitude"], df["outlet_longitude"])
+
+    # phone number formatting
+    df["pic_phone"] = df["pic_phone"].astype("category")
+    # float coordinates, a malformed or missing one drops its outlet instead of failing the float32 cast
+    df = numeric_coordinates(df, "outlet_langitude", "outlet_longitude")
+
+    return compact(df, "leads")
+
+
+def prepare_customers(df):
+    """Cleans the raw Customers sheet, see ``load_customers``"""
+    # filter non-null values and slicing dataframe
+    df = df.loc[df["Last Transaction Date"].notnull() & df["Google Maps"].notnull(), ["ID Merchant", "Nama Outlet", "Kota Outlet", "Provinsi Outlet", "Google Maps"]].copy()
+    # extracting latitude and longitude from Google Maps URL
+    coordinates = coordinates_from_urls(df["Google Maps"])
+    df["longitude"] = coordinates["longitude"]
+    df["latitude"] = coordinates["latitude"]
+    # lowering columns' name
+    df.columns = df.columns.str.lower().str.replace(" ", "_")
+    # final slicing, get rid of null values of longitude and latitude
+    df = df.loc[(df["longitude"].notnull()) & (df["latitude"].notnull())].copy()
+
+    # adding new columns (for openrouteservice api compatibility)
+    # open/close hours depend on the day, so the page adds them after loading
+    df["needed_amount"] = 1
+
+    return compact(df, "customers")
+
+
+def load_data_habs(path=DATA_HABS_URL):
+    return prepare_data_habs(pd.read_csv(path))
+
+
+def load_leads(path=LEADS_PATH):
+    return prepare_leads(pd.read_csv(path))
+
+
+def load_customers(path=CUSTOMERS_PATH):
+    return prepare_customers(pd.read_excel(path))
+
+
+# per dataset: loader, default source, outlet id column (None means the row index),
+# coordinate columns, columns merged into the result, the "Downloadable Data" layout,
+# the columns kept in memory (None for all, the explorer shows them) and which are categoricals (see ``compact``)
+# and the radius in metres within which outlets sharing a name or phone column become one job (0 keeps them all)
+DATASETS = {
+    "data_habs": {
+        "loader": load_data_habs,
+        "path": DATA_HABS_URL,
+        "id": None,
+        "name": "nama",
+        "latitude": "latitude",
+        "longitude": "longitude",
+        "merge": ["nama", "google_maps", "telp"],
+        "download": ["nama", "arrival", "departure", "google_maps_url", "duration_to_previous", "distance_to_previous"],
+        "columns": None,
+        "categories": ["kota/kab"],
+        "duplicate_radius": DEFAULT_DUPLICATE_RADIUS,
+        "duplicate_match": ["nama", "telp"],
+    },
+    "leads": {
+        "loader": load_leads,
+        "path": LEADS_PATH,
+        "id": "mt_leads_code",
+        "name": "outlet_name",
+        "latitude": "outlet_langitude",
+        "longitude": "outlet_longitude",
+        "merge": ["mt_leads_code", "outlet_name", "google_maps"],
+        "download": ["mt_leads_code", "outlet_name", "arrival", "departure", "google_maps_url", "duration_to_previous", "distance_to_previous"],
+        "columns": None,
+        "categories": ["m_province_name", "m_regency_name", "m_district_name"],
+        "duplicate_radius": DEFAULT_DUPLICATE_RADIUS,
+        "duplicate_match": ["outlet_name", "pic_phone"],
+    },
+    "customers": {
+        "loader": load_customers,
+        "path": CUSTOMERS_PATH,
+        "id": "id_merchant",
+        "name": "nama_outlet",
+        "latitude": "latitude",
+        "longitude": "longitude",
+        "merge": ["nama_outlet", "google_maps"],
+        "download": ["nama_outlet", "google_maps_url", "duration_to_previous", "distance_to_previous"],
+        "columns": ["id_merchant", "nama_outlet", "kota_outlet", "provinsi_outlet", "google_maps", "longitude", "latitude", "needed_amount"],
+        "categories": ["kota_outlet", "provinsi_outlet"],
+        "duplicate_radius": DEFAULT_DUPLICATE_RADIUS,
+        "duplicate_match": ["nama_outlet"],
+    },
+}
+
+
+def load_dataset(name, path=None):
+    """Loads one of the DATASETS by name, from its default source unless a path is given"""
+    config = DATASETS[name]
+    return config["loader"](path or config["path"])
@@ -0,0 +1,190 @@
+"""Spatial de-duplication of outlets listed more than once.
+
+The same shop is often listed twice a few metres apart (two sales reps, a
+typo in the name), and every listing used to become a job of its own. Outlets
+are hashed into a grid of cells as wide as the merge radius, so two outlets
+closer than the radius sit in the same or in adjacent cells. Only those
+pairs are measured. Two close listings are only taken for the same shop when
+they also share a name or a phone number, neighbouring shops in a market row
+stay apart. Groups are grown from their first listing and an outlet only
+joins one when it is close to every member, so a group never spans more than
+the radius however densely the outlets are listed.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from route_optimizer.distance import KM_PER_DEGREE, haversine
+
+# half of the 3x3 neighbourhood, every pair of adjacent cells is looked at once
+_NEIGHBOURS = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _cell_pairs(keys, offsets, order, starts, ends):
+    # every point paired with every point of the cell at ``keys + offsets``
+    cell_keys = keys[order][starts]
+    slots = np.searchsorted(cell_keys, keys + offsets)
+    slots = np.minimum(slots, len(cell_keys) - 1)
+    found = cell_keys[slots] == keys + offsets
+    points = np.flatnonzero(found)
+    counts = (ends - starts)[slots[found]]
+    left = np.repeat(points, counts)
+    # positions inside the neighbour cell, then the sorted positions of its points
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = order[np.repeat(starts[slots[found]], counts) + within]
+    return left, right
+
+
+def close_pairs(latitude, longitude, radius_m):
+    """
+    Pairs of points at most ``radius_m`` apart, found through a grid hash
+
+    Args:
+        latitude (array-like): latitude of every point, NaN points are never paired
+        longitude (array-like): longitude of every point
+        radius_m (float): largest distance of a pair in metres
+
+    Returns:
+        tuple: (first positions, second positions), first < second
+    """
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    valid = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+    if len(valid) < 2 or radius_m <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    lat, lon = latitude[valid], longitude[valid]
+
+    # projected with the smallest cos(latitude), so projected distances never exceed the real ones
+    x_scale = KM_PER_DEGREE * math.cos(math.radians(min(float(np.abs(lat).max()), 89.0)))
+    cell_km = radius_m / 1000
+    cells_x = np.floor(lon * x_scale / cell_km).astype(np.int64)
+    cells_y = np.floor(lat * KM_PER_DEGREE / cell_km).astype(np.int64)
+    # one spare row and column around the grid, so neighbour keys never wrap around
+    cells_x -= cells_x.min() - 1
+    cells_y -= cells_y.min() - 1
+    height = int(cells_y.max()) + 2
+    keys = cells_x * height + cells_y
+
+    order = np.argsort(keys, kind="stable")
+    _, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    ends = starts + counts
+    lefts, rights = [], []
+    for dx, dy in _NEIGHBOURS:
+        left, right = _cell_pairs(keys, dx * height + dy, order, starts, ends)
+        if dx == 0 and dy == 0:
+            # a cell with itself, each pair once
+            keep = left < right
+            left, right = left[keep], right[keep]
+        lefts.append(left)
+        rights.append(right)
+    left, right = np.concatenate(lefts), np.concatenate(rights)
+    close = haversine(lat[left], lon[left], lat[right], lon[right]) <= radius_m
+    left, right = valid[left[close]], valid[right[close]]
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def _identities(values):
+    # lower-case letters and digits only, "Toko Maju " and "TOKO MAJU." are one name; a missing value matches nothing
+    values = pd.Series(values)
+    return values.where(values.notnull(), "").astype(str).str.lower().str.replace(r"[^0-9a-z]", "", regex=True).to_numpy()
+
+
+def duplicate_groups(latitude, longitude, radius_m, identities=()):
+    """
+    Group of every point, the points of a group are all at most ``radius_m`` from each other
+
+    Args:
+        latitude (array-like): latitude of every point
+        longitude (array-like): longitude of every point
+        radius_m (float): largest distance between two points of a group in metres
+        identities (list): arrays of names or phone numbers per point, a point only joins the group
+            of a first point it shares one of them with; without any, distance alone groups them
+
+    Returns:
+        np.ndarray: position of the first point of each point's group
+    """
+    groups = np.arange(len(latitude))
+    left, right = close_pairs(latitude, longitude, radius_m)
+    close = set(zip(left.tolist(), right.tolist()))
+    if len(left) and len(identities):
+        same = np.zeros(len(left), dtype=bool)
+        for values in identities:
+            values = _identities(values)
+            same |= (values[left] == values[right]) & (values[left] != "")
+        left, right = left[same], right[same]
+    if not len(left):
+        return groups
+
+    # grown from the first listing, only the (few) points with a close pair are visited: an outlet
+    # sharing a name or phone with the first listing joins when it is close to every member
+    candidates = {}
+    for first, second in sorted(zip(left.tolist(), right.tolist())):
+        candidates.setdefault(first, []).append(second)
+    for first, seconds in candidates.items():
+        if groups[first] != first:
+            continue
+        members = []
+        for second in seconds:
+            if groups[second] == second and all((member, second) in close for member in members):
+                groups[second] = first
+                members.append(second)
+    return groups
+
+
+def merge_duplicates(df, latitude, longitude, radius_m, identities=()):
+    """
+    Keeps the first listing of every group of outlets closer than ``radius_m``
+
+    Args:
+        df (pd.DataFrame): outlets, their index is the job id
+        latitude (str): latitude column
+        longitude (str): longitude column
+        radius_m (float): merge radius in metres, 0 keeps every outlet
+        identities (list): name / phone columns, close outlets are only merged when they share one
+
+    Returns:
+        tuple: (the outlets kept in their original order, dict of kept index -> indexes of the listings merged into it)
+    """
+    groups = duplicate_groups(df[latitude].to_numpy(dtype=float), df[longitude].to_numpy(dtype=float), radius_m,
+                              [df[column].to_numpy() for column in identities if column in df.columns])
+    kept = groups == np.arange(len(df))
+    index = df.index.tolist()
+    merged = {}
+    for position in np.flatnonzero(~kept):
+        merged.setdefault(index[groups[position]], []).append(index[position])
+    return df.take(np.flatnonzero(kept)), merged
+
+
+def expand_duplicates(result, merged):
+    """
+    Puts the merged listings back into a result solved with the kept ones, see ``merge_duplicates``
+
+    Every merged listing becomes a stop at the same place and time right after the
+    stop of its kept listing, and is unassigned (or unscheduled) with it.
+
+    Args:
+        result (dict): openrouteservice-shaped result (or territory plan) of the kept outlets
+        merged (dict): kept index -> indexes of the listings merged into it
+
+    Returns:
+        dict: a new result, the same one when nothing was merged
+    """
+    if not merged or not result:
+        return result
+    expanded = dict(result)
+    routes = []
+    for route in result.get("routes", []):
+        steps = []
+        for step in route["steps"]:
+            steps.append(step)
+            if step["type"] == "job":
+                steps.extend({**step, "id": other, "job": other} for other in merged.get(step["id"], []))
+        routes.append({**route, "steps": steps})
+    expanded["routes"] = routes
+    if "unassigned" in result:
+        expanded["unassigned"] = [job for kept in result["unassigned"]
+                                  for job in [kept] + [{**kept, "id": other} for other in merged.get(kept["id"], [])]]
+    if "unscheduled" in result:
+        expanded["unscheduled"] = [job_id for kept in result["unscheduled"] for job_id in [kept] + merged.get(kept, [])]
+    return expanded
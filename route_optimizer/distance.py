@@ -0,0 +1,157 @@
+"""Vectorised great-circle distance and travel time estimates.
+
+Everything here works on plain latitude/longitude arrays so it can be used for
+pre-ranking outlets, feeding the local solver and validating API results
+without calling openrouteservice.
+"""
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6371008.8
+# km per degree of latitude (and of longitude at the equator), for projecting points onto a flat grid
+KM_PER_DEGREE = 111.32
+
+# road distance is longer than the great-circle one, and traffic is slow
+DETOUR_FACTOR = 1.3
+AVERAGE_SPEED_KMH = 25
+
+# rows per block in the bounded-memory mode, 2048 x 50k float32 is ~400 MB
+DEFAULT_BLOCK_SIZE = 2048
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in metres, broadcasting over numpy arrays
+
+    Args:
+        lat1, lon1: coordinates of the first points in degrees
+        lat2, lon2: coordinates of the second points in degrees
+
+    Returns:
+        np.ndarray: distances in metres
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(lat, lon, other_lat=None, other_lon=None, dtype=np.float64):
+    """
+    Pairwise great-circle distances in a single batched computation
+
+    Args:
+        lat, lon: coordinates of the row points in degrees
+        other_lat, other_lon: coordinates of the column points, defaults to the row points
+        dtype: output dtype, float32 halves the memory
+
+    Returns:
+        np.ndarray: len(lat) x len(other_lat) matrix in metres
+    """
+    lat = np.asarray(lat, dtype=dtype)
+    lon = np.asarray(lon, dtype=dtype)
+    other_lat = lat if other_lat is None else np.asarray(other_lat, dtype=dtype)
+    other_lon = lon if other_lon is None else np.asarray(other_lon, dtype=dtype)
+    return haversine(lat[:, None], lon[:, None], other_lat[None, :], other_lon[None, :]).astype(dtype, copy=False)
+
+
+def estimate_duration(distance_m, detour_factor=DETOUR_FACTOR, speed_kmh=AVERAGE_SPEED_KMH):
+    """Estimated travel time in seconds for great-circle distances in metres"""
+    return distance_m * detour_factor / (speed_kmh * 1000 / 3600)
+
+
+def travel_matrices(coordinates, detour_factor=DETOUR_FACTOR, speed_kmh=AVERAGE_SPEED_KMH, dtype=np.float64):
+    """
+    Estimated road durations and distances between [longitude, latitude] pairs
+
+    Args:
+        coordinates (list): [longitude, latitude] pairs, openrouteservice order
+        detour_factor (float): ratio between road and great-circle distance
+        speed_kmh (float): average travel speed
+        dtype: output dtype
+
+    Returns:
+        tuple: (durations in seconds, distances in metres) as NxN arrays
+    """
+    coords = np.asarray(coordinates, dtype=dtype).reshape(-1, 2)
+    distances = haversine_matrix(coords[:, 1], coords[:, 0], dtype=dtype) * detour_factor
+    durations = distances / (speed_kmh * 1000 / 3600)
+    return durations, distances
+
+
+def dataframe_matrices(df, latitude="latitude", longitude="longitude", detour_factor=DETOUR_FACTOR,
+                       speed_kmh=AVERAGE_SPEED_KMH, dtype=np.float64):
+    """
+    Travel matrices for the outlets of a page dataframe
+
+    Coordinates stored as strings are converted, invalid values become NaN rows.
+
+    Returns:
+        tuple: (durations in seconds, distances in metres) as NxN arrays
+    """
+    lat = pd.to_numeric(df[latitude], errors="coerce").to_numpy(dtype=dtype)
+    lon = pd.to_numeric(df[longitude], errors="coerce").to_numpy(dtype=dtype)
+    return travel_matrices(np.column_stack((lon, lat)), detour_factor=detour_factor, speed_kmh=speed_kmh, dtype=dtype)
+
+
+def distance_to_point(lat, lon, point_lat, point_lon, dtype=np.float64):
+    """Distances in metres from every outlet to a single point, e.g. the start point"""
+    return haversine(np.asarray(lat, dtype=dtype), np.asarray(lon, dtype=dtype), float(point_lat), float(point_lon))
+
+
+def iter_haversine_blocks(lat, lon, block_size=DEFAULT_BLOCK_SIZE, dtype=np.float32):
+    """
+    Yields the distance matrix one block of rows at a time
+
+    Memory stays bounded by ``block_size x len(lat)`` regardless of the number of outlets.
+
+    Yields:
+        tuple: (first row index, block of distances in metres)
+    """
+    lat = np.asarray(lat, dtype=dtype)
+    lon = np.asarray(lon, dtype=dtype)
+    for start in range(0, len(lat), block_size):
+        stop = min(start + block_size, len(lat))
+        yield start, haversine_matrix(lat[start:stop], lon[start:stop], lat, lon, dtype=dtype)
+
+
+def haversine_matrix_blockwise(lat, lon, out=None, block_size=DEFAULT_BLOCK_SIZE, dtype=np.float32):
+    """
+    Fills a full distance matrix block by block
+
+    Args:
+        out: optional preallocated array, pass a ``np.memmap`` to keep the matrix on disk
+
+    Returns:
+        np.ndarray: the filled matrix
+    """
+    n = len(lat)
+    if out is None:
+        out = np.empty((n, n), dtype=dtype)
+    for start, block in iter_haversine_blocks(lat, lon, block_size=block_size, dtype=dtype):
+        out[start:start + len(block)] = block
+    return out
+
+
+def nearest_neighbours(lat, lon, k, block_size=DEFAULT_BLOCK_SIZE, dtype=np.float32):
+    """
+    The k closest other outlets of every outlet, computed blockwise
+
+    Returns:
+        tuple: (indices, distances in metres) as len(lat) x k arrays sorted by distance
+    """
+    n = len(lat)
+    k = min(k, n - 1)
+    indices = np.empty((n, max(k, 0)), dtype=np.int64)
+    distances = np.empty((n, max(k, 0)), dtype=dtype)
+    if k <= 0:
+        return indices, distances
+    for start, block in iter_haversine_blocks(lat, lon, block_size=block_size, dtype=dtype):
+        rows = np.arange(len(block))
+        # exclude the outlet itself
+        block[rows, start + rows] = np.inf
+        part = np.argpartition(block, k - 1, axis=1)[:, :k]
+        part_dist = np.take_along_axis(block, part, axis=1)
+        order = np.argsort(part_dist, axis=1)
+        indices[start:start + len(block)] = np.take_along_axis(part, order, axis=1)
+        distances[start:start + len(block)] = np.take_along_axis(part_dist, order, axis=1)
+    return indices, distances
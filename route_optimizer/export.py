@@ -0,0 +1,378 @@
+"""Streaming export of route results: Excel, CSV, Parquet, GeoJSON and GPX.
+
+Routes are written one at a time and nothing but a one-line summary per
+route is kept, so a day with hundreds of canvassers exports in flat memory:
+
+- xlsx: xlsxwriter in constant-memory mode, a summary sheet and one sheet
+  per route (the routes past ``MAX_ROUTE_SHEETS`` share a last sheet)
+- csv: one table, a ``route`` column tells the routes apart
+- parquet: one row group per route
+- geojson: a FeatureCollection with the route line and one point per stop
+- gpx: one ``rte`` of the stops per route and one ``trk`` of its road geometry
+
+Usage:
+
+    with open_exporter("routes.xlsx", "xlsx", name_column="nama") as exporter:
+        for name, table, route, locations in route_items(result, df_merged_clean, table):
+            exporter.add(name, table, route, locations)
+"""
+import csv
+import datetime
+import io
+import json
+import re
+import shutil
+import tempfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from route_optimizer.geometry import decode_polyline
+
+# format -> (file extension, mime type, label of the pages)
+EXPORT_FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.ms-excel", "Excel (one sheet per canvasser)"),
+    "csv": ("csv", "text/csv", "CSV"),
+    "parquet": ("parquet", "application/octet-stream", "Parquet"),
+    "geojson": ("geojson", "application/geo+json", "GeoJSON (stops and route lines)"),
+    "gpx": ("gpx", "application/gpx+xml", "GPX (for navigation apps)"),
+}
+SUMMARY_COLUMNS = ["route", "stops", "distance_km", "duration_minutes"]
+# routes with a sheet of their own, xlsxwriter keeps a temporary file open per sheet
+# until the workbook is closed; later routes share one "More routes" sheet
+MAX_ROUTE_SHEETS = 200
+# excel limits on sheet names
+_SHEET_NAME_LENGTH = 31
+_SHEET_NAME_INVALID = re.compile(r"[\[\]:*?/\\]")
+
+
+def _cell(value):
+    # plain python value of a table cell, None for missing ones
+    if value is None or (not isinstance(value, (list, dict, str)) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _summary(name, table, route):
+    """Stops, distance and duration of one route, from the route totals when available"""
+    stops = int(len(table))
+    if route is not None:
+        # the table also holds the start and end steps
+        stops = sum(step["type"] == "job" for step in route.get("steps", []))
+        distance, duration = route.get("distance", 0) / 1000, route.get("duration", 0) / 60
+    else:
+        distance = float(table["distance_to_previous_in_km"].sum()) if "distance_to_previous_in_km" in table else None
+        duration = float(table["duration_to_previous_in_minutes"].sum()) if "duration_to_previous_in_minutes" in table else None
+    return {"route": name, "stops": stops,
+            "distance_km": None if distance is None else round(distance, 2),
+            "duration_minutes": None if duration is None else round(duration, 2)}
+
+
+class RouteExporter:
+    """
+    Base of the exporters: ``add`` routes one by one, then ``close``
+
+    Args:
+        target: file path or binary file object
+        name_column (str): column naming the stops (GeoJSON/GPX), the stop number otherwise
+    """
+
+    def __init__(self, target, name_column=None):
+        self.target = target
+        self.name_column = name_column
+        self.summaries = []
+
+    def add(self, name, table, route=None, locations=None):
+        """
+        Writes one route
+
+        Args:
+            name (str): route name, e.g. the canvasser
+            table (pd.DataFrame): the route's rows of the downloadable table
+            route (dict): the route of the optimization result, for totals and geometry
+            locations (list): [longitude, latitude] of every table row, for the map formats
+        """
+        self._write(name, table, route, locations)
+        self.summaries.append(_summary(name, table, route))
+
+    def _write(self, name, table, route, locations):
+        raise NotImplementedError
+
+    def close(self):
+        """Finishes the file and returns the summary row of every route"""
+        return self.summaries
+
+    def _open(self, mode):
+        # the caller's file object is left open, paths are opened here
+        if isinstance(self.target, (str, bytes)) or hasattr(self.target, "__fspath__"):
+            return open(self.target, mode, **({"newline": "", "encoding": "utf-8"} if "b" not in mode else {})), True
+        if "b" in mode:
+            return self.target, False
+        return io.TextIOWrapper(self.target, encoding="utf-8", newline="", write_through=True), False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class ExcelExporter(RouteExporter):
+    """
+    Workbook with a summary sheet and one sheet per route, streamed with constant memory
+
+    Args:
+        max_sheets (int): routes with a sheet of their own, the next ones share a "More routes" sheet
+    """
+
+    def __init__(self, target, name_column=None, max_sheets=MAX_ROUTE_SHEETS):
+        super().__init__(target, name_column)
+        self.max_sheets = max_sheets
+        self.overflow_sheet = None
+        self.overflow_row = 0
+        self.workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "strings_to_urls": False})
+        self.date_format = self.workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        self.header_format = self.workbook.add_format({"bold": True})
+        # first tab, its rows are appended as the routes come in
+        self.summary_sheet = self.workbook.add_worksheet("Summary")
+        self.summary_sheet.write_row(0, 0, SUMMARY_COLUMNS, self.header_format)
+        self.sheet_names = {"summary"}
+
+    def _sheet_name(self, name):
+        base = _SHEET_NAME_INVALID.sub("_", str(name)).strip("'")[:_SHEET_NAME_LENGTH] or "Route"
+        sheet_name, number = base, 1
+        while sheet_name.lower() in self.sheet_names:
+            number += 1
+            suffix = f" ({number})"
+            sheet_name = base[:_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        self.sheet_names.add(sheet_name.lower())
+        return sheet_name
+
+    def _write_rows(self, sheet, first_row, rows, first_column=0):
+        # row by row, constant_memory flushes every finished row to disk
+        for row_number, row in enumerate(rows, start=first_row):
+            for column, value in enumerate(row, start=first_column):
+                if isinstance(value, (pd.Timestamp, datetime.datetime)) and not pd.isna(value):
+                    sheet.write_datetime(row_number, column, value.to_pydatetime() if isinstance(value, pd.Timestamp) else value, self.date_format)
+                else:
+                    value = _cell(value)
+                    if value is None:
+                        continue
+                    sheet.write(row_number, column, value if isinstance(value, (int, float, str, bool)) else str(value))
+
+    def _write(self, name, table, route, locations):
+        rows = table.itertuples(index=False, name=None)
+        if len(self.summaries) < self.max_sheets:
+            sheet = self.workbook.add_worksheet(self._sheet_name(name))
+            sheet.write_row(0, 0, list(table.columns), self.header_format)
+            self._write_rows(sheet, 1, rows)
+            return
+        if self.overflow_sheet is None:
+            self.overflow_sheet = self.workbook.add_worksheet(self._sheet_name("More routes"))
+            self.overflow_sheet.write_row(0, 0, ["route"] + list(table.columns), self.header_format)
+            self.overflow_row = 1
+        for row in rows:
+            self.overflow_sheet.write_string(self.overflow_row, 0, str(name))
+            self._write_rows(self.overflow_sheet, self.overflow_row, [row], first_column=1)
+            self.overflow_row += 1
+
+    def add(self, name, table, route=None, locations=None):
+        super().add(name, table, route, locations)
+        summary = self.summaries[-1]
+        self.summary_sheet.write_row(len(self.summaries), 0, [summary[column] for column in SUMMARY_COLUMNS])
+
+    def close(self):
+        self.workbook.close()
+        return super().close()
+
+
+class CsvExporter(RouteExporter):
+    """One CSV table of every route, with the route name in the first column"""
+
+    def __init__(self, target, name_column=None):
+        super().__init__(target, name_column)
+        self.file, self._owned = self._open("w")
+        self.writer = csv.writer(self.file)
+        self.columns = None
+
+    def _write(self, name, table, route, locations):
+        if self.columns is None:
+            self.columns = list(table.columns)
+            self.writer.writerow(["route"] + self.columns)
+        for row in table.loc[:, self.columns].itertuples(index=False, name=None):
+            self.writer.writerow([name] + ["" if _cell(value) is None else value for value in row])
+
+    def close(self):
+        self.file.flush()
+        if self._owned:
+            self.file.close()
+        else:
+            self.file.detach()
+        return super().close()
+
+
+class ParquetExporter(RouteExporter):
+    """Parquet file with one row group per route"""
+
+    def __init__(self, target, name_column=None):
+        super().__init__(target, name_column)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.writer = None
+
+    def _write(self, name, table, route, locations):
+        frame = table.reset_index(drop=True)
+        frame.insert(0, "route", str(name))
+        if self.writer is None:
+            arrow_table = self._pa.Table.from_pandas(frame, preserve_index=False)
+            self.writer = self._pq.ParquetWriter(self.target, arrow_table.schema)
+        else:
+            # all-empty columns of a later route must not change the file's schema
+            arrow_table = self._pa.Table.from_pandas(frame, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(arrow_table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        return super().close()
+
+
+class GeoJsonExporter(RouteExporter):
+    """FeatureCollection with a LineString per route and a Point per stop, written feature by feature"""
+
+    def __init__(self, target, name_column=None):
+        super().__init__(target, name_column)
+        self.file, self._owned = self._open("w")
+        self.file.write('{"type": "FeatureCollection", "features": [')
+        self.first = True
+
+    def _feature(self, geometry, properties):
+        self.file.write(("" if self.first else ",") + "\n" + json.dumps(
+            {"type": "Feature", "geometry": geometry, "properties": properties}, default=str))
+        self.first = False
+
+    def _write(self, name, table, route, locations):
+        if route is not None and route.get("geometry"):
+            line = decode_polyline(route["geometry"])
+            self._feature({"type": "LineString", "coordinates": np.round(line, 6).tolist()},
+                          {"route": name, "kind": "route", **{key: route.get(key) for key in ("distance", "duration")}})
+        if locations is None:
+            return
+        columns = list(table.columns)
+        for stop, (row, location) in enumerate(zip(table.itertuples(index=False, name=None), locations), start=1):
+            properties = {"route": name, "kind": "stop", "stop": stop}
+            properties.update((column, _cell(value)) for column, value in zip(columns, row))
+            self._feature({"type": "Point", "coordinates": [float(location[0]), float(location[1])]}, properties)
+
+    def close(self):
+        self.file.write("\n]}\n")
+        self.file.flush()
+        if self._owned:
+            self.file.close()
+        else:
+            self.file.detach()
+        return super().close()
+
+
+class GpxExporter(RouteExporter):
+    """GPX 1.1 with one route (the stops in visiting order) and one track (the road geometry) per route"""
+
+    def __init__(self, target, name_column=None):
+        super().__init__(target, name_column)
+        self.file, self._owned = self._open("w")
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<gpx version="1.1" creator="route_optimizer" xmlns="http://www.topografix.com/GPX/1/1">\n')
+        # GPX wants every rte before the first trk, tracks wait in a temporary file
+        self.tracks = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+
+    def _write(self, name, table, route, locations):
+        if locations is not None:
+            names = table[self.name_column].tolist() if self.name_column in table else None
+            self.file.write(f"<rte><name>{escape(str(name))}</name>\n")
+            for stop, location in enumerate(locations, start=1):
+                label = names[stop - 1] if names is not None and _cell(names[stop - 1]) is not None else f"Stop {stop}"
+                self.file.write(f'<rtept lat="{float(location[1]):.6f}" lon="{float(location[0]):.6f}">'
+                                f"<name>{escape(f'{stop}. {label}')}</name></rtept>\n")
+            self.file.write("</rte>\n")
+        if route is not None and route.get("geometry"):
+            self.tracks.write(f"<trk><name>{escape(str(name))}</name><trkseg>\n")
+            self.tracks.writelines(f'<trkpt lat="{lat:.6f}" lon="{lon:.6f}"/>\n' for lon, lat in decode_polyline(route["geometry"]))
+            self.tracks.write("</trkseg></trk>\n")
+
+    def close(self):
+        self.tracks.seek(0)
+        shutil.copyfileobj(self.tracks, self.file)
+        self.tracks.close()
+        self.file.write("</gpx>\n")
+        self.file.flush()
+        if self._owned:
+            self.file.close()
+        else:
+            self.file.detach()
+        return super().close()
+
+
+EXPORTERS = {
+    "xlsx": ExcelExporter,
+    "csv": CsvExporter,
+    "parquet": ParquetExporter,
+    "geojson": GeoJsonExporter,
+    "gpx": GpxExporter,
+}
+
+
+def open_exporter(target, file_format, name_column=None, **options):
+    """
+    Exporter of a format writing to a path or binary file object, ``options`` go to its class
+
+    Returns:
+        RouteExporter: use as a context manager, or call ``close``
+    """
+    if file_format not in EXPORTERS:
+        raise ValueError(f"unknown export format {file_format!r}, expected one of {sorted(EXPORTERS)}")
+    return EXPORTERS[file_format](target, name_column=name_column, **options)
+
+
+def route_items(result, df_merged_clean, table):
+    """
+    The downloadable table split per route, for ``RouteExporter.add``
+
+    Args:
+        result (dict): optimization result
+        df_merged_clean (pd.DataFrame): merged steps with ``vehicle`` and ``location``
+        table (pd.DataFrame): downloadable table of the same rows (``downloadable_dataframe``)
+
+    Yields:
+        tuple: (name, table rows, route, locations), the route's ``name`` or "Canvasser <n>"
+    """
+    # step numbers restart for every route, the rows are matched by position
+    vehicles = df_merged_clean["vehicle"].to_numpy()
+    for position, route in enumerate(result["routes"]):
+        rows = vehicles == route["vehicle"]
+        part = table[rows]
+        if "vehicle" in part:
+            part = part.drop(columns="vehicle")
+        yield route.get("name", f"Canvasser {position + 1}"), part, route, df_merged_clean.loc[rows, "location"].tolist()
+
+
+def export_bytes(file_format, items, name_column=None):
+    """
+    Export of ``(name, table, route, locations)`` items to an in-memory buffer, for download buttons
+
+    Returns:
+        io.BytesIO: the file, at position 0
+    """
+    buffer = io.BytesIO()
+    with open_exporter(buffer, file_format, name_column=name_column) as exporter:
+        for name, table, route, locations in items:
+            exporter.add(name, table, route, locations)
+    buffer.seek(0)
+    return buffer
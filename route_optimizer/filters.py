@@ -0,0 +1,179 @@
+"""Column handling behind the "Add filters" explorer of the pages.
+
+``FilterSchema`` is built once per loaded dataset (and cached with it): the
+date columns are converted, every column gets its filter kind, and the
+lookup structures are kept so a widget interaction only evaluates masks:
+
+- categorical columns: integer codes, a selection is a table lookup per row
+- numeric and date columns: positions sorted by value, a range is two
+  ``searchsorted`` calls
+- text columns: the string version of the column, and the last search
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype, is_datetime64_any_dtype, is_numeric_dtype, is_object_dtype
+
+# columns with fewer distinct values are filtered as categories
+MAX_CATEGORIES = 10
+# values tried before converting a whole text column to dates
+_DATE_SAMPLE = 100
+
+
+def _parses_as_dates(series):
+    # a column that fails on a sample fails as a whole, without parsing every row
+    sample = series.dropna().head(_DATE_SAMPLE)
+    if sample.empty:
+        return False
+    try:
+        pd.to_datetime(sample)
+    except Exception:
+        return False
+    return True
+
+
+def coerce_datetimes(df):
+    """
+    Converts the text columns that hold dates into timezone-naive datetimes
+
+    Args:
+        df (pd.DataFrame): dataframe shown in the explorer, it is not modified
+
+    Returns:
+        pd.DataFrame: a new dataframe with the converted columns, ``df`` itself when nothing needs converting
+    """
+    # Try to convert datetimes into a standard format (datetime, no timezone)
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if is_object_dtype(series) and _parses_as_dates(series):
+            try:
+                series = pd.to_datetime(series)
+                converted[col] = series
+            except Exception:
+                pass
+
+        if is_datetime64_any_dtype(series) and series.dt.tz is not None:
+            converted[col] = series.dt.tz_localize(None)
+    if not converted:
+        # the shared dataset is only copied when a column changes
+        return df
+    df = df.copy()
+    for col, series in converted.items():
+        df[col] = series
+    return df
+
+
+class FilterSchema:
+    """
+    Filter kind and lookup structures of every column of a dataset
+
+    Args:
+        df (pd.DataFrame): the cleaned dataset, it is only copied when a date column is converted
+        max_categories (int): columns with fewer distinct values are categorical
+    """
+
+    def __init__(self, df, max_categories=MAX_CATEGORIES):
+        self.frame = coerce_datetimes(df)
+        self.kinds = {}
+        self._codes = {}
+        self._sorted = {}
+        self._strings = {}
+        self._searches = {}
+        for column in self.frame.columns:
+            series = self.frame[column]
+            if is_categorical_dtype(series):
+                # missing values (code -1) get a code after the categories
+                categories = list(series.cat.categories)
+                codes = series.cat.codes.to_numpy()
+                missing = codes < 0
+                if missing.any():
+                    codes = np.where(missing, len(categories), codes)
+                    categories.append(np.nan)
+                self._codes[column] = (codes, categories)
+                self.kinds[column] = "categorical"
+                continue
+            codes, uniques = pd.factorize(series, use_na_sentinel=False)
+            if len(uniques) < max_categories:
+                self._codes[column] = (codes, list(uniques))
+                self.kinds[column] = "categorical"
+            elif is_numeric_dtype(series):
+                self.kinds[column] = "numeric"
+            elif is_datetime64_any_dtype(series):
+                self.kinds[column] = "datetime"
+            else:
+                self.kinds[column] = "text"
+
+    @property
+    def columns(self):
+        return list(self.frame.columns)
+
+    def options(self, column):
+        """Values of a categorical column, NaN included when it occurs"""
+        return self._codes[column][1]
+
+    def _sorted_values(self, column):
+        # row positions ordered by value, missing values left out; built on first use
+        if column not in self._sorted:
+            series = self.frame[column]
+            valid = series.notna().to_numpy()
+            if self.kinds[column] == "datetime":
+                values = series.to_numpy(dtype="datetime64[ns]").view("i8")
+            else:
+                values = series.to_numpy(dtype=float)
+            positions = np.flatnonzero(valid)
+            order = positions[np.argsort(values[positions], kind="stable")]
+            self._sorted[column] = (order, values[order])
+        return self._sorted[column]
+
+    @staticmethod
+    def _key(value, kind):
+        return pd.Timestamp(value).value if kind == "datetime" else float(value)
+
+    def bounds(self, column):
+        """Smallest and largest value of a numeric or date column"""
+        _, values = self._sorted_values(column)
+        if not len(values):
+            return None, None
+        if self.kinds[column] == "datetime":
+            return pd.Timestamp(values[0]), pd.Timestamp(values[-1])
+        return float(values[0]), float(values[-1])
+
+    def isin(self, column, selected):
+        """Mask of the rows of a categorical column holding one of ``selected``"""
+        codes, values = self._codes[column]
+        # one lookup per distinct value, then one per row; isin matches NaN with NaN
+        allowed = pd.Index(values, dtype=object).isin(list(selected))
+        return allowed[codes]
+
+    def between(self, column, low, high):
+        """Mask of the rows of a numeric or date column within [low, high]"""
+        order, values = self._sorted_values(column)
+        kind = self.kinds[column]
+        first = np.searchsorted(values, self._key(low, kind), side="left")
+        last = np.searchsorted(values, self._key(high, kind), side="right")
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[order[first:last]] = True
+        return mask
+
+    def contains(self, column, pattern):
+        """Mask of the rows whose text contains the substring or regex ``pattern``"""
+        if self._searches.get(column, (None,))[0] != pattern:
+            if column not in self._strings:
+                self._strings[column] = self.frame[column].astype(str)
+            self._searches[column] = (pattern, self._strings[column].str.contains(pattern).to_numpy(dtype=bool))
+        return self._searches[column][1]
+
+    def select(self, masks):
+        """
+        Rows matching every mask
+
+        Args:
+            masks (list): boolean masks from ``isin``, ``between`` and ``contains``
+
+        Returns:
+            pd.DataFrame: the filtered rows (the whole frame without masks)
+        """
+        if not masks:
+            return self.frame
+        mask = np.logical_and.reduce(masks)
+        return self.frame.iloc[np.flatnonzero(mask)]
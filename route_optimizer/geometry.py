@@ -0,0 +1,144 @@
+"""Route geometry for the map: decoding, simplification and compact GeoJSON.
+
+openrouteservice returns every route as an encoded polyline with a vertex
+every few metres of road. Embedding it as is makes the map HTML megabytes
+large for a day of canvassing, so before it reaches folium every line is
+
+- decoded straight into an ``n x 2`` NumPy array of [longitude, latitude],
+- simplified with Douglas-Peucker, with a tolerance of about one screen pixel
+  at the zoom level the map is read at (``tolerance_for_zoom``),
+- written with 5 decimals (about 1 m), the precision of the polyline itself.
+"""
+import json
+import math
+
+import numpy as np
+
+from route_optimizer.distance import KM_PER_DEGREE
+
+# web mercator metres per pixel at zoom 0 on the equator (256 px tiles)
+_METRES_PER_PIXEL = 156543.03392
+# street level, simplified lines look the same as the full ones up to this zoom
+DEFAULT_ZOOM = 16
+# largest deviation from the road allowed, in screen pixels at DEFAULT_ZOOM
+DEFAULT_PIXELS = 1.0
+# decimals written to the map, 5 is what openrouteservice encodes
+COORDINATE_DECIMALS = 5
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decodes a Google encoded polyline, vectorised over all characters
+
+    Same output as ``openrouteservice.convert.decode_polyline`` (2D), without
+    building one Python list per vertex.
+
+    Args:
+        encoded (str): encoded polyline
+        precision (int): decimals of the encoding, 5 for openrouteservice
+
+    Returns:
+        np.ndarray: n x 2 array of [longitude, latitude]
+    """
+    if not encoded:
+        return np.zeros((0, 2))
+    chunks = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    # a value is a run of 5-bit chunks, the last one has the 0x20 bit unset
+    last = chunks < 0x20
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    shift = 5 * (np.arange(len(chunks)) - np.repeat(starts, np.diff(np.append(starts, len(chunks)))))
+    values = np.add.reduceat((chunks & 0x1f) << shift, starts)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+    latitude_longitude = np.cumsum(values.reshape(-1, 2), axis=0) / 10 ** precision
+    return latitude_longitude[:, ::-1].copy()
+
+
+def tolerance_for_zoom(zoom=DEFAULT_ZOOM, latitude=0.0, pixels=DEFAULT_PIXELS):
+    """Metres covered by ``pixels`` screen pixels at a web map zoom level and latitude"""
+    return pixels * _METRES_PER_PIXEL * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def simplify(coordinates, tolerance):
+    """
+    Douglas-Peucker simplification of a line
+
+    Args:
+        coordinates (np.ndarray): n x 2 array of [longitude, latitude]
+        tolerance (float): largest distance in metres between the line and a dropped vertex
+
+    Returns:
+        np.ndarray: the kept vertices, first and last always included
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    if len(coordinates) < 3 or tolerance <= 0:
+        return coordinates
+    scale = KM_PER_DEGREE * 1000
+    points = np.column_stack((
+        coordinates[:, 0] * scale * math.cos(math.radians(coordinates[:, 1].mean())),
+        coordinates[:, 1] * scale,
+    ))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, segment = points[first], points[last] - points[first]
+        inner = points[first + 1:last] - start
+        length = segment @ segment
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            # distance to the segment, clamped to its ends
+            along = np.clip(inner @ segment / length, 0, 1)
+            distances = np.hypot(*(inner - along[:, None] * segment).T)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    return coordinates[keep]
+
+
+def line_geojson(coordinates, decimals=COORDINATE_DECIMALS):
+    """GeoJSON LineString of an n x 2 array, rounded to ``decimals``"""
+    return {"type": "LineString", "coordinates": np.round(coordinates, decimals).tolist()}
+
+
+def simplify_routes(routes, zoom=DEFAULT_ZOOM, pixels=DEFAULT_PIXELS):
+    """
+    Decodes and simplifies the geometry of every route
+
+    Args:
+        routes (list): ``result['routes']``
+        zoom (int): zoom level the lines must look exact at
+        pixels (float): tolerance in screen pixels at that zoom
+
+    Returns:
+        tuple: (lines, stats) with one array per route (None without geometry) and
+            the number of vertices and GeoJSON bytes before and after simplification
+    """
+    lines = []
+    stats = {"points": 0, "simplified_points": 0, "bytes": 0, "simplified_bytes": 0}
+    for route in routes:
+        if not route.get("geometry"):
+            lines.append(None)
+            continue
+        coordinates = decode_polyline(route["geometry"])
+        tolerance = tolerance_for_zoom(zoom, float(coordinates[:, 1].mean()), pixels)
+        simplified = simplify(coordinates, tolerance)
+        lines.append(simplified)
+        stats["points"] += len(coordinates)
+        stats["simplified_points"] += len(simplified)
+        # what the map used to embed: every vertex, as openrouteservice.convert decodes it
+        stats["bytes"] += len(json.dumps(line_geojson(coordinates, decimals=6)))
+        stats["simplified_bytes"] += len(json.dumps(line_geojson(simplified)))
+    return lines, stats
+
+
+def describe_stats(stats):
+    """One-line summary of ``simplify_routes`` stats for the pages"""
+    return (f"Route lines: {stats['points']:,} → {stats['simplified_points']:,} points, "
+            f"{stats['bytes'] / 1024:,.0f} KB → {stats['simplified_bytes'] / 1024:,.0f} KB sent to the map")
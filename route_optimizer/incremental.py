@@ -0,0 +1,111 @@
+"""Incremental re-optimization of the last plan after a small edit.
+
+Adding or removing an outlet, or moving a start point, used to throw the
+previous routes away and solve everything again (with openrouteservice, a
+full remote optimization). When the edit is small the previous routes are
+kept as a warm start for the local solver instead: removed or changed
+outlets are spliced out, new ones are placed by cheapest insertion, a route
+that no longer fits its time window gives up its last stops to be inserted
+again, and a short 2-opt / Or-opt pass repairs the rest. Travel times come
+from the ``MatrixStore``, so only the pairs of the new outlets may have to be
+requested, and an update takes milliseconds.
+
+The route lines of an update are straight between stops, like every local
+solver result.
+"""
+import time
+
+from route_optimizer.cache import normalize
+from route_optimizer.solver import attr
+
+# added, removed or changed outlets plus moved start points handled incrementally
+DEFAULT_MAX_CHANGES = 5
+# search budget of the repair pass, it usually stops well before
+DEFAULT_REPAIR_TIME_LIMIT = 0.2
+
+
+def id_key(value):
+    """
+    Job or vehicle id as a plain python value
+
+    Numpy ids (the pandas index used as job id) then compare equal to the ids
+    read back from a result.
+    """
+    return value.item() if hasattr(value, "item") else value
+
+
+def _payloads(jobs):
+    return {id_key(attr(job, "id")): normalize(job) for job in jobs}
+
+
+def _vehicle_payload(vehicle):
+    # the capacity follows the number of selected outlets, it is not an edit of its own
+    return [normalize(attr(vehicle, name)) for name in ("id", "start", "end", "time_window")]
+
+
+def edit_size(previous_jobs, previous_vehicles, jobs, vehicles):
+    """
+    Size of the edit between two plans
+
+    Returns:
+        int: added, removed and changed jobs plus changed vehicles, None when the vehicles are not the same ones
+    """
+    if [id_key(attr(vehicle, "id")) for vehicle in previous_vehicles] != [id_key(attr(vehicle, "id")) for vehicle in vehicles]:
+        return None
+    before, after = _payloads(previous_jobs), _payloads(jobs)
+    changed_jobs = sum(before.get(key) != payload for key, payload in after.items()) + len(before.keys() - after.keys())
+    changed_vehicles = sum(_vehicle_payload(old) != _vehicle_payload(new) for old, new in zip(previous_vehicles, vehicles))
+    return changed_jobs + changed_vehicles
+
+
+def warm_routes(previous, previous_jobs, jobs, vehicles):
+    """
+    Previous routes as job positions of the new problem
+
+    Outlets that were removed or changed are left out, they (and the new
+    outlets) are inserted again by the solver.
+
+    Returns:
+        list: job positions per vehicle, in the previous visiting order
+    """
+    before = _payloads(previous_jobs)
+    positions = {}
+    for position, job in enumerate(jobs):
+        key = id_key(attr(job, "id"))
+        if before.get(key) == normalize(job):
+            positions[key] = position
+    sequences = {
+        id_key(route["vehicle"]): [positions[id_key(step["id"])] for step in route["steps"]
+                                 if step["type"] == "job" and id_key(step["id"]) in positions]
+        for route in previous.get("routes", [])
+    }
+    return [sequences.get(id_key(attr(vehicle, "id")), []) for vehicle in vehicles]
+
+
+def reoptimize(optimize, previous, previous_jobs, previous_vehicles, jobs, vehicles, max_changes=DEFAULT_MAX_CHANGES):
+    """
+    Updates the previous plan after a small edit of its outlets or start points
+
+    Args:
+        optimize (callable): ``optimize(jobs=..., vehicles=..., geometry=True, routes=...)``, e.g. the
+            ``optimization`` of a ``MatrixClient`` around a ``LocalClient`` with a short time limit
+        previous (dict): result of the previous plan
+        previous_jobs (list): jobs of the previous plan
+        previous_vehicles (list): vehicles of the previous plan
+        jobs (list): jobs of the new plan
+        vehicles (list): vehicles of the new plan
+        max_changes (int): largest edit updated incrementally
+
+    Returns:
+        dict: openrouteservice-shaped result with ``incremental`` (edit size and milliseconds taken),
+        None when the edit has to be solved from scratch
+    """
+    if not previous or not previous.get("routes"):
+        return None
+    size = edit_size(previous_jobs, previous_vehicles, jobs, vehicles)
+    if size is None or size > max_changes:
+        return None
+    started = time.perf_counter()
+    result = optimize(jobs=jobs, vehicles=vehicles, geometry=True, routes=warm_routes(previous, previous_jobs, jobs, vehicles))
+    result["incremental"] = {"edits": size, "milliseconds": int((time.perf_counter() - started) * 1000)}
+    return result
@@ -0,0 +1,200 @@
+"""Background execution of optimizer runs.
+
+Pressing "Run Optimizer" used to solve on the Streamlit script thread, so the
+page froze for the whole run and any widget change threw the work away.
+Runs are now submitted to a ``JobManager`` shared by every session of the
+process: each gets a job id, runs on a worker thread (the local solver still
+spreads its own work over processes), reports its progress and can be
+cancelled. The pages keep the ids of their jobs in the session state and
+poll the manager on every rerun, so results survive reruns and several runs
+can be in flight at once.
+
+A job only sees the arguments it was submitted with, nothing may be read from
+``st.session_state`` inside it (there is no script context on the worker).
+"""
+import concurrent.futures
+import functools
+import threading
+import time
+import traceback
+import uuid
+
+DEFAULT_WORKERS = 4
+# finished jobs are kept this long for their sessions to pick up the results
+DEFAULT_KEEP_SECONDS = 3600
+# how often a page with running jobs reruns to show their progress
+POLL_SECONDS = 1
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``Job.report`` once the job has been cancelled"""
+
+
+class Job:
+    """
+    One submitted run
+
+    Attributes:
+        id (str): short job id
+        label (str): what the run is, shown on the page
+        context (dict): whatever the page needs to show the result (e.g. the selected outlets)
+        status (str): queued, running, done, failed or cancelled
+        progress (float): share of the work done, from 0 to 1
+        message (str): last progress message
+        result: return value of the job function once done
+        error (str): exception of a failed job
+    """
+
+    def __init__(self, label="", context=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.label = label
+        self.context = context or {}
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def elapsed(self):
+        """Seconds spent running so far (or in total once finished)"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def report(self, done, total=None, message=None):
+        """
+        Progress from inside the job, e.g. ``progress=job.report`` of ``plan_territory``
+
+        Raises:
+            JobCancelled: once the job has been cancelled, so the work stops at the next report
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.progress = min(1.0, done / total) if total else float(done)
+        if message:
+            self.message = message
+
+
+class JobManager:
+    """
+    Thread pool running jobs in the background, with their state kept by id
+
+    Args:
+        workers (int): jobs running at the same time, the next ones wait in the queue
+        keep_seconds (float): finished jobs are forgotten after this long
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, keep_seconds=DEFAULT_KEEP_SECONDS):
+        self.keep_seconds = keep_seconds
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="optimizer")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, label="", context=None, **kwargs):
+        """
+        Runs ``function(job, *args, **kwargs)`` on the pool
+
+        Returns:
+            Job: the submitted job, its ``id`` is what the page keeps
+        """
+        job = Job(label, context)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, function, args, kwargs)
+        return job
+
+    def record(self, result, label="", context=None, started=None):
+        """
+        Keeps a result computed on the script thread as a finished job, e.g. an incremental update
+
+        Returns:
+            Job: the finished job
+        """
+        job = Job(label, context)
+        job.started = started or job.submitted
+        job.finished = time.time()
+        job.result = result
+        job.progress = 1.0
+        job.status = DONE
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job, function, args, kwargs):
+        if job.cancelled:
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            result = function(job, *args, **kwargs)
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as error:
+            job.error = f"{type(error).__name__}: {error}"
+            job.traceback = traceback.format_exc()
+            job.status = CANCELLED if job.cancelled else FAILED
+        else:
+            # a run cancelled while waiting on a request finishes, its result is dropped
+            if job.cancelled:
+                job.status = CANCELLED
+            else:
+                job.result = result
+                job.progress = 1.0
+                job.status = DONE
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        """The job of an id, None once it has been forgotten"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or running job
+
+        A queued job never starts. A running one stops at its next progress
+        report; a request already sent to openrouteservice is waited for and
+        its answer dropped.
+        """
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            job.finished = time.time()
+        job.status = CANCELLED
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and now - job.finished > self.keep_seconds]:
+            del self._jobs[job_id]
+
+
+@functools.lru_cache(maxsize=None)
+def get_job_manager():
+    """One job manager per process, shared by every session"""
+    return JobManager()
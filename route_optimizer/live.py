@@ -0,0 +1,130 @@
+"""Live re-routing of the rest of the day from the visited sheet.
+
+Once a day's routes are out, canvassers mark the outlets they visited (the
+``visited`` column of the Data Habs sheet, the visited sheet of the Leads
+page). In live mode the page reads the sheets' local copies, which are
+refreshed in the background (``route_optimizer.sheets``), every few minutes and
+plans each canvasser's remaining stops again. A canvasser starts from their
+last visited outlet at the current time. The previous order is the warm
+start, so only the stops that no longer fit move. Travel times come from the
+``MatrixStore``, so a refresh costs milliseconds per canvasser and no remote
+optimization.
+"""
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+
+from route_optimizer.clustering import merge_results
+from route_optimizer.incremental import id_key
+from route_optimizer.solver import attr
+
+# seconds between two live refreshes of a page
+DEFAULT_LIVE_INTERVAL = 120
+
+
+def _replace(item, **values):
+    # copy of a job/vehicle (object or dict) with some fields replaced
+    item = copy.copy(item)
+    for name, value in values.items():
+        if isinstance(item, dict):
+            item[name] = value
+        else:
+            setattr(item, name, value)
+    return item
+
+
+def _outlet_keys(df, columns):
+    # one string per row, stripped and lower-cased so the sheet and the dataset spell an outlet the same way
+    keys = df[columns[0]].astype(str).str.strip().str.lower()
+    for column in columns[1:]:
+        keys = keys + "|" + df[column].astype(str).str.strip().str.lower()
+    return keys
+
+
+def visited_stops(outlets, visits, key, flag=None, flag_value="Yes", time_column=None):
+    """
+    Outlets of the routes marked as visited
+
+    Outlets are matched on the values of ``key``, not on the row position in the
+    sheet, which shifts when rows are inserted or deleted.
+
+    Args:
+        outlets (pd.DataFrame): outlets of the routes, their index is the job id
+        visits (pd.DataFrame): the visited sheet, its column names are matched lower-cased with ``_`` for spaces
+        key (str or list): column(s) naming the outlet in both tables, e.g. "mt_leads_code" or ["nama", "telp"]
+        flag (str): column marking a visited row (e.g. "visited"), every row of ``visits`` counts when None
+        flag_value (str): value of ``flag`` for a visited outlet
+        time_column (str): visit time column, orders the visits of a canvasser when present
+
+    Returns:
+        dict: job id -> visit time in seconds (NaN when unknown)
+    """
+    columns = [key] if isinstance(key, str) else list(key)
+    visits = visits.copy()
+    visits.columns = visits.columns.astype(str).str.lower().str.replace(" ", "_")
+    if any(column not in visits.columns for column in columns):
+        return {}
+    if flag is not None:
+        if flag not in visits.columns:
+            return {}
+        visits = visits.loc[visits[flag].astype(str).str.strip().str.lower() == flag_value.lower()]
+    times = pd.Series(np.nan, index=visits.index)
+    if time_column is not None and time_column in visits.columns:
+        stamps = pd.to_datetime(visits[time_column], errors="coerce")
+        times = pd.Series(stamps.astype("int64").where(stamps.notnull()) / 1e9, index=visits.index)
+    latest = times.groupby(_outlet_keys(visits, columns).values).max()
+    codes = _outlet_keys(outlets, columns)
+    return {id_key(job_id): float(latest[code]) for job_id, code in codes.items() if code in latest.index}
+
+
+def replan_remaining(optimize, result, jobs, vehicles, visited, now=None):
+    """
+    Plans the rest of the day of every canvasser from their last visited outlet
+
+    Args:
+        optimize (callable): ``optimize(jobs=..., vehicles=..., geometry=True, routes=...)``, e.g. the
+            ``optimization`` of a ``MatrixClient`` around a ``LocalClient`` with a short time limit
+        result (dict): the day's openrouteservice-shaped result
+        jobs (list): jobs of that result
+        vehicles (list): vehicles of that result
+        visited (dict): job id -> visit time (NaN when unknown), see ``visited_stops``
+        now (float): current unix time, time.time() by default
+
+    Returns:
+        dict: openrouteservice-shaped result with the remaining stops of every canvasser still out,
+        ``visited`` (job ids) and ``finished`` (vehicle ids with every stop visited)
+    """
+    now = time.time() if now is None else now
+    jobs_by_id = {id_key(attr(job, "id")): job for job in jobs}
+    vehicles_by_id = {id_key(attr(vehicle, "id")): vehicle for vehicle in vehicles}
+    results = []
+    finished = []
+    done_ids = []
+    for route in result.get("routes", []):
+        vehicle = vehicles_by_id[id_key(route["vehicle"])]
+        stops = [id_key(step["id"]) for step in route["steps"] if step["type"] == "job"]
+        done = [stop for stop in stops if stop in visited]
+        remaining = [stop for stop in stops if stop not in visited]
+        done_ids.extend(done)
+        if not remaining:
+            finished.append(route["vehicle"])
+            continue
+        start = attr(vehicle, "start")
+        if done:
+            # the latest visit when the sheet has visit times, else the last visited stop of the route
+            times = np.array([visited[stop] for stop in done], dtype=float)
+            last = done[int(np.nanargmax(times))] if np.isfinite(times).any() else done[-1]
+            start = attr(jobs_by_id[last], "location")
+        window = attr(vehicle, "time_window")
+        if window:
+            window = [int(min(max(now, window[0]), window[1])), window[1]]
+        rest = _replace(vehicle, start=list(start), time_window=window)
+        # the previous order is the warm start, stops that no longer fit the day are inserted again or left out
+        results.append(optimize(jobs=[jobs_by_id[stop] for stop in remaining], vehicles=[rest], geometry=True,
+                                routes=[list(range(len(remaining)))]))
+    merged = merge_results(results)
+    merged["visited"] = done_ids
+    merged["finished"] = finished
+    return merged
@@ -0,0 +1,173 @@
+"""Folium map of optimized routes.
+
+Stops are not added as one ``folium.Marker`` each: every canvasser's stops go
+to the browser as a single compact data array (``StopLayer``), and the
+numbered icons, tooltips and popups are built client-side from it. Large
+routes are clustered so the map stays responsive on phones.
+"""
+import folium
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from folium.plugins import MarkerCluster
+from jinja2 import Template
+
+from route_optimizer.geometry import line_geojson, simplify_routes
+
+# one color per canvasser, folium.Icon only knows a fixed palette
+ROUTE_COLORS = ['green', 'red', 'blue', 'purple', 'orange', 'darkred', 'cadetblue', 'darkgreen', 'darkblue', 'gray']
+# stops of one canvasser above which the layer clusters its markers
+CLUSTER_THRESHOLD = 200
+
+
+class StopLayer(JSCSSMixin, MacroElement):
+    """
+    Numbered stop markers of one route, rendered in the browser from one data array
+
+    Every row is ``[latitude, longitude, number, name, km, minutes, url]``; the
+    icon, tooltip and popup of a marker are only built by Leaflet, the popup
+    when it is opened.
+
+    Args:
+        data (list): one row per stop
+        color (str): css color of the icons
+        cluster (bool): group nearby markers (leaflet.markercluster)
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            (function(){
+                var data = {{ this.data|tojson }};
+                var color = {{ this.color|tojson }};
+                var group = {% if this.cluster %}L.markerClusterGroup({disableClusteringAtZoom: 16}){% else %}L.featureGroup(){% endif %};
+                function escape(text) {
+                    return String(text).replace(/[&<>"']/g, function(c) {
+                        return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+                    });
+                }
+                for (var i = 0; i < data.length; i++) {
+                    var row = data[i];
+                    var icon = L.divIcon({
+                        className: "",
+                        iconSize: [26, 26],
+                        iconAnchor: [13, 13],
+                        html: '<div style="width:22px;height:22px;border:2px solid ' + color + ';border-radius:50%;'
+                            + 'background:#FFF;color:' + color + ';font:bold 12px/22px sans-serif;text-align:center">'
+                            + row[2] + '</div>'
+                    });
+                    var marker = L.marker([row[0], row[1]], {icon: icon});
+                    marker.row = row;
+                    marker.bindTooltip(function(layer) { return "Merchant: " + escape(layer.row[3]); });
+                    marker.bindPopup(function(layer) {
+                        var r = layer.row, url = escape(r[6]);
+                        return "Distance to Previous: " + r[4].toFixed(2) + " km <br> Duration to Previous: "
+                            + r[5].toFixed(2) + ' minutes <br> Maps URL: <a href="' + url + '" target="_blank">' + url + '</a>';
+                    });
+                    group.addLayer(marker);
+                }
+                group.addTo({{ this._parent.get_name() }});
+            })();
+        {% endmacro %}""")
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, data, color, cluster=False):
+        super().__init__()
+        self._name = 'StopLayer'
+        self.data = data
+        self.color = color
+        self.cluster = cluster
+        if not cluster:
+            # the markercluster assets are only needed by clustered layers
+            self.default_js, self.default_css = [], []
+
+
+def stop_rows(stops, name_column):
+    """
+    ``StopLayer`` rows of the merged steps of one route, built column-wise
+
+    Args:
+        stops (pd.DataFrame): merged steps, indexed by stop number
+        name_column (str): outlet name shown in the tooltip
+
+    Returns:
+        list: one row per stop
+    """
+    if stops.empty:
+        return []
+    locations = stops["location"].tolist()
+    return [list(row) for row in zip(
+        [round(float(location[1]), 6) for location in locations],
+        [round(float(location[0]), 6) for location in locations],
+        stops.index.astype(int).tolist(),
+        stops[name_column].astype(str).tolist(),
+        (stops["distance_to_previous"].astype(float) / 1000).round(3).tolist(),
+        (stops["duration_to_previous"].astype(float) / 60).round(2).tolist(),
+        stops["google_maps"].fillna("").astype(str).tolist(),
+    )]
+
+
+def route_color(position):
+    return ROUTE_COLORS[position % len(ROUTE_COLORS)]
+
+
+def route_map(df_merged_clean, routes, name_column, center, lines=None):
+    """
+    Map with one colored layer (stops, start point and route line) per canvasser
+
+    Routes with a ``layer`` name (e.g. the day of a multi-day plan) share the
+    layer of that name, only the first one is shown at first, and take the
+    color of their ``canvasser``.
+
+    Args:
+        df_merged_clean (pd.DataFrame): merged steps of every route, with a ``vehicle`` column
+        routes (list): ``result['routes']``
+        name_column (str): outlet name shown in the tooltip
+        center (list): [latitude, longitude] the map is centered on
+        lines (list): simplified route lines from ``simplify_routes``, computed when missing
+
+    Returns:
+        folium.Map: the map
+    """
+    # create map by instantiating folium object
+    m = folium.Map(location=center, zoom_start=10, tiles='cartodbpositron')
+    if lines is None:
+        lines, _ = simplify_routes(routes)
+
+    layers = {}
+    for position, (route, line) in enumerate(zip(routes, lines)):
+        color = route_color(route.get("canvasser", position))
+        name = route.get("layer", 'Canvasser {}'.format(position + 1))
+        if name not in layers:
+            layers[name] = folium.FeatureGroup(name=name, show=not layers or "layer" not in route)
+        layer = layers[name]
+
+        # all stops of the canvasser as one data-driven layer
+        stops = df_merged_clean.loc[df_merged_clean["vehicle"] == route["vehicle"]]
+        rows = stop_rows(stops, name_column)
+        StopLayer(rows, color, cluster=len(rows) > CLUSTER_THRESHOLD).add_to(layer)
+
+        # plot starting point
+        for step in route["steps"]:
+            if step["type"] == "start":
+                folium.Marker(
+                    location=list(reversed(step["location"])),
+                    icon=folium.Icon(color=color, icon="bus", prefix='fa'),
+                    setZIndexOffset=1000, tooltip="Start Point"
+                ).add_to(layer)
+
+        # add geometry distance, simplified so the page stays light on mobile data
+        if line is not None:
+            folium.GeoJson(
+                data={"type": "FeatureCollection", "features": [{"type": "Feature",
+                                                                "geometry": line_geojson(line),
+                                                                "properties": {"color": color}
+                                                                }]},
+                style_function=lambda x: {"color": x['properties']['color']}
+            ).add_to(layer)
+
+    for layer in layers.values():
+        layer.add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
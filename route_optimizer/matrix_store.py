@@ -0,0 +1,384 @@
+"""Persistent store of road durations and distances between outlet pairs.
+
+Outlets of one district are planned again and again, and every optimization
+used to have openrouteservice compute the same road travel times between
+them. ``MatrixStore`` keeps every pair it has seen in SQLite, keyed by the
+rounded coordinates of both ends, so a later plan only asks the ORS matrix
+endpoint for the pairs it does not know yet (in blocks the endpoint accepts)
+and hands the optimizer a custom matrix. Pairs expire after a while, since
+roads and one-way rules change, and the least recently used pairs are
+evicted over a size limit.
+
+``MatrixClient`` wraps any client with an ``optimization`` method (the
+shared ``RoutingClient`` or the ``LocalClient``) so the pages and the
+splitter keep calling ``optimization`` as before.
+"""
+import contextlib
+import copy
+import functools
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from route_optimizer.distance import travel_matrices
+from route_optimizer.solver import LocalClient, attr
+
+DEFAULT_MATRIX_PATH = os.path.join(".cache", "road_matrix.sqlite")
+# road times hardly change from one day to the next, but they do over months
+DEFAULT_TTL = 30 * 24 * 3600
+# ~100 bytes per pair on disk
+DEFAULT_MAX_PAIRS = 2000000
+# sources x destinations per openrouteservice matrix request (limit of the public api)
+DEFAULT_MAX_ELEMENTS = 3500
+DEFAULT_PROFILE = "driving-car"
+
+# pairs are keyed at ~1 m precision, the same outlet always gets the same key
+_COORDINATE_DECIMALS = 5
+
+
+def location_key(location):
+    """Store key of a [longitude, latitude] pair"""
+    return f"{float(location[0]):.{_COORDINATE_DECIMALS}f},{float(location[1]):.{_COORDINATE_DECIMALS}f}"
+
+
+def _cover(missing, rows, max_elements):
+    # the rows share the union of their missing columns, cut to the request size
+    columns = np.flatnonzero(missing[rows].any(axis=0))
+    column_step = min(len(columns), max_elements)
+    row_step = max(1, max_elements // column_step)
+    blocks = []
+    for row_start in range(0, len(rows), row_step):
+        block_rows = rows[row_start:row_start + row_step]
+        block_columns = columns[missing[np.ix_(block_rows, columns)].any(axis=0)]
+        for column_start in range(0, len(block_columns), column_step):
+            blocks.append((block_rows, block_columns[column_start:column_start + column_step]))
+    return blocks
+
+
+def missing_blocks(missing, max_elements=DEFAULT_MAX_ELEMENTS):
+    """
+    Groups the missing cells of a matrix into requests of at most ``max_elements`` cells
+
+    A location never seen before misses its whole row and column, so the
+    mostly missing rows are requested first against every column, then the
+    other rows against the columns still missing; a few known pairs may be
+    fetched again rather than sending one request per row.
+
+    Args:
+        missing (np.ndarray): n x n boolean mask of the pairs to fetch
+
+    Returns:
+        list: (source positions, destination positions) per request
+    """
+    missing = missing.copy()
+    blocks = []
+    dense = np.flatnonzero(missing.sum(axis=1) * 2 > missing.shape[1])
+    for rows in (dense, None):
+        if rows is None:
+            rows = np.flatnonzero(missing.any(axis=1))
+        if len(rows):
+            blocks.extend(_cover(missing, rows, max_elements))
+            missing[rows] = False
+    return blocks
+
+
+def ors_fetch(client, profile=DEFAULT_PROFILE):
+    """
+    Fetch function of ``MatrixStore.matrices`` calling the openrouteservice matrix endpoint
+
+    Returns:
+        callable: (locations, sources, destinations) -> (durations, distances) as nested lists
+    """
+    def fetch(locations, sources, destinations):
+        response = client.distance_matrix(
+            locations=locations, profile=profile, sources=sources, destinations=destinations,
+            metrics=["duration", "distance"], units="m",
+        )
+        return response["durations"], response.get("distances")
+    return fetch
+
+
+class MatrixStore:
+    """
+    SQLite-backed road durations and distances per pair of locations
+
+    A connection is opened per operation, so one instance can be shared by all
+    Streamlit sessions and threads, and several processes can use the same file.
+
+    Args:
+        path (str): database file
+        ttl (float): seconds before a pair is stale and fetched again, None to keep forever
+        max_pairs (int): stored pairs before the least recently used ones are evicted
+        profile (str): openrouteservice routing profile of the stored times
+    """
+
+    def __init__(self, path=DEFAULT_MATRIX_PATH, ttl=DEFAULT_TTL, max_pairs=DEFAULT_MAX_PAIRS, profile=DEFAULT_PROFILE):
+        self.path = path
+        self.ttl = ttl
+        self.max_pairs = max_pairs
+        self.profile = profile
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pairs ("
+                "profile TEXT NOT NULL, origin TEXT NOT NULL, destination TEXT NOT NULL, "
+                "duration REAL, distance REAL, created REAL NOT NULL, accessed REAL NOT NULL, "
+                "PRIMARY KEY (profile, origin, destination))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pairs_accessed ON pairs (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, conn, name, value):
+        if value:
+            conn.execute(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, int(value))
+            )
+
+    def lookup(self, locations):
+        """
+        Stored pairs between every two locations
+
+        Args:
+            locations (list): [longitude, latitude] pairs
+
+        Returns:
+            tuple: (durations, distances, found) as n x n arrays, NaN where
+            nothing is stored; ``found`` also covers the pairs of one location
+            with itself and the pairs stored as unreachable (NaN duration)
+        """
+        keys = [location_key(location) for location in locations]
+        n = len(keys)
+        # the same outlet may be listed twice (e.g. a start point on an outlet)
+        codes = np.unique(keys, return_inverse=True)[1] if n else np.zeros(0, dtype=int)
+        found = codes[:, None] == codes[None, :]
+        durations = np.where(found, 0.0, np.nan)
+        distances = durations.copy()
+        if len(set(keys)) < 2:
+            return durations, distances, found
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE wanted (key TEXT NOT NULL, position INTEGER NOT NULL)")
+            conn.executemany("INSERT INTO wanted (key, position) VALUES (?, ?)", [(key, i) for i, key in enumerate(keys)])
+            conn.execute("CREATE INDEX temp.wanted_key ON wanted (key)")
+            rows = conn.execute(
+                "SELECT o.position, d.position, p.duration, p.distance FROM pairs p "
+                "JOIN wanted o ON p.origin = o.key JOIN wanted d ON p.destination = d.key "
+                "WHERE p.profile = ? AND p.created >= ?",
+                (self.profile, now - self.ttl if self.ttl is not None else -np.inf),
+            ).fetchall()
+            # the temp table opened a transaction, a write on top of its read snapshot
+            # would fail at once instead of waiting for the other writers
+            conn.commit()
+            if rows:
+                conn.execute(
+                    "UPDATE pairs SET accessed = ? WHERE profile = ? "
+                    "AND origin IN (SELECT key FROM wanted) AND destination IN (SELECT key FROM wanted)",
+                    (now, self.profile),
+                )
+            conn.execute("DROP TABLE temp.wanted")
+        if rows:
+            table = np.array(rows, dtype=float)
+            origin = table[:, 0].astype(int)
+            destination = table[:, 1].astype(int)
+            durations[origin, destination] = table[:, 2]
+            distances[origin, destination] = table[:, 3]
+            found[origin, destination] = True
+        return durations, distances, found
+
+    def store(self, origins, destinations, durations, distances=None):
+        """
+        Stores a block of pairs and evicts the least recently used pairs over the limit
+
+        Args:
+            origins (list): [longitude, latitude] of the rows
+            destinations (list): [longitude, latitude] of the columns
+            durations: len(origins) x len(destinations) seconds, None where unreachable
+            distances: same shape in metres, optional
+        """
+        origin_keys = [location_key(location) for location in origins]
+        destination_keys = [location_key(location) for location in destinations]
+        durations = np.array(durations, dtype=float).reshape(len(origin_keys), len(destination_keys))
+        distances = np.full_like(durations, np.nan) if distances is None else np.array(distances, dtype=float).reshape(durations.shape)
+        now = time.time()
+        rows = [
+            (self.profile, origin, destination, _nullable(durations[i, j]), _nullable(distances[i, j]), now, now)
+            for i, origin in enumerate(origin_keys)
+            for j, destination in enumerate(destination_keys)
+            if origin != destination
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pairs (profile, origin, destination, duration, distance, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+            )
+            if self.ttl is not None:
+                conn.execute("DELETE FROM pairs WHERE created < ?", (now - self.ttl,))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+        if count <= self.max_pairs:
+            return
+        # down to 90% of the limit, so the next stores do not evict again right away
+        evicted = count - int(self.max_pairs * 0.9)
+        conn.execute("DELETE FROM pairs WHERE rowid IN (SELECT rowid FROM pairs ORDER BY accessed LIMIT ?)", (evicted,))
+        self._count(conn, "evictions", evicted)
+
+    def matrices(self, locations, fetch=None, max_elements=DEFAULT_MAX_ELEMENTS):
+        """
+        Road durations and distances between every two locations
+
+        Stored pairs are reused, the missing ones are fetched in blocks of at
+        most ``max_elements`` and stored. Without ``fetch`` (offline) and for
+        unreachable pairs the straight-line estimate of
+        ``route_optimizer.distance.travel_matrices`` fills the gaps.
+
+        Args:
+            locations (list): [longitude, latitude] pairs
+            fetch (callable): (locations, sources, destinations) -> (durations, distances), e.g. ``ors_fetch(client)``
+            max_elements (int): sources x destinations per fetch
+
+        Returns:
+            tuple: (durations in seconds, distances in metres) as n x n arrays
+        """
+        locations = [[float(location[0]), float(location[1])] for location in locations]
+        durations, distances, found = self.lookup(locations)
+        missing = ~found
+        requested = 0
+        if fetch is not None:
+            for sources, destinations in missing_blocks(missing, max_elements):
+                # only the coordinates of the block are sent
+                positions = np.union1d(sources, destinations)
+                block_durations, block_distances = fetch(
+                    [locations[i] for i in positions],
+                    np.searchsorted(positions, sources).tolist(),
+                    np.searchsorted(positions, destinations).tolist(),
+                )
+                self.store([locations[i] for i in sources], [locations[i] for i in destinations], block_durations, block_distances)
+                cells = np.ix_(sources, destinations)
+                durations[cells] = np.array(block_durations, dtype=float)
+                if block_distances is not None:
+                    distances[cells] = np.array(block_distances, dtype=float)
+                requested += len(sources) * len(destinations)
+        # hits and misses count distinct location pairs, a location listed twice is not a store hit
+        distinct = np.unique([location_key(location) for location in locations], return_index=True)[1] if locations else []
+        cells = np.ix_(distinct, distinct)
+        with self._connect() as conn:
+            self._count(conn, "hits", found[cells].sum() - len(distinct))
+            self._count(conn, "misses", missing[cells].sum())
+            self._count(conn, "requested", requested)
+        gaps = np.isnan(durations) | np.isnan(distances)
+        if gaps.any():
+            estimated_durations, estimated_distances = travel_matrices(locations)
+            durations = np.where(np.isnan(durations), estimated_durations, durations)
+            distances = np.where(np.isnan(distances), estimated_distances, distances)
+        return durations, distances
+
+    def stats(self):
+        """
+        Usage of the store so far
+
+        Returns:
+            dict: ``hits`` and ``misses`` (distinct location pairs found in the store or not),
+            ``requested`` (matrix cells sent to the fetch, the quota used), ``evictions`` and
+            ``pairs`` (pairs stored now)
+        """
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            pairs = conn.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+        return {
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "requested": counts.get("requested", 0),
+            "evictions": counts.get("evictions", 0),
+            "pairs": pairs,
+        }
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pairs")
+            conn.execute("DELETE FROM stats")
+
+
+def _nullable(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _indexed(item, **indices):
+    # copy of a job/vehicle (object or dict) with matrix indices added
+    item = copy.copy(item)
+    for name, index in indices.items():
+        if isinstance(item, dict):
+            item[name] = index
+        else:
+            setattr(item, name, index)
+    return item
+
+
+class MatrixClient:
+    """
+    Optimization client sending a custom matrix built from a ``MatrixStore``
+
+    Jobs and vehicles keep their locations (the answer still has them, and
+    openrouteservice still draws the route geometry), only the travel times
+    between them come from the matrix.
+
+    ``routes`` (a warm start, see ``route_optimizer.incremental``) is only
+    understood by the ``LocalClient``.
+
+    Args:
+        client: client with an ``optimization`` method, ``RoutingClient`` or ``LocalClient``
+        store (MatrixStore): pairs to reuse
+        fetch (callable): fetch of the missing pairs (``ors_fetch``), None to estimate them instead
+    """
+
+    def __init__(self, client, store, fetch=None):
+        self.client = client
+        self.store = store
+        self.fetch = fetch
+
+    def optimization(self, jobs=None, vehicles=None, shipments=None, matrix=None, geometry=None, dry_run=None, routes=None):
+        if matrix is not None or shipments or dry_run:
+            return self.client.optimization(jobs=jobs, vehicles=vehicles, shipments=shipments, matrix=matrix,
+                                            geometry=geometry, dry_run=dry_run)
+        positions = {}
+
+        def index(location):
+            if location is None:
+                return None
+            return positions.setdefault(location_key(location), (len(positions), location))[0]
+
+        jobs = [_indexed(job, location_index=index(attr(job, "location"))) for job in jobs or []]
+        vehicles = [
+            _indexed(vehicle, **{name + "_index": index(attr(vehicle, name)) for name in ("start", "end") if attr(vehicle, name) is not None})
+            for vehicle in vehicles or []
+        ]
+        locations = [location for _, location in sorted(positions.values(), key=lambda item: item[0])]
+        durations, distances = self.store.matrices(locations, fetch=self.fetch)
+        # vroom takes whole seconds
+        matrix = np.rint(durations).astype(int).tolist()
+        if isinstance(self.client, LocalClient):
+            # the local solver also reports the stored road distances
+            return self.client.optimization(jobs=jobs, vehicles=vehicles, matrix=matrix, geometry=geometry,
+                                            distances=distances.tolist(), routes=routes)
+        return self.client.optimization(jobs=jobs, vehicles=vehicles, matrix=matrix, geometry=geometry)
+
+
+@functools.lru_cache(maxsize=None)
+def get_matrix_store(path=DEFAULT_MATRIX_PATH):
+    """One store instance per process and path, shared by every session"""
+    return MatrixStore(path)
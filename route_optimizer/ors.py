@@ -0,0 +1,234 @@
+"""Shared openrouteservice client: one keep-alive session, rate limited, with bounded retries.
+
+Every page and batch worker goes through ``get_routing_client()``, so all
+requests of a process share one HTTP connection pool and one token bucket
+sized to the openrouteservice plan. Requests wait for a token instead of
+bursting into 429 errors, and 429/5xx answers are retried a few times with
+exponential backoff (or the server's Retry-After).
+
+Several problems can be sent at once with ``optimize_many``, which runs them
+on a thread pool behind the same limiter.
+
+The API key is read from the ``ORS_API_KEY`` environment variable unless the
+caller passes one (the pages pass the Streamlit secret of the same name).
+"""
+import concurrent.futures
+import functools
+import logging
+import os
+import random
+import threading
+import time
+
+import openrouteservice
+import requests
+from openrouteservice import exceptions
+from requests.adapters import HTTPAdapter
+
+# environment variable holding the API key, get one from https://openrouteservice.org/dev/#/signup
+API_KEY_VARIABLE = "ORS_API_KEY"
+# optimization quota of the free plan, per minute
+DEFAULT_RATE_PER_MINUTE = float(os.environ.get("ORS_RATE_PER_MINUTE", 40))
+# requests that may go out back to back before the per-minute rate applies
+DEFAULT_BURST = 5
+DEFAULT_MAX_RETRIES = 3
+# first retry waits about this long, doubling after every attempt
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 60
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Args:
+        rate_per_minute (float): tokens added per minute
+        burst (int): tokens the bucket holds at most
+    """
+
+    def __init__(self, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate if self.rate else 1.0)
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """Holds back every caller for a while, e.g. after the server answered 429"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RoutingClient(openrouteservice.Client):
+    """
+    ``openrouteservice.Client`` with a shared session, a rate limiter and bounded retries
+
+    The API methods (``optimization``, ``directions``, ...) are the ones of
+    openrouteservice-py; only the HTTP layer underneath is replaced.
+
+    Args:
+        key (str): openrouteservice api key
+        base_url (str): api url, e.g. a local stub server
+        rate_per_minute (float): requests per minute allowed by the plan
+        burst (int): requests that may go out back to back
+        max_retries (int): retries of a request answered with 429/5xx or a connection error
+        backoff (float): seconds before the first retry, doubled for every next one
+        max_workers (int): concurrent requests of ``optimize_many`` (and pooled connections)
+        timeout (float): seconds per request
+    """
+
+    def __init__(self, key=None, base_url=None, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, max_workers=DEFAULT_MAX_WORKERS,
+                 timeout=DEFAULT_TIMEOUT):
+        kwargs = {"base_url": base_url} if base_url else {}
+        super().__init__(key=key, timeout=timeout, retry_over_query_limit=False, **kwargs)
+        # keep-alive connections for every worker thread
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self.limiter = TokenBucket(rate_per_minute, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _delay(self, attempt, response=None):
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return retry_after
+        # jittered exponential backoff, so waiting threads do not retry in lockstep
+        return min(DEFAULT_MAX_BACKOFF, self.backoff * 2 ** attempt) * (0.5 + random.random())
+
+    def request(self, url, get_params=None, first_request_time=None, retry_counter=0, requests_kwargs=None,
+                post_json=None, dry_run=None):
+        """Same as ``openrouteservice.Client.request``, rate limited and retried a bounded number of times"""
+        if dry_run:
+            return super().request(url, get_params, requests_kwargs=requests_kwargs, post_json=post_json, dry_run=dry_run)
+
+        final_requests_kwargs = dict(self._requests_kwargs, **(requests_kwargs or {}))
+        method = self._session.get
+        if post_json is not None:
+            method = self._session.post
+            final_requests_kwargs["json"] = post_json
+        full_url = self._base_url + self._generate_auth_url(url, get_params)
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = method(full_url, **final_requests_kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as error:
+                if attempt == self.max_retries:
+                    if isinstance(error, requests.exceptions.Timeout):
+                        raise exceptions.Timeout()
+                    raise
+                delay = self._delay(attempt)
+                logger.warning("openrouteservice %s failed (%s), retrying in %.1fs", url, type(error).__name__, delay)
+                time.sleep(delay)
+                continue
+            self._req = response.request
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._delay(attempt, response)
+                if response.status_code == 429:
+                    # the quota is shared, every thread of the process backs off
+                    self.limiter.block(delay)
+                logger.warning("openrouteservice %s answered %s, retrying in %.1fs", url, response.status_code, delay)
+                time.sleep(delay)
+                continue
+            return self._get_body(response)
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Runs a client method (e.g. ``"optimization"``) on the shared thread pool
+
+        Returns:
+            concurrent.futures.Future: future of the method's result
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ors")
+        return self._executor.submit(getattr(self, method), *args, **kwargs)
+
+    def optimize_many(self, problems, return_exceptions=False):
+        """
+        Solves several optimization problems concurrently
+
+        Args:
+            problems (list): keyword arguments of ``optimization`` per problem,
+                e.g. ``{"jobs": ..., "vehicles": ..., "geometry": True}``
+            return_exceptions (bool): put a failed problem's exception in its slot instead of raising
+
+        Returns:
+            list: results in the order of the problems
+        """
+        futures = [self.submit("optimization", **problem) for problem in problems]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                results.append(error)
+        return results
+
+
+def api_key(key=None, base_url=None):
+    """The openrouteservice key to use: ``key``, else the ``ORS_API_KEY`` environment variable
+
+    Args:
+        key: explicit key, e.g. from the app secrets or the command line
+        base_url: self-hosted openrouteservice, which needs no key
+
+    Raises:
+        ValueError: no key is set and ``base_url`` is the public API
+    """
+    key = key or os.environ.get(API_KEY_VARIABLE)
+    if not key and not base_url:
+        raise ValueError(f"No openrouteservice API key, set the {API_KEY_VARIABLE} environment variable")
+    return key
+
+
+def get_routing_client(key=None, base_url=None, rate_per_minute=DEFAULT_RATE_PER_MINUTE):
+    """One client per process, key and url, shared by every session
+
+    Raises:
+        ValueError: there is no API key, see ``api_key``
+    """
+    return _routing_client(api_key(key, base_url), base_url, rate_per_minute)
+
+
+@functools.lru_cache(maxsize=None)
+def _routing_client(key, base_url, rate_per_minute):
+    return RoutingClient(key=key, base_url=base_url, rate_per_minute=rate_per_minute)
@@ -0,0 +1,194 @@
+"""Multi-day territory planning over a whole backlog of unvisited outlets.
+
+A city's backlog is split into one compact territory per canvasser
+(``clustering.partition``), every territory into one group per working day
+of about what a canvasser can visit in a day (``splitting.chunk_jobs``), and
+the canvassers x days routes are solved in parallel. Outlets a day route
+could not fit are moved to another day of the same canvasser with time left
+and those days are solved again; what still does not fit, and the outlets
+past the planning horizon, are left for the next period.
+"""
+import concurrent.futures
+import math
+
+import numpy as np
+import openrouteservice
+import pandas as pd
+
+from route_optimizer.clustering import merge_results, partition
+from route_optimizer.distance import AVERAGE_SPEED_KMH, DETOUR_FACTOR, haversine, nearest_neighbours
+from route_optimizer.routes import build_jobs, time_window
+from route_optimizer.splitting import chunk_jobs
+
+# canvassers work on Saturdays too
+DEFAULT_WEEKMASK = "Mon Tue Wed Thu Fri Sat"
+# neighbours averaged for the typical hop between two visits
+_HOP_NEIGHBOURS = 3
+
+
+def working_days(first_day, count, weekmask=DEFAULT_WEEKMASK):
+    """The first ``count`` working days from ``first_day`` on, as ``datetime.date``"""
+    return [day.date() for day in pd.bdate_range(first_day, periods=count, freq="C", weekmask=weekmask)]
+
+
+def day_capacity(latitude, longitude, service, window_seconds, detour_factor=DETOUR_FACTOR, speed_kmh=AVERAGE_SPEED_KMH):
+    """
+    Outlets a canvasser can visit in a working day
+
+    Args:
+        latitude, longitude: coordinates of the backlog
+        service (int): visit duration in seconds
+        window_seconds (int): length of the working day in seconds
+
+    Returns:
+        int: visits per day, from the visit duration and the typical hop between neighbouring outlets
+    """
+    hop = 0.0
+    if len(latitude) > 1:
+        _, distances = nearest_neighbours(np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float), _HOP_NEIGHBOURS)
+        hop = float(np.median(distances.mean(axis=1))) * detour_factor / (speed_kmh / 3.6)
+    return max(1, int(window_seconds // (service + hop)))
+
+
+def assign_days(coordinates, starts, days, capacity):
+    """
+    Canvasser and working day of every outlet
+
+    Args:
+        coordinates (list): [longitude, latitude] of every outlet
+        starts (list): [longitude, latitude] start point of every canvasser
+        days (int): number of working days
+        capacity (int): outlets per canvasser and day at most
+
+    Returns:
+        tuple: (canvasser, day) positions per outlet, -1 for the outlets past the horizon
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    canvasser = partition(coordinates, starts)
+    day = np.full(len(coordinates), -1, dtype=int)
+    for position, start in enumerate(starts):
+        members = np.flatnonzero(canvasser == position)
+        if not len(members):
+            continue
+        # the outlets closest to the start point first, the farthest wait for the next period
+        distance = haversine(coordinates[members, 1], coordinates[members, 0], start[1], start[0])
+        members = members[np.argsort(distance, kind="stable")][:days * capacity]
+        # the visits are spread evenly over the days, in visiting order from the start point
+        chunks = chunk_jobs([{"location": coordinates[member], "member": member} for member in members], start,
+                            max(1, math.ceil(len(members) / days)))
+        for number, chunk in enumerate(chunks):
+            day[[item["member"] for item in chunk]] = number
+    canvasser[day < 0] = -1
+    return canvasser, day
+
+
+def _problem(outlets, longitude, latitude, ids, start, window, service, vehicle_id):
+    jobs = build_jobs(outlets.loc[ids], longitude, latitude, service, window)
+    vehicles = [openrouteservice.optimization.Vehicle(id=vehicle_id, start=list(start), capacity=[len(jobs) + 2],
+                                                      time_window=list(window))]
+    return jobs, vehicles
+
+
+def _solve_all(optimize, problems, workers, processes, progress, done, total):
+    pool = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+    results = {}
+    executor = pool(max_workers=workers)
+    try:
+        futures = {executor.submit(optimize, jobs=jobs, vehicles=vehicles, geometry=True): key
+                   for key, (jobs, vehicles) in problems.items()}
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+            done += 1
+            if progress:
+                progress(done, total)
+    finally:
+        # a progress callback raising (e.g. a cancelled job) drops the day routes not started yet
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results, done
+
+
+def _route_end(route):
+    last = route["steps"][-1]
+    return last["arrival"] + last.get("service", 0) + last.get("waiting_time", 0)
+
+
+def plan_territory(optimize, outlets, longitude, latitude, starts, days, clock, service, capacity=None,
+                   workers=None, processes=True, progress=None):
+    """
+    Day routes of every canvasser over several working days
+
+    Args:
+        optimize (callable): ``optimize(jobs=..., vehicles=..., geometry=True)``, e.g.
+            ``SplitOptimizer(client.optimization)``; must be picklable when ``processes`` is True
+        outlets (pd.DataFrame): the backlog, its index is used as job id
+        longitude (str): longitude column
+        latitude (str): latitude column
+        starts (list): [longitude, latitude] start point of every canvasser
+        days (list): working days (``datetime.date``), see ``working_days``
+        clock (tuple): (hour, minute, hour_finish, minute_finish) of the working day
+        service (int): visit duration in seconds
+        capacity (int): outlets per canvasser and day, estimated with ``day_capacity`` when None
+        workers (int): pool size, the number of CPUs by default
+        processes (bool): use a process pool (CPU-bound local solving) instead of threads
+        progress (callable): ``progress(done, total)`` after every solved day route
+
+    Returns:
+        dict: openrouteservice-shaped result with one route per canvasser and day;
+        every route also has ``canvasser`` (position), ``day`` (ISO date), ``name``
+        and ``layer`` (the day), and ``unscheduled`` lists the outlet ids past the
+        horizon or without valid coordinates
+    """
+    first_window = time_window(*clock, day=pd.Timestamp(days[0]).to_pydatetime())
+    coordinates = np.column_stack([pd.to_numeric(outlets[column], errors="coerce").to_numpy(dtype=float)
+                                   for column in (longitude, latitude)])
+    # outlets without valid coordinates cannot be routed, they stay unscheduled
+    valid = np.flatnonzero(np.isfinite(coordinates).all(axis=1))
+    if capacity is None:
+        capacity = day_capacity(coordinates[valid, 1], coordinates[valid, 0], service, first_window[1] - first_window[0])
+    canvasser = np.full(len(outlets), -1, dtype=int)
+    day = np.full(len(outlets), -1, dtype=int)
+    canvasser[valid], day[valid] = assign_days(coordinates[valid], starts, len(days), capacity)
+
+    windows = [time_window(*clock, day=pd.Timestamp(date).to_pydatetime()) for date in days]
+    ids = {}
+    for position in np.flatnonzero(day >= 0):
+        ids.setdefault((int(canvasser[position]), int(day[position])), []).append(outlets.index[position])
+
+    def problem(key):
+        number, date = key
+        # one vehicle id per canvasser and day, so the routes stay apart in the result tables
+        return _problem(outlets, longitude, latitude, ids[key], starts[number], windows[date], service,
+                        date * len(starts) + number)
+
+    problems = {key: problem(key) for key in sorted(ids)}
+    results, done = _solve_all(optimize, problems, workers, processes, progress, 0, len(problems))
+
+    # repair round: unassigned outlets go to the day of the same canvasser with the most time left
+    slack = {key: windows[key[1]][1] - (_route_end(result["routes"][0]) if result.get("routes") else windows[key[1]][0])
+             for key, result in results.items()}
+    moved = set()
+    for key in sorted(results):
+        for job in results[key].get("unassigned", []):
+            others = [other for other in slack if other[0] == key[0] and other != key and slack[other] >= service]
+            if not others:
+                continue
+            target = max(others, key=lambda other: slack[other])
+            slack[target] -= service
+            ids[key].remove(job["id"])
+            ids[target].append(job["id"])
+            moved.update((key, target))
+    if moved:
+        retry = {key: problem(key) for key in sorted(moved) if ids[key]}
+        retried, _ = _solve_all(optimize, retry, workers, processes, progress, done, done + len(retry))
+        results.update(retried)
+        for key in moved - set(retry):
+            results.pop(key, None)
+
+    for (number, date), result in results.items():
+        for route in result.get("routes", []):
+            label = pd.Timestamp(days[date]).strftime("%a %d %b")
+            route.update({"canvasser": number, "day": days[date].isoformat(), "layer": label,
+                          "name": f"{label} Canvasser {number + 1}"})
+    merged = merge_results([results[key] for key in sorted(results, key=lambda key: (key[1], key[0]))])
+    merged["unscheduled"] = outlets.index[day < 0].tolist()
+    return merged
@@ -0,0 +1,118 @@
+"""Hierarchical region index behind the province → city → district → outlet selection.
+
+The sidebar options and the selected outlets used to be recomputed with
+chained ``isin`` masks over the whole dataframe on every rerun. ``RegionIndex``
+groups the row positions of a dataset once, level by level (e.g. province,
+then city, then district), so an option list or a selection only walks the
+selected branches of the tree and touches the rows below them.
+"""
+import numpy as np
+import pandas as pd
+
+# key of the rows without a value at some level (NaN is not a usable dict key)
+_MISSING = object()
+
+
+def _key(value):
+    return _MISSING if pd.isna(value) else value
+
+
+class _Node:
+    __slots__ = ("positions", "children")
+
+    def __init__(self, positions):
+        # row positions below this node, ascending
+        self.positions = positions
+        # child key -> _Node, in order of first appearance
+        self.children = {}
+
+
+class RegionIndex:
+    """
+    Row positions of a dataset grouped by nested region columns
+
+    Lists of selected values are given per level from the top, e.g.
+    ``[provinces, cities]`` for the districts of those cities; an empty list
+    selects nothing, like an empty multiselect.
+
+    Args:
+        df (pd.DataFrame): the cleaned dataset
+        levels (list): region columns from the widest to the narrowest
+    """
+
+    def __init__(self, df, levels):
+        self.frame = df
+        self.levels = list(levels)
+        codes = []
+        uniques = []
+        for column in self.levels:
+            level_codes, level_uniques = pd.factorize(df[column], use_na_sentinel=False)
+            codes.append(level_codes)
+            uniques.append(list(level_uniques))
+        self.root = _Node(np.arange(len(df)))
+        self._split(self.root, 0, codes, uniques)
+
+    def _split(self, node, level, codes, uniques):
+        if level == len(self.levels):
+            return
+        node_codes = codes[level][node.positions]
+        # stable sort keeps the positions of every group ascending
+        order = np.argsort(node_codes, kind="stable")
+        sorted_codes = node_codes[order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        groups = np.split(node.positions[order], bounds)
+        group_codes = sorted_codes[np.concatenate(([0], bounds))] if len(sorted_codes) else []
+        # children in order of first appearance, like Series.unique()
+        for group, code in sorted(zip(groups, group_codes), key=lambda item: item[0][0]):
+            child = _Node(group)
+            node.children[_key(uniques[level][code])] = child
+            self._split(child, level + 1, codes, uniques)
+
+    def _nodes(self, selections):
+        nodes = [self.root]
+        for selected in selections:
+            keys = list(dict.fromkeys(_key(value) for value in selected))
+            nodes = [node.children[key] for node in nodes for key in keys if key in node.children]
+        return nodes
+
+    def options(self, selections=()):
+        """
+        Values of the next level under the selected branches
+
+        Args:
+            selections (list): selected values of the levels above
+
+        Returns:
+            list: values in order of first appearance in the dataset
+        """
+        # a value may sit under several selected parents, it is listed at its first row
+        first = {}
+        for node in self._nodes(selections):
+            for key, child in node.children.items():
+                first[key] = min(first.get(key, child.positions[0]), child.positions[0])
+        return [np.nan if key is _MISSING else key for key in sorted(first, key=first.get)]
+
+    def positions(self, selections):
+        """Ascending row positions of the rows under the selected branches"""
+        nodes = self._nodes(selections)
+        if not nodes:
+            return np.zeros(0, dtype=np.intp)
+        if len(nodes) == 1:
+            return nodes[0].positions
+        return np.sort(np.concatenate([node.positions for node in nodes]))
+
+    def values(self, column, selections):
+        """Distinct values of another column (e.g. outlet names) under the selected branches"""
+        return pd.unique(self.frame[column].to_numpy()[self.positions(selections)]).tolist()
+
+    def select(self, selections, column=None, values=None):
+        """
+        Row positions under the selected branches, optionally narrowed to ``column`` in ``values``
+
+        Returns:
+            np.ndarray: ascending positions, for ``df.iloc``
+        """
+        positions = self.positions(selections)
+        if column is None:
+            return positions
+        return positions[pd.Series(self.frame[column].to_numpy()[positions]).isin(values).to_numpy()]
@@ -0,0 +1,182 @@
+"""Optimization payloads and result tables shared by the pages and the batch CLI."""
+import datetime
+import io
+
+import openrouteservice
+import pandas as pd
+
+
+def time_window(hour, minute, hour_finish, minute_finish, day=None):
+    """Unix timestamps of the start and end of a working day, today by default"""
+    day = day or datetime.datetime.today()
+    return [int(day.replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()),
+            int(day.replace(hour=hour_finish, minute=minute_finish, second=0, microsecond=0).timestamp())]
+
+
+def parse_start_points(text):
+    """
+    Start points typed one per line as "latitude, longitude"
+
+    Returns:
+        list: [longitude, latitude] pairs, lines that cannot be parsed are skipped
+    """
+    starts = []
+    for line in text.splitlines():
+        parts = [part.strip() for part in line.replace(";", ",").split(",")]
+        try:
+            latitude, longitude = float(parts[0]), float(parts[1])
+        except (ValueError, IndexError):
+            continue
+        starts.append([longitude, latitude])
+    return starts
+
+
+def build_vehicles(starts, window, capacity):
+    """
+    One openrouteservice Vehicle per canvasser
+
+    Args:
+        starts (list): [longitude, latitude] start point of every canvasser
+        window (list): [start, end] unix timestamps of the working day
+        capacity (int): number of outlets a canvasser may visit
+
+    Returns:
+        list: openrouteservice.optimization.Vehicle objects
+    """
+    # https://openrouteservice-py.readthedocs.io/en/latest/openrouteservice.html#openrouteservice.optimization.Vehicle
+    return [
+        openrouteservice.optimization.Vehicle(id=idx, start=list(start), capacity=[capacity], time_window=list(window))
+        for idx, start in enumerate(starts)
+    ]
+
+
+def build_jobs(df, longitude, latitude, service, window):
+    """
+    One openrouteservice Job per outlet, the dataframe index is used as job id
+
+    Args:
+        df (pd.DataFrame): selected outlets
+        longitude (str): longitude column
+        latitude (str): latitude column
+        service (int): visit duration in seconds
+        window (list): [open, close] unix timestamps
+
+    Returns:
+        list: openrouteservice.optimization.Job objects
+    """
+    # https://openrouteservice-py.readthedocs.io/en/latest/openrouteservice.html#openrouteservice.optimization.Job
+    amounts = df["needed_amount"] if "needed_amount" in df else pd.Series(1, index=df.index)
+    return [
+        openrouteservice.optimization.Job(
+            id=idx,
+            location=[float(lon), float(lat)],
+            service=service,
+            amount=[int(amount)],
+            time_windows=[list(window)]
+        )
+        for idx, lon, lat, amount in zip(df.index, df[longitude], df[latitude], amounts)
+    ]
+
+
+def stations_dataframe(route):
+    """
+    Steps of one optimized route as the "df_stations" table of the pages
+
+    Args:
+        route (dict): one element of ``result['routes']``
+
+    Returns:
+        pd.DataFrame: one row per step with arrival/departure times and distances to the previous step
+    """
+    # create list of extracted result
+    stations = list()
+    for step in route["steps"]:
+        stations.append([
+            step.get("job", "Center/Start"),  # Station ID
+            step["arrival"],  # Arrival time
+            step["arrival"] + step.get("service", 0),  # Departure time
+            step["location"],
+            step["distance"],
+            step["duration"]
+        ])
+
+    # create dataframe
+    df_stations = pd.DataFrame(stations, columns=["Station ID", "Arrival", "Departure", "Location", "Distance", "Duration"])
+    df_stations['Arrival'] = pd.to_datetime(df_stations['Arrival'], unit='s')
+    df_stations['Departure'] = pd.to_datetime(df_stations['Departure'], unit='s')
+    df_stations["Distance to Previous"] = df_stations["Distance"] - df_stations["Distance"].shift(periods=1, fill_value=0)
+    df_stations["Duration to Previous"] = df_stations["Duration"] - df_stations["Duration"].shift(periods=1, fill_value=0)
+    df_stations["Vehicle"] = route["vehicle"]
+    return df_stations
+
+
+def all_stations_dataframe(result):
+    """Steps of every route of a result, the index restarts at 0 for each route (no rows without routes)"""
+    if not result.get("routes"):
+        return stations_dataframe({"steps": [], "vehicle": None})
+    return pd.concat([stations_dataframe(route) for route in result["routes"]])
+
+
+def merge_outlets(df_stations, outlets, columns):
+    """
+    Joins outlet details onto the route steps by job id (the outlet index)
+
+    Returns:
+        pd.DataFrame: outer merge with lower-cased, underscored column names
+    """
+    df_merged = pd.merge(
+        df_stations,
+        outlets.loc[:, columns],
+        how="outer",
+        left_on="Station ID",
+        right_index=True
+    )
+    # keep the visiting order, the merge groups the "Center/Start" steps of all routes together
+    df_merged = df_merged.rename_axis("step").sort_values(["Vehicle", "step"], kind="stable", na_position="last").rename_axis(None)
+    # rename columns' name
+    df_merged.columns = df_merged.columns.str.lower().str.replace(" ", "_")
+    return df_merged
+
+
+def downloadable_dataframe(df_merged_clean, columns):
+    """
+    The "Downloadable Data" table: selected columns, minutes and kilometres
+
+    Args:
+        df_merged_clean (pd.DataFrame): merged steps with a valid duration
+        columns (list): columns to keep, ``google_maps_url`` is built from ``google_maps``
+
+    Returns:
+        pd.DataFrame: table shown as HTML and written to Excel
+    """
+    df_merged_clean = df_merged_clean.copy()
+    # add url link to columns
+    df_merged_clean["google_maps_url"] = df_merged_clean["google_maps"].apply(lambda x: f'<a href="{x}">{x}</a>')
+
+    # slicing the important columns
+    df_merged_clean_linked = df_merged_clean.loc[:, columns].copy()
+
+    # change unit in duration
+    df_merged_clean_linked['duration_to_previous'] = df_merged_clean_linked['duration_to_previous']/60
+    df_merged_clean_linked['duration_to_previous'] = df_merged_clean_linked['duration_to_previous'].round(2)
+
+    # change unit in distance
+    df_merged_clean_linked['distance_to_previous'] = df_merged_clean_linked['distance_to_previous']/1000
+    df_merged_clean_linked['distance_to_previous'] = df_merged_clean_linked['distance_to_previous'].round(2)
+
+    # rename columns
+    df_merged_clean_linked = df_merged_clean_linked.rename(columns={
+        "duration_to_previous": "duration_to_previous_in_minutes",
+        "distance_to_previous": "distance_to_previous_in_km",
+    })
+    return df_merged_clean_linked
+
+
+def excel_bytes(df):
+    """Single worksheet Excel file of a dataframe, as an in-memory buffer"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        # Write excel with single worksheet
+        df.to_excel(writer, index=False)
+    buffer.seek(0)
+    return buffer
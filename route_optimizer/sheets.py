@@ -0,0 +1,261 @@
+"""Local copies of the published Google Sheets, refreshed in the background.
+
+Every sheet is kept as a CSV file under ``.cache/sheets`` together with the
+ETag/Last-Modified validators of the last download. A refresh is a conditional
+request, so an unchanged sheet costs a 304 and nothing is parsed. When the
+sheet did change, only the rows whose text changed are parsed again; all other
+rows are reused from the previous dataframe. Refreshes run on a background
+thread, so page reruns always read the local copy without waiting.
+"""
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SHEETS_DIR = os.path.join(".cache", "sheets")
+# seconds between two background refreshes
+DEFAULT_REFRESH_INTERVAL = 300
+DEFAULT_TIMEOUT = 30
+
+logger = logging.getLogger(__name__)
+
+
+def split_records(text):
+    """
+    Header line and data lines of a CSV text
+
+    Returns:
+        tuple: (header, records), or None when a quoted field spans several lines
+            and the file can only be parsed as a whole
+    """
+    lines = text.splitlines()
+    if not lines or any(line.count('"') % 2 for line in lines):
+        return None
+    return lines[0], [line for line in lines[1:] if line.strip()]
+
+
+def parse_incremental(text, previous=None):
+    """
+    Parses a CSV text, reusing the rows of a previous parse whose line is unchanged
+
+    Args:
+        text (str): the whole CSV file
+        previous (tuple): ``(df, header, positions)`` returned by the previous call
+
+    Returns:
+        tuple: (df, header, positions, parsed) where ``positions`` maps every record
+            to its row and ``parsed`` is the number of rows that had to be parsed
+    """
+    split = split_records(text)
+    if split is None:
+        df = pd.read_csv(io.StringIO(text))
+        return df, None, {}, len(df)
+    header, records = split
+
+    if previous is None or previous[1] != header:
+        df = pd.read_csv(io.StringIO(text))
+        if len(df) != len(records):
+            # lines pandas reads differently (e.g. comment lines), not safe to reuse rows
+            return df, None, {}, len(df)
+        return df, header, {record: position for position, record in enumerate(records)}, len(df)
+
+    previous_df, _, previous_positions = previous
+    source = np.fromiter((previous_positions.get(record, -1) for record in records), dtype=np.int64, count=len(records))
+    reused = source >= 0
+    new_records = [record for record, position in zip(records, source) if position < 0]
+
+    parts = [previous_df.iloc[source[reused]]]
+    if new_records:
+        parts.append(pd.read_csv(io.StringIO("\n".join([header] + new_records)), names=previous_df.columns, header=0))
+    df = pd.concat(parts, ignore_index=True)
+    # back into the order of the sheet, reused rows first in the concat
+    df.index = np.concatenate((np.flatnonzero(reused), np.flatnonzero(~reused)))
+    df = df.sort_index()
+    return df, header, {record: position for position, record in enumerate(records)}, len(new_records)
+
+
+class SheetSource:
+    """
+    A published sheet (any CSV url) mirrored to a local file
+
+    Args:
+        url (str): csv export url of the sheet
+        cache_dir (str): where the local copy and its validators are kept
+        timeout (float): seconds before a download is given up
+    """
+
+    def __init__(self, url, cache_dir=DEFAULT_SHEETS_DIR, timeout=DEFAULT_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        base = os.path.join(cache_dir, hashlib.sha1(url.encode()).hexdigest()[:16])
+        self.data_path = base + ".csv"
+        self.meta_path = base + ".json"
+        self.version = None
+        self.parsed_rows = 0
+        self.last_error = None
+        self._parse = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, self.meta_path)
+
+    def _write(self, content, meta):
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        # content first, the validators must never describe a file that is not there yet
+        tmp_path = self.data_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        os.replace(tmp_path, self.data_path)
+        self._write_meta(meta)
+
+    def fetch(self):
+        """
+        Downloads the sheet unless the server says the local copy is current
+
+        Returns:
+            bool: whether the local copy changed
+        """
+        meta = self._read_meta()
+        headers = {}
+        if os.path.exists(self.data_path):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url, headers=headers), timeout=self.timeout) as response:
+                content = response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as error:
+            if error.code != 304:
+                raise
+            meta["checked_at"] = time.time()
+            self._write_meta(meta)
+            return False
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        changed = sha256 != meta.get("sha256")
+        self._write(content, {
+            "url": self.url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256,
+            "fetched_at": time.time() if changed else meta.get("fetched_at", time.time()),
+            "checked_at": time.time(),
+        })
+        return changed
+
+    def _load(self):
+        # (re)parse the local copy if it is newer than the parsed dataframe
+        if self._parse is not None and self._read_meta().get("sha256") == self.version:
+            return
+        with open(self.data_path, "rb") as file:
+            content = file.read()
+        df, header, positions, parsed = parse_incremental(content.decode("utf-8-sig"), self._parse)
+        self._parse = (df, header, positions)
+        self.parsed_rows = parsed
+        self.version = hashlib.sha256(content).hexdigest()
+
+    def refresh(self):
+        """
+        Fetches and parses the sheet, keeping the previous data when the download fails
+
+        Returns:
+            bool: whether the data changed
+        """
+        try:
+            changed = self.fetch()
+        except (OSError, ValueError) as error:
+            # urllib errors are OSErrors, the stale copy stays in use
+            self.last_error = f"{type(error).__name__}: {error}"
+            logger.warning("refreshing %s failed: %s", self.url, self.last_error)
+            return False
+        self.last_error = None
+        if changed or self._parse is None:
+            with self._lock:
+                self._load()
+        return changed
+
+    def load(self):
+        """
+        Parses the local copy if it changed, downloading it first only if there is none yet
+
+        Returns:
+            str: version (content hash) of the parsed sheet
+        """
+        if not os.path.exists(self.data_path):
+            self.fetch()
+        with self._lock:
+            self._load()
+            return self.version
+
+    def dataframe(self):
+        """
+        The latest parsed sheet
+
+        Returns:
+            pd.DataFrame: a copy the caller may modify
+        """
+        self.load()
+        with self._lock:
+            return self._parse[0].copy()
+
+    def status(self):
+        """Validators and timings of the local copy, for display"""
+        meta = self._read_meta()
+        return {
+            "url": self.url,
+            "version": self.version,
+            "fetched_at": meta.get("fetched_at"),
+            "checked_at": meta.get("checked_at"),
+            "parsed_rows": self.parsed_rows,
+            "rows": 0 if self._parse is None else len(self._parse[0]),
+            "last_error": self.last_error,
+        }
+
+    def start(self, interval=DEFAULT_REFRESH_INTERVAL):
+        """Refreshes the sheet every ``interval`` seconds on a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._thread = threading.Thread(target=run, name=f"sheet-refresh-{os.path.basename(self.data_path)}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+@functools.lru_cache(maxsize=None)
+def get_sheet_source(url, interval=DEFAULT_REFRESH_INTERVAL, cache_dir=DEFAULT_SHEETS_DIR):
+    """One source per process and url, shared by every session and refreshed in the background"""
+    source = SheetSource(url, cache_dir=cache_dir)
+    source.start(interval)
+    return source
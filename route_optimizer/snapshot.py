@@ -0,0 +1,178 @@
+"""Columnar Parquet snapshots of the cleaned outlet datasets.
+
+Parsing the Excel/CSV sources and extracting coordinates is the dominant cold
+start cost, so the cleaned dataframe is written once to Parquet next to a small
+metadata file. Later loads read the snapshot (memory mapped, optionally only a
+few columns) until the source file changes.
+
+Build the snapshots ahead of time with:
+
+    python -m route_optimizer.snapshot leads customers
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+from route_optimizer.datasets import DATASETS
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+# bump when the cleaning done by the loaders changes, old snapshots are then rebuilt
+SNAPSHOT_VERSION = 6
+
+
+def _is_url(source):
+    return str(source).startswith(("http://", "https://"))
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_paths(name, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Parquet file and metadata file of a dataset snapshot"""
+    base = os.path.join(snapshot_dir, name)
+    return base + ".parquet", base + ".json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(name, source, loader, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """
+    Whether the snapshot still matches its source file
+
+    Size and mtime are checked first; when only the mtime changed the content
+    hash decides, so touching a file does not force a rebuild.
+    """
+    data_path, meta_path = snapshot_paths(name, snapshot_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or not os.path.exists(data_path):
+        return False
+    if meta.get("version") != SNAPSHOT_VERSION or meta.get("loader") != loader.__name__:
+        return False
+    if meta.get("source") != os.path.abspath(source):
+        return False
+    stat = os.stat(source)
+    if stat.st_size != meta.get("size"):
+        return False
+    if stat.st_mtime_ns == meta.get("mtime_ns"):
+        return True
+    if _file_hash(source) != meta.get("sha256"):
+        return False
+    # same content, remember the new mtime so the hash is not computed again
+    meta["mtime_ns"] = stat.st_mtime_ns
+    _write_meta(meta_path, meta)
+    return True
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, meta_path)
+
+
+def _arrow_friendly(df):
+    # object columns holding mixed python types cannot be stored as one arrow type
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object and infer_dtype(df[column], skipna=True) not in ("string", "empty", "bytes"):
+            df[column] = df[column].where(df[column].isnull(), df[column].astype(str))
+    return df
+
+
+def write_snapshot(name, source, loader, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """
+    Runs the loader on the source and stores the cleaned dataframe as Parquet
+
+    Returns:
+        pd.DataFrame: the freshly loaded dataframe
+    """
+    df = loader(source)
+    data_path, meta_path = snapshot_paths(name, snapshot_dir)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    stat = os.stat(source)
+
+    # write to a temporary file first, so readers never see half a snapshot
+    tmp_path = data_path + ".tmp"
+    _arrow_friendly(df).to_parquet(tmp_path, engine="pyarrow", index=True)
+    os.replace(tmp_path, data_path)
+    _write_meta(meta_path, {
+        "version": SNAPSHOT_VERSION,
+        "loader": loader.__name__,
+        "source": os.path.abspath(source),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _file_hash(source),
+        "rows": len(df),
+    })
+    return df
+
+
+def load_snapshot(name, source, loader, columns=None, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """
+    Loads a dataset from its snapshot, rebuilding the snapshot when the source changed
+
+    Remote sources (URLs) have no mtime to check and are always loaded directly.
+
+    Args:
+        name (str): snapshot name, e.g. the dataset name
+        source (str): source file the loader reads
+        loader (callable): ``loader(source)`` returning the cleaned dataframe
+        columns (list): only read these columns (the index is always kept)
+        snapshot_dir (str): where snapshots are kept
+
+    Returns:
+        pd.DataFrame: cleaned dataframe
+    """
+    if _is_url(source):
+        df = loader(source)
+        return df if columns is None else df.loc[:, columns]
+
+    data_path, _ = snapshot_paths(name, snapshot_dir)
+    if is_fresh(name, source, loader, snapshot_dir):
+        return pd.read_parquet(data_path, engine="pyarrow", columns=columns, memory_map=True)
+    df = write_snapshot(name, source, loader, snapshot_dir)
+    return df if columns is None else df.loc[:, columns]
+
+
+def load_dataset_snapshot(name, path=None, columns=None, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Snapshot-backed version of ``route_optimizer.datasets.load_dataset``"""
+    config = DATASETS[name]
+    return load_snapshot(name, path or config["path"], config["loader"], columns=columns, snapshot_dir=snapshot_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datasets", nargs="+", choices=sorted(DATASETS))
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the snapshot is fresh")
+    args = parser.parse_args(argv)
+
+    for name in args.datasets:
+        config = DATASETS[name]
+        if _is_url(config["path"]):
+            print(f"{name}: remote source, nothing to snapshot")
+            continue
+        if not args.force and is_fresh(name, config["path"], config["loader"], args.snapshot_dir):
+            print(f"{name}: snapshot is up to date")
+            continue
+        df = write_snapshot(name, config["path"], config["loader"], args.snapshot_dir)
+        print(f"{name}: {len(df)} rows -> {snapshot_paths(name, args.snapshot_dir)[0]}")
+
+
+if __name__ == "__main__":
+    main()
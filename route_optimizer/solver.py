@@ -0,0 +1,514 @@
+"""Local vehicle routing solver.
+
+Offline alternative to ``ors_client.optimization``: it takes the same
+``openrouteservice.optimization.Vehicle`` / ``Job`` objects built by the pages
+and returns a dict shaped like the openrouteservice (VROOM) response, so the
+existing result parsing and map code can be reused as is.
+"""
+import time
+
+import numpy as np
+
+from route_optimizer.distance import travel_matrices
+
+# default search budget in seconds
+DEFAULT_TIME_LIMIT = 2.0
+
+# or-opt moves segments of up to this many consecutive stops
+OR_OPT_MAX_SEGMENT = 3
+# the progress callback is called at most this often, the search loops check it all the time
+REPORT_SECONDS = 0.1
+
+_EPS = 1e-6
+
+
+def attr(obj, name, default=None):
+    """
+    Field of an ``openrouteservice.optimization.Job`` / ``Vehicle`` or of its plain dict payload
+    """
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encodes [longitude, latitude] pairs with the Google polyline algorithm
+
+    The output can be read back with ``openrouteservice.convert.decode_polyline``.
+    """
+    factor = 10 ** precision
+    output = []
+    prev_lat = prev_lng = 0
+    for lng, lat in coordinates:
+        lat_i = int(round(lat * factor))
+        lng_i = int(round(lng * factor))
+        for value in (lat_i - prev_lat, lng_i - prev_lng):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        prev_lat, prev_lng = lat_i, lng_i
+    return "".join(output)
+
+
+class _Problem:
+    """Flat numpy view of the jobs/vehicles payload"""
+
+    def __init__(self, jobs, vehicles, matrix=None, distances=None):
+        self.jobs = list(jobs)
+        self.vehicles = list(vehicles)
+        n_jobs = len(self.jobs)
+        n_vehicles = len(self.vehicles)
+
+        if matrix is not None:
+            durations = np.asarray(matrix, dtype=float)
+            distances = np.zeros_like(durations) if distances is None else np.asarray(distances, dtype=float)
+            locations = None
+            job_index = [attr(job, "location_index") for job in self.jobs]
+            start_index = [attr(vehicle, "start_index") for vehicle in self.vehicles]
+            end_index = [attr(vehicle, "end_index") for vehicle in self.vehicles]
+        else:
+            locations = []
+
+            def add(location):
+                if location is None:
+                    return None
+                locations.append([float(location[0]), float(location[1])])
+                return len(locations) - 1
+
+            job_index = [add(attr(job, "location")) for job in self.jobs]
+            start_index = [add(attr(vehicle, "start")) for vehicle in self.vehicles]
+            end_index = [add(attr(vehicle, "end")) for vehicle in self.vehicles]
+            durations, distances = travel_matrices(locations) if locations else (np.zeros((0, 0)), np.zeros((0, 0)))
+
+        if any(idx is None for idx in job_index):
+            raise ValueError("Every job needs a location (or a location_index with a custom matrix)")
+
+        # an extra "free" node with zero cost stands in for a missing start or end,
+        # so open routes do not need special cases anywhere in the search
+        size = len(durations)
+        self.free = size
+        self.durations = np.zeros((size + 1, size + 1))
+        self.durations[:size, :size] = durations
+        self.distances = np.zeros((size + 1, size + 1))
+        self.distances[:size, :size] = distances
+        self.locations = locations
+
+        self.job_node = np.asarray(job_index, dtype=int)
+        self.start_node = np.asarray([self.free if idx is None else idx for idx in start_index], dtype=int)
+        self.end_node = np.asarray([self.free if idx is None else idx for idx in end_index], dtype=int)
+
+        self.service = np.asarray([attr(job, "service") or 0 for job in self.jobs], dtype=float)
+        self.open = np.zeros(n_jobs)
+        self.close = np.full(n_jobs, np.inf)
+        for j, job in enumerate(self.jobs):
+            windows = attr(job, "time_windows")
+            if windows:
+                # only the first time window of a job is honoured
+                self.open[j], self.close[j] = windows[0]
+
+        self.tw_start = np.zeros(n_vehicles)
+        self.tw_end = np.full(n_vehicles, np.inf)
+        for v, vehicle in enumerate(self.vehicles):
+            window = attr(vehicle, "time_window")
+            if window:
+                self.tw_start[v], self.tw_end[v] = window
+
+        dims = max([len(attr(job, "amount") or []) for job in self.jobs]
+                   + [len(attr(vehicle, "capacity") or []) for vehicle in self.vehicles] + [0])
+        self.amount = np.zeros((n_jobs, dims))
+        for j, job in enumerate(self.jobs):
+            amount = attr(job, "amount") or []
+            self.amount[j, :len(amount)] = amount
+        self.capacity = np.full((n_vehicles, dims), np.inf)
+        for v, vehicle in enumerate(self.vehicles):
+            capacity = attr(vehicle, "capacity")
+            if capacity:
+                self.capacity[v, :len(capacity)] = capacity
+
+    def route_cost(self, v, seq):
+        nodes = np.concatenate(([self.start_node[v]], self.job_node[seq], [self.end_node[v]])).astype(int)
+        return float(self.durations[nodes[:-1], nodes[1:]].sum())
+
+    def feasible(self, v, seq):
+        if len(seq) and np.any(self.amount[seq].sum(axis=0) > self.capacity[v] + _EPS):
+            return False
+        t = self.tw_start[v]
+        prev = self.start_node[v]
+        for j in seq:
+            node = self.job_node[j]
+            t = max(t + self.durations[prev, node], self.open[j])
+            if t > self.close[j] + _EPS:
+                return False
+            t += self.service[j]
+            prev = node
+        return t + self.durations[prev, self.end_node[v]] <= self.tw_end[v] + _EPS
+
+    def insertion_table(self, v, seq):
+        """Vectorised cost and feasibility of inserting every job at every position of a route"""
+        seq = np.asarray(seq, dtype=int)
+        nodes = self.job_node[seq]
+        prev_nodes = np.concatenate(([self.start_node[v]], nodes))
+        next_nodes = np.concatenate((nodes, [self.end_node[v]]))
+
+        # departure time from each stop and latest allowed arrival at each following stop
+        depart = np.empty(len(seq) + 1)
+        depart[0] = self.tw_start[v]
+        t = self.tw_start[v]
+        for k, j in enumerate(seq):
+            t = max(t + self.durations[prev_nodes[k], nodes[k]], self.open[j]) + self.service[j]
+            depart[k + 1] = t
+        latest = np.empty(len(seq) + 1)
+        latest[-1] = self.tw_end[v]
+        for k in range(len(seq) - 1, -1, -1):
+            j = seq[k]
+            latest[k] = min(self.close[j], latest[k + 1] - self.service[j] - self.durations[nodes[k], next_nodes[k + 1]])
+
+        job_nodes = self.job_node
+        to_job = self.durations[prev_nodes][:, job_nodes]
+        from_job = self.durations[job_nodes][:, next_nodes].T
+        delta = to_job + from_job - self.durations[prev_nodes, next_nodes][:, None]
+
+        start = np.maximum(depart[:, None] + to_job, self.open[None, :])
+        ok = (start <= self.close[None, :] + _EPS) & (start + self.service[None, :] + from_job <= latest[:, None] + _EPS)
+        load = self.amount[seq].sum(axis=0) if len(seq) else np.zeros(self.amount.shape[1])
+        ok &= np.all(load[None, :] + self.amount <= self.capacity[v][None, :] + _EPS, axis=1)[None, :]
+        return np.where(ok, delta, np.inf)
+
+
+class LocalSolver:
+    """
+    Cheapest insertion construction followed by 2-opt and Or-opt local search
+
+    Args:
+        time_limit (float): search budget in seconds, construction always completes
+        progress (callable): ``progress(done, total, message)`` while solving, e.g. ``Job.report``;
+            an exception it raises (a cancelled job) stops the solve
+    """
+
+    def __init__(self, time_limit=DEFAULT_TIME_LIMIT, progress=None):
+        self.time_limit = time_limit
+        self.progress = progress
+        self._reported = -np.inf
+
+    def _report(self, done, total, message):
+        if self.progress is None:
+            return
+        now = time.perf_counter()
+        if now - self._reported >= REPORT_SECONDS:
+            self._reported = now
+            self.progress(done, total, message)
+
+    def _searching(self, deadline):
+        # progress of the improvement loop is the share of its time budget used
+        if self.time_limit > 0:
+            self._report(min(self.time_limit, self.time_limit - (deadline - time.perf_counter())), self.time_limit,
+                         "improving the routes")
+
+    def solve(self, jobs, vehicles, matrix=None, distances=None, geometry=False, routes=None):
+        """
+        Solves the problem and returns a dict shaped like the openrouteservice response
+
+        Args:
+            jobs (list): openrouteservice.optimization.Job objects (or their dicts)
+            vehicles (list): openrouteservice.optimization.Vehicle objects (or their dicts)
+            matrix (list): optional custom duration matrix indexed by location_index
+            distances (list): optional distance matrix matching ``matrix``
+            geometry (bool): add an encoded straight-line geometry to each route
+            routes (list): optional initial job positions per vehicle to start from
+
+        Returns:
+            dict: result with ``routes``, ``unassigned`` and ``summary``
+        """
+        started = time.perf_counter()
+        self._reported = -np.inf
+        self._report(0, 1, "building the routes")
+        problem = _Problem(jobs, vehicles, matrix=matrix, distances=distances)
+        loaded = time.perf_counter()
+        deadline = loaded + self.time_limit
+
+        if routes is None:
+            routes = [[] for _ in problem.vehicles]
+        else:
+            routes = [list(seq) for seq in routes]
+            # a warm start may no longer fit (e.g. a moved start point), its last stops are inserted again
+            for v, seq in enumerate(routes):
+                while seq and not problem.feasible(v, seq):
+                    seq.pop()
+        assigned = {j for seq in routes for j in seq}
+        unassigned = [j for j in range(len(problem.jobs)) if j not in assigned]
+
+        unassigned = self._insert(problem, routes, unassigned)
+        self._local_search(problem, routes, deadline)
+        if unassigned:
+            unassigned = self._insert(problem, routes, unassigned)
+
+        solved = time.perf_counter()
+        return _build_result(problem, routes, unassigned, geometry, {
+            "loading": int((loaded - started) * 1000),
+            "solving": int((solved - loaded) * 1000),
+        })
+
+    def _insert(self, problem, routes, unassigned):
+        # cheapest insertion: repeatedly place the job whose best feasible insertion is cheapest
+        if not unassigned:
+            return []
+        pending = np.zeros(len(problem.jobs), dtype=bool)
+        pending[unassigned] = True
+        best_cost = np.full((len(routes), len(problem.jobs)), np.inf)
+        best_pos = np.zeros((len(routes), len(problem.jobs)), dtype=int)
+
+        def refresh(v):
+            table = problem.insertion_table(v, routes[v])
+            best_pos[v] = np.argmin(table, axis=0)
+            best_cost[v] = table[best_pos[v], np.arange(table.shape[1])]
+
+        for v in range(len(routes)):
+            refresh(v)
+
+        while pending.any():
+            self._report(len(unassigned) - pending.sum(), len(unassigned), "building the routes")
+            costs = np.where(pending[None, :], best_cost, np.inf)
+            v, j = np.unravel_index(np.argmin(costs), costs.shape)
+            if not np.isfinite(costs[v, j]):
+                break
+            routes[v].insert(best_pos[v, j], int(j))
+            pending[j] = False
+            refresh(v)
+
+        return [int(j) for j in np.flatnonzero(pending)]
+
+    def _local_search(self, problem, routes, deadline):
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            self._searching(deadline)
+            improved = False
+            for v in range(len(routes)):
+                improved |= self._two_opt(problem, routes, v, deadline)
+            improved |= self._or_opt(problem, routes, deadline)
+
+    def _two_opt(self, problem, routes, v, deadline):
+        seq = routes[v]
+        improved = False
+        cost = problem.route_cost(v, seq)
+        d = problem.durations
+        i = 0
+        while i < len(seq) - 1:
+            if time.perf_counter() > deadline:
+                break
+            self._searching(deadline)
+            a = problem.start_node[v] if i == 0 else problem.job_node[seq[i - 1]]
+            b = problem.job_node[seq[i]]
+            moved = False
+            for k in range(i + 1, len(seq)):
+                c = problem.job_node[seq[k]]
+                e = problem.end_node[v] if k == len(seq) - 1 else problem.job_node[seq[k + 1]]
+                # symmetric estimate first, the exact cost is checked before accepting
+                if d[a, c] + d[b, e] - d[a, b] - d[c, e] >= -_EPS:
+                    continue
+                candidate = seq[:i] + seq[i:k + 1][::-1] + seq[k + 1:]
+                new_cost = problem.route_cost(v, candidate)
+                if new_cost < cost - _EPS and problem.feasible(v, candidate):
+                    seq[:] = candidate
+                    cost = new_cost
+                    improved = moved = True
+                    break
+            if not moved:
+                i += 1
+        return improved
+
+    def _or_opt(self, problem, routes, deadline):
+        d = problem.durations
+        improved = False
+        for v in range(len(routes)):
+            for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+                i = 0
+                while i + length <= len(routes[v]):
+                    if time.perf_counter() > deadline:
+                        return improved
+                    self._searching(deadline)
+                    seq = routes[v]
+                    segment = seq[i:i + length]
+                    rest = seq[:i] + seq[i + length:]
+                    a = problem.start_node[v] if i == 0 else problem.job_node[seq[i - 1]]
+                    b = problem.end_node[v] if i + length == len(seq) else problem.job_node[seq[i + length]]
+                    first, last = problem.job_node[segment[0]], problem.job_node[segment[-1]]
+                    gain = d[a, first] + d[last, b] - d[a, b]
+                    if self._relocate(problem, routes, v, i, segment, rest, gain, first, last):
+                        improved = True
+                    else:
+                        i += 1
+        return improved
+
+    def _relocate(self, problem, routes, v, i, segment, rest, gain, first, last):
+        # try every position in every route, cheapest first, and keep the first feasible improvement
+        d = problem.durations
+        candidates = []
+        for w in range(len(routes)):
+            base = rest if w == v else routes[w]
+            nodes = problem.job_node[np.asarray(base, dtype=int)]
+            prev_nodes = np.concatenate(([problem.start_node[w]], nodes))
+            next_nodes = np.concatenate((nodes, [problem.end_node[w]]))
+            delta = d[prev_nodes, first] + d[last, next_nodes] - d[prev_nodes, next_nodes]
+            for pos in np.flatnonzero(delta < gain - _EPS):
+                if w == v and pos == i:
+                    continue
+                candidates.append((delta[pos], w, int(pos)))
+        candidates.sort()
+
+        for _, w, pos in candidates:
+            base = rest if w == v else routes[w]
+            candidate = base[:pos] + segment + base[pos:]
+            if w == v:
+                old_cost = problem.route_cost(v, routes[v])
+                new_cost = problem.route_cost(v, candidate)
+            else:
+                old_cost = problem.route_cost(v, routes[v]) + problem.route_cost(w, routes[w])
+                new_cost = problem.route_cost(v, rest) + problem.route_cost(w, candidate)
+            if new_cost >= old_cost - _EPS:
+                continue
+            if not problem.feasible(w, candidate):
+                continue
+            if w != v and not problem.feasible(v, rest):
+                continue
+            if w == v:
+                routes[v] = candidate
+            else:
+                routes[v] = rest
+                routes[w] = candidate
+            return True
+        return False
+
+
+def _build_result(problem, routes, unassigned, geometry, computing_times):
+    result_routes = []
+    totals = {"cost": 0, "service": 0, "duration": 0, "waiting_time": 0, "distance": 0}
+    dims = problem.amount.shape[1]
+
+    for v, seq in enumerate(routes):
+        if not seq:
+            continue
+        vehicle = problem.vehicles[v]
+        steps = []
+        t = problem.tw_start[v]
+        travel = distance = waiting = service = 0.0
+        prev = problem.start_node[v]
+        load = problem.amount[seq].sum(axis=0)
+
+        if prev != problem.free:
+            steps.append({
+                "type": "start",
+                "location": attr(vehicle, "start"),
+                "load": [int(x) for x in load],
+                "arrival": int(round(t)),
+                "duration": 0,
+                "distance": 0,
+            })
+
+        for j in seq:
+            node = problem.job_node[j]
+            travel += problem.durations[prev, node]
+            distance += problem.distances[prev, node]
+            t += problem.durations[prev, node]
+            arrival = t
+            wait = max(0.0, problem.open[j] - t)
+            t += wait + problem.service[j]
+            waiting += wait
+            service += problem.service[j]
+            load = load - problem.amount[j]
+            job = problem.jobs[j]
+            steps.append({
+                "type": "job",
+                "location": attr(job, "location"),
+                "id": attr(job, "id"),
+                "job": attr(job, "id"),
+                "service": int(problem.service[j]),
+                "waiting_time": int(round(wait)),
+                "load": [int(x) for x in load],
+                "arrival": int(round(arrival)),
+                "duration": int(round(travel)),
+                "distance": int(round(distance)),
+            })
+            prev = node
+
+        end = problem.end_node[v]
+        if end != problem.free:
+            travel += problem.durations[prev, end]
+            distance += problem.distances[prev, end]
+            t += problem.durations[prev, end]
+            steps.append({
+                "type": "end",
+                "location": attr(vehicle, "end"),
+                "load": [int(x) for x in load],
+                "arrival": int(round(t)),
+                "duration": int(round(travel)),
+                "distance": int(round(distance)),
+            })
+
+        route = {
+            "vehicle": attr(vehicle, "id"),
+            "cost": int(round(travel)),
+            "delivery": [int(x) for x in problem.amount[seq].sum(axis=0)] if dims else [],
+            "amount": [int(x) for x in problem.amount[seq].sum(axis=0)] if dims else [],
+            "pickup": [0] * dims,
+            "service": int(service),
+            "duration": int(round(travel)),
+            "waiting_time": int(round(waiting)),
+            "distance": int(round(distance)),
+            "steps": steps,
+        }
+        if geometry:
+            coordinates = [step["location"] for step in steps if step["location"] is not None]
+            route["geometry"] = encode_polyline(coordinates)
+        result_routes.append(route)
+
+        for key in totals:
+            totals[key] += route[key]
+
+    summary = dict(totals)
+    summary.update({
+        "routes": len(result_routes),
+        "unassigned": len(unassigned),
+        "computing_times": computing_times,
+    })
+    return {
+        "code": 0,
+        "summary": summary,
+        "unassigned": [{"id": attr(problem.jobs[j], "id"), "location": attr(problem.jobs[j], "location")} for j in unassigned],
+        "routes": result_routes,
+    }
+
+
+def optimization(jobs=None, vehicles=None, matrix=None, geometry=None, time_limit=DEFAULT_TIME_LIMIT, distances=None,
+                 routes=None, progress=None):
+    """
+    Drop-in replacement for ``ors_client.optimization`` that solves locally
+
+    Travel times are estimated with ``route_optimizer.distance.travel_matrices``
+    unless a custom ``matrix`` is given. ``routes`` (job positions per vehicle)
+    warm-starts the search from an earlier solution, ``progress`` is called while solving (see ``LocalSolver``).
+    """
+    return LocalSolver(time_limit=time_limit, progress=progress).solve(
+        jobs or [], vehicles or [], matrix=matrix, distances=distances, geometry=bool(geometry), routes=routes
+    )
+
+
+class LocalClient:
+    """Mimics the part of ``openrouteservice.Client`` used by the pages"""
+
+    def __init__(self, time_limit=DEFAULT_TIME_LIMIT, progress=None):
+        self.time_limit = time_limit
+        self.progress = progress
+
+    def __getstate__(self):
+        # a callback does not cross into a worker process, solves there report nothing
+        return {**self.__dict__, "progress": None}
+
+    def optimization(self, jobs=None, vehicles=None, shipments=None, matrix=None, geometry=None, dry_run=None, distances=None,
+                     routes=None):
+        if shipments:
+            raise ValueError("The local solver does not support shipments")
+        return optimization(jobs=jobs, vehicles=vehicles, matrix=matrix, geometry=geometry, time_limit=self.time_limit,
+                            distances=distances, routes=routes, progress=self.progress)
@@ -0,0 +1,178 @@
+"""Grid index of outlet coordinates for "nearest outlets" and "within R km" queries.
+
+Points are bucketed into square cells of ``cell_km`` kilometres once per
+dataset load. A query only looks at the cells around the query point, growing
+ring by ring until no unseen cell can hold a closer outlet, so it stays fast
+however many outlets the dataset has.
+"""
+import math
+
+import numpy as np
+
+from route_optimizer.distance import KM_PER_DEGREE, distance_to_point
+
+# without an explicit cell size, cells are sized to hold about this many outlets on average
+POINTS_PER_CELL = 8
+# smallest cell size in km, for datasets with many outlets at the same spot
+MIN_CELL_KM = 0.05
+# projection and haversine disagree slightly, keep the stopping rule conservative
+_SLACK = 1.01
+
+
+class SpatialIndex:
+    """
+    Outlets bucketed into a regular grid of projected cells
+
+    Query results are positions into the arrays the index was built from, so
+    ``df.index[positions]`` gives the outlet ids of a dataframe.
+
+    Args:
+        latitude (array-like): latitude of every outlet, NaN outlets are never returned
+        longitude (array-like): longitude of every outlet
+        cell_km (float): side of a grid cell in km, sized from the outlet density by default
+    """
+
+    def __init__(self, latitude, longitude, cell_km=None):
+        self.latitude = np.asarray(latitude, dtype=float)
+        self.longitude = np.asarray(longitude, dtype=float)
+        valid = np.flatnonzero(np.isfinite(self.latitude) & np.isfinite(self.longitude))
+
+        # the smallest cos(latitude) of the data, so projected distances never exceed the real ones
+        max_abs_lat = float(np.abs(self.latitude[valid]).max()) if len(valid) else 0.0
+        self._x_scale = KM_PER_DEGREE * math.cos(math.radians(min(max_abs_lat, 89.0)))
+        self.cell_km = float(cell_km) if cell_km else self._default_cell_km(valid)
+        cells_x, cells_y = self._cells(self.latitude[valid], self.longitude[valid])
+        self._x0, self._y0 = (int(cells_x.min()), int(cells_y.min())) if len(valid) else (0, 0)
+        self._height = int(cells_y.max()) - self._y0 + 1 if len(valid) else 1
+        self._width = int(cells_x.max()) - self._x0 + 1 if len(valid) else 1
+
+        # points sorted by cell key, every occupied cell is a contiguous slice
+        keys = self._keys(cells_x, cells_y)
+        order = np.argsort(keys, kind="stable")
+        self._points = valid[order]
+        self._cell_keys, self._cell_starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self._cell_ends = self._cell_starts + counts
+
+    def _default_cell_km(self, valid):
+        if not len(valid):
+            return 1.0
+        # bounding box area of the outlets, spread evenly over cells of POINTS_PER_CELL outlets
+        width = np.ptp(self.longitude[valid]) * self._x_scale
+        height = np.ptp(self.latitude[valid]) * KM_PER_DEGREE
+        return max(math.sqrt(width * height * POINTS_PER_CELL / len(valid)), MIN_CELL_KM)
+
+    @classmethod
+    def from_dataframe(cls, df, latitude="latitude", longitude="longitude", cell_km=None):
+        return cls(df[latitude].to_numpy(dtype=float), df[longitude].to_numpy(dtype=float), cell_km=cell_km)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cells(self, lat, lon):
+        return (np.floor(lon * self._x_scale / self.cell_km).astype(np.int64),
+                np.floor(lat * KM_PER_DEGREE / self.cell_km).astype(np.int64))
+
+    def _keys(self, cells_x, cells_y):
+        return (cells_x - self._x0) * self._height + (cells_y - self._y0)
+
+    def _gather(self, cells_x, cells_y):
+        # points of the given cells, cells outside the grid or without points are skipped
+        inside = (cells_x >= self._x0) & (cells_x < self._x0 + self._width) & \
+                 (cells_y >= self._y0) & (cells_y < self._y0 + self._height)
+        keys = self._keys(cells_x[inside], cells_y[inside])
+        slots = np.searchsorted(self._cell_keys, keys)
+        occupied = slots < len(self._cell_keys)
+        slots, keys = slots[occupied], keys[occupied]
+        slots = slots[self._cell_keys[slots] == keys]
+        if not len(slots):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._points[start:end] for start, end in zip(self._cell_starts[slots], self._cell_ends[slots])])
+
+    def _ring(self, cell_x, cell_y, ring):
+        # cells whose chebyshev distance to the query cell is exactly ``ring``
+        if ring == 0:
+            return np.array([cell_x]), np.array([cell_y])
+        side = np.arange(-ring, ring + 1)
+        inner = side[1:-1]
+        xs = np.concatenate((side, side, np.full(len(inner), -ring), np.full(len(inner), ring)))
+        ys = np.concatenate((np.full(len(side), -ring), np.full(len(side), ring), inner, inner))
+        return cell_x + xs, cell_y + ys
+
+    def _distances(self, positions, lat, lon):
+        return distance_to_point(self.latitude[positions], self.longitude[positions], lat, lon)
+
+    def _closest(self, positions, distances, k, radius_m):
+        if radius_m is not None:
+            keep = distances <= radius_m
+            positions, distances = positions[keep], distances[keep]
+        if k < len(distances):
+            closest = np.argpartition(distances, k - 1)[:k]
+            positions, distances = positions[closest], distances[closest]
+        order = np.argsort(distances, kind="stable")
+        return positions[order], distances[order]
+
+    def nearest(self, lat, lon, k, radius_km=None, mask=None):
+        """
+        The k outlets closest to a point, optionally only those within a radius
+
+        Args:
+            lat (float): latitude of the point, e.g. the canvasser's start point
+            lon (float): longitude of the point
+            k (int): number of outlets
+            radius_km (float): only outlets at most this far away (None means no limit)
+            mask (np.ndarray): boolean array, only outlets where it is True are eligible
+                (e.g. the ones not visited yet)
+
+        Returns:
+            tuple: (positions, distances in metres), closest first
+        """
+        radius_m = None if radius_km is None else radius_km * 1000
+        if k <= 0 or not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cell_x, cell_y = (int(value[0]) for value in self._cells(np.array([lat]), np.array([lon])))
+        # beyond this ring there are no cells with points
+        last_ring = max(abs(cell_x - self._x0), abs(cell_x - (self._x0 + self._width - 1)),
+                        abs(cell_y - self._y0), abs(cell_y - (self._y0 + self._height - 1)))
+
+        found = []
+        seen_cells = 0
+        # rings closer than the grid itself are empty
+        ring = max(self._x0 - cell_x, cell_x - (self._x0 + self._width - 1),
+                   self._y0 - cell_y, cell_y - (self._y0 + self._height - 1), 0)
+        while True:
+            ring_x, ring_y = self._ring(cell_x, cell_y, ring)
+            seen_cells += len(ring_x)
+            candidates = self._gather(ring_x, ring_y)
+            if mask is not None and len(candidates):
+                candidates = candidates[mask[candidates]]
+            found.append(candidates)
+
+            # every point closer than ``ring`` cells has been seen, stop once k of them are closer
+            covered_km = ring * self.cell_km
+            if radius_km is not None and covered_km >= radius_km * _SLACK:
+                break
+            positions = np.concatenate(found)
+            if len(positions) >= k:
+                distances = self._distances(positions, lat, lon)
+                kth = np.partition(distances, k - 1)[k - 1]
+                if kth / 1000 * _SLACK <= covered_km:
+                    return self._closest(positions, distances, k, radius_m)
+            if ring >= last_ring:
+                break
+            if seen_cells > 4 * len(self._cell_keys):
+                # sparse data around the point, a full scan is cheaper than more rings
+                positions = self._points if mask is None else self._points[mask[self._points]]
+                return self._closest(positions, self._distances(positions, lat, lon), k, radius_m)
+            ring += 1
+
+        positions = np.concatenate(found)
+        return self._closest(positions, self._distances(positions, lat, lon), k, radius_m)
+
+    def within(self, lat, lon, radius_km, mask=None):
+        """
+        Every outlet at most ``radius_km`` away from a point
+
+        Returns:
+            tuple: (positions, distances in metres), closest first
+        """
+        return self.nearest(lat, lon, len(self), radius_km=radius_km, mask=mask)
@@ -0,0 +1,387 @@
+"""Splitting oversized single-canvasser problems into chunks and stitching the routes back.
+
+The hosted optimization endpoint rejects large job lists, and the local solver
+slows down quadratically, so a route with more outlets than ``max_jobs`` is cut
+into spatially compact chunks visited one after the other:
+
+1. outlets are clustered into ``ceil(n / max_jobs)`` balanced chunks, ordered
+   by a nearest-neighbour tour over the chunk centres from the start point;
+2. the seams are fixed up front: chunk ``i`` ends at the outlet of chunk ``i``
+   closest to chunk ``i + 1``, where chunk ``i + 1`` starts, so every chunk can
+   be solved concurrently;
+3. the chunk routes are stitched into one continuous route, arrival times,
+   loads and the geometry are recomputed along it;
+4. a boundary pass re-optimizes the few outlets on both sides of every seam
+   and keeps the new order when it is shorter.
+"""
+import concurrent.futures
+import math
+
+import numpy as np
+import openrouteservice
+
+from route_optimizer.geometry import decode_polyline
+from route_optimizer.clustering import _project, balanced_labels, kmeans, merge_results, solve_partitioned
+from route_optimizer.solver import attr, encode_polyline
+
+# largest job list sent in one request, the hosted openrouteservice plan rejects more
+DEFAULT_MAX_JOBS = 50
+# the local solver has no such limit, it is only kept fast
+DEFAULT_LOCAL_MAX_JOBS = 150
+# outlets on each side of a seam that the boundary pass may reorder
+BOUNDARY_JOBS = 4
+
+
+def _vehicle(vehicle, start=None, end=None, capacity=None):
+    # copy of a vehicle with another start/end, the ends may be None (open route)
+    return openrouteservice.optimization.Vehicle(
+        id=attr(vehicle, "id"),
+        profile=attr(vehicle, "profile", "driving-car"),
+        start=start,
+        end=end,
+        capacity=capacity if capacity is not None else attr(vehicle, "capacity"),
+        time_window=attr(vehicle, "time_window"),
+    )
+
+
+def chunk_jobs(jobs, start, max_jobs=DEFAULT_MAX_JOBS):
+    """
+    Splits jobs into compact chunks of at most ``max_jobs``, in visiting order
+
+    Args:
+        jobs (list): openrouteservice Jobs (or dicts)
+        start (list): [longitude, latitude] of the canvasser, None for an open start
+        max_jobs (int): largest chunk
+
+    Returns:
+        list: lists of jobs, the chunk to visit first comes first
+    """
+    coordinates = np.array([attr(job, "location") for job in jobs], dtype=float).reshape(-1, 2)
+    k = math.ceil(len(jobs) / max_jobs)
+    if k <= 1:
+        return [list(jobs)]
+    origin_lat = float(coordinates[:, 1].mean())
+    points = _project(coordinates, origin_lat)
+
+    # seed k-means with evenly spread points (farthest point first), then balance to max_jobs
+    seeds = [int(np.argmin(points[:, 0]))]
+    gaps = ((points - points[seeds[0]]) ** 2).sum(axis=1)
+    while len(seeds) < k:
+        seeds.append(int(np.argmax(gaps)))
+        gaps = np.minimum(gaps, ((points - points[seeds[-1]]) ** 2).sum(axis=1))
+    _, centroids = kmeans(points, points[seeds])
+    labels = balanced_labels(points, centroids, capacity=max_jobs)
+    centroids = np.array([points[labels == c].mean(axis=0) for c in range(k)])
+
+    # nearest-neighbour tour over the chunk centres
+    position = _project([start], origin_lat)[0] if start is not None else centroids[0]
+    order, left = [], set(range(k))
+    while left:
+        closest = min(left, key=lambda c: ((centroids[c] - position) ** 2).sum())
+        order.append(closest)
+        left.remove(closest)
+        position = centroids[closest]
+    return [[job for job, label in zip(jobs, labels) if label == c] for c in order]
+
+
+def _exit_job(chunk, next_chunk):
+    # outlet of a chunk closest to the centre of the next one, the seam between both
+    locations = np.array([attr(job, "location") for job in chunk], dtype=float)
+    centre = np.array([attr(job, "location") for job in next_chunk], dtype=float).mean(axis=0)
+    return chunk[int(np.argmin(((locations - centre) ** 2).sum(axis=1)))]
+
+
+def _legs(route):
+    """Job steps of a route with the travel leg leading to each, plus the leg to the end step"""
+    steps = route["steps"]
+    legs = []
+    end_leg = (0, 0)
+    for previous, step in zip(steps, steps[1:]):
+        leg = (step.get("duration", 0) - previous.get("duration", 0), step.get("distance", 0) - previous.get("distance", 0))
+        if step["type"] == "job":
+            legs.append((step, leg))
+        elif step["type"] == "end":
+            end_leg = leg
+    if steps and steps[0]["type"] == "job":
+        # no start step, the first job is reached without travelling
+        legs.insert(0, (steps[0], (0, 0)))
+    return legs, end_leg
+
+
+def _geometry(route):
+    if not route.get("geometry"):
+        return []
+    return decode_polyline(route["geometry"]).tolist()
+
+
+def _marks(coordinates, locations, first=0):
+    # index of the geometry vertex closest to every location, moving forward only
+    points = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    marks = []
+    for location in locations:
+        if not len(points):
+            marks.append(0)
+            continue
+        tail = points[first:]
+        first += int(np.argmin(((tail - np.asarray(location, dtype=float)) ** 2).sum(axis=1))) if len(tail) else 0
+        marks.append(first)
+    return marks
+
+
+class _Route:
+    """A route being stitched: job steps with their legs, the end leg and the geometry"""
+
+    def __init__(self, vehicle, jobs_by_id, start_step=None):
+        self.vehicle = vehicle
+        self.jobs_by_id = jobs_by_id
+        self.start_step = start_step
+        self.stops = []  # [step, (leg duration, leg distance)]
+        self.end_step = None
+        self.end_leg = (0, 0)
+        self.coordinates = []
+
+    def append(self, route):
+        legs, end_leg = _legs(route)
+        if self.stops and legs:
+            # the previous chunk travelled to its end (the seam) before this chunk started there
+            step, (duration, distance) = legs[0]
+            legs[0] = (step, (duration + self.end_leg[0], distance + self.end_leg[1]))
+        self.stops.extend([step, leg] for step, leg in legs)
+        self.end_leg = end_leg
+        self.end_step = next((step for step in route["steps"] if step["type"] == "end"), None)
+        coordinates = _geometry(route)
+        if self.coordinates and coordinates and self.coordinates[-1] == coordinates[0]:
+            coordinates = coordinates[1:]
+        self.coordinates.extend(coordinates)
+
+    def location(self, position):
+        """Location before stop ``position`` (the start for 0), None for an open start"""
+        if position == 0:
+            return self.start_step["location"] if self.start_step else None
+        return self.stops[position - 1][0]["location"]
+
+    def marks(self):
+        # vertex of the geometry at the start, every stop and the end
+        locations = [self.location(0) or self.stops[0][0]["location"]] + [step["location"] for step, _ in self.stops]
+        return _marks(self.coordinates, locations)
+
+    def result(self, unassigned):
+        """openrouteservice-shaped result, stops past the working day or the capacity go to ``unassigned``"""
+        vehicle = self.vehicle
+        window = attr(vehicle, "time_window") or [0, None]
+        capacity = attr(vehicle, "capacity")
+        time = self.start_step["arrival"] if self.start_step else window[0]
+        travel = distance = waiting = service = 0
+        kept, amounts = [], []
+        for position, (step, (leg_duration, leg_distance)) in enumerate(self.stops):
+            job = self.jobs_by_id[step["job"]]
+            amount = list(attr(job, "amount") or [])
+            arrival = time + leg_duration
+            job_windows = attr(job, "time_windows") or [[arrival, None]]
+            wait = max(0, job_windows[0][0] - arrival)
+            load = [sum(values) for values in zip(*(amounts + [amount]))] if amount else []
+            late = window[1] is not None and arrival + wait + step.get("service", 0) > window[1]
+            full = capacity and load and any(used > limit for used, limit in zip(load, capacity))
+            if late or full:
+                # legs are only valid along the route, so the day ends at the first stop that does not fit
+                unassigned.extend({"id": rest["job"], "location": rest["location"]} for rest, _ in self.stops[position:])
+                break
+            travel += leg_duration
+            distance += leg_distance
+            waiting += wait
+            service += step.get("service", 0)
+            time = arrival + wait + step.get("service", 0)
+            amounts.append(amount)
+            kept.append(dict(step, arrival=int(arrival), waiting_time=int(wait), duration=int(travel), distance=int(distance)))
+
+        total = [sum(values) for values in zip(*amounts)] if amounts and amounts[0] else []
+        steps = []
+        if self.start_step:
+            steps.append(dict(self.start_step, load=total, duration=0, distance=0))
+        remaining = list(total)
+        for step, amount in zip(kept, amounts):
+            remaining = [left - used for left, used in zip(remaining, amount)]
+            steps.append(dict(step, load=remaining))
+        if self.end_step:
+            travel += self.end_leg[0]
+            distance += self.end_leg[1]
+            steps.append(dict(self.end_step, arrival=int(time + self.end_leg[0]), load=remaining, duration=int(travel), distance=int(distance)))
+
+        route = {
+            "vehicle": attr(vehicle, "id"),
+            "cost": int(travel),
+            "delivery": total,
+            "amount": total,
+            "pickup": [0] * len(total),
+            "service": int(service),
+            "duration": int(travel),
+            "waiting_time": int(waiting),
+            "distance": int(distance),
+            "steps": steps,
+        }
+        if self.coordinates:
+            route["geometry"] = encode_polyline(self.coordinates)
+        return route
+
+
+def _improve_seam(route, optimize, seam, boundary_jobs):
+    """
+    Re-optimizes the stops around one seam with fixed neighbours
+
+    Returns:
+        callable: applies the better order to ``route``, or None when nothing improved
+    """
+    first = max(0, seam - boundary_jobs)
+    last = min(len(route.stops), seam + boundary_jobs)
+    if last - first < 3:
+        return None
+    window = route.stops[first:last]
+    before = route.location(first)
+    after = route.stops[last][0]["location"] if last < len(route.stops) else (route.end_step or {}).get("location")
+    old_cost = sum(leg[0] for _, leg in window[1:]) + (route.stops[last][1][0] if last < len(route.stops) else route.end_leg[0])
+    if before is not None:
+        old_cost += window[0][1][0]
+
+    jobs = [route.jobs_by_id[step["job"]] for step, _ in window]
+    vehicle = _vehicle(route.vehicle, start=before, end=after, capacity=[sum(sum(attr(job, "amount") or [0]) for job in jobs) + 1])
+    result = optimize(jobs=jobs, vehicles=[vehicle], geometry=bool(route.coordinates))
+    routes = result.get("routes") or []
+    if result.get("unassigned") or len(routes) != 1:
+        return None
+    new_route = routes[0]
+    new_cost = new_route["steps"][-1].get("duration", 0)
+    if new_cost >= old_cost:
+        return None
+
+    def apply():
+        legs, end_leg = _legs(new_route)
+        stops = [[step, leg] for step, leg in legs]
+        if before is None:
+            stops[0][1] = (0, 0)
+        if last < len(route.stops):
+            route.stops[last][1] = end_leg
+        else:
+            route.end_leg = end_leg
+        if route.coordinates:
+            # marks[p] is the vertex before stop p, the window runs up to the stop after it (or the end)
+            marks = route.marks()
+            stop = marks[last + 1] + 1 if last < len(route.stops) else len(route.coordinates)
+            route.coordinates[marks[first]:stop] = _geometry(new_route)
+        route.stops[first:last] = stops
+    return apply
+
+
+def solve_split(optimize, jobs, vehicle, max_jobs=DEFAULT_MAX_JOBS, geometry=True, workers=None, processes=False,
+                boundary_jobs=BOUNDARY_JOBS, progress=None):
+    """
+    Solves a single-vehicle problem of any size as concurrent chunks of at most ``max_jobs``
+
+    Args:
+        optimize (callable): ``optimize(jobs=..., vehicles=..., geometry=...)``, e.g.
+            ``get_routing_client().optimization``; picklable when ``processes`` is True
+        jobs (list): openrouteservice Jobs
+        vehicle: the canvasser's openrouteservice Vehicle
+        max_jobs (int): largest job list sent to ``optimize``
+        geometry (bool): return the route geometry
+        workers (int): pool size, one worker per chunk by default
+        processes (bool): use a process pool (CPU-bound local solving) instead of threads
+        boundary_jobs (int): stops on each side of a seam the boundary pass may reorder, 0 to skip it
+        progress (callable): ``progress(done, total, message)`` after every solved chunk, e.g. ``Job.report``;
+            when it raises (a cancelled job) the chunks not started yet are dropped
+
+    Returns:
+        dict: openrouteservice-shaped result with a single route
+    """
+    if len(jobs) <= max_jobs:
+        return optimize(jobs=jobs, vehicles=[vehicle], geometry=geometry)
+
+    start, end = attr(vehicle, "start"), attr(vehicle, "end")
+    chunks = chunk_jobs(jobs, start, max_jobs)
+    exits = [attr(_exit_job(chunk, following), "location") for chunk, following in zip(chunks, chunks[1:])]
+    problems = []
+    for position, chunk in enumerate(chunks):
+        chunk_start = start if position == 0 else exits[position - 1]
+        chunk_end = exits[position] if position < len(exits) else end
+        problems.append((chunk, [_vehicle(vehicle, start=chunk_start, end=chunk_end)]))
+
+    pool = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+    executor = pool(max_workers=workers or len(problems))
+    try:
+        futures = {executor.submit(_solve_chunk, optimize, problem, geometry): position
+                   for position, problem in enumerate(problems)}
+        results = [None] * len(problems)
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(done, len(problems), f"{done} of {len(problems)} parts of the route solved")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    jobs_by_id = {attr(job, "id"): job for job in jobs}
+    unassigned = [job for result in results for job in result.get("unassigned", [])]
+    chunk_routes = [(result.get("routes") or [None])[0] for result in results]
+    first_route = next((route for route in chunk_routes if route), None)
+    if first_route is None:
+        return merge_results(results)
+    start_step = first_route["steps"][0] if first_route["steps"][0]["type"] == "start" and start is not None else None
+    route = _Route(vehicle, jobs_by_id, start_step)
+    seams = []
+    for chunk_route in chunk_routes:
+        if chunk_route:
+            if route.stops:
+                seams.append(len(route.stops))
+            route.append(chunk_route)
+    if end is None:
+        route.end_step, route.end_leg = None, (0, 0)
+
+    # boundary pass, windows must not overlap so the seams can be improved independently,
+    # and a window is a request too, so it is never larger than max_jobs
+    boundary_jobs = min(boundary_jobs, max_jobs // 2)
+    seams = [seam for previous, seam in zip([-2 * boundary_jobs] + seams, seams) if seam - previous >= 2 * boundary_jobs]
+    if boundary_jobs > 0 and seams:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or len(seams)) as executor:
+            improvements = list(executor.map(lambda seam: _improve_seam(route, optimize, seam, boundary_jobs), seams))
+        # apply from the last seam backwards so earlier positions stay valid
+        for apply in reversed(improvements):
+            if apply:
+                apply()
+
+    stitched = route.result(unassigned)
+    result = merge_results([{"routes": [stitched], "unassigned": unassigned,
+                             "summary": {key: stitched[key] for key in ("cost", "service", "duration", "waiting_time", "distance")}}])
+    result["summary"]["unassigned"] = len(unassigned)
+    return result
+
+
+def _solve_chunk(optimize, problem, geometry):
+    chunk, vehicles = problem
+    return optimize(jobs=chunk, vehicles=vehicles, geometry=geometry)
+
+
+class SplitOptimizer:
+    """``optimize`` callable that splits oversized single-vehicle problems (picklable)"""
+
+    def __init__(self, optimize, max_jobs=DEFAULT_MAX_JOBS, processes=False):
+        self.optimize = optimize
+        self.max_jobs = max_jobs
+        self.processes = processes
+
+    def __call__(self, jobs=None, vehicles=None, geometry=True):
+        return solve_split(self.optimize, jobs, vehicles[0], max_jobs=self.max_jobs, geometry=geometry, processes=self.processes)
+
+
+def solve(optimize, jobs, vehicles, max_jobs=DEFAULT_MAX_JOBS, processes=False, progress=None):
+    """
+    Solves a page's problem whatever its size
+
+    Several canvassers get one cluster each (``solve_partitioned``), and any
+    route with more than ``max_jobs`` outlets is split into chunks. ``progress``
+    is called after every solved group or chunk, see ``solve_partitioned``.
+
+    Returns:
+        dict: openrouteservice-shaped result
+    """
+    if len(vehicles) > 1:
+        # the groups already run in parallel, their chunks are solved on threads
+        return solve_partitioned(SplitOptimizer(optimize, max_jobs), jobs, vehicles, processes=processes, progress=progress)
+    return solve_split(optimize, jobs, vehicles[0], max_jobs=max_jobs, processes=processes, progress=progress)
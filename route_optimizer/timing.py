@@ -0,0 +1,164 @@
+"""Timing spans of the stages of a page rerun.
+
+A page opens one ``Timings`` per rerun and wraps every stage (sheet load,
+filtering, building the routes tables, polyline decoding, map building,
+export...) in ``timings.span(stage)``. At the end of the rerun the spans are
+shown in the sidebar performance panel and written to the ``TimingLog``:
+one JSON line per rerun for later analysis, and running totals per page and
+stage in a Prometheus text file (node_exporter textfile collector format)
+for dashboards. Background optimizer runs log their own spans the same way.
+
+A single rerun can also be profiled with ``cProfile`` (``start_profile`` /
+``save_profile``), the .prof file opens with ``python -m pstats`` or snakeviz.
+"""
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+
+DEFAULT_TIMINGS_PATH = os.path.join(".cache", "timings.jsonl")
+DEFAULT_METRICS_PATH = os.path.join(".cache", "timings.prom")
+DEFAULT_PROFILE_DIR = os.path.join(".cache", "profiles")
+# the JSON lines file is rotated to .1 past this size
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+_METRIC = "route_optimizer_stage_seconds"
+
+
+class Timings:
+    """
+    Spans of one rerun (or one background run) of a page
+
+    Args:
+        page (str): page name, e.g. "data_habs"
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        """Times the enclosed block, spans opened inside it are nested under it"""
+        entry = {"stage": stage, "depth": self._depth, "start": time.perf_counter() - self._origin, "seconds": None}
+        self.spans.append(entry)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+            self._depth -= 1
+
+    def total(self):
+        """Seconds since the rerun started"""
+        return time.perf_counter() - self._origin
+
+    def breakdown(self):
+        """
+        Rows of the performance panel
+
+        Returns:
+            list: one dict per span (stage indented by its depth, seconds, share of the rerun)
+        """
+        total = self.total() or 1.0
+        # em spaces, the table would strip plain leading spaces
+        return [{"stage": "\u2003" * span["depth"] + span["stage"], "seconds": round(span["seconds"] or 0.0, 4),
+                 "share": f"{(span['seconds'] or 0.0) / total:.0%}"} for span in self.spans]
+
+    def record(self):
+        """JSON-ready record of the rerun"""
+        return {"time": self.started, "page": self.page, "total": round(self.total(), 6),
+                "spans": [{**span, "start": round(span["start"], 6), "seconds": round(span["seconds"] or 0.0, 6)}
+                          for span in self.spans]}
+
+
+class TimingLog:
+    """
+    Appends reruns to a JSON lines file and keeps per-stage totals in a Prometheus text file
+
+    Shared by every session and background run of the process; the totals start
+    from zero with the process, like any Prometheus counter.
+
+    Args:
+        path (str): JSON lines file, None to skip it
+        metrics_path (str): Prometheus text file, None to skip it
+        max_bytes (int): size of the JSON lines file before it is rotated
+    """
+
+    def __init__(self, path=DEFAULT_TIMINGS_PATH, metrics_path=DEFAULT_METRICS_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.metrics_path = metrics_path
+        self.max_bytes = max_bytes
+        self._totals = {}
+        self._lock = threading.Lock()
+        for file_path in (path, metrics_path):
+            if file_path and os.path.dirname(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    def write(self, timings):
+        """Logs the spans of a finished rerun"""
+        record = timings.record()
+        with self._lock:
+            for stage, seconds in [("total", record["total"])] + [(span["stage"], span["seconds"]) for span in record["spans"]]:
+                count, total = self._totals.get((record["page"], stage), (0, 0.0))
+                self._totals[(record["page"], stage)] = (count + 1, total + seconds)
+            if self.path:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+            if self.metrics_path:
+                self._write_metrics()
+
+    def _write_metrics(self):
+        lines = [f"# HELP {_METRIC} Time spent in each stage of the page reruns",
+                 f"# TYPE {_METRIC} summary"]
+        for (page, stage), (count, total) in sorted(self._totals.items()):
+            labels = 'page="{}",stage="{}"'.format(*(value.replace("\\", "\\\\").replace('"', '\\"') for value in (page, stage)))
+            lines.append(f"{_METRIC}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{_METRIC}_count{{{labels}}} {count}")
+        # written aside and renamed, a scraper never reads half a file
+        temporary = f"{self.metrics_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary, self.metrics_path)
+
+
+@functools.lru_cache(maxsize=None)
+def get_timing_log():
+    """One timing log per process, shared by every session"""
+    return TimingLog()
+
+
+def start_profile():
+    """Starts profiling the calling thread, background jobs are not included"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler):
+    """Stops a profile from ``start_profile`` without saving it, None is ignored"""
+    if profiler is not None:
+        profiler.disable()
+
+
+def save_profile(profiler, page, directory=DEFAULT_PROFILE_DIR):
+    """
+    Stops a profile from ``start_profile`` and writes it to disk
+
+    Returns:
+        str: path of the .prof file
+    """
+    profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{page}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler.dump_stats(path)
+    return path
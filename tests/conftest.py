@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the tests import route_optimizer from the repository root, like the pages and benchmarks
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# and the benchmark helpers (the openrouteservice stub, synthetic data) by module name, like the benchmarks
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
@@ -0,0 +1,89 @@
+import csv
+import datetime
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from route_optimizer.batch import build_tasks, main, needed_columns, parse_args
+from route_optimizer.datasets import prepare_leads
+from route_optimizer.ors import API_KEY_VARIABLE
+
+LEADS_CSV = (
+    "mt_leads_code,outlet_name,outlet_langitude,outlet_longitude,pic_phone,m_regency_name\n"
+    "L1,Toko A,-6.2,106.8,0811,Bogor\n"
+    "L2,Toko B,-6.21,106.81,0812,Bogor\n"
+    "L3,Toko C,-6.22,106.82,0813,Bogor\n"
+)
+PLANS_CSV = (
+    "canvasser,dataset,start_latitude,start_longitude,start_time,end_time,outlet_ids\n"
+    "Budi,leads,-6.2,106.79,08:00,17:00,L1;L2\n"
+    "budi,leads,-6.2,106.79,,,L3;L9\n"
+)
+
+
+def leads():
+    return prepare_leads(pd.read_csv(io.StringIO(LEADS_CSV)))
+
+
+def test_plans_get_distinct_file_names():
+    plans = pd.DataFrame({
+        "canvasser": ["Budi", "budi", np.nan, 1234.0, "Ani / Jakarta"],
+        "start_latitude": -6.2, "start_longitude": 106.79, "outlet_ids": "L1;L2",
+    })
+    tasks = build_tasks(plans, {"leads": leads()}, default_dataset="leads")
+    assert [task["canvasser"] for task in tasks] == ["Budi", "budi", "plan_2", "1234", "Ani / Jakarta"]
+    assert [task["file_name"] for task in tasks] == ["Budi", "budi_2", "plan_2", "1234", "Ani_Jakarta"]
+
+
+def test_tasks_hold_the_plan():
+    plans = pd.DataFrame({"canvasser": ["Budi"], "start_latitude": [-6.2], "start_longitude": [106.79],
+                          "start_time": ["09:30"], "service_minutes": [10], "outlet_ids": ["L1; L3 ;L9"]})
+    task = build_tasks(plans, {"leads": leads()}, default_dataset="leads", day=datetime.datetime(2026, 10, 19))[0]
+    assert task["outlets"]["mt_leads_code"].tolist() == ["L1", "L3"]
+    assert [job.service for job in task["jobs"]] == [600, 600]
+    window = task["vehicles"][0].time_window
+    assert window[0] == datetime.datetime(2026, 10, 19, 9, 30).timestamp()
+    assert window[1] == datetime.datetime(2026, 10, 19, 20, 0).timestamp()
+
+
+def test_unknown_dataset_is_rejected():
+    plans = pd.DataFrame({"canvasser": ["Budi"], "dataset": ["shops"], "start_latitude": [-6.2],
+                          "start_longitude": [106.79], "outlet_ids": ["L1"]})
+    with pytest.raises(ValueError, match="unknown dataset 'shops'"):
+        build_tasks(plans, {"leads": leads()})
+
+
+def test_needed_columns_keep_the_duplicate_match_columns():
+    columns = needed_columns("leads")
+    assert {"outlet_name", "pic_phone", "outlet_langitude", "outlet_longitude", "mt_leads_code"} <= set(columns)
+    assert len(columns) == len(set(columns))
+
+
+def test_ors_engine_needs_a_key(monkeypatch, capsys):
+    monkeypatch.delenv(API_KEY_VARIABLE, raising=False)
+    with pytest.raises(SystemExit):
+        parse_args(["plans.csv", "--engine", "ors"])
+    assert "--api-key" in capsys.readouterr().err
+    assert parse_args(["plans.csv", "--engine", "ors", "--api-key", "key"]).api_key == "key"
+    assert parse_args(["plans.csv", "--engine", "ors", "--base-url", "http://127.0.0.1:8080"]).api_key is None
+    monkeypatch.setenv(API_KEY_VARIABLE, "from-env")
+    assert parse_args(["plans.csv", "--engine", "ors"]).api_key == "from-env"
+
+
+def test_batch_writes_one_file_per_plan(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    with open("leads.csv", "w") as file:
+        file.write(LEADS_CSV)
+    with open("plans.csv", "w") as file:
+        file.write(PLANS_CSV)
+    status = main(["plans.csv", "--data-path", "leads=leads.csv", "--workers", "1", "--time-limit", "0.1",
+                   "--format", "csv", "--output", "routes", "--cache-path", "", "--matrix-path", ""])
+    assert status == 0
+    assert sorted(os.listdir("routes")) == ["optimized_routes_Budi.csv", "optimized_routes_budi_2.csv"]
+    with open(os.path.join("routes", "optimized_routes_Budi.csv")) as file:
+        rows = list(csv.DictReader(file))
+    assert sorted(row["mt_leads_code"] for row in rows if row["mt_leads_code"]) == ["L1", "L2"]
+    assert "budi: 1 outlets" in capsys.readouterr().out
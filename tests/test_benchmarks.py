@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+from end_to_end import EXTENSIONS, STAGES, compare, run_pipeline
+from ors_stub import start_stub
+from route_optimizer.ors import RoutingClient
+from synthetic import MAKERS, write_raw
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server, base_url = start_stub(time_limit=0.1)
+    yield server, RoutingClient(base_url=base_url, rate_per_minute=60000, burst=1000)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("name", sorted(MAKERS))
+def test_pipeline_times_every_stage_against_the_stub(stub, tmp_path, name):
+    server, client = stub
+    requests = server.requests
+    path = os.path.join(tmp_path, f"{name}.{EXTENSIONS[name]}")
+    write_raw(name, MAKERS[name](300), path)
+    timings = run_pipeline(name, path, 5, client)
+    assert list(timings) == STAGES
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert server.requests == requests + 1
+
+
+def test_stub_matrix_answers_the_requested_cells(stub):
+    server, client = stub
+    locations = [[106.8, -6.2], [106.81, -6.21], [106.82, -6.22]]
+    matrix = client.distance_matrix(locations, sources=[0], destinations=[1, 2], metrics=["duration", "distance"])
+    assert len(matrix["durations"]) == 1 and len(matrix["durations"][0]) == 2
+    assert matrix["distances"][0][1] > matrix["distances"][0][0] > 0
+
+
+def test_compare_counts_slower_stages(tmp_path, capsys):
+    baseline = os.path.join(tmp_path, "baseline.json")
+    with open(baseline, "w") as file:
+        json.dump({"commit": "abc", "results": [
+            {"dataset": "leads", "rows": 100, "stage": "load", "seconds": 1.0},
+            {"dataset": "leads", "rows": 100, "stage": "map", "seconds": 1.0},
+        ]}, file)
+    results = [
+        {"dataset": "leads", "rows": 100, "stage": "load", "seconds": 1.1},
+        {"dataset": "leads", "rows": 100, "stage": "map", "seconds": 1.5},
+        {"dataset": "leads", "rows": 100, "stage": "export", "seconds": 9.0},
+    ]
+    assert compare(results, baseline) == 1
+    assert "slower" in capsys.readouterr().out
@@ -0,0 +1,70 @@
+import os
+import time
+
+import numpy as np
+
+from route_optimizer.cache import ResultCache, normalize, payload_key
+
+JOBS = [{"id": 1, "location": [106.8, -6.2]}, {"id": 2, "location": [106.81, -6.21]}]
+VEHICLES = [{"id": 0, "start": [106.8, -6.2]}]
+RESULT = {"routes": [{"vehicle": 0, "steps": []}], "unassigned": []}
+
+
+def test_key_ignores_order_and_tiny_float_noise():
+    key = payload_key(JOBS, VEHICLES, engine="Local solver")
+    shuffled = [JOBS[1], {"id": np.int64(1), "location": [106.80000001, -6.2]}]
+    assert payload_key(shuffled, VEHICLES, engine="Local solver") == key
+    assert payload_key(JOBS, VEHICLES, engine="Openrouteservice") != key
+    assert payload_key(JOBS[:1], VEHICLES, engine="Local solver") != key
+
+
+def test_compute_runs_once(tmp_path):
+    cache = ResultCache(os.path.join(tmp_path, "cache.sqlite"))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return RESULT
+
+    assert cache.get_or_compute(compute, JOBS, VEHICLES) == RESULT
+    assert cache.get_or_compute(compute, JOBS, VEHICLES) == RESULT
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_empty_results_are_not_stored(tmp_path):
+    cache = ResultCache(os.path.join(tmp_path, "cache.sqlite"))
+    assert cache.get_or_compute(lambda: None, JOBS, VEHICLES) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_missed(tmp_path):
+    cache = ResultCache(os.path.join(tmp_path, "cache.sqlite"), ttl=0.01)
+    cache.set("key", RESULT)
+    time.sleep(0.05)
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(os.path.join(tmp_path, "cache.sqlite"), max_entries=2)
+    cache.set("a", RESULT)
+    time.sleep(0.01)
+    cache.set("b", RESULT)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", RESULT)
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULT and cache.get("c") == RESULT
+    assert cache.stats()["evictions"] == 1
+
+
+def test_clear(tmp_path):
+    cache = ResultCache(os.path.join(tmp_path, "cache.sqlite"))
+    cache.set("a", RESULT)
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0}
+
+
+def test_normalize_gives_plain_rounded_values():
+    assert normalize({"location": (106.1234567, np.float64(-6.2)), 1: [np.int64(2)]}) == {"location": [106.123457, -6.2], "1": [2]}
@@ -0,0 +1,72 @@
+import numpy as np
+
+from route_optimizer.clustering import balanced_labels, merge_results, partition, solve_partitioned
+from route_optimizer.solver import LocalClient
+
+# two canvassers, one in the west and one in the east of the city
+STARTS = [[106.70, -6.2], [106.90, -6.2]]
+
+
+def make_coordinates(west, east, seed=0):
+    rng = np.random.default_rng(seed)
+    west_points = np.column_stack((106.70 + rng.random(west) * 0.02, -6.2 + rng.random(west) * 0.02))
+    east_points = np.column_stack((106.90 + rng.random(east) * 0.02, -6.2 + rng.random(east) * 0.02))
+    return np.vstack((west_points, east_points)).tolist()
+
+
+def test_outlets_go_to_the_canvasser_starting_closest():
+    labels = partition(make_coordinates(10, 10), STARTS)
+    assert labels[:10].tolist() == [0] * 10
+    assert labels[10:].tolist() == [1] * 10
+
+
+def test_balanced_partition_evens_out_the_groups():
+    coordinates = make_coordinates(16, 4)
+    assert np.bincount(partition(coordinates, STARTS, balanced=False)).tolist() == [16, 4]
+    assert np.bincount(partition(coordinates, STARTS)).tolist() == [10, 10]
+
+
+def test_balanced_labels_respect_the_capacity():
+    points = np.random.default_rng(1).random((25, 2))
+    centroids = np.array([[0.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+    labels = balanced_labels(points, centroids, capacity=9)
+    assert (labels >= 0).all()
+    assert np.bincount(labels, minlength=3).max() <= 9
+
+
+def test_single_canvasser_gets_everything():
+    assert partition(make_coordinates(3, 3), STARTS[:1]).tolist() == [0] * 6
+
+
+def test_merged_result_sums_the_groups():
+    results = [
+        {"routes": [{"vehicle": 0}], "unassigned": [], "summary": {"cost": 10, "duration": 10, "distance": 100}},
+        {"routes": [{"vehicle": 1}], "unassigned": [{"id": 7}], "summary": {"cost": 5, "duration": 5, "distance": 50}},
+    ]
+    merged = merge_results(results)
+    assert [route["vehicle"] for route in merged["routes"]] == [0, 1]
+    assert merged["summary"]["routes"] == 2 and merged["summary"]["unassigned"] == 1
+    assert merged["summary"]["distance"] == 150
+
+
+def make_problem():
+    coordinates = make_coordinates(6, 6)
+    jobs = [{"id": i, "location": location, "service": 60, "amount": [1]} for i, location in enumerate(coordinates)]
+    vehicles = [{"id": v, "start": start, "capacity": [20], "time_window": [0, 86400]} for v, start in enumerate(STARTS)]
+    return jobs, vehicles
+
+
+def test_partitioned_solve_routes_every_job_once():
+    jobs, vehicles = make_problem()
+    result = solve_partitioned(LocalClient(time_limit=0.1).optimization, jobs, vehicles, processes=False)
+    routed = {route["vehicle"]: [step["id"] for step in route["steps"] if step["type"] == "job"] for route in result["routes"]}
+    assert sorted(routed[0]) == list(range(6))
+    assert sorted(routed[1]) == list(range(6, 12))
+
+
+def test_partitioned_solve_reports_every_group():
+    jobs, vehicles = make_problem()
+    reports = []
+    solve_partitioned(LocalClient(time_limit=0.1).optimization, jobs, vehicles, processes=False,
+                      progress=lambda done, total, message: reports.append((done, total)))
+    assert reports == [(1, 2), (2, 2)]
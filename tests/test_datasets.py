@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from route_optimizer.datasets import compact, memory_report, prepare_customers, prepare_data_habs, prepare_leads
+
+DATA_HABS = pd.DataFrame({
+    "Nama": ["Toko A", "Toko B", "Toko C", "Toko D"],
+    "Latitude": [-6.2, np.nan, -6.22, -6.23],
+    "Longitude": [106.8, 106.81, 106.82, 106.83],
+    "Visited": ["No", "No", "Yes", np.nan],
+    "Telp": ["0811", "0812", "0813", "0814"],
+    "Kota/Kab": ["Bogor", "Bogor", "Depok", "Depok"],
+})
+LEADS = pd.DataFrame({
+    "mt_leads_code": ["L1", "L2", "L3"],
+    "outlet_name": ["Toko A", "Toko B", "Toko C"],
+    "outlet_langitude": [-6.2, -6.21, -6.22],
+    "outlet_longitude": [106.8, 106.81, 106.82],
+    "pic_phone": ["0811", "0812", "0811"],
+    "m_province_name": ["Jawa Barat"] * 3,
+    "m_regency_name": ["Bogor", "Bogor", "Depok"],
+    "m_district_name": ["Cibinong", "Cibinong", "Beji"],
+})
+CUSTOMERS = pd.DataFrame({
+    "ID Merchant": [1, 2, 3, 4],
+    "Nama Outlet": ["Toko A", "Toko B", "Toko C", "Toko D"],
+    "Kota Outlet": ["Bogor", "Bogor", "Depok", "Depok"],
+    "Provinsi Outlet": ["Jawa Barat"] * 4,
+    "Google Maps": ["https://www.google.com/maps/?q=-6.2,106.8", "https://www.google.com/maps/?q=-6.21,106.81",
+                    "https://www.google.com/maps/?q=-6.22,106.82", "no coordinates"],
+    "Last Transaction Date": ["2022-10-01", None, "2022-10-03", "2022-10-04"],
+})
+
+
+# the per-row cleaning the prepare_* functions replace
+def old_data_habs(df):
+    df["needed_amount"] = 1
+    df.columns = df.columns.str.lower().str.replace(' ', '_')
+    df["google_maps"] = df.apply(lambda row: "https://www.google.com/maps/?q=" + str(row["latitude"]) + "," + str(row["longitude"]), axis=1)
+    df['longitude'] = df['longitude'].astype('str')
+    df['latitude'] = df['latitude'].astype('str')
+    return df.loc[(df['latitude'].notnull()) & (df['latitude'] != 'nan') & (df['visited'] != 'Yes')].copy()
+
+
+def old_leads(df):
+    df["needed_amount"] = 1
+    df["google_maps"] = df.apply(lambda row: "https://www.google.com/maps/?q=" + str(row["outlet_langitude"]) + "," + str(row["outlet_longitude"]), axis=1)
+    df["pic_phone"] = df["pic_phone"].astype("category")
+    return df
+
+
+def old_customers(df):
+    df = df.loc[df["Last Transaction Date"].notnull()].copy()
+    df = df.loc[df["Google Maps"].notnull(), ["ID Merchant", "Nama Outlet", "Kota Outlet", "Provinsi Outlet", "Google Maps"]].copy()
+    df["longitude"] = df['Google Maps'].str.split(",", expand=True)[1]
+    df["latitude"] = df['Google Maps'].str.split(",", expand=True)[0].str.split("=", expand=True)[1]
+    df["latitude"] = pd.to_numeric(df["latitude"], errors='coerce')
+    df["longitude"] = pd.to_numeric(df["longitude"], errors='coerce')
+    df.columns = df.columns.str.lower().str.replace(" ", "_")
+    df = df.loc[(df["longitude"].notnull()) & (df["latitude"].notnull())].copy()
+    df["needed_amount"] = 1
+    return df
+
+
+def assert_same_outlets(new, old, latitude, longitude):
+    assert new.index.tolist() == old.index.tolist()
+    assert set(new.columns) == set(old.columns)
+    assert new["google_maps"].tolist() == old["google_maps"].tolist()
+    np.testing.assert_allclose(new[latitude].astype(float), old[latitude].astype(float), atol=1e-6)
+    np.testing.assert_allclose(new[longitude].astype(float), old[longitude].astype(float), atol=1e-5)
+
+
+def test_data_habs_match_the_per_row_cleaning():
+    new = prepare_data_habs(DATA_HABS.copy())
+    assert_same_outlets(new, old_data_habs(DATA_HABS.copy()), "latitude", "longitude")
+    assert new["nama"].tolist() == ["Toko A", "Toko D"]
+
+
+def test_leads_match_the_per_row_cleaning():
+    assert_same_outlets(prepare_leads(LEADS.copy()), old_leads(LEADS.copy()), "outlet_langitude", "outlet_longitude")
+
+
+def test_customers_match_the_per_row_cleaning():
+    new = prepare_customers(CUSTOMERS.copy())
+    assert_same_outlets(new, old_customers(CUSTOMERS.copy()), "latitude", "longitude")
+    assert new["id_merchant"].tolist() == [1, 3]
+
+
+def test_compact_layout_keeps_the_values():
+    df = prepare_leads(LEADS.copy())
+    assert df["outlet_langitude"].dtype == "float32"
+    assert df["m_regency_name"].dtype == "category"
+    assert df["outlet_name"].tolist() == LEADS["outlet_name"].tolist()
+    # compacting again changes nothing
+    pd.testing.assert_frame_equal(compact(df, "leads"), df)
+
+
+def test_customers_keep_only_their_columns():
+    df = CUSTOMERS.copy()
+    df["Extra"] = 1
+    assert list(prepare_customers(df).columns) == ["id_merchant", "nama_outlet", "kota_outlet", "provinsi_outlet",
+                                                   "google_maps", "longitude", "latitude", "needed_amount"]
+
+
+def test_memory_report_adds_up():
+    df = prepare_leads(LEADS.copy())
+    report = memory_report(df)
+    assert report.index.tolist() == ["Index"] + list(df.columns) + ["total"]
+    assert report.loc["total", "bytes"] == df.memory_usage(index=True, deep=True).sum()
+    assert report.loc["outlet_langitude", "dtype"] == "float32"
+
+
+def test_malformed_leads_coordinates_drop_their_outlet():
+    df = LEADS.copy()
+    df["outlet_langitude"] = ["-6.2", "not a number", None]
+    new = prepare_leads(df)
+    assert new["mt_leads_code"].tolist() == ["L1"]
+    assert new["outlet_langitude"].dtype == "float32"
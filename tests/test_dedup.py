@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from route_optimizer.dedup import close_pairs, duplicate_groups, expand_duplicates, merge_duplicates
+from route_optimizer.distance import KM_PER_DEGREE, haversine
+
+# degrees of latitude per metre
+METRE = 1 / (KM_PER_DEGREE * 1000)
+
+
+def test_close_pairs_match_brute_force():
+    rng = np.random.default_rng(0)
+    lat = -6.2 + rng.uniform(0, 200 * METRE, 300)
+    lon = 106.8 + rng.uniform(0, 200 * METRE, 300)
+    lat[5] = np.nan
+    left, right = close_pairs(lat, lon, 10)
+    distances = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    expected = {(i, j) for i, j in zip(*np.nonzero(np.triu(distances <= 10, 1)))}
+    assert set(zip(left.tolist(), right.tolist())) == expected
+
+
+def test_chain_does_not_collapse_into_one_group():
+    # 250 outlets 4 m apart in a row, a 5 m radius only merges neighbours two by two
+    lat = -6.2 + np.arange(250) * 4 * METRE
+    lon = np.full(250, 106.8)
+    groups = duplicate_groups(lat, lon, 5)
+    assert len(np.unique(groups)) == 125
+    # no group spans more than the radius
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        assert haversine(lat[members].min(), 106.8, lat[members].max(), 106.8) <= 5
+
+
+def test_close_outlets_need_a_shared_name_or_phone():
+    df = pd.DataFrame({
+        "latitude": -6.2 + np.array([0, 1, 2, 3]) * METRE,
+        "longitude": 106.8,
+        "nama": ["Toko Maju", "TOKO MAJU.", "Warung Sari", "Apotek"],
+        "telp": ["0812", None, "0812", None],
+    })
+    kept, merged = merge_duplicates(df, "latitude", "longitude", 5, ["nama", "telp"])
+    assert kept.index.tolist() == [0, 3]
+    assert merged == {0: [1, 2]}
+    # a missing phone matches nothing
+    kept, merged = merge_duplicates(df.iloc[[1, 3]], "latitude", "longitude", 5, ["telp"])
+    assert merged == {}
+
+
+def test_zero_radius_keeps_everything():
+    df = pd.DataFrame({"latitude": [-6.2, -6.2], "longitude": [106.8, 106.8]}, index=[10, 11])
+    kept, merged = merge_duplicates(df, "latitude", "longitude", 0)
+    assert kept.index.tolist() == [10, 11] and merged == {}
+    kept, merged = merge_duplicates(df, "latitude", "longitude", 5)
+    assert kept.index.tolist() == [10] and merged == {10: [11]}
+
+
+def test_expand_puts_merged_listings_back():
+    result = {
+        "routes": [{"vehicle": 0, "steps": [
+            {"type": "start", "arrival": 0},
+            {"type": "job", "id": 10, "job": 10, "arrival": 100, "service": 60},
+            {"type": "job", "id": 12, "job": 12, "arrival": 300, "service": 60},
+        ]}],
+        "unassigned": [{"id": 13, "location": [106.8, -6.2]}],
+    }
+    expanded = expand_duplicates(result, {10: [11], 13: [14]})
+    steps = expanded["routes"][0]["steps"]
+    assert [step.get("id") for step in steps] == [None, 10, 11, 12]
+    assert steps[2]["arrival"] == 100 and steps[2]["job"] == 11
+    assert [job["id"] for job in expanded["unassigned"]] == [13, 14]
+    # the original result is left as it was
+    assert len(result["routes"][0]["steps"]) == 3
+    assert expand_duplicates(result, {}) is result
+
+
+def test_expand_territory_plan_unscheduled():
+    plan = {"routes": [], "unassigned": [], "unscheduled": [1, 2]}
+    assert expand_duplicates(plan, {2: [3]})["unscheduled"] == [1, 2, 3]
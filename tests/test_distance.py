@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from route_optimizer.distance import (
+    AVERAGE_SPEED_KMH,
+    DETOUR_FACTOR,
+    EARTH_RADIUS_M,
+    dataframe_matrices,
+    haversine,
+    haversine_matrix,
+    haversine_matrix_blockwise,
+    nearest_neighbours,
+    travel_matrices,
+)
+
+LAT = np.array([-6.2, -6.21, -6.3, -7.0, -6.2005])
+LON = np.array([106.8, 106.82, 106.9, 107.5, 106.8])
+
+
+def test_one_degree_of_latitude():
+    assert np.isclose(haversine(0, 0, 1, 0), EARTH_RADIUS_M * np.pi / 180)
+    assert haversine(-6.2, 106.8, -6.2, 106.8) == 0
+
+
+def test_matrix_is_symmetric_with_zero_diagonal():
+    matrix = haversine_matrix(LAT, LON)
+    assert matrix.shape == (5, 5)
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(np.diag(matrix), 0)
+    assert np.isclose(matrix[0, 3], haversine(LAT[0], LON[0], LAT[3], LON[3]))
+
+
+def test_travel_matrices_take_longitude_first():
+    durations, distances = travel_matrices(np.column_stack((LON, LAT)).tolist())
+    assert np.allclose(distances, haversine_matrix(LAT, LON) * DETOUR_FACTOR)
+    assert np.allclose(durations, distances / (AVERAGE_SPEED_KMH / 3.6))
+
+
+def test_dataframe_matrices_convert_strings():
+    df = pd.DataFrame({"latitude": ["-6.2", "-6.21", "x"], "longitude": [106.8, 106.82, 106.9]})
+    durations, distances = dataframe_matrices(df)
+    assert np.isclose(distances[0, 1], haversine(-6.2, 106.8, -6.21, 106.82) * DETOUR_FACTOR)
+    assert np.isnan(distances[2]).all()
+
+
+def test_blockwise_matrix_matches_the_full_one():
+    full = haversine_matrix(LAT, LON, dtype=np.float32)
+    assert np.allclose(haversine_matrix_blockwise(LAT, LON, block_size=2), full)
+
+
+def test_nearest_neighbours_skip_the_point_itself():
+    indices, distances = nearest_neighbours(LAT, LON, 2, block_size=2)
+    assert indices.shape == (5, 2)
+    assert indices[0, 0] == 4 and indices[4, 0] == 0
+    assert (indices != np.arange(5)[:, None]).all()
+    assert (np.diff(distances, axis=1) >= 0).all()
+    assert nearest_neighbours(LAT[:1], LON[:1], 3)[0].shape == (1, 0)
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+import xml.etree.ElementTree as ElementTree
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from route_optimizer.export import export_bytes, open_exporter, route_items
+from route_optimizer.solver import encode_polyline
+
+STOPS = {
+    0: [[106.80, -6.20], [106.81, -6.21], [106.82, -6.20]],
+    1: [[106.90, -6.30], [106.91, -6.31]],
+}
+RESULT = {"routes": [
+    {"vehicle": vehicle, "distance": 1500 * (vehicle + 1), "duration": 600 * (vehicle + 1), "geometry": encode_polyline(stops),
+     "steps": [{"type": "job", "location": location} for location in stops]}
+    for vehicle, stops in STOPS.items()
+]}
+MERGED = pd.DataFrame({
+    "vehicle": [vehicle for vehicle, stops in STOPS.items() for _ in stops],
+    "location": [location for stops in STOPS.values() for location in stops],
+})
+TABLE = pd.DataFrame({
+    "nama": ["Toko A", "Toko B", "Toko <C> & D", "Toko E", None],
+    "arrival": pd.to_datetime(["2026-10-19 08:10", "2026-10-19 08:40", "2026-10-19 09:10", "2026-10-19 08:20", "2026-10-19 09:00"]),
+    "distance_to_previous_in_km": [1.0, 0.5, 0.0, 2.0, 1.5],
+})
+GPX = "{http://www.topografix.com/GPX/1/1}"
+
+
+def export(file_format):
+    return export_bytes(file_format, route_items(RESULT, MERGED, TABLE), name_column="nama")
+
+
+def test_items_split_the_table_per_route():
+    items = list(route_items(RESULT, MERGED, TABLE))
+    assert [name for name, _, _, _ in items] == ["Canvasser 1", "Canvasser 2"]
+    assert [len(table) for _, table, _, _ in items] == [3, 2]
+    assert items[1][3] == STOPS[1]
+
+
+def test_csv_has_every_row_with_its_route():
+    rows = list(csv.reader(io.TextIOWrapper(export("csv"), encoding="utf-8")))
+    assert rows[0] == ["route", "nama", "arrival", "distance_to_previous_in_km"]
+    assert [row[0] for row in rows[1:]] == ["Canvasser 1"] * 3 + ["Canvasser 2"] * 2
+    assert rows[3][1] == "Toko <C> & D"
+    assert rows[5][1] == ""
+
+
+def test_geojson_has_route_lines_and_stops():
+    features = json.load(export("geojson"))["features"]
+    lines = [feature for feature in features if feature["properties"]["kind"] == "route"]
+    stops = [feature for feature in features if feature["properties"]["kind"] == "stop"]
+    assert [line["geometry"]["type"] for line in lines] == ["LineString", "LineString"]
+    assert lines[0]["geometry"]["coordinates"] == STOPS[0]
+    assert [stop["geometry"]["coordinates"] for stop in stops] == MERGED["location"].tolist()
+    assert stops[0]["properties"]["nama"] == "Toko A"
+    assert stops[0]["properties"]["arrival"] == "2026-10-19T08:10:00"
+
+
+def test_gpx_has_a_route_and_a_track_per_canvasser():
+    root = ElementTree.parse(export("gpx")).getroot()
+    routes = root.findall(f"{GPX}rte")
+    assert [route.find(f"{GPX}name").text for route in routes] == ["Canvasser 1", "Canvasser 2"]
+    points = routes[0].findall(f"{GPX}rtept")
+    assert [point.find(f"{GPX}name").text for point in points] == ["1. Toko A", "2. Toko B", "3. Toko <C> & D"]
+    assert float(points[1].get("lat")) == -6.21 and float(points[1].get("lon")) == 106.81
+    assert routes[1].findall(f"{GPX}rtept")[1].find(f"{GPX}name").text == "2. Stop 2"
+    assert len(root.findall(f"{GPX}trk")) == 2
+    # every rte comes before the first trk
+    assert [child.tag for child in root] == [f"{GPX}rte"] * 2 + [f"{GPX}trk"] * 2
+
+
+def test_parquet_has_one_row_group_per_route():
+    import pyarrow.parquet as pq
+
+    buffer = export("parquet")
+    assert pq.ParquetFile(buffer).num_row_groups == 2
+    buffer.seek(0)
+    df = pd.read_parquet(buffer)
+    assert df["route"].tolist() == ["Canvasser 1"] * 3 + ["Canvasser 2"] * 2
+    assert df["nama"].tolist()[:4] == TABLE["nama"].tolist()[:4]
+
+
+def test_excel_has_a_summary_and_a_sheet_per_route():
+    workbook = openpyxl.load_workbook(export("xlsx"))
+    assert workbook.sheetnames == ["Summary", "Canvasser 1", "Canvasser 2"]
+    summary = list(workbook["Summary"].values)
+    assert summary[0] == ("route", "stops", "distance_km", "duration_minutes")
+    assert summary[1] == ("Canvasser 1", 3, 1.5, 10)
+    assert [row[0] for row in workbook["Canvasser 1"].values] == ["nama", "Toko A", "Toko B", "Toko <C> & D"]
+
+
+def test_excel_shares_a_sheet_past_the_limit():
+    buffer = io.BytesIO()
+    with open_exporter(buffer, "xlsx", max_sheets=1) as exporter:
+        for name, table, route, locations in route_items(RESULT, MERGED, TABLE):
+            exporter.add(name, table, route, locations)
+    buffer.seek(0)
+    workbook = openpyxl.load_workbook(buffer)
+    assert workbook.sheetnames == ["Summary", "Canvasser 1", "More routes"]
+    assert [row[0] for row in workbook["More routes"].values] == ["route", "Canvasser 2", "Canvasser 2"]
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="unknown export format"):
+        open_exporter(io.BytesIO(), "kml")
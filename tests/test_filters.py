@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from route_optimizer.filters import FilterSchema, coerce_datetimes
+
+DF = pd.DataFrame({
+    "nama": [f"Toko {i}" for i in range(20)],
+    "kota": pd.Categorical(["Jakarta", "Bogor", None, "Depok"] * 5),
+    "visited": ["Yes", "No"] * 10,
+    "amount": np.arange(20, dtype=float),
+    "tanggal": pd.date_range("2026-01-01", periods=20).strftime("%Y-%m-%d"),
+})
+
+
+def test_coerce_datetimes_leaves_the_dataset_alone():
+    converted = coerce_datetimes(DF)
+    assert converted is not DF
+    assert pd.api.types.is_datetime64_any_dtype(converted["tanggal"])
+    assert DF["tanggal"].dtype == object
+    plain = DF.drop(columns="tanggal")
+    assert coerce_datetimes(plain) is plain
+
+
+def test_timezones_are_dropped():
+    df = pd.DataFrame({"at": pd.date_range("2026-01-01", periods=3, tz="Asia/Jakarta")})
+    assert coerce_datetimes(df)["at"].dt.tz is None
+
+
+def test_column_kinds():
+    schema = FilterSchema(DF)
+    assert schema.kinds == {"nama": "text", "kota": "categorical", "visited": "categorical",
+                            "amount": "numeric", "tanggal": "datetime"}
+
+
+def test_isin_matches_missing_categories():
+    schema = FilterSchema(DF)
+    assert np.isnan(schema.options("kota")[-1])
+    mask = schema.isin("kota", ["Bogor", np.nan])
+    assert mask.tolist() == (DF["kota"].isin(["Bogor"]) | DF["kota"].isna()).tolist()
+    assert schema.isin("visited", ["Yes"]).sum() == 10
+
+
+def test_between_numbers_and_dates():
+    schema = FilterSchema(DF)
+    assert schema.bounds("amount") == (0.0, 19.0)
+    assert np.flatnonzero(schema.between("amount", 3, 5)).tolist() == [3, 4, 5]
+    mask = schema.between("tanggal", pd.Timestamp("2026-01-02"), pd.Timestamp("2026-01-03"))
+    assert np.flatnonzero(mask).tolist() == [1, 2]
+
+
+def test_contains_and_select():
+    schema = FilterSchema(DF)
+    text = schema.contains("nama", "Toko 1")
+    assert text.sum() == 11
+    selected = schema.select([text, schema.isin("visited", ["No"])])
+    assert selected["nama"].tolist() == ["Toko 1", "Toko 11", "Toko 13", "Toko 15", "Toko 17", "Toko 19"]
+    assert schema.select([]) is schema.frame
@@ -0,0 +1,49 @@
+import numpy as np
+from openrouteservice import convert
+
+from route_optimizer.distance import haversine
+from route_optimizer.geometry import decode_polyline, line_geojson, simplify, simplify_routes, tolerance_for_zoom
+from route_optimizer.solver import encode_polyline
+
+rng = np.random.default_rng(0)
+# a wiggly road, a vertex about every 10 m
+ROAD = np.column_stack((106.8 + np.arange(500) * 1e-4, -6.2 + np.cumsum(rng.normal(0, 2e-5, 500))))
+
+
+def test_decode_matches_openrouteservice():
+    encoded = encode_polyline(ROAD)
+    expected = np.array(convert.decode_polyline(encoded)["coordinates"])
+    assert np.allclose(decode_polyline(encoded), expected)
+    assert decode_polyline("").shape == (0, 2)
+
+
+def test_simplify_keeps_the_ends_and_stays_within_tolerance():
+    simplified = simplify(ROAD, 5)
+    assert 2 <= len(simplified) < len(ROAD)
+    assert (simplified[0] == ROAD[0]).all() and (simplified[-1] == ROAD[-1]).all()
+    # every dropped vertex is close to the simplified line (measured north-south, the road runs east)
+    line_latitude = np.interp(ROAD[:, 0], simplified[:, 0], simplified[:, 1])
+    assert haversine(ROAD[:, 1], ROAD[:, 0], line_latitude, ROAD[:, 0]).max() <= 5.5
+
+
+def test_straight_line_is_two_points():
+    line = np.column_stack((np.linspace(106.8, 106.9, 50), np.linspace(-6.2, -6.3, 50)))
+    assert len(simplify(line, 1)) == 2
+    assert len(simplify(line[:2], 1)) == 2
+
+
+def test_tolerance_halves_per_zoom_level():
+    assert np.isclose(tolerance_for_zoom(15), 2 * tolerance_for_zoom(16))
+    assert tolerance_for_zoom(16, latitude=60) < tolerance_for_zoom(16)
+
+
+def test_line_geojson_rounds():
+    assert line_geojson(np.array([[106.1234567, -6.7654321]])) == {"type": "LineString", "coordinates": [[106.12346, -6.76543]]}
+
+
+def test_simplify_routes_counts_points_and_skips_routes_without_geometry():
+    lines, stats = simplify_routes([{"geometry": encode_polyline(ROAD)}, {"steps": []}])
+    assert lines[1] is None
+    assert stats["points"] == len(ROAD)
+    assert stats["simplified_points"] == len(lines[0]) < len(ROAD)
+    assert stats["simplified_bytes"] < stats["bytes"]
@@ -0,0 +1,61 @@
+import numpy as np
+
+from route_optimizer.incremental import edit_size, id_key, reoptimize, warm_routes
+from route_optimizer.solver import optimization
+
+
+def make_jobs(ids):
+    return [{"id": np.int64(i), "location": [106.8 + 0.01 * i, -6.2], "service": 60} for i in ids]
+
+
+VEHICLES = [{"id": 0, "start": [106.8, -6.2], "time_window": [0, 100000]}]
+
+
+def job_ids(result):
+    return [step["id"] for route in result["routes"] for step in route["steps"] if step["type"] == "job"]
+
+
+def test_edit_size_counts_added_removed_and_changed():
+    before = make_jobs([1, 2, 3])
+    after = make_jobs([2, 3, 4])
+    after[0]["service"] = 120
+    assert edit_size(before, VEHICLES, before, VEHICLES) == 0
+    # 1 removed, 4 added, 2 changed
+    assert edit_size(before, VEHICLES, after, VEHICLES) == 3
+
+
+def test_edit_size_of_other_vehicles_is_none():
+    jobs = make_jobs([1])
+    assert edit_size(jobs, VEHICLES, jobs, VEHICLES + [{"id": 1, "start": [106.8, -6.2]}]) is None
+    moved = [{**VEHICLES[0], "start": [106.9, -6.2]}]
+    assert edit_size(jobs, VEHICLES, jobs, moved) == 1
+    # the capacity follows the selection, it is not an edit
+    assert edit_size(jobs, VEHICLES, jobs, [{**VEHICLES[0], "capacity": [5]}]) == 0
+
+
+def test_warm_routes_keep_the_previous_order_of_unchanged_jobs():
+    previous = {"routes": [{"vehicle": 0, "steps": [{"type": "start"}] + [{"type": "job", "id": i} for i in (3, 1, 2)]}]}
+    jobs = make_jobs([1, 2, 4])
+    # job 3 was removed, 4 is new, positions refer to the new jobs
+    assert warm_routes(previous, make_jobs([1, 2, 3]), jobs, VEHICLES) == [[0, 1]]
+
+
+def test_reoptimize_small_edit():
+    previous_jobs = make_jobs(range(6))
+    previous = optimization(jobs=previous_jobs, vehicles=VEHICLES)
+    jobs = make_jobs([0, 1, 2, 3, 4, 6])
+    result = reoptimize(optimization, previous, previous_jobs, VEHICLES, jobs, VEHICLES)
+    assert sorted(job_ids(result)) == [0, 1, 2, 3, 4, 6]
+    assert result["incremental"]["edits"] == 2
+
+
+def test_large_edit_is_solved_from_scratch():
+    previous_jobs = make_jobs(range(6))
+    previous = optimization(jobs=previous_jobs, vehicles=VEHICLES)
+    assert reoptimize(optimization, previous, previous_jobs, VEHICLES, make_jobs(range(10, 16)), VEHICLES) is None
+    assert reoptimize(optimization, {"routes": []}, previous_jobs, VEHICLES, previous_jobs, VEHICLES) is None
+
+
+def test_id_key_gives_plain_ids():
+    assert id_key(np.int64(3)) == 3 and type(id_key(np.int64(3))) is int
+    assert id_key("LEAD1") == "LEAD1"
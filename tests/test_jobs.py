@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from route_optimizer.jobs import CANCELLED, DONE, FAILED, Job, JobCancelled, JobManager
+
+
+def wait_for(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_job_result_and_progress():
+    manager = JobManager(workers=1)
+
+    def work(job, count):
+        for done in range(1, count + 1):
+            job.report(done, count, f"{done} of {count}")
+        return count * 2
+
+    job = wait_for(manager.submit(work, 4, label="four", context={"page": "test"}))
+    assert job.status == DONE and job.result == 8
+    assert job.progress == 1.0 and job.message == "4 of 4"
+    assert manager.get(job.id) is job and job.context == {"page": "test"}
+
+
+def test_failed_job_keeps_the_error():
+    manager = JobManager(workers=1)
+
+    def work(job):
+        raise ValueError("no outlets")
+
+    job = wait_for(manager.submit(work))
+    assert job.status == FAILED
+    assert job.error == "ValueError: no outlets"
+    assert "Traceback" in job.traceback
+
+
+def test_running_job_stops_at_its_next_report():
+    manager = JobManager(workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def work(job):
+        started.set()
+        release.wait(5)
+        job.report(1, 2)
+        return "finished"
+
+    job = manager.submit(work)
+    started.wait(5)
+    manager.cancel(job.id)
+    release.set()
+    wait_for(job)
+    job.future.result(timeout=5)
+    assert job.status == CANCELLED and job.result is None
+
+
+def test_queued_job_never_starts():
+    manager = JobManager(workers=1)
+    release = threading.Event()
+    ran = []
+    blocker = manager.submit(lambda job: release.wait(5))
+    queued = manager.submit(lambda job: ran.append(job.id))
+    manager.cancel(queued.id)
+    release.set()
+    wait_for(blocker)
+    time.sleep(0.05)
+    assert queued.status == CANCELLED and ran == []
+
+
+def test_report_raises_once_cancelled():
+    job = Job()
+    job.report(1, 2)
+    assert job.progress == 0.5
+    job._cancel.set()
+    with pytest.raises(JobCancelled):
+        job.report(2, 2)
+
+
+def test_finished_jobs_expire():
+    manager = JobManager(workers=1, keep_seconds=0.05)
+    old = wait_for(manager.submit(lambda job: None, label="old"))
+    assert manager.get(old.id) is old
+    time.sleep(0.1)
+    new = wait_for(manager.submit(lambda job: None, label="new"))
+    assert manager.get(old.id) is None
+    assert manager.get(new.id) is new
+
+
+def test_recorded_result_is_a_finished_job():
+    manager = JobManager(workers=1)
+    job = manager.record({"routes": []}, label="update", context={"page": "test"})
+    assert job.status == DONE and job.result == {"routes": []}
+    assert job.progress == 1.0 and not job.active
+    assert manager.get(job.id) is job
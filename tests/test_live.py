@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from route_optimizer.live import replan_remaining, visited_stops
+from route_optimizer.solver import optimization
+
+JOBS = [{"id": i, "location": [106.8 + 0.01 * i, -6.2], "service": 60} for i in range(1, 5)]
+VEHICLES = [{"id": 0, "start": [106.8, -6.2], "time_window": [0, 200000]},
+            {"id": 1, "start": [106.8, -6.3], "time_window": [0, 200000]}]
+RESULT = {"routes": [
+    {"vehicle": 0, "steps": [{"type": "start"}] + [{"type": "job", "id": i} for i in (1, 2, 3)]},
+    {"vehicle": 1, "steps": [{"type": "start"}, {"type": "job", "id": 4}]},
+]}
+
+
+def job_ids(route):
+    return [step["id"] for step in route["steps"] if step["type"] == "job"]
+
+
+def test_visits_are_matched_on_name_and_phone_not_row_position():
+    outlets = pd.DataFrame({"nama": ["Toko A", "Toko B", "Toko C"], "telp": [812, 813, 814]}, index=[10, 11, 12])
+    # a row inserted at the top moves every outlet of the sheet down
+    sheet = pd.DataFrame({"Nama": ["New Row", " toko b", "Toko C"], "Telp": [1, 813, 814], "Visited": ["Yes", "yes", "No"]})
+    visited = visited_stops(outlets, sheet, key=["nama", "telp"], flag="visited")
+    assert list(visited) == [11]
+    assert np.isnan(visited[11])
+
+
+def test_visit_times_and_missing_columns():
+    outlets = pd.DataFrame({"mt_leads_code": ["L1", "L2"]}, index=[0, 1])
+    sheet = pd.DataFrame({"MT Leads Code": ["L2", "L2"], "Timestamp": ["2026-10-18 09:00", "2026-10-18 10:00"]})
+    visited = visited_stops(outlets, sheet, key="mt_leads_code", time_column="timestamp")
+    assert visited == {1: pd.Timestamp("2026-10-18 10:00").timestamp()}
+    assert visited_stops(outlets, sheet, key="nama") == {}
+    assert visited_stops(outlets, sheet, key="mt_leads_code", flag="visited") == {}
+
+
+def test_replan_starts_from_the_last_visit():
+    live = replan_remaining(optimization, RESULT, JOBS, VEHICLES, {1: 100.0, 2: 50.0}, now=1000)
+    assert sorted(live["visited"]) == [1, 2]
+    routes = {route["vehicle"]: route for route in live["routes"]}
+    assert job_ids(routes[0]) == [3]
+    # the latest visit is outlet 1, the route starts there at the current time
+    assert routes[0]["steps"][0]["location"] == JOBS[0]["location"]
+    assert routes[0]["steps"][0]["arrival"] == 1000
+    assert job_ids(routes[1]) == [4]
+
+
+def test_canvasser_with_every_stop_visited_is_finished():
+    live = replan_remaining(optimization, RESULT, JOBS, VEHICLES, {4: np.nan}, now=1000)
+    assert live["finished"] == [1]
+    assert [route["vehicle"] for route in live["routes"]] == [0]
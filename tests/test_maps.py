@@ -0,0 +1,65 @@
+import folium
+import pandas as pd
+
+from route_optimizer.maps import StopLayer, route_map, stop_rows
+from route_optimizer.solver import encode_polyline
+
+START = [106.80, -6.20]
+
+
+def make_route(vehicle, stops, **values):
+    steps = [{"type": "start", "location": START}] + [{"type": "job", "location": location} for location in stops]
+    return {"vehicle": vehicle, "geometry": encode_polyline([START] + stops), "steps": steps, **values}
+
+
+def make_merged(routes):
+    rows = []
+    for route in routes:
+        for number, step in enumerate(route["steps"][1:], start=1):
+            rows.append({"vehicle": route["vehicle"], "location": step["location"], "nama": f"Toko {route['vehicle']}-{number}",
+                         "distance_to_previous": 1500.0, "duration_to_previous": 90.0,
+                         "google_maps": f"https://www.google.com/maps/?q={step['location'][1]},{step['location'][0]}",
+                         "number": number})
+    return pd.DataFrame(rows).set_index("number")
+
+
+def layers(m):
+    return [child for child in m._children.values() if isinstance(child, folium.FeatureGroup)]
+
+
+def stop_layers(m):
+    return [child for layer in layers(m) for child in layer._children.values() if isinstance(child, StopLayer)]
+
+
+def test_stop_rows_hold_what_the_popup_shows():
+    routes = [make_route(0, [[106.81, -6.21]])]
+    rows = stop_rows(make_merged(routes), "nama")
+    assert rows == [[-6.21, 106.81, 1, "Toko 0-1", 1.5, 1.5, "https://www.google.com/maps/?q=-6.21,106.81"]]
+    assert stop_rows(make_merged(routes).iloc[:0], "nama") == []
+
+
+def test_one_layer_of_stops_per_canvasser():
+    routes = [make_route(0, [[106.81, -6.21], [106.82, -6.22]]), make_route(1, [[106.79, -6.19]])]
+    m = route_map(make_merged(routes), routes, "nama", [-6.2, 106.8])
+    assert [layer.layer_name for layer in layers(m)] == ["Canvasser 1", "Canvasser 2"]
+    assert [len(layer.data) for layer in stop_layers(m)] == [2, 1]
+    assert [layer.color for layer in stop_layers(m)] == ["green", "red"]
+    html = m.get_root().render()
+    assert html.count("Toko 0-") == 2 and "markercluster" not in html.lower()
+
+
+def test_large_routes_are_clustered(monkeypatch):
+    monkeypatch.setattr("route_optimizer.maps.CLUSTER_THRESHOLD", 2)
+    routes = [make_route(0, [[106.81, -6.21], [106.82, -6.22], [106.83, -6.23]]), make_route(1, [[106.79, -6.19]])]
+    m = route_map(make_merged(routes), routes, "nama", [-6.2, 106.8])
+    assert [layer.cluster for layer in stop_layers(m)] == [True, False]
+    assert "markerClusterGroup" in m.get_root().render()
+
+
+def test_day_routes_share_a_layer_per_day():
+    routes = [make_route(day * 2 + canvasser, [[106.81 + canvasser / 10, -6.21 - day / 10]], layer=f"Day {day + 1}",
+                         canvasser=canvasser) for day in range(2) for canvasser in range(2)]
+    m = route_map(make_merged(routes), routes, "nama", [-6.2, 106.8])
+    assert [(layer.layer_name, layer.show) for layer in layers(m)] == [("Day 1", True), ("Day 2", False)]
+    # a canvasser keeps its color on every day
+    assert [layer.color for layer in stop_layers(m)] == ["green", "red", "green", "red"]
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+
+from route_optimizer.distance import travel_matrices
+from route_optimizer.matrix_store import MatrixClient, MatrixStore, missing_blocks
+from route_optimizer.solver import LocalClient
+
+LOCATIONS = [[106.80, -6.20], [106.81, -6.21], [106.82, -6.20], [106.83, -6.22]]
+
+
+class Fetch:
+    # road times twice the straight estimate, so stored values tell apart from estimates
+    def __init__(self):
+        self.cells = 0
+
+    def __call__(self, locations, sources, destinations):
+        self.cells += len(sources) * len(destinations)
+        durations, distances = travel_matrices(locations)
+        cells = np.ix_(sources, destinations)
+        return (2 * durations[cells]).tolist(), (2 * distances[cells]).tolist()
+
+
+def test_blocks_cover_every_missing_cell_within_the_limit():
+    missing = np.random.default_rng(0).random((40, 40)) < 0.3
+    missing[5] = missing[:, 5] = True
+    covered = np.zeros_like(missing)
+    for sources, destinations in missing_blocks(missing, max_elements=50):
+        assert len(sources) * len(destinations) <= 50
+        covered[np.ix_(sources, destinations)] = True
+    assert not (missing & ~covered).any()
+
+
+def test_nothing_missing_needs_no_request():
+    assert missing_blocks(np.zeros((5, 5), dtype=bool)) == []
+
+
+def test_stored_pairs_are_reused(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"))
+    fetch = Fetch()
+    durations, _ = store.matrices(LOCATIONS, fetch=fetch)
+    assert fetch.cells >= 12
+    assert store.stats()["pairs"] == 12
+    assert store.stats()["misses"] == 12 and store.stats()["hits"] == 0
+
+    fetch.cells = 0
+    again, _ = store.matrices(LOCATIONS, fetch=fetch)
+    assert fetch.cells == 0
+    np.testing.assert_allclose(again, durations)
+    np.testing.assert_allclose(again, 2 * travel_matrices(LOCATIONS)[0])
+    assert store.stats()["hits"] == 12
+
+
+def test_only_new_locations_are_fetched(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"))
+    store.matrices(LOCATIONS[:3], fetch=Fetch())
+    fetch = Fetch()
+    store.matrices(LOCATIONS, fetch=fetch)
+    # the new location's row and column
+    assert fetch.cells == 6
+    assert store.stats()["pairs"] == 12
+
+
+def test_hits_count_distinct_pairs(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"))
+    store.matrices(LOCATIONS[:2], fetch=Fetch())
+    # a start point on an outlet lists the location twice
+    store.matrices([LOCATIONS[0], LOCATIONS[1], LOCATIONS[0]], fetch=Fetch())
+    assert store.stats()["hits"] == 2
+
+
+def test_offline_gaps_are_estimated_and_not_stored(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"))
+    durations, distances = store.matrices(LOCATIONS)
+    np.testing.assert_allclose(durations, travel_matrices(LOCATIONS)[0])
+    assert store.stats()["pairs"] == 0
+
+
+def test_stale_pairs_are_fetched_again(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"), ttl=-1)
+    store.matrices(LOCATIONS[:2], fetch=Fetch())
+    fetch = Fetch()
+    store.matrices(LOCATIONS[:2], fetch=fetch)
+    assert fetch.cells > 0
+
+
+def test_least_recently_used_pairs_are_evicted(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"), max_pairs=10)
+    store.matrices(LOCATIONS, fetch=Fetch())
+    assert store.stats()["pairs"] == 9
+    assert store.stats()["evictions"] == 3
+
+
+def test_client_solves_on_the_stored_matrix(tmp_path):
+    store = MatrixStore(os.path.join(tmp_path, "matrix.sqlite"))
+    fetch = Fetch()
+    client = MatrixClient(LocalClient(time_limit=0.1), store, fetch)
+    jobs = [{"id": i, "location": location, "service": 60} for i, location in enumerate(LOCATIONS[1:])]
+    vehicles = [{"id": 0, "start": LOCATIONS[0], "end": LOCATIONS[0]}]
+    result = client.optimization(jobs=jobs, vehicles=vehicles)
+    route = result["routes"][0]
+    assert sorted(step["id"] for step in route["steps"] if step["type"] == "job") == [0, 1, 2]
+    # the route is driven on the stored (doubled) times
+    assert route["duration"] > 1.5 * LocalClient(time_limit=0.1).optimization(jobs=jobs, vehicles=vehicles)["routes"][0]["duration"]
+    fetch.cells = 0
+    client.optimization(jobs=jobs, vehicles=vehicles)
+    assert fetch.cells == 0
@@ -0,0 +1,98 @@
+import time
+
+import openrouteservice
+import pytest
+
+from ors_stub import start_stub
+from route_optimizer.ors import API_KEY_VARIABLE, RoutingClient, TokenBucket, api_key
+
+JOBS = [openrouteservice.optimization.Job(id=i, location=[106.8 + 0.01 * i, -6.2], service=60) for i in range(3)]
+VEHICLES = [openrouteservice.optimization.Vehicle(id=0, profile="driving-car", start=[106.8, -6.2], end=[106.8, -6.2])]
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub(time_limit=0.1, **options)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client(base_url, **options):
+    return RoutingClient(base_url=base_url, rate_per_minute=6000, backoff=0.01, **options)
+
+
+def test_bucket_lets_the_burst_through_then_paces():
+    bucket = TokenBucket(rate_per_minute=600, burst=2)
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # two tokens were there, the next two come 0.1s apart
+    assert 0.15 <= time.monotonic() - started < 1
+
+
+def test_blocked_bucket_holds_every_caller_back():
+    bucket = TokenBucket(rate_per_minute=6000, burst=5)
+    bucket.block(0.2)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.2
+
+
+def test_optimization_through_the_stub(stub):
+    server, base_url = stub()
+    result = client(base_url).optimization(jobs=JOBS, vehicles=VEHICLES)
+    assert sorted(step["id"] for step in result["routes"][0]["steps"] if step["type"] == "job") == [0, 1, 2]
+    assert server.requests == 1
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_failures_are_retried_a_bounded_number_of_times(stub, status):
+    server, base_url = stub(fail_rate=1.0, fail_status=status)
+    with pytest.raises(openrouteservice.exceptions.ApiError) as error:
+        client(base_url, max_retries=2).optimization(jobs=JOBS, vehicles=VEHICLES)
+    assert error.value.status == status
+    assert server.requests == 3
+
+
+def test_retries_recover_from_transient_failures(stub):
+    server, base_url = stub(fail_rate=0.5, seed=3)
+    routing = client(base_url, max_retries=10)
+    results = [routing.optimization(jobs=JOBS, vehicles=VEHICLES) for _ in range(4)]
+    assert all(result["routes"] for result in results)
+    assert server.requests > 4
+
+
+def test_optimize_many_keeps_the_order_of_the_problems(stub):
+    server, base_url = stub()
+    problems = [{"jobs": JOBS[:count], "vehicles": VEHICLES} for count in (1, 2, 3)]
+    results = client(base_url).optimize_many(problems)
+    # start and end steps around the jobs
+    assert [len(result["routes"][0]["steps"]) - 2 for result in results] == [1, 2, 3]
+    assert server.requests == 3
+
+
+def test_optimize_many_can_return_failures(stub):
+    server, base_url = stub(fail_rate=1.0)
+    results = client(base_url, max_retries=0).optimize_many([{"jobs": JOBS, "vehicles": VEHICLES}], return_exceptions=True)
+    assert isinstance(results[0], openrouteservice.exceptions.ApiError)
+
+
+def test_api_key_comes_from_the_argument_or_the_environment(monkeypatch):
+    monkeypatch.setenv(API_KEY_VARIABLE, "from-env")
+    assert api_key("given") == "given"
+    assert api_key() == "from-env"
+
+
+def test_missing_api_key_is_an_error_unless_self_hosted(monkeypatch):
+    monkeypatch.delenv(API_KEY_VARIABLE, raising=False)
+    with pytest.raises(ValueError, match=API_KEY_VARIABLE):
+        api_key()
+    assert api_key(base_url="http://127.0.0.1:8080") is None
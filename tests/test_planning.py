@@ -0,0 +1,72 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from route_optimizer.planning import assign_days, day_capacity, plan_territory, working_days
+from route_optimizer.solver import LocalClient
+
+STARTS = [[106.70, -6.2], [106.90, -6.2]]
+CLOCK = (8, 0, 17, 0)
+SERVICE = 20 * 60
+
+
+def make_outlets(per_start=20, seed=0):
+    rng = np.random.default_rng(seed)
+    lon = np.concatenate([start[0] + rng.random(per_start) * 0.03 for start in STARTS])
+    lat = np.concatenate([start[1] + rng.random(per_start) * 0.03 for start in STARTS])
+    return pd.DataFrame({"longitude": lon, "latitude": lat}, index=[f"outlet{i}" for i in range(len(lon))])
+
+
+def routed_ids(result):
+    return [step["id"] for route in result["routes"] for step in route["steps"] if step["type"] == "job"]
+
+
+def test_working_days_skip_sundays():
+    # 17 Oct 2026 is a Saturday
+    assert working_days(datetime.date(2026, 10, 17), 3) == [
+        datetime.date(2026, 10, 17), datetime.date(2026, 10, 19), datetime.date(2026, 10, 20)]
+
+
+def test_day_capacity_shrinks_with_longer_visits():
+    outlets = make_outlets()
+    short = day_capacity(outlets["latitude"], outlets["longitude"], 10 * 60, 9 * 3600)
+    long = day_capacity(outlets["latitude"], outlets["longitude"], 60 * 60, 9 * 3600)
+    assert 1 <= long < short < 9 * 6
+
+
+def test_days_are_capped_and_the_rest_waits():
+    outlets = make_outlets()
+    canvasser, day = assign_days(outlets[["longitude", "latitude"]].to_numpy(), STARTS, 2, 6)
+    assert ((canvasser >= 0) == (day >= 0)).all()
+    counts = pd.Series(list(zip(canvasser[day >= 0], day[day >= 0]))).value_counts()
+    assert counts.max() <= 6
+    assert (day < 0).sum() == len(outlets) - 2 * 2 * 6
+
+
+def test_territory_plan_schedules_every_outlet_once():
+    outlets = make_outlets()
+    outlets.loc["outlet0", "latitude"] = np.nan
+    days = working_days(datetime.date(2026, 10, 19), 3)
+    result = plan_territory(LocalClient(time_limit=0.1).optimization, outlets, "longitude", "latitude", STARTS, days,
+                            CLOCK, SERVICE, capacity=5, processes=False)
+
+    routed = routed_ids(result)
+    assert len(routed) == len(set(routed))
+    assert "outlet0" in result["unscheduled"]
+    assert sorted(routed + result["unscheduled"] + [job["id"] for job in result["unassigned"]]) == sorted(outlets.index)
+    assert {route["day"] for route in result["routes"]} <= {day.isoformat() for day in days}
+    assert {route["canvasser"] for route in result["routes"]} == {0, 1}
+    for route in result["routes"]:
+        assert route["name"].endswith(f"Canvasser {route['canvasser'] + 1}")
+    # every canvasser has one vehicle id per day
+    assert len({route["vehicle"] for route in result["routes"]}) == len(result["routes"])
+
+
+def test_territory_plan_reports_progress():
+    outlets = make_outlets(per_start=5)
+    reports = []
+    plan_territory(LocalClient(time_limit=0.1).optimization, outlets, "longitude", "latitude", STARTS,
+                   working_days(datetime.date(2026, 10, 19), 2), CLOCK, SERVICE, capacity=5, processes=False,
+                   progress=lambda done, total: reports.append((done, total)))
+    assert reports and reports[-1][0] == reports[-1][1]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from route_optimizer.regions import RegionIndex
+
+LEVELS = ["province", "city", "district"]
+DF = pd.DataFrame({
+    "province": ["Jawa Barat", "DKI Jakarta", "Jawa Barat", "DKI Jakarta", "Jawa Barat", "Banten"],
+    "city": ["Bogor", "Jakarta Selatan", "Bekasi", "Jakarta Selatan", "Bogor", "Tangerang"],
+    "district": ["Cibinong", "Kebayoran", "Bekasi Barat", "Tebet", np.nan, "Ciledug"],
+    "name": ["Toko A", "Toko B", "Toko C", "Toko D", "Toko E", "Toko A"],
+})
+
+
+def masked(selections, column=None, values=None):
+    # the chained isin masks the index replaces
+    mask = pd.Series(True, index=DF.index)
+    for level, selected in zip(LEVELS, selections):
+        mask &= DF[level].isin(selected)
+    if column is not None:
+        mask &= DF[column].isin(values)
+    return np.flatnonzero(mask.to_numpy())
+
+
+def test_options_follow_the_dataset_order():
+    index = RegionIndex(DF, LEVELS)
+    assert index.options() == ["Jawa Barat", "DKI Jakarta", "Banten"]
+    assert index.options([["Jawa Barat", "Banten"]]) == ["Bogor", "Bekasi", "Tangerang"]
+    assert index.options([["DKI Jakarta"], ["Jakarta Selatan"]]) == ["Kebayoran", "Tebet"]
+
+
+def test_missing_values_are_an_option():
+    options = RegionIndex(DF, LEVELS).options([["Jawa Barat"], ["Bogor"]])
+    assert options[0] == "Cibinong" and pd.isna(options[1])
+
+
+def test_selections_match_the_masks():
+    index = RegionIndex(DF, LEVELS)
+    for selections in ([["Jawa Barat"]], [["Jawa Barat", "DKI Jakarta"], ["Bogor", "Jakarta Selatan"]],
+                       [["DKI Jakarta"], ["Jakarta Selatan"], ["Tebet"]], [["Banten"], ["Bogor"]]):
+        assert index.select(selections).tolist() == masked(selections).tolist()
+    selections = [["Jawa Barat", "Banten"], ["Bogor", "Tangerang"]]
+    assert index.select(selections, "name", ["Toko A"]).tolist() == masked(selections, "name", ["Toko A"]).tolist()
+
+
+def test_empty_selection_selects_nothing():
+    index = RegionIndex(DF, LEVELS)
+    assert index.select([[]]).tolist() == []
+    assert index.options([["Jawa Barat"], []]) == []
+
+
+def test_values_under_a_branch():
+    index = RegionIndex(DF, LEVELS)
+    assert index.values("name", [["Jawa Barat"]]) == ["Toko A", "Toko C", "Toko E"]
+    assert index.values("name", [["Jawa Barat", "Banten"]]) == ["Toko A", "Toko C", "Toko E"]
@@ -0,0 +1,148 @@
+import hashlib
+import http.server
+import io
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from route_optimizer.sheets import SheetSource, parse_incremental, split_records
+
+SHEET = "Nama,Latitude,Longitude,Visited\nToko A,-6.2,106.8,No\nToko B,-6.21,106.81,No\nToko C,-6.22,106.82,Yes\n"
+
+
+def assert_same_as_full_parse(df, text):
+    pd.testing.assert_frame_equal(df, pd.read_csv(io.StringIO(text)), check_dtype=False)
+
+
+def test_first_parse_reads_every_row():
+    df, header, positions, parsed = parse_incremental(SHEET)
+    assert header == "Nama,Latitude,Longitude,Visited"
+    assert parsed == 3
+    assert positions == {"Toko A,-6.2,106.8,No": 0, "Toko B,-6.21,106.81,No": 1, "Toko C,-6.22,106.82,Yes": 2}
+    assert_same_as_full_parse(df, SHEET)
+
+
+def test_only_changed_rows_are_parsed():
+    previous = parse_incremental(SHEET)[:3]
+    text = SHEET.replace("Toko B,-6.21,106.81,No", "Toko B,-6.21,106.81,Yes")
+    df, _, _, parsed = parse_incremental(text, previous)
+    assert parsed == 1
+    assert_same_as_full_parse(df, text)
+
+
+def test_inserted_and_deleted_rows_keep_the_sheet_order():
+    previous = parse_incremental(SHEET)[:3]
+    text = "Nama,Latitude,Longitude,Visited\nToko New,-6.3,106.9,No\nToko A,-6.2,106.8,No\nToko C,-6.22,106.82,Yes\n"
+    df, _, _, parsed = parse_incremental(text, previous)
+    assert parsed == 1
+    assert df["Nama"].tolist() == ["Toko New", "Toko A", "Toko C"]
+    assert_same_as_full_parse(df, text)
+
+
+def test_unchanged_sheet_parses_nothing():
+    previous = parse_incremental(SHEET)[:3]
+    df, _, _, parsed = parse_incremental(SHEET, previous)
+    assert parsed == 0
+    assert_same_as_full_parse(df, SHEET)
+
+
+def test_new_header_parses_everything():
+    previous = parse_incremental(SHEET)[:3]
+    text = SHEET.replace("Visited", "Visited Today")
+    df, _, _, parsed = parse_incremental(text, previous)
+    assert parsed == 3
+    assert "Visited Today" in df.columns
+
+
+def test_multiline_fields_fall_back_to_a_full_parse():
+    text = 'Nama,Alamat\nToko A,"Jl. Satu\nNo. 2"\n'
+    assert split_records(text) is None
+    df, header, positions, parsed = parse_incremental(text)
+    assert header is None and positions == {}
+    assert df.loc[0, "Alamat"] == "Jl. Satu\nNo. 2"
+
+
+class SheetHandler(http.server.BaseHTTPRequestHandler):
+    # serves self.server.content with an ETag, answers 304 when the client already has it
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = '"%s"' % hashlib.sha1(server.content).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 05 Oct 2026 08:00:00 GMT")
+        self.end_headers()
+        self.wfile.write(server.content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sheet_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SheetHandler)
+    server.content = SHEET.encode()
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def sheet_url(server):
+    return "http://127.0.0.1:%d/sheet.csv" % server.server_address[1]
+
+
+def test_fetch_sends_the_validators_and_handles_304(sheet_server, tmp_path):
+    source = SheetSource(sheet_url(sheet_server), cache_dir=str(tmp_path))
+    assert source.fetch()
+    assert "If-None-Match" not in sheet_server.requests[0]
+    assert source.dataframe()["Nama"].tolist() == ["Toko A", "Toko B", "Toko C"]
+
+    assert not source.fetch()
+    assert sheet_server.requests[1]["If-None-Match"] == '"%s"' % hashlib.sha1(SHEET.encode()).hexdigest()
+    assert sheet_server.requests[1]["If-Modified-Since"] == "Mon, 05 Oct 2026 08:00:00 GMT"
+    assert source.status()["checked_at"] is not None
+
+
+def test_refresh_parses_only_changed_rows(sheet_server, tmp_path):
+    source = SheetSource(sheet_url(sheet_server), cache_dir=str(tmp_path))
+    version = source.load()
+    sheet_server.content = SHEET.replace("Toko B,-6.21,106.81,No", "Toko B,-6.21,106.81,Yes").encode()
+    assert source.refresh()
+    assert source.version != version
+    assert source.parsed_rows == 1
+    assert source.dataframe()["Visited"].tolist() == ["No", "Yes", "Yes"]
+
+
+def test_failed_refresh_keeps_the_local_copy(sheet_server, tmp_path):
+    source = SheetSource(sheet_url(sheet_server), cache_dir=str(tmp_path))
+    source.load()
+    sheet_server.shutdown()
+    sheet_server.server_close()
+    assert not source.refresh()
+    assert source.last_error
+    assert len(source.dataframe()) == 3
+
+
+def test_background_thread_picks_up_changes(sheet_server, tmp_path):
+    source = SheetSource(sheet_url(sheet_server), cache_dir=str(tmp_path))
+    source.load()
+    sheet_server.content = (SHEET + "Toko D,-6.23,106.83,No\n").encode()
+    source.start(interval=0.05)
+    try:
+        deadline = time.time() + 5
+        while len(source.dataframe()) != 4 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        source.stop()
+    assert source.dataframe()["Nama"].tolist()[-1] == "Toko D"
+    assert len(sheet_server.requests) >= 2
@@ -0,0 +1,85 @@
+import os
+
+import pandas as pd
+
+from route_optimizer import snapshot
+from route_optimizer.datasets import load_leads
+from route_optimizer.snapshot import is_fresh, load_snapshot, snapshot_paths
+
+LEADS_CSV = (
+    "mt_leads_code,outlet_name,outlet_langitude,outlet_longitude,pic_phone,m_regency_name\n"
+    "L1,Toko A,-6.2,106.8,0811,Bogor\n"
+    "L2,Toko B,-6.21,106.81,0812,Depok\n"
+)
+
+
+class Loader:
+    # load_leads counting its calls, under the same name so the snapshot metadata matches
+    def __init__(self):
+        self.calls = 0
+        self.__name__ = load_leads.__name__
+
+    def __call__(self, path):
+        self.calls += 1
+        return load_leads(path)
+
+
+def write_source(tmp_path, text=LEADS_CSV):
+    path = os.path.join(tmp_path, "leads.csv")
+    with open(path, "w") as file:
+        file.write(text)
+    return path
+
+
+def test_snapshot_round_trip(tmp_path):
+    source = write_source(tmp_path)
+    snapshot_dir = os.path.join(tmp_path, "snapshots")
+    loader = Loader()
+    built = load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    assert os.path.exists(snapshot_paths("leads", snapshot_dir)[0])
+    loaded = load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    assert loader.calls == 1
+    # parquet gives integer categories back as plain integers, the values are the same
+    pd.testing.assert_frame_equal(loaded, built, check_dtype=False, check_categorical=False)
+
+
+def test_snapshot_reads_only_the_wanted_columns(tmp_path):
+    source = write_source(tmp_path)
+    snapshot_dir = os.path.join(tmp_path, "snapshots")
+    load_snapshot("leads", source, Loader(), snapshot_dir=snapshot_dir)
+    df = load_snapshot("leads", source, Loader(), columns=["outlet_name"], snapshot_dir=snapshot_dir)
+    assert list(df.columns) == ["outlet_name"]
+    assert df["outlet_name"].tolist() == ["Toko A", "Toko B"]
+
+
+def test_touched_source_stays_fresh(tmp_path):
+    source = write_source(tmp_path)
+    snapshot_dir = os.path.join(tmp_path, "snapshots")
+    loader = Loader()
+    load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert is_fresh("leads", source, loader, snapshot_dir)
+
+
+def test_changed_source_rebuilds_the_snapshot(tmp_path):
+    source = write_source(tmp_path)
+    snapshot_dir = os.path.join(tmp_path, "snapshots")
+    loader = Loader()
+    load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    write_source(tmp_path, LEADS_CSV + "L3,Toko C,-6.22,106.82,0813,Depok\n")
+    df = load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    assert loader.calls == 2
+    assert df["mt_leads_code"].tolist() == ["L1", "L2", "L3"]
+
+
+def test_new_snapshot_version_rebuilds_the_snapshot(tmp_path, monkeypatch):
+    source = write_source(tmp_path)
+    snapshot_dir = os.path.join(tmp_path, "snapshots")
+    loader = Loader()
+    load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+    assert not is_fresh("leads", source, loader, snapshot_dir)
+    load_snapshot("leads", source, loader, snapshot_dir=snapshot_dir)
+    assert loader.calls == 2
+    assert is_fresh("leads", source, loader, snapshot_dir)
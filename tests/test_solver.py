@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from route_optimizer.solver import LocalClient, LocalSolver, attr, encode_polyline, optimization
+
+
+def make_jobs(count, service=60):
+    return [{"id": i, "location": [106.8 + 0.01 * i, -6.2], "service": service, "amount": [1]} for i in range(count)]
+
+
+def make_vehicle(vehicle_id=0, capacity=10, window=(0, 100000)):
+    return {"id": vehicle_id, "start": [106.8, -6.2], "capacity": [capacity], "time_window": list(window)}
+
+
+def job_ids(result):
+    return [step["id"] for route in result["routes"] for step in route["steps"] if step["type"] == "job"]
+
+
+def test_every_job_is_routed_once():
+    result = optimization(jobs=make_jobs(8), vehicles=[make_vehicle(0), make_vehicle(1)])
+    assert sorted(job_ids(result)) == list(range(8))
+    assert result["unassigned"] == []
+    assert result["summary"]["unassigned"] == 0
+
+
+def test_capacity_leaves_jobs_unassigned():
+    result = optimization(jobs=make_jobs(5), vehicles=[make_vehicle(capacity=2)])
+    assert len(job_ids(result)) == 2
+    assert len(result["unassigned"]) == 3
+
+
+def test_closed_time_window_leaves_job_unassigned():
+    jobs = make_jobs(2)
+    jobs[1]["time_windows"] = [[0, 10]]
+    vehicle = make_vehicle(window=(1000, 100000))
+    result = optimization(jobs=jobs, vehicles=[vehicle])
+    assert job_ids(result) == [0]
+    assert [job["id"] for job in result["unassigned"]] == [1]
+
+
+def test_arrivals_follow_the_route():
+    result = optimization(jobs=make_jobs(4), vehicles=[make_vehicle()])
+    steps = result["routes"][0]["steps"]
+    arrivals = [step["arrival"] for step in steps]
+    assert arrivals == sorted(arrivals)
+    assert steps[0]["type"] == "start"
+
+
+def test_custom_matrix_gives_the_cheapest_order():
+    # a line 0 - 1 - 2 - 3, the vehicle starts at 0
+    positions = np.arange(4)
+    matrix = (np.abs(positions[:, None] - positions[None, :]) * 100).tolist()
+    jobs = [{"id": i, "location_index": i} for i in (3, 1, 2)]
+    vehicle = {"id": 0, "start_index": 0}
+    result = optimization(jobs=jobs, vehicles=[vehicle], matrix=matrix)
+    assert job_ids(result) == [1, 2, 3]
+
+
+def test_progress_exception_stops_the_solve():
+    class Cancelled(Exception):
+        pass
+
+    def progress(done, total=None, message=None):
+        raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        LocalSolver(time_limit=1, progress=progress).solve(make_jobs(5), [make_vehicle()])
+
+
+def test_client_rejects_shipments():
+    with pytest.raises(ValueError):
+        LocalClient().optimization(shipments=[{"id": 0}], vehicles=[make_vehicle()])
+
+
+def test_client_progress_is_not_pickled():
+    client = LocalClient(progress=print)
+    assert client.__getstate__()["progress"] is None
+
+
+def test_encode_polyline():
+    # example of the Google polyline documentation, as [longitude, latitude] pairs
+    coordinates = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert encode_polyline(coordinates) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_attr_reads_objects_and_dicts():
+    class Job:
+        id = 7
+
+    assert attr(Job(), "id") == 7
+    assert attr({"id": 7}, "id") == 7
+    assert attr({}, "service", 0) == 0
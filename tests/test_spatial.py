@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from route_optimizer.distance import distance_to_point
+from route_optimizer.spatial import SpatialIndex
+
+rng = np.random.default_rng(0)
+LAT = rng.uniform(-6.5, -6.0, 2000)
+LON = rng.uniform(106.5, 107.0, 2000)
+
+
+def brute_force(lat, lon, mask=None):
+    distances = distance_to_point(LAT, LON, lat, lon)
+    if mask is not None:
+        distances = np.where(mask, distances, np.inf)
+    return np.argsort(distances, kind="stable"), distances
+
+
+@pytest.mark.parametrize("point", [(-6.25, 106.75), (-6.0, 106.5), (-5.0, 108.0)])
+@pytest.mark.parametrize("cell_km", [None, 0.5, 20])
+def test_nearest_matches_brute_force(point, cell_km):
+    index = SpatialIndex(LAT, LON, cell_km=cell_km)
+    positions, distances = index.nearest(*point, 10)
+    order, expected = brute_force(*point)
+    assert np.allclose(distances, expected[order[:10]])
+    assert set(positions) == set(order[:10])
+
+
+def test_within_radius():
+    index = SpatialIndex(LAT, LON)
+    positions, distances = index.within(-6.25, 106.75, 3)
+    _, expected = brute_force(-6.25, 106.75)
+    assert set(positions) == set(np.flatnonzero(expected <= 3000))
+    assert (np.diff(distances) >= 0).all()
+
+
+def test_mask_excludes_outlets():
+    mask = np.arange(len(LAT)) % 2 == 0
+    positions, _ = SpatialIndex(LAT, LON).nearest(-6.25, 106.75, 5, mask=mask)
+    order, _ = brute_force(-6.25, 106.75, mask)
+    assert mask[positions].all()
+    assert set(positions) == set(order[:5])
+
+
+def test_missing_coordinates_are_skipped():
+    df = pd.DataFrame({"latitude": [-6.2, np.nan, -6.21], "longitude": [106.8, 106.8, np.nan]})
+    index = SpatialIndex.from_dataframe(df)
+    assert len(index) == 1
+    positions, _ = index.nearest(-6.2, 106.8, 3)
+    assert positions.tolist() == [0]
+
+
+def test_empty_index():
+    index = SpatialIndex([], [])
+    positions, distances = index.nearest(-6.2, 106.8, 3)
+    assert len(positions) == 0 and len(distances) == 0
@@ -0,0 +1,162 @@
+import numpy as np
+
+from route_optimizer.distance import travel_matrices
+from route_optimizer.solver import LocalClient
+from route_optimizer.splitting import SplitOptimizer, _improve_seam, _Route, chunk_jobs, solve_split
+
+START = [106.8, -6.2]
+WINDOW = [0, 24 * 3600]
+
+
+def make_jobs(count, service=60, seed=0):
+    rng = np.random.default_rng(seed)
+    locations = np.column_stack((106.8 + rng.random(count) * 0.1, -6.2 + rng.random(count) * 0.1))
+    return [{"id": i, "location": [round(float(lon), 6), round(float(lat), 6)], "service": service, "amount": [1]}
+            for i, (lon, lat) in enumerate(locations)]
+
+
+def make_vehicle(start=START, end=START, capacity=1000):
+    return {"id": 0, "profile": "driving-car", "start": start, "end": end, "capacity": [capacity], "time_window": WINDOW}
+
+
+def optimize(jobs=None, vehicles=None, geometry=True):
+    return LocalClient(time_limit=0.2).optimization(jobs=jobs, vehicles=vehicles, geometry=geometry)
+
+
+def job_steps(result):
+    return [step for route in result["routes"] for step in route["steps"] if step["type"] == "job"]
+
+
+def assert_consistent(route):
+    # every leg starts when the previous stop is left, totals are those of the last step
+    steps = route["steps"]
+    for previous, step in zip(steps, steps[1:]):
+        leg = step["duration"] - previous["duration"]
+        departure = previous["arrival"] + previous.get("waiting_time", 0) + previous.get("service", 0)
+        assert leg >= 0 and step["distance"] >= previous["distance"]
+        assert step["arrival"] == departure + leg
+    assert route["duration"] == steps[-1]["duration"]
+    assert route["distance"] == steps[-1]["distance"]
+    assert route["service"] == sum(step.get("service", 0) for step in steps)
+
+
+def test_chunks_are_capped_and_cover_every_job():
+    jobs = make_jobs(23)
+    chunks = chunk_jobs(jobs, START, max_jobs=10)
+    assert len(chunks) == 3
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert sorted(job["id"] for chunk in chunks for job in chunk) == list(range(23))
+
+
+def test_small_problems_are_not_chunked():
+    jobs = make_jobs(5)
+    assert chunk_jobs(jobs, START, max_jobs=10) == [jobs]
+
+
+def test_split_route_visits_every_job_once():
+    jobs = make_jobs(30)
+    calls = []
+
+    def counting(jobs=None, vehicles=None, geometry=True):
+        calls.append(len(jobs))
+        return optimize(jobs=jobs, vehicles=vehicles, geometry=geometry)
+
+    result = solve_split(counting, jobs, make_vehicle(), max_jobs=10)
+    assert max(calls) <= 10
+    assert len(result["routes"]) == 1
+    assert sorted(step["id"] for step in job_steps(result)) == list(range(30))
+    assert result["unassigned"] == []
+    assert result["summary"]["unassigned"] == 0
+
+
+def test_split_route_timing_is_continuous_across_seams():
+    jobs = make_jobs(30)
+    result = solve_split(optimize, jobs, make_vehicle(), max_jobs=10)
+    route = result["routes"][0]
+    assert route["steps"][0]["type"] == "start" and route["steps"][-1]["type"] == "end"
+    assert_consistent(route)
+    assert result["summary"]["duration"] == route["duration"]
+
+    # a leg is never shorter than the straight estimate between its two stops
+    durations, _ = travel_matrices([step["location"] for step in route["steps"]])
+    for position, (previous, step) in enumerate(zip(route["steps"], route["steps"][1:])):
+        assert step["duration"] - previous["duration"] >= int(durations[position, position + 1]) - 1
+
+
+def test_stitched_route_drops_stops_past_the_working_day():
+    jobs = make_jobs(30, service=3600)
+    vehicle = dict(make_vehicle(), time_window=[0, 8 * 3600])
+    result = solve_split(optimize, jobs, vehicle, max_jobs=10, boundary_jobs=0)
+    kept = job_steps(result)
+    assert len(kept) < 30
+    assert sorted([step["id"] for step in kept] + [job["id"] for job in result["unassigned"]]) == list(range(30))
+    assert all(step["arrival"] + step["waiting_time"] + step["service"] <= 8 * 3600 for step in kept)
+
+
+def test_route_appends_chunks_at_the_seam():
+    jobs = make_jobs(6)
+    first = optimize(jobs=jobs[:3], vehicles=[make_vehicle(end=jobs[2]["location"])])["routes"][0]
+    second = optimize(jobs=jobs[3:], vehicles=[make_vehicle(start=jobs[2]["location"], end=None)])["routes"][0]
+    route = _Route(make_vehicle(end=None), {job["id"]: job for job in jobs}, first["steps"][0])
+    route.append(first)
+    route.append(second)
+    route.end_step, route.end_leg = None, (0, 0)
+    stitched = route.result([])
+    assert [step["id"] for step in stitched["steps"] if step["type"] == "job"] == \
+        [step["id"] for step in first["steps"] + second["steps"] if step["type"] == "job"]
+    assert stitched["distance"] == first["distance"] + second["distance"]
+    assert_consistent(stitched)
+
+
+def test_seam_improvement_shortens_a_bad_order():
+    jobs = [{"id": i, "location": [106.8 + 0.01 * i, -6.2], "service": 0, "amount": [1]} for i in range(6)]
+    # the middle stops are visited back and forth
+    order = [0, 1, 4, 2, 3, 5]
+    vehicle = make_vehicle(end=None)
+    bad = optimize(jobs=[jobs[i] for i in order], vehicles=[vehicle], geometry=False)
+    steps = [bad["routes"][0]["steps"][0]]
+    durations, distances = travel_matrices([START] + [jobs[i]["location"] for i in order])
+    for position, i in enumerate(order, 1):
+        steps.append({"type": "job", "id": i, "job": i, "location": jobs[i]["location"], "service": 0, "arrival": 0,
+                      "duration": int(durations[0, 1] + sum(durations[p, p + 1] for p in range(1, position))),
+                      "distance": int(distances[0, 1] + sum(distances[p, p + 1] for p in range(1, position)))})
+    route = _Route(vehicle, {job["id"]: job for job in jobs}, steps[0])
+    route.append({"steps": steps})
+    before = route.result([])["duration"]
+
+    apply = _improve_seam(route, optimize, 3, 3)
+    assert apply is not None
+    apply()
+    after = route.result([])
+    assert after["duration"] < before
+    assert sorted(step["id"] for step in after["steps"] if step["type"] == "job") == list(range(6))
+    assert_consistent(after)
+
+
+def test_split_optimizer_only_splits_oversized_routes():
+    jobs = make_jobs(12)
+    calls = []
+
+    def counting(jobs=None, vehicles=None, geometry=True):
+        calls.append(len(jobs))
+        return optimize(jobs=jobs, vehicles=vehicles, geometry=geometry)
+
+    SplitOptimizer(counting, max_jobs=20)(jobs=jobs, vehicles=[make_vehicle()])
+    assert calls == [12]
+    calls.clear()
+    result = SplitOptimizer(counting, max_jobs=8)(jobs=jobs, vehicles=[make_vehicle()])
+    assert max(calls) <= 8
+    assert sorted(step["id"] for step in job_steps(result)) == list(range(12))
+
+
+def test_seam_windows_stay_within_max_jobs():
+    jobs = make_jobs(30)
+    calls = []
+
+    def counting(jobs=None, vehicles=None, geometry=True):
+        calls.append(len(jobs))
+        return optimize(jobs=jobs, vehicles=vehicles, geometry=geometry)
+
+    result = solve_split(counting, jobs, make_vehicle(), max_jobs=5, boundary_jobs=4)
+    assert max(calls) <= 5
+    assert sorted(step["id"] for step in job_steps(result)) == list(range(30))
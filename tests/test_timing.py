@@ -0,0 +1,70 @@
+import json
+import os
+import pstats
+
+from route_optimizer.timing import Timings, TimingLog, save_profile, start_profile, stop_profile
+
+
+def make_timings(page="data_habs"):
+    timings = Timings(page)
+    with timings.span("load"):
+        with timings.span("parse"):
+            pass
+    with timings.span("map"):
+        pass
+    return timings
+
+
+def test_spans_nest_and_are_timed():
+    timings = make_timings()
+    assert [(span["stage"], span["depth"]) for span in timings.spans] == [("load", 0), ("parse", 1), ("map", 0)]
+    assert all(span["seconds"] >= 0 for span in timings.spans)
+    assert [row["stage"] for row in timings.breakdown()] == ["load", "\u2003parse", "map"]
+
+
+def test_log_appends_one_line_per_rerun(tmp_path):
+    path = os.path.join(tmp_path, "timings.jsonl")
+    log = TimingLog(path, metrics_path=None)
+    log.write(make_timings())
+    log.write(make_timings("leads"))
+    with open(path) as file:
+        records = [json.loads(line) for line in file]
+    assert [record["page"] for record in records] == ["data_habs", "leads"]
+    assert [span["stage"] for span in records[0]["spans"]] == ["load", "parse", "map"]
+
+
+def test_log_rotates_past_its_size(tmp_path):
+    path = os.path.join(tmp_path, "timings.jsonl")
+    log = TimingLog(path, metrics_path=None, max_bytes=10)
+    log.write(make_timings())
+    log.write(make_timings())
+    assert os.path.exists(path + ".1")
+    with open(path) as file:
+        assert len(file.readlines()) == 1
+
+
+def test_metrics_keep_running_totals(tmp_path):
+    metrics_path = os.path.join(tmp_path, "timings.prom")
+    log = TimingLog(None, metrics_path=metrics_path)
+    log.write(make_timings())
+    log.write(make_timings())
+    with open(metrics_path) as file:
+        text = file.read()
+    assert '# TYPE route_optimizer_stage_seconds summary' in text
+    assert 'route_optimizer_stage_seconds_count{page="data_habs",stage="load"} 2' in text
+    assert 'route_optimizer_stage_seconds_count{page="data_habs",stage="total"} 2' in text
+
+
+def test_profile_is_saved_and_readable(tmp_path):
+    profiler = start_profile()
+    sum(range(1000))
+    path = save_profile(profiler, "leads", directory=str(tmp_path))
+    assert os.path.basename(path).startswith("leads-")
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_stopping_a_stopped_profile_is_harmless():
+    profiler = start_profile()
+    stop_profile(profiler)
+    stop_profile(profiler)
+    stop_profile(None)